@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Intel HEX解析性能测试
+
+生成指定大小的HEX文本 (默认接近 MAX_CONTENT_LENGTH = 16MB)，
+比较新解析器与旧的逐行 readlines() 检查的耗时。
+
+用法:
+    python benchmarks/bench_hexfile.py [--size-mb 16] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.hexfile import FirmwareImage, parse_hex
+
+
+def make_hex(text_size: int) -> bytes:
+    """生成约text_size字节的HEX文本 (16字节数据记录)"""
+    data_size = text_size * 16 // 44
+    image = FirmwareImage.from_binary(os.urandom(data_size))
+    return image.to_hex()
+
+
+def legacy_validate(text: bytes) -> bool:
+    """旧版 validate_hex_file 的检查逻辑"""
+    for line in text.decode('ascii').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(':') or len(line) < 11:
+            return False
+    return True
+
+
+def bench(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Intel HEX parser benchmark')
+    parser.add_argument('--size-mb', type=float, default=16, help='HEX文本大小 (MB)')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数 (取最好成绩)')
+    args = parser.parse_args()
+
+    text = make_hex(int(args.size_mb * 1024 * 1024))
+    print(f"HEX文本: {len(text) / 1024 / 1024:.1f} MB, {text.count(b':')} 条记录")
+
+    legacy = bench(lambda: legacy_validate(text), args.repeat)
+    parsed = bench(lambda: parse_hex(text), args.repeat)
+    image = parse_hex(text)
+
+    print(f"旧版逐行检查 (无校验和):  {legacy * 1000:8.1f} ms")
+    print(f"parse_hex (完整校验):      {parsed * 1000:8.1f} ms  "
+          f"({len(text) / parsed / 1024 / 1024:.0f} MB/s)")
+    print(f"镜像: {image.to_dict(page_size=256)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+编程器后端性能测试
+
+在伪终端上启动Optiboot模拟器 (按波特率模拟传输时间、按页模拟擦写时间)，
+分别用原生STK500v1后端和avrdude后端烧录同一镜像 (写入+校验)，比较总耗时。
+avrdude未安装时只测试原生后端。
+
+默认只运行编程器后端，不计入复位时序 (两个后端相同)；--pipeline 时模拟器连接到假GPIO复位线，
+测量完整的 perform_arduino_operation (复位-烧录-复位) 耗时。
+
+用法:
+    python benchmarks/bench_programmers.py [--size-kb 30] [--repeat 3] [--baudrate 115200] [--pipeline]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.config import TestingConfig
+from remote_flasher.gpio import FakeGPIOBackend
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+
+RESET_PIN = 4
+
+
+class BenchConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    LOG_LEVEL = 'WARNING'
+    DEBUG = False
+    AVRDUDE_PATH = shutil.which('avrdude') or '/usr/bin/avrdude'
+
+
+def program(flasher, hex_file, backend, port):
+    """只运行编程器后端 (不含复位时序)"""
+    image = flasher.load_hex_image(hex_file)
+    events = flasher.get_backend(backend).program(hex_file, image, port=port)
+    while True:
+        try:
+            next(events)
+        except StopIteration as stop:
+            return stop.value
+
+
+def bench(hex_file, backend, args):
+    best = float('inf')
+    result = None
+    for _ in range(args.repeat):
+        gpio = FakeGPIOBackend()
+        flasher = AVRFlasher(BenchConfig, gpio_backend=gpio, reset_pin=RESET_PIN)
+        sim = OptibootSimulator(baudrate=args.baudrate, page_write_time=args.page_write_ms / 1000)
+        with sim:
+            start = time.perf_counter()
+            if args.pipeline:
+                sim.attach_reset(gpio, RESET_PIN)
+                result = flasher.perform_arduino_operation(hex_file, port=sim.port, backend=backend)
+            else:
+                result = program(flasher, hex_file, backend, sim.port)
+            best = min(best, time.perf_counter() - start)
+        flasher.cleanup()
+        if not result['success']:
+            break
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Programmer backend benchmark')
+    parser.add_argument('--size-kb', type=float, default=30, help='镜像大小 (KB)')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数 (取最好成绩)')
+    parser.add_argument('--baudrate', type=int, default=115200, help='模拟的串口波特率 (0表示不限速)')
+    parser.add_argument('--page-write-ms', type=float, default=4.5, help='每页擦写时间 (ms)')
+    parser.add_argument('--pipeline', action='store_true', help='包含复位时序的完整流程')
+    args = parser.parse_args()
+
+    data = os.urandom(int(args.size_kb * 1024))
+    with tempfile.NamedTemporaryFile('wb', suffix='.hex', delete=False) as f:
+        f.write(FirmwareImage.from_binary(data).to_hex())
+    mode = '完整流程' if args.pipeline else '仅编程'
+    print(f"镜像: {len(data)} 字节, 波特率: {args.baudrate or '不限速'}, 模式: {mode}")
+
+    try:
+        for backend in ('stk500', 'avrdude'):
+            if backend == 'avrdude' and not os.path.exists(BenchConfig.AVRDUDE_PATH):
+                print(f"{backend:8s}: 未安装，跳过")
+                continue
+            elapsed, result = bench(f.name, backend, args)
+            if not result['success']:
+                print(f"{backend:8s}: 失败 - {result['message']}")
+                continue
+            timings = ', '.join(f"{k} {v * 1000:.1f} ms" for k, v in result.get('timings', {}).items())
+            print(f"{backend:8s}: {elapsed * 1000:8.1f} ms  {timings}")
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    main()
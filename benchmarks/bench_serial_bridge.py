@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+串口TCP桥接与HTTP接口的延迟和吞吐量测试
+
+目标板由伪终端另一端的回显进程代替 (收到什么发回什么)，API服务器在子进程中运行。
+分别测量：
+
+- 往返延迟：发送一条短消息并收到回显的时间 (HTTP为 /serial/write + 轮询 /serial/read)，
+  与直接读写伪终端的延迟相减即为桥接增加的延迟
+- 吞吐量：持续发送数据并接收回显，与1 Mbaud (8N1，100000字节/秒) 比较
+
+用法:
+    python benchmarks/bench_serial_bridge.py [--rounds 200] [--megabytes 2]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+
+import requests
+import serial
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+ONE_MBAUD = 1000000 / 10  # 8N1每字节10位
+MESSAGE = b'ping 0123456789\n'
+
+
+def serve(args):
+    """子进程：运行API服务器"""
+    from remote_flasher.api_server import FlasherAPI
+    from remote_flasher.config import TestingConfig
+
+    config = type('BenchConfig', (TestingConfig,), {
+        'UPLOAD_FOLDER': tempfile.mkdtemp(prefix='bench-bridge-'),
+        'LOG_FILE': None,
+        'LOG_LEVEL': 'ERROR',
+        'DEBUG': False,
+        'SERIAL_BRIDGE_HOST': '127.0.0.1',
+    })
+    FlasherAPI(config).run(host='127.0.0.1', port=args.port, server='asyncio')
+
+
+def echo(fd):
+    """子进程：回显伪终端收到的数据"""
+    while True:
+        data = os.read(fd, 65536)
+        if not data:
+            break
+        os.write(fd, data)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def summary(name, samples, baseline=None):
+    samples.sort()
+    p50 = statistics.median(samples)
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+    added = f"  增加 {(p50 - baseline) * 1e3:7.3f} ms" if baseline is not None else ''
+    print(f"  {name:16s}: p50 {p50 * 1e3:7.3f} ms  p99 {p99 * 1e3:7.3f} ms{added}")
+    return p50
+
+
+def throughput(name, total, elapsed):
+    rate = total / elapsed
+    print(f"  {name:16s}: {rate / 1024:8.1f} KB/s ({rate / ONE_MBAUD:5.2f}x 1 Mbaud)")
+
+
+class HTTPPath:
+    """/serial/write + /serial/read 轮询"""
+
+    def __init__(self, base, port):
+        self.base = base
+        self.params = {'port': port, 'baudrate': 115200}
+        self.http = requests.Session()
+        self.cursor = self.http.post(f'{base}/serial/read', json=dict(self.params, max_lines=0)).json()['next']
+
+    def write(self, data):
+        self.http.post(f'{self.base}/serial/write',
+                       json=dict(self.params, data=data.decode(), add_newline=False))
+
+    def read_lines(self, count):
+        lines = []
+        while len(lines) < count:
+            result = self.http.post(f'{self.base}/serial/read',
+                                    json=dict(self.params, since=self.cursor, max_lines=count - len(lines))).json()
+            self.cursor = result['next']
+            lines.extend(result['data'])
+        return lines
+
+
+def recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(max(65536, size - len(data)))
+        if not chunk:
+            raise ConnectionError('bridge closed')
+        data += chunk
+    return bytes(data)
+
+
+def measure_latency(args, roundtrip):
+    samples = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        roundtrip()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def measure_throughput(total, send, receive):
+    """发送线程持续写入，主线程接收全部回显"""
+    chunk = MESSAGE * 256
+    count = total // len(chunk)
+    sender = threading.Thread(target=lambda: [send(chunk) for _ in range(count)])
+    start = time.perf_counter()
+    sender.start()
+    receive(count * len(chunk))
+    elapsed = time.perf_counter() - start
+    sender.join()
+    return count * len(chunk), elapsed
+
+
+def bench(args):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    tty.setraw(master)
+    port_name = os.ttyname(slave)
+
+    # 直接读写伪终端的基准延迟
+    echoer = subprocess.Popen([sys.executable, __file__, '--echo-fd', str(master)], pass_fds=(master,))
+    direct = serial.Serial(port_name, 115200, timeout=5)
+    print(f"往返延迟 ({args.rounds} 次，{len(MESSAGE)} 字节):")
+    baseline = summary('direct pty', measure_latency(
+        args, lambda: (direct.write(MESSAGE), direct.read(len(MESSAGE)))))
+    direct.close()
+
+    api_port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, '--serve', '--port', str(api_port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{api_port}'
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                requests.get(f'{base}/status', timeout=1)
+                break
+            except requests.ConnectionError:
+                if time.monotonic() > deadline:
+                    print("服务器未启动")
+                    return
+                time.sleep(0.1)
+
+        result = requests.post(f'{base}/serial/open', json={
+            'port': port_name, 'baudrate': 115200, 'bridge': {'protocol': 'raw'}}).json()
+        http = HTTPPath(base, port_name)
+        summary('HTTP', measure_latency(args, lambda: (http.write(MESSAGE), http.read_lines(1))), baseline)
+
+        sock = socket.create_connection(('127.0.0.1', result['bridge']['port']))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        summary('TCP raw', measure_latency(
+            args, lambda: (sock.sendall(MESSAGE), recv_exactly(sock, len(MESSAGE)))), baseline)
+
+        total = int(args.megabytes * 1024 * 1024)
+        print(f"吞吐量 (回显 {total / 1024 / 1024:.1f} MB，HTTP {total / 16 / 1024 / 1024:.2f} MB):")
+        throughput('TCP raw', *measure_throughput(total, sock.sendall, lambda size: recv_exactly(sock, size)))
+        sock.close()
+        http = HTTPPath(base, port_name)
+        throughput('HTTP', *measure_throughput(
+            total // 16, http.write, lambda size: http.read_lines(size // len(MESSAGE))))
+
+        # 切换为RFC 2217桥接
+        requests.post(f'{base}/serial/close', json={'port': port_name, 'baudrate': 115200})
+        result = requests.post(f'{base}/serial/open', json={
+            'port': port_name, 'baudrate': 115200, 'bridge': {'protocol': 'rfc2217'}}).json()
+        remote = serial.serial_for_url(f"rfc2217://127.0.0.1:{result['bridge']['port']}", baudrate=115200, timeout=5)
+        print("RFC 2217 (pyserial客户端):")
+        summary('TCP rfc2217', measure_latency(
+            args, lambda: (remote.write(MESSAGE), remote.read(len(MESSAGE)))), baseline)
+        throughput('TCP rfc2217', *measure_throughput(total, remote.write, remote.read))
+        remote.close()
+    finally:
+        server.terminate()
+        server.wait()
+        echoer.terminate()
+        echoer.wait()
+        os.close(master)
+        os.close(slave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial TCP bridge benchmark')
+    parser.add_argument('--rounds', type=int, default=200, help='延迟测试的往返次数')
+    parser.add_argument('--megabytes', type=float, default=2, help='吞吐量测试的数据量 (MB)')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--echo-fd', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+    elif args.echo_fd is not None:
+        echo(args.echo_fd)
+    else:
+        bench(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+串口抓包时间范围查询性能测试
+
+生成一个模拟长时间测试的抓包文件 (115200波特率的持续输出，每条记录一行)，
+然后查询随机位置附近2秒的数据，比较按索引定位与从头扫描记录头的耗时。
+
+用法:
+    python benchmarks/bench_serial_capture.py [--hours 4] [--queries 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.serial_capture import SerialCapture, CaptureReader, RX
+
+SECOND = 1000000000
+
+
+def build(path, hours, line_rate):
+    """写入hours小时、每秒line_rate行的抓包"""
+    capture = SerialCapture(path)
+    with capture.reader() as reader:
+        wall_time, base = reader.wall_time, reader.monotonic_ns
+    step = SECOND // line_rate
+    count = int(hours * 3600 * line_rate)
+    start = time.perf_counter()
+    for i in range(count):
+        capture.write(RX, b'[%010d] sensor=%05d status=ok\n' % (i, i % 65536), base + i * step)
+    capture.close()
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"抓包: {hours} 小时, {count} 条记录, {size / 1024 / 1024:.1f} MB, "
+          f"写入 {elapsed:.1f} s ({count / elapsed / 1000:.0f}k 条/秒)")
+    return wall_time, hours * 3600
+
+
+def measure(reader, points, window):
+    samples, total = [], 0
+    for point in points:
+        start = time.perf_counter()
+        total += sum(len(record[2]) for record in reader.records(point - window / 2, point + window / 2))
+        samples.append(time.perf_counter() - start)
+    return samples, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial capture range query benchmark')
+    parser.add_argument('--hours', type=float, default=4, help='抓包时长 (小时)')
+    parser.add_argument('--line-rate', type=int, default=300, help='每秒行数 (115200波特率约每秒300行)')
+    parser.add_argument('--queries', type=int, default=20, help='查询次数')
+    parser.add_argument('--window', type=float, default=2, help='查询窗口 (秒)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'soak.cap')
+        wall_time, duration = build(path, args.hours, args.line_rate)
+        random.seed(1)
+        points = [wall_time + random.uniform(0, duration) for _ in range(args.queries)]
+
+        for name, index_path in (('索引', path + '.idx'), ('无索引', None)):
+            with CaptureReader(path, index_path) as reader:
+                queries = points if index_path else points[:3]
+                samples, total = measure(reader, queries, args.window)
+            print(f"  {name:6s}: {len(queries):3d} 次查询 {args.window:.0f} 秒窗口, "
+                  f"p50 {statistics.median(samples) * 1000:8.2f} ms  最大 {max(samples) * 1000:8.2f} ms  "
+                  f"(平均 {total / len(queries) / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+串口触发器匹配性能测试
+
+模拟115200波特率下的日志输出，注册若干字面量 (错误码、状态字) 和正则表达式，
+比较组合模式一次扫描整块数据与逐行逐个模式查找的吞吐量。
+
+用法:
+    python benchmarks/bench_serial_triggers.py [--literals 50] [--mb 8]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.serial_triggers import compile_patterns
+
+
+def make_log(size):
+    """生成size字节不含任何模式的日志"""
+    rng = random.Random(1)
+    lines, total, i = [], 0, 0
+    while total < size:
+        line = b'[%08d] sensor=%05d adc=%04x status=ok\n' % (i, rng.randrange(65536), rng.randrange(4096))
+        lines.append(line)
+        total += len(line)
+        i += 1
+    return b''.join(lines)
+
+
+def per_line(data, literals, regexes):
+    compiled = [re.compile(regex.encode(), re.MULTILINE) for regex in regexes]
+    encoded = [literal.encode() for literal in literals]
+    for line in data.split(b'\n'):
+        for literal in encoded:
+            if literal in line:
+                return line
+        for regex in compiled:
+            if regex.search(line):
+                return line
+    return None
+
+
+def combined(data, literals, regexes):
+    return compile_patterns(literals, regexes).search(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial trigger matching benchmark')
+    parser.add_argument('--literals', type=int, default=50, help='字面量数量')
+    parser.add_argument('--mb', type=float, default=8, help='日志大小 (MB)')
+    args = parser.parse_args()
+
+    data = make_log(int(args.mb * 1024 * 1024))
+    literals = [f'ERR_{i:04d}' for i in range(args.literals - 3)] + ['PANIC', 'Guru Meditation', 'READY']
+    regexes = [r'^(PASS|FAIL)\b', r'temp=(1[0-9]{2})C']
+    print(f"日志: {len(data) / 1024 / 1024:.1f} MB, {len(literals)} 个字面量, {len(regexes)} 个正则表达式")
+
+    for name, func in (('组合模式', combined), ('逐行查找', per_line)):
+        start = time.perf_counter()
+        result = func(data, literals, regexes)
+        elapsed = time.perf_counter() - start
+        assert not result
+        print(f"  {name}: {elapsed * 1000:8.1f} ms  ({len(data) / elapsed / 1024 / 1024:8.1f} MB/s)")
+
+
+if __name__ == '__main__':
+    main()
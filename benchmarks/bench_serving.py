@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+服务器模式负载测试
+
+在子进程中分别以开发服务器 (flask，每个连接一个线程) 和异步服务器 (asyncio)
+运行API，同时发起多个 /flash/stream 流式烧录 (每个客户端一个设备) 和 /status 轮询，
+比较服务器进程的峰值线程数、内存和状态接口的延迟。
+
+avrdude由一个按固定间隔输出进度行的脚本代替，不需要硬件。
+
+用法:
+    python benchmarks/bench_serving.py [--viewers 50] [--pollers 4] [--lines 40] [--delay 0.05]
+"""
+
+import argparse
+import hashlib
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.hexfile import FirmwareImage
+
+FAKE_AVRDUDE = '''#!{python}
+import os, time
+for i in range(int(os.environ['BENCH_LINES'])):
+    print(f'avrdude: writing block {{i}}', flush=True)
+    time.sleep(float(os.environ['BENCH_DELAY']))
+'''
+
+
+def serve(args):
+    """子进程：运行API服务器"""
+    from remote_flasher.api_server import FlasherAPI
+    from remote_flasher.config import TestingConfig
+
+    store = tempfile.mkdtemp(prefix='bench-serving-')
+    config = type('BenchConfig', (TestingConfig,), {
+        'UPLOAD_FOLDER': store,
+        'FIRMWARE_STORE_DIR': store,
+        'LOG_FILE': None,
+        'LOG_LEVEL': 'ERROR',
+        'DEBUG': False,
+        'PROGRAMMER_BACKEND': 'avrdude',
+        'AVRDUDE_PATH': args.avrdude,
+        'RESET_PROFILES': {'bench': {'reset_hold': 0, 'probe': False, 'settle': 0, 'restart_hold': 0}},
+        'DEFAULT_RESET_PROFILE': 'bench',
+    })
+    FlasherAPI(config).run(host='127.0.0.1', port=args.port, server=args.serve)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def proc_status(pid):
+    """服务器进程的线程数和常驻内存 (KB)"""
+    values = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Threads', 'VmRSS'):
+                    values[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return values.get('Threads', 0), values.get('VmRSS', 0)
+
+
+def bench(mode, args, avrdude):
+    port = free_port()
+    env = dict(os.environ, BENCH_LINES=str(args.lines), BENCH_DELAY=str(args.delay))
+    server = subprocess.Popen([sys.executable, __file__, '--serve', mode, '--port', str(port),
+                               '--avrdude', avrdude], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                requests.get(f'{base}/status', timeout=1)
+                break
+            except requests.ConnectionError:
+                if time.monotonic() > deadline:
+                    print(f"{mode:8s}: 服务器未启动")
+                    return
+                time.sleep(0.1)
+
+        hex_data = FirmwareImage.from_binary(os.urandom(1024)).to_hex()
+        sha = hashlib.sha256(hex_data).hexdigest()
+        requests.put(f'{base}/firmware/{sha}', data=hex_data)
+
+        done = threading.Event()
+        results = []
+        latencies = []
+        peak = {'threads': 0, 'rss': 0}
+
+        def viewer(index):
+            try:
+                with requests.post(f'{base}/flash/stream', params={'port': f'/dev/ttyBENCH{index}', 'sha256': sha},
+                                   stream=True, timeout=120) as response:
+                    lines = [line for line in response.iter_lines() if line.startswith(b'data: ')]
+                results.append(b'"success"' in b''.join(lines))
+            except requests.RequestException:
+                results.append(False)
+
+        def poller():
+            session = requests.Session()
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    session.get(f'{base}/status', timeout=30)
+                    latencies.append(time.perf_counter() - start)
+                except requests.RequestException:
+                    pass
+                time.sleep(0.02)
+
+        def sampler():
+            while not done.is_set():
+                threads, rss = proc_status(server.pid)
+                peak['threads'] = max(peak['threads'], threads)
+                peak['rss'] = max(peak['rss'], rss)
+                time.sleep(0.05)
+
+        helpers = [threading.Thread(target=poller) for _ in range(args.pollers)]
+        helpers.append(threading.Thread(target=sampler))
+        viewers = [threading.Thread(target=viewer, args=(i,)) for i in range(args.viewers)]
+        for thread in helpers:
+            thread.start()
+        start = time.perf_counter()
+        for thread in viewers:
+            thread.start()
+        for thread in viewers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in helpers:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    print(f"{mode:8s}: 成功 {sum(results):3d}/{args.viewers}  总耗时 {elapsed:6.2f} s  "
+          f"峰值线程 {peak['threads']:4d}  峰值内存 {peak['rss'] / 1024:6.1f} MB  "
+          f"/status p50 {statistics.median(latencies) * 1000 if latencies else 0:7.1f} ms  "
+          f"p95 {p95 * 1000:7.1f} ms ({len(latencies)} 次)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serving mode load benchmark')
+    parser.add_argument('--viewers', type=int, default=50, help='并发流式烧录客户端数')
+    parser.add_argument('--pollers', type=int, default=4, help='并发状态轮询客户端数')
+    parser.add_argument('--lines', type=int, default=40, help='每次烧录的avrdude输出行数')
+    parser.add_argument('--delay', type=float, default=0.05, help='avrdude输出行间隔 (秒)')
+    parser.add_argument('--modes', default='flask,asyncio', help='要测试的服务器模式')
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--avrdude', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        avrdude = os.path.join(tmp, 'avrdude')
+        with open(avrdude, 'w') as f:
+            f.write(FAKE_AVRDUDE.format(python=sys.executable))
+        os.chmod(avrdude, 0o755)
+
+        print(f"流式客户端: {args.viewers}, 轮询客户端: {args.pollers}, "
+              f"每次烧录: {args.lines} 行 x {args.delay * 1000:.0f} ms")
+        for mode in args.modes.split(','):
+            bench(mode, args, avrdude)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+上传烧录路径性能测试
+
+比较 multipart 上传 (/flash/file，保存到固件存储后由编程器读取文件) 与
+原始请求体上传 (/flash/raw，镜像只在内存中) 的请求延迟和磁盘写入量。
+目标板为不限速的Optiboot模拟器，每次请求使用不同的镜像 (固件存储无法去重)。
+
+磁盘写入量取自 /proc/self/io 的 write_bytes (不支持时只统计固件存储中的字节数)。
+固件存储目录位于tmpfs时 write_bytes 为0，可用 --store-dir 指定SD卡上的目录。
+
+用法:
+    python benchmarks/bench_upload.py [--size-kb 30] [--repeat 10] [--backend stk500] [--store-dir DIR]
+"""
+
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.api_server import FlasherAPI
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+
+
+def write_bytes():
+    """当前进程累计写入存储设备的字节数"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('write_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def post_file(client, body, port):
+    return client.post('/flash/file', query_string={'port': port},
+                       data={'file': (io.BytesIO(body), 'firmware.hex')},
+                       content_type='multipart/form-data')
+
+
+def post_raw(client, body, port):
+    return client.post('/flash/raw', query_string={'port': port}, data=body,
+                       content_type='application/octet-stream')
+
+
+def bench(name, post, args, store_dir):
+    config = type('BenchConfig', (TestingConfig,), {
+        'UPLOAD_FOLDER': store_dir,
+        'FIRMWARE_STORE_DIR': store_dir,
+        'FLASH_HISTORY_FILE': None,
+        'LOG_FILE': None,
+        'LOG_LEVEL': 'ERROR',
+        'DEBUG': False,
+        'PROGRAMMER_BACKEND': args.backend,
+    })
+    api = FlasherAPI(config)
+    client = api.app.test_client()
+    bodies = [FirmwareImage.from_binary(os.urandom(int(args.size_kb * 1024))).to_hex()
+              for _ in range(args.repeat)]
+
+    elapsed = []
+    try:
+        with OptibootSimulator() as sim:
+            disk_before = write_bytes()
+            for body in bodies:
+                start = time.perf_counter()
+                result = post(client, body, sim.port).get_json()
+                elapsed.append(time.perf_counter() - start)
+                if not result.get('success'):
+                    print(f"{name:12s}: 失败 - {result.get('message') or result.get('error')}")
+                    return
+            if disk_before is not None:
+                os.sync()
+                disk = write_bytes() - disk_before
+            else:
+                disk = None
+    finally:
+        stored = api.firmware.stats()['total_bytes']
+        api.jobs.shutdown(timeout=1)
+        api.devices.cleanup()
+
+    disk_text = f"{disk / 1024:8.1f} KB" if disk is not None else '     n/a'
+    print(f"{name:12s}: 平均 {sum(elapsed) / len(elapsed) * 1000:7.1f} ms  最快 {min(elapsed) * 1000:7.1f} ms  "
+          f"磁盘写入 {disk_text}  固件存储 {stored / 1024:8.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload path benchmark')
+    parser.add_argument('--size-kb', type=float, default=30, help='镜像大小 (KB)')
+    parser.add_argument('--repeat', type=int, default=10, help='请求次数')
+    parser.add_argument('--backend', default='stk500', help='编程器后端')
+    parser.add_argument('--store-dir', help='固件存储目录 (默认新建临时目录)')
+    args = parser.parse_args()
+
+    print(f"镜像: {int(args.size_kb * 1024)} 字节, 请求: {args.repeat} 次, 后端: {args.backend}")
+    for name, post in (('/flash/file', post_file), ('/flash/raw', post_raw)):
+        store_dir = tempfile.mkdtemp(prefix='bench-store-', dir=args.store_dir)
+        try:
+            bench(name, post, args, store_dir)
+        finally:
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
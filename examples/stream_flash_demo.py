@@ -62,6 +62,13 @@ def stream_flash_demo(server_url, hex_file, **params):
                         print(f"ℹ️  {message}")
                     elif msg_type == 'output':
                         print(f"   {message}")
+                    elif msg_type == 'progress':
+                        # 同一行重绘进度条
+                        bar = '#' * (data['percent'] // 2)
+                        print(f"\r   {data['phase']:<10} |{bar:<50}| {data['percent']:3d}%", end='', flush=True)
+                    elif msg_type == 'phase':
+                        if data['state'] != 'start':
+                            print()
                     else:
                         print(f"   {message}")
                         
@@ -135,31 +142,26 @@ def serial_debug_demo(server_url, port="/dev/ttyS0", baudrate=9600):
             
             time.sleep(0.5)
         
-        # 3. 读取串口数据
-        print("\n3. 读取串口数据...")
-        for i in range(3):
-            response = requests.post(f"{server_url}/serial/read", json={
-                'port': port,
-                'baudrate': baudrate,
-                'max_lines': 10
-            })
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    lines = result.get('data', [])
-                    if lines:
-                        print(f"📥 接收到 {len(lines)} 行数据:")
-                        for line in lines:
-                            print(f"   {line}")
-                    else:
-                        print("   (无数据)")
-                else:
-                    print(f"❌ 读取失败: {result.get('message')}")
-            else:
-                print(f"❌ 读取请求失败: {response.text}")
-            
-            time.sleep(1)
+        # 3. 订阅串口输出 (服务器推送，无需轮询)
+        print("\n3. 订阅串口输出 (3秒)...")
+        conn_id = f"{port}_{baudrate}".lstrip('/')
+        deadline = time.time() + 3
+        try:
+            with requests.get(f"{server_url}/serial/{conn_id}/stream", params={'since': 0},
+                              stream=True, timeout=(5, 3)) as response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith('data: '):
+                        event = json.loads(line[6:])
+                        if event['type'] == 'lines':
+                            for text in event['lines']:
+                                print(f"📥 {text}")
+                        elif event['type'] == 'dropped':
+                            print(f"⚠️ 输出过快，丢弃 {event['bytes']} 字节")
+                    if time.time() > deadline:
+                        break
+        except requests.exceptions.ConnectionError:
+            # 3秒内没有新数据时读取超时
+            pass
         
         # 4. 获取连接状态
         print("\n4. 获取连接状态...")
@@ -22,6 +22,7 @@ def main():
     parser.add_argument('--port', type=int, default=5000, help='Port to bind to')
     parser.add_argument('--config', default='development', help='Configuration name')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--server', choices=['flask', 'asyncio'], help='Server mode (default: SERVER_MODE)')
     
     args = parser.parse_args()
     
@@ -29,7 +30,7 @@ def main():
     api = FlasherAPI(args.config)
     
     # 运行服务器
-    api.run(host=args.host, port=args.port, debug=args.debug)
+    api.run(host=args.host, port=args.port, debug=args.debug, server=args.server)
 
 if __name__ == '__main__':
     main()
@@ -5,9 +5,10 @@ REST API服务器 - RemoteFlasher API
 
 import os
 import json
+import hashlib
 import logging
+import time
 from pathlib import Path
-from werkzeug.utils import secure_filename
 
 # 由于依赖安装问题，我们先创建一个简化版本，稍后可以添加Flask
 try:
@@ -20,19 +21,40 @@ except ImportError:
     FLASK_AVAILABLE = False
     print("Flask not available. Please install: pip install Flask Flask-CORS")
 
-from .avr_flasher import AVRFlasher
 from .config import get_config
+from .devices import DeviceRegistry, UnknownDeviceError
+from .jobs import JobManager, UnknownJobError
+from .plan import PlanError, build_plan
+from .firmware_store import FirmwareStore, FirmwareNotFoundError, is_sha256
+from .hexfile import FirmwareImage
+from .programmers import PROGRAMMER_BACKENDS
+from .serial_session import SerialSession
+from .serial_bridge import SerialBridge
+from .serial_capture import SerialCapture
+from .serial_triggers import SerialTrigger, compile_patterns
+
+# 异步服务器放入WSGI环境的列表：同步请求的任务登记在这里，由事件循环等待任务结束，不占用线程池
+DEFERRED_JOBS_ENVIRON = 'remote_flasher.deferred_jobs'
 
 class FlasherAPI:
     """AVR烧录器API服务"""
     
     def __init__(self, config_name=None):
         self.config = get_config(config_name)
-        self.flasher = AVRFlasher(config_name)
+        self.devices = DeviceRegistry(config_name)
+        self.flasher = self.devices.default.flasher
+        self.jobs = JobManager(self.devices, self.config.JOB_HISTORY_SIZE)
+        self.firmware = FirmwareStore(
+            self.config.FIRMWARE_STORE_DIR,
+            self.config.FIRMWARE_STORE_MAX_BYTES,
+            self.config.MAX_CONTENT_LENGTH
+        )
         self.logger = self._setup_logger()
         
         if FLASK_AVAILABLE:
             self.app = self._create_flask_app()
+            # 串口会话保存在设备注册表中，烧录同一串口时自动暂停和恢复
+            self.app.serial_connections = self.devices.serial_sessions
         else:
             self.app = None
             self.logger.error("Flask not available, API server cannot start")
@@ -79,8 +101,19 @@ class FlasherAPI:
                     'GET /': 'API information',
                     'GET /status': 'Service status',
                     'POST /flash/file': 'Flash uploaded hex file',
+                    'POST /flash/raw': 'Flash hex content from request body (in memory)',
                     'POST /flash/url': 'Flash hex file from URL',
+                    'POST /program': 'Run several memory operations (flash/eeprom/fuses/lock) in one session',
                     'GET /device/info': 'Get device information',
+                    'GET /devices': 'List registered devices',
+                    'HEAD /firmware/<sha256>': 'Check whether firmware is stored',
+                    'PUT /firmware/<sha256>': 'Upload firmware by SHA-256',
+                    'GET /jobs/<job_id>': 'Get flash job status',
+                    'GET /jobs/<job_id>/wait': 'Wait for flash job to finish',
+                    'GET /serial/<connection_id>/stream': 'Push serial output (server-sent events)',
+                    'GET /serial/<connection_id>/capture': 'Read the serial capture log by time range',
+                    'POST /serial/<connection_id>/triggers': 'Register serial output triggers (optionally wait)',
+                    'GET /serial/<connection_id>/triggers/<trigger_id>/wait': 'Wait for the first trigger match',
                     'GET /config': 'Get current configuration'
                 }
             })
@@ -93,48 +126,84 @@ class FlasherAPI:
                 'flasher_ready': True,
                 'gpio_available': self.flasher.gpio_available,
                 'upload_folder': self.config.UPLOAD_FOLDER,
-                'supported_mcus': self.config.SUPPORTED_MCUS,
-                'supported_programmers': self.config.SUPPORTED_PROGRAMMERS
+                'firmware_store': self.firmware.stats(),
+                'url_cache': self.devices.url_cache.stats(),
+                'identity_cache': self.devices.identity.stats(),
+                'supported_mcus': self.devices.parts.mcus(),
+                'supported_programmers': self.devices.parts.programmers(),
+                'devices': [device.to_dict() for device in self.devices.devices()]
+            })
+
+        @app.route('/devices', methods=['GET'])
+        def list_devices():
+            """列出已注册设备"""
+            devices = [device.to_dict() for device in self.devices.devices()]
+            return jsonify({
+                'success': True,
+                'devices': devices,
+                'total_devices': len(devices)
             })
         
         @app.route('/flash/file', methods=['POST'])
         def flash_file():
-            """烧录上传的hex文件"""
+            """烧录上传的hex文件 (或通过sha256引用已上传的固件)"""
             try:
-                # 检查文件
-                if 'file' not in request.files:
-                    return jsonify({'error': 'No file provided'}), 400
-                
-                file = request.files['file']
-                if file.filename == '':
-                    return jsonify({'error': 'No file selected'}), 400
-                
-                if not self._allowed_file(file.filename):
-                    return jsonify({'error': 'Invalid file type'}), 400
-                
-                # 保存文件
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(self.config.UPLOAD_FOLDER, filename)
-                file.save(file_path)
-                
-                # 获取烧录参数
-                flash_params = self._get_flash_params(request)
+                device, flash_params, sha = self._prepare_stream(request)
+                file_path = self.firmware.path(sha)
                 
                 # 执行烧录 (使用FangTangLink风格的完整操作流程)
-                result = self.flasher.perform_arduino_operation(file_path, **flash_params)
-                
-                # 清理文件
-                try:
-                    os.unlink(file_path)
-                except:
-                    pass
-                
-                return jsonify(result)
+                return self._run_job(
+                    device, 'flash_file',
+                    lambda: self._tag_firmware(
+                        device.flasher.perform_arduino_operation(file_path, **flash_params), sha),
+                    cleanup=lambda: self.firmware.unpin(sha)
+                )
                 
+            except (UnknownDeviceError, FirmwareNotFoundError) as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 self.logger.error(f"Flash file error: {e}")
                 return jsonify({'error': str(e)}), 500
         
+        @app.route('/flash/raw', methods=['POST'])
+        def flash_raw():
+            """烧录请求体中的hex或二进制内容 (application/octet-stream)，镜像只保存在内存中"""
+            try:
+                if request.mimetype != 'application/octet-stream':
+                    return jsonify({'error': 'Content-Type must be application/octet-stream'}), 415
+
+                # 获取目标设备和烧录参数
+                device = self._resolve_device(request)
+                flash_params = self._get_flash_params(request, device=device)
+
+                # 直接读取请求体，不经过multipart解析，也不写入固件存储
+                data = request.get_data(cache=False)
+                if not data:
+                    return jsonify({'error': 'No firmware provided'}), 400
+                sha = hashlib.sha256(data).hexdigest()
+                expected = request.args.get('sha256')
+                if expected and expected.lower() != sha:
+                    return jsonify({'error': f'SHA-256 mismatch: expected {expected}, got {sha}'}), 400
+                if data.lstrip()[:1] != b':':
+                    # 二进制固件从地址0开始，与URL下载相同
+                    data = FirmwareImage.from_binary(data).to_hex()
+
+                return self._run_job(
+                    device, 'flash_raw',
+                    lambda: self._tag_firmware(
+                        device.flasher.perform_arduino_operation(data, **flash_params), sha)
+                )
+
+            except UnknownDeviceError as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                self.logger.error(f"Flash raw error: {e}")
+                return jsonify({'error': str(e)}), 500
+
         @app.route('/flash/url', methods=['POST'])
         def flash_url():
             """从URL下载并烧录hex文件"""
@@ -144,35 +213,145 @@ class FlasherAPI:
                     return jsonify({'error': 'URL required'}), 400
                 
                 url = data['url']
+                expected_sha = data.get('sha256')
+                if expected_sha and not is_sha256(expected_sha.lower()):
+                    return jsonify({'error': 'Invalid SHA-256'}), 400
                 
-                # 获取烧录参数
-                flash_params = self._get_flash_params(request, data)
+                # 获取目标设备和烧录参数
+                device = self._resolve_device(request, data)
+                flash_params = self._get_flash_params(request, data, device)
                 
                 # 执行烧录
-                result = self.flasher.flash_from_url(url, **flash_params)
-                
-                return jsonify(result)
+                return self._run_job(
+                    device, 'flash_url',
+                    lambda: device.flasher.flash_from_url(url, expected_sha256=expected_sha, **flash_params),
+                    data=data
+                )
                 
+            except UnknownDeviceError as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 self.logger.error(f"Flash URL error: {e}")
                 return jsonify({'error': str(e)}), 500
         
+        @app.route('/program', methods=['POST'])
+        def program():
+            """在一次编程器会话中执行多个存储器操作 (JSON，或multipart的 operations 字段加上传的文件)"""
+            try:
+                data = request.get_json(silent=True)
+                if data is None:
+                    data = request.form.to_dict()
+                    try:
+                        data['operations'] = json.loads(data.get('operations') or 'null')
+                    except ValueError:
+                        return jsonify({'error': 'operations must be JSON'}), 400
+                    if 'baudrate' in data:
+                        data['baudrate'] = int(data['baudrate'])
+
+                # 获取目标设备和烧录参数
+                device = self._resolve_device(request, data)
+                flash_params = self._get_flash_params(request, data, device)
+
+                # 在排队和复位目标板之前检查整个计划
+                plan = build_plan(data.get('operations'),
+                                  self.devices.parts.resolve_part(flash_params['mcu']),
+                                  flash_params['programmer'], self._plan_source)
+
+                return self._run_job(
+                    device, 'program',
+                    lambda: device.flasher.program_plan(plan, **flash_params),
+                    data=data
+                )
+
+            except (UnknownDeviceError, FirmwareNotFoundError) as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                self.logger.error(f"Program error: {e}")
+                return jsonify({'error': str(e)}), 500
+
         @app.route('/device/info', methods=['GET'])
         def device_info():
             """获取设备信息"""
             try:
                 # 获取设备参数
-                device_params = self._get_flash_params(request)
+                device = self._resolve_device(request)
+                device_params = self._get_flash_params(request, device=device)
                 
-                # 获取设备信息
-                result = self.flasher.get_device_info(**device_params)
+                # 缓存的设备身份不需要复位目标板，也不占用设备锁；refresh=1 时重新读取
+                result = None
+                if not self._get_flag(request, 'refresh'):
+                    result = device.flasher.cached_device_info(**device_params)
+                if result is None:
+                    with self.devices.acquire(device, release_serial=True):
+                        result = device.flasher.get_device_info(refresh=True, **device_params)
                 
                 return jsonify(result)
                 
+            except UnknownDeviceError as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 self.logger.error(f"Device info error: {e}")
                 return jsonify({'error': str(e)}), 500
 
+        @app.route('/firmware/<sha>', methods=['HEAD'])
+        def firmware_head(sha):
+            """检查固件是否已存储"""
+            sha = sha.lower()
+            if not self.firmware.has(sha):
+                return Response(status=404)
+            return Response(status=200, headers={'Content-Length': str(self.firmware.size_of(sha))})
+
+        @app.route('/firmware/<sha>', methods=['PUT'])
+        def firmware_put(sha):
+            """按SHA-256上传固件 (请求体为固件原始内容)"""
+            try:
+                sha = sha.lower()
+                if not is_sha256(sha):
+                    return jsonify({'error': 'Invalid SHA-256'}), 400
+                existed = self.firmware.has(sha)
+                self.firmware.put(request.get_data(), expected_sha=sha)
+                return jsonify({
+                    'success': True,
+                    'sha256': sha,
+                    'size': self.firmware.size_of(sha),
+                    'created': not existed
+                }), 200 if existed else 201
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                self.logger.error(f"Firmware upload error: {e}")
+                return jsonify({'error': str(e)}), 500
+
+        @app.route('/jobs/<job_id>', methods=['GET'])
+        def job_status(job_id):
+            """获取烧录任务状态"""
+            try:
+                job = self.jobs.get(job_id)
+                info = job.to_dict()
+                info['queue_depth'] = self.jobs.queue_depth(job.device_name)
+                return jsonify(info)
+            except UnknownJobError as e:
+                return jsonify({'error': str(e.args[0])}), 404
+
+        @app.route('/jobs/<job_id>/wait', methods=['GET'])
+        def job_wait(job_id):
+            """长轮询等待烧录任务结束"""
+            try:
+                job = self.jobs.get(job_id)
+                timeout = float(request.args.get('timeout', self.config.JOB_WAIT_TIMEOUT))
+                job.wait(max(0.0, min(timeout, self.config.JOB_WAIT_TIMEOUT)))
+                return jsonify(job.to_dict())
+            except UnknownJobError as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError:
+                return jsonify({'error': 'Invalid timeout'}), 400
+
         @app.route('/control/reset', methods=['POST'])
         def control_reset():
             """控制Arduino复位"""
@@ -180,32 +359,41 @@ class FlasherAPI:
                 data = request.get_json() or {}
                 reset_state = data.get('reset', True)  # True=进入复位, False=退出复位
                 duration = data.get('duration', 0.1)   # 复位持续时间
+                device = self._resolve_device(request, data)
+                flasher = device.flasher
 
                 if reset_state in [True, 'true', '1', 1]:
                     # 进入复位状态
-                    success = self.flasher.control_arduino_reset(reset=True)
-                    if duration > 0:
-                        import time
-                        time.sleep(duration)
-                        # 自动退出复位状态
-                        success = success and self.flasher.control_arduino_reset(reset=False)
-                        message = f"复位操作完成 (持续{duration}秒)"
-                    else:
-                        message = "Arduino进入复位状态"
+                    with self.devices.acquire(device):
+                        success = flasher.control_arduino_reset(reset=True)
+                        if duration > 0:
+                            import time
+                            time.sleep(duration)
+                            # 自动退出复位状态
+                            success = success and flasher.control_arduino_reset(reset=False)
+                            message = f"复位操作完成 (持续{duration}秒)"
+                        else:
+                            message = "Arduino进入复位状态"
                 elif reset_state in [False, 'false', '0', 0]:
                     # 退出复位状态
-                    success = self.flasher.control_arduino_reset(reset=False)
+                    with self.devices.acquire(device):
+                        success = flasher.control_arduino_reset(reset=False)
                     message = "Arduino退出复位状态"
                 else:
                     return jsonify({'error': 'Invalid reset state. Use true/false'}), 400
 
-                return jsonify({
+                return jsonify(self._with_warnings(device, {
                     'success': success,
                     'message': message,
                     'reset_state': reset_state,
-                    'duration': duration
-                })
+                    'duration': duration,
+                    'device': device.name
+                }))
 
+            except UnknownDeviceError as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 self.logger.error(f"Reset control error: {e}")
                 return jsonify({'error': str(e)}), 500
@@ -214,30 +402,27 @@ class FlasherAPI:
         def arduino_operation():
             """执行完整的Arduino操作 (FangTangLink风格)"""
             try:
-                # 检查是否有文件上传
-                hex_file_path = None
-                if 'file' in request.files:
-                    file = request.files['file']
-                    if file.filename != '' and self._allowed_file(file.filename):
-                        filename = secure_filename(file.filename)
-                        hex_file_path = os.path.join(self.config.UPLOAD_FOLDER, filename)
-                        file.save(hex_file_path)
-
-                # 获取操作参数
-                flash_params = self._get_flash_params(request)
-
-                # 执行完整的Arduino操作
-                result = self.flasher.perform_arduino_operation(hex_file_path, **flash_params)
-
-                # 清理临时文件
-                if hex_file_path:
-                    try:
-                        os.unlink(hex_file_path)
-                    except:
-                        pass
+                # 获取目标设备和操作参数
+                device = self._resolve_device(request)
+                flash_params = self._get_flash_params(request, device=device)
 
-                return jsonify(result)
+                # 检查是否有文件上传 (可选)
+                sha = self._pin_firmware(request)
+                hex_file_path = self.firmware.path(sha) if sha else None
+
+                # 执行完整的Arduino操作 (只复位时不占用串口)
+                return self._run_job(
+                    device, 'arduino_operation',
+                    lambda: self._tag_firmware(
+                        device.flasher.perform_arduino_operation(hex_file_path, **flash_params), sha),
+                    cleanup=lambda: self.firmware.unpin(sha) if sha else None,
+                    release_serial=bool(sha or flash_params.get('await_pattern'))
+                )
 
+            except (UnknownDeviceError, FirmwareNotFoundError) as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 self.logger.error(f"Arduino operation error: {e}")
                 return jsonify({'error': str(e)}), 500
@@ -246,40 +431,29 @@ class FlasherAPI:
         def flash_stream():
             """流式烧录端点"""
             try:
-                # 检查文件
-                if 'file' not in request.files:
-                    return jsonify({'error': 'No file provided'}), 400
+                # 获取目标设备和烧录参数
+                device = self._resolve_device(request)
+                flash_params = self._get_flash_params(request, device=device)
 
-                file = request.files['file']
-                if file.filename == '':
-                    return jsonify({'error': 'No file selected'}), 400
-
-                if not self._allowed_file(file.filename):
-                    return jsonify({'error': 'Invalid file type'}), 400
-
-                # 保存文件
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(self.config.UPLOAD_FOLDER, filename)
-                file.save(file_path)
-
-                # 获取烧录参数
-                flash_params = self._get_flash_params(request)
+                # 保存文件到固件存储并锁定
+                sha = self._pin_firmware(request)
+                if sha is None:
+                    return jsonify({'error': 'No file provided'}), 400
+                file_path = self.firmware.path(sha)
 
                 def generate():
                     """生成流式响应"""
                     try:
-                        for output in self.flasher.flash_hex_file_stream(file_path, **flash_params):
-                            yield f"data: {json.dumps(output)}\n\n"
+                        # 设备锁在生成器内获取，覆盖整个流式烧录过程
+                        for warning in device.warnings():
+                            yield f"data: {json.dumps({'type': 'warning', 'message': warning})}\n\n"
+                        with self.devices.acquire(device, release_serial=True):
+                            for output in device.flasher.flash_hex_file_stream(file_path, **flash_params):
+                                yield f"data: {json.dumps(output)}\n\n"
                     except Exception as e:
                         yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-                    finally:
-                        # 清理文件
-                        try:
-                            os.unlink(file_path)
-                        except:
-                            pass
 
-                return Response(
+                response = Response(
                     generate(),
                     mimetype='text/plain',
                     headers={
@@ -288,7 +462,14 @@ class FlasherAPI:
                         'X-Accel-Buffering': 'no'  # 禁用nginx缓冲
                     }
                 )
+                # 响应结束 (包括客户端提前断开) 时解除固件锁定
+                response.call_on_close(lambda: self.firmware.unpin(sha))
+                return response
 
+            except (UnknownDeviceError, FirmwareNotFoundError) as e:
+                return jsonify({'error': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 self.logger.error(f"Stream flash error: {e}")
                 return jsonify({'error': str(e)}), 500
@@ -302,21 +483,40 @@ class FlasherAPI:
                 baudrate = data.get('baudrate', 9600)
                 timeout = data.get('timeout', 1)
 
-                # 存储串口连接（简化版本，实际应用中可能需要会话管理）
+                # 重新打开同一连接时先关闭原有会话
+                app.serial_connections = getattr(app, 'serial_connections', {})
+                conn_id = f"{port}_{baudrate}"
+                if conn_id in app.serial_connections:
+                    app.serial_connections.pop(conn_id).close()
+
                 serial_conn = self.flasher.open_serial_connection(port, baudrate, timeout)
 
                 if serial_conn:
-                    # 将连接存储在应用上下文中（简化处理）
-                    app.serial_connections = getattr(app, 'serial_connections', {})
-                    conn_id = f"{port}_{baudrate}"
-                    app.serial_connections[conn_id] = serial_conn
+                    # 后台线程持续读取串口数据到环形缓冲区
+                    session = SerialSession(serial_conn, self.config.SERIAL_BUFFER_SIZE, self.logger)
+                    if data.get('capture'):
+                        # 抓包文件在串口关闭后仍可查询
+                        session.capture = self._create_capture(port, baudrate)
+                        app.serial_captures = getattr(app, 'serial_captures', {})
+                        app.serial_captures[conn_id] = session.capture
+                    if data.get('bridge'):
+                        try:
+                            session.bridge = self._create_bridge(session, data['bridge'])
+                        except (TypeError, ValueError, OSError) as e:
+                            session.close()
+                            return jsonify({'success': False, 'error': f'Invalid bridge options: {e}'}), 400
+                    app.serial_connections[conn_id] = session.start()
+                    if session.bridge:
+                        session.bridge.start()
 
                     return jsonify({
                         'success': True,
                         'message': f'Serial connection opened: {port} @ {baudrate}',
                         'connection_id': conn_id,
                         'port': port,
-                        'baudrate': baudrate
+                        'baudrate': baudrate,
+                        'bridge': session.bridge.info() if session.bridge else None,
+                        'capture': session.capture.path if session.capture else None
                     })
                 else:
                     return jsonify({
@@ -336,6 +536,9 @@ class FlasherAPI:
                 port = data.get('port', self.config.DEFAULT_PORT)
                 baudrate = data.get('baudrate', 9600)
                 max_lines = data.get('max_lines', 100)
+                since = data.get('since')
+                if since is not None and (isinstance(since, bool) or not isinstance(since, int) or since < 0):
+                    return jsonify({'error': 'since must be a non-negative integer'}), 400
 
                 conn_id = f"{port}_{baudrate}"
                 serial_connections = getattr(app, 'serial_connections', {})
@@ -346,13 +549,16 @@ class FlasherAPI:
                         'message': 'Serial connection not found. Please open connection first.'
                     }), 404
 
-                serial_conn = serial_connections[conn_id]
-                lines = self.flasher.read_serial_data(serial_conn, max_lines)
+                # 从缓冲区读取，不访问串口
+                result = serial_connections[conn_id].read_lines(since, max_lines)
 
                 return jsonify({
                     'success': True,
-                    'data': lines,
-                    'lines_count': len(lines)
+                    'data': result['lines'],
+                    'lines_count': len(result['lines']),
+                    'next': result['next'],
+                    'dropped': result['dropped'],
+                    'gaps': result['gaps']
                 })
 
             except Exception as e:
@@ -381,8 +587,13 @@ class FlasherAPI:
                         'message': 'Serial connection not found. Please open connection first.'
                     }), 404
 
-                serial_conn = serial_connections[conn_id]
-                success = self.flasher.write_serial_data(serial_conn, message)
+                session = serial_connections[conn_id]
+                if session.suspended:
+                    return jsonify({
+                        'success': False,
+                        'message': 'Serial connection is suspended while the port is being flashed'
+                    }), 409
+                success = self.flasher.write_serial_data(session, message)
 
                 return jsonify({
                     'success': success,
@@ -405,9 +616,7 @@ class FlasherAPI:
                 serial_connections = getattr(app, 'serial_connections', {})
 
                 if conn_id in serial_connections:
-                    serial_conn = serial_connections[conn_id]
-                    serial_conn.close()
-                    del serial_connections[conn_id]
+                    serial_connections.pop(conn_id).close()
 
                     return jsonify({
                         'success': True,
@@ -430,14 +639,16 @@ class FlasherAPI:
                 serial_connections = getattr(app, 'serial_connections', {})
 
                 connections = []
-                for conn_id, conn in serial_connections.items():
-                    port, baudrate = conn_id.split('_')
-                    connections.append({
+                for conn_id, session in serial_connections.items():
+                    port, baudrate = conn_id.rsplit('_', 1)
+                    connection = {
                         'connection_id': conn_id,
                         'port': port,
                         'baudrate': int(baudrate),
-                        'is_open': conn.is_open if hasattr(conn, 'is_open') else True
-                    })
+                        'is_open': session.is_open
+                    }
+                    connection.update(session.stats())
+                    connections.append(connection)
 
                 return jsonify({
                     'success': True,
@@ -449,6 +660,88 @@ class FlasherAPI:
                 self.logger.error(f"Serial status error: {e}")
                 return jsonify({'error': str(e)}), 500
         
+        @app.route('/serial/<path:connection_id>/stream', methods=['GET'])
+        def serial_stream(connection_id):
+            """推送串口数据 (server-sent events)，每个订阅者有独立的游标"""
+            try:
+                subscriber = self._subscribe_serial(connection_id, request)
+            except KeyError as e:
+                return jsonify({'success': False, 'message': str(e.args[0])}), 404
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            def generate():
+                try:
+                    yield subscriber.opened_message()
+                    while True:
+                        yield from subscriber.messages()
+                        if subscriber.closed:
+                            break
+                        if not subscriber.has_new_data() and not subscriber.wait(self.config.SERIAL_STREAM_HEARTBEAT):
+                            yield ': keepalive\n\n'
+                finally:
+                    # 客户端断开时取消订阅
+                    subscriber.session.unsubscribe(subscriber)
+
+            return Response(
+                generate(),
+                mimetype='text/event-stream',
+                headers={
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no'  # 禁用nginx缓冲
+                }
+            )
+        
+        @app.route('/serial/<path:connection_id>/triggers', methods=['POST'])
+        def serial_trigger_create(connection_id):
+            """注册串口触发器，指定 wait 时长轮询等待第一个匹配后删除触发器"""
+            return self._serial_trigger_response(connection_id, None)
+
+        @app.route('/serial/<path:connection_id>/triggers/<trigger_id>', methods=['GET', 'DELETE'])
+        def serial_trigger(connection_id, trigger_id):
+            """获取或删除串口触发器"""
+            session = self._lookup_serial(getattr(app, 'serial_connections', {}), connection_id)
+            trigger = session.triggers.get(trigger_id) if session else None
+            if trigger is None:
+                return jsonify({'success': False, 'message': f'Serial trigger not found: {trigger_id}'}), 404
+            if request.method == 'DELETE':
+                session.remove_trigger(trigger_id)
+            return jsonify(trigger.to_dict())
+
+        @app.route('/serial/<path:connection_id>/triggers/<trigger_id>/wait', methods=['GET'])
+        def serial_trigger_wait(connection_id, trigger_id):
+            """长轮询等待串口触发器匹配"""
+            return self._serial_trigger_response(connection_id, trigger_id)
+
+        @app.route('/serial/<path:connection_id>/capture', methods=['GET'])
+        def serial_capture(connection_id):
+            """按时间范围 (Unix时间戳 from/to) 读取串口抓包，format=jsonl (默认) 或 raw"""
+            capture = self._lookup_serial(getattr(app, 'serial_captures', {}), connection_id)
+            if capture is None:
+                return jsonify({'success': False, 'message': f'Serial capture not found: {connection_id}'}), 404
+            try:
+                start, end = (float(request.args[name]) if request.args.get(name) else None
+                              for name in ('from', 'to'))
+            except ValueError:
+                return jsonify({'error': 'from and to must be Unix timestamps'}), 400
+            output = request.args.get('format', 'jsonl')
+            if output not in ('jsonl', 'raw'):
+                return jsonify({'error': f'Unsupported capture format: {output}'}), 400
+
+            if output == 'raw':
+                return Response(
+                    capture.export(start, end),
+                    mimetype='application/octet-stream',
+                    headers={'Content-Disposition': f'attachment; filename={os.path.basename(capture.path)}'}
+                )
+
+            def generate():
+                for timestamp, direction, payload in capture.read(start, end):
+                    yield json.dumps({'time': timestamp, 'dir': direction,
+                                      'data': bytes(payload).decode('utf-8', errors='replace')}) + '\n'
+
+            return Response(generate(), mimetype='application/x-ndjson')
+        
         @app.route('/config', methods=['GET'])
         def get_config():
             """获取当前配置"""
@@ -457,37 +750,355 @@ class FlasherAPI:
                 'default_programmer': self.config.DEFAULT_PROGRAMMER,
                 'default_baudrate': self.config.DEFAULT_BAUDRATE,
                 'default_port': self.config.DEFAULT_PORT,
-                'supported_mcus': self.config.SUPPORTED_MCUS,
-                'supported_programmers': self.config.SUPPORTED_PROGRAMMERS,
+                'supported_mcus': self.devices.parts.mcus(),
+                'supported_programmers': self.devices.parts.programmers(),
                 'supported_baudrates': self.config.SUPPORTED_BAUDRATES,
                 'max_file_size': self.config.MAX_CONTENT_LENGTH,
-                'flash_timeout': self.config.FLASH_TIMEOUT
+                'flash_timeout': self.config.FLASH_TIMEOUT,
+                'programmer_backend': self.config.PROGRAMMER_BACKEND,
+                'programmer_backends': list(PROGRAMMER_BACKENDS),
+                # avrdude.conf (或配置) 中的器件参数和编程器
+                'part_database': self.devices.parts.describe()
             })
     
+    def _pin_firmware(self, request):
+        """
+        取得请求中的固件并在存储中锁定 (调用者负责unpin)
+
+        优先使用上传的文件；没有文件时使用 sha256 参数引用已上传的固件
+
+        Returns:
+            固件SHA-256，请求中没有固件时返回None
+
+        Raises:
+            ValueError: 文件类型、内容或哈希无效
+            FirmwareNotFoundError: 引用的固件不存在
+        """
+        file = request.files.get('file')
+        sha = request.args.get('sha256') or request.form.get('sha256')
+        if file is not None:
+            if file.filename == '':
+                raise ValueError('No file selected')
+            if not self._allowed_file(file.filename):
+                raise ValueError('Invalid file type')
+            return self.firmware.put(file.read(), expected_sha=sha, pin=True)
+        if sha:
+            self.firmware.pin(sha.lower())
+            return sha.lower()
+        return None
+    
+    def _plan_source(self, spec):
+        """
+        编程计划中 flash/eeprom 操作的内容：hex (HEX文本)、sha256 (已上传的固件) 或 file (multipart文件字段名)
+
+        Raises:
+            PlanError: 引用的文件字段不存在
+            FirmwareNotFoundError: 引用的固件不存在
+        """
+        if spec.get('hex') is not None:
+            return str(spec['hex']).encode()
+        if spec.get('sha256'):
+            with self.firmware.checkout(str(spec['sha256']).lower()) as path:
+                with open(path, 'rb') as f:
+                    return f.read()
+        if spec.get('file'):
+            file = request.files.get(spec['file'])
+            if file is None:
+                raise PlanError(f"No uploaded file '{spec['file']}'")
+            # 同一个文件可以被多个操作引用
+            file.seek(0)
+            return file.read()
+        return None
+    
+    def _prepare_stream(self, request):
+        """
+        解析流式烧录请求 (开发服务器和异步服务器共用)
+
+        Returns:
+            (目标设备, 烧录参数, 已锁定的固件SHA-256)，调用者负责unpin
+
+        Raises:
+            ValueError: 参数无效或请求中没有固件
+            UnknownDeviceError / FirmwareNotFoundError: 设备或固件不存在
+        """
+        # 获取目标设备和烧录参数
+        device = self._resolve_device(request)
+        flash_params = self._get_flash_params(request, device=device)
+
+        # 保存文件到固件存储并锁定
+        sha = self._pin_firmware(request)
+        if sha is None:
+            raise ValueError('No file provided')
+        return device, flash_params, sha
+    
+    def _create_bridge(self, session, options):
+        """
+        根据 /serial/open 的 bridge 参数创建TCP桥接 (true表示全部使用默认值)
+
+        Raises:
+            ValueError / TypeError: 参数无效
+            OSError: 端口无法监听
+        """
+        options = options if isinstance(options, dict) else {}
+        return SerialBridge(
+            session,
+            host=self.config.SERIAL_BRIDGE_HOST,
+            port=int(options.get('port', 0)),
+            protocol=options.get('protocol', self.config.SERIAL_BRIDGE_PROTOCOL),
+            nodelay=bool(options.get('nodelay', self.config.SERIAL_BRIDGE_NODELAY)),
+            batch_delay=float(options.get('batch_delay', self.config.SERIAL_BRIDGE_BATCH_DELAY)),
+            batch_size=int(options.get('batch_size', self.config.SERIAL_BRIDGE_BATCH_SIZE)),
+            logger=self.logger
+        )
+    
+    def _create_capture(self, port, baudrate):
+        """在抓包目录中为串口连接创建抓包文件"""
+        name = f"{port.strip('/').replace('/', '_')}_{baudrate}_{time.strftime('%Y%m%d-%H%M%S')}.cap"
+        return SerialCapture(os.path.join(self.config.SERIAL_CAPTURE_DIR, name),
+                             self.config.SERIAL_CAPTURE_INDEX_INTERVAL)
+    
+    @staticmethod
+    def _lookup_serial(mapping, connection_id):
+        """按连接ID查找，连接ID以串口路径开头，URL中可以省略开头的'/'"""
+        return mapping.get(connection_id) or mapping.get('/' + connection_id)
+    
+    def _serial_trigger_response(self, connection_id, trigger_id):
+        """注册触发器或等待已有的触发器 (开发服务器)"""
+        try:
+            session, trigger, wait = self._prepare_trigger(connection_id, request, trigger_id)
+        except KeyError as e:
+            return jsonify({'success': False, 'message': str(e.args[0])}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if wait is not None:
+            trigger.wait(wait)
+        result, status = self._trigger_result(connection_id, session, trigger, trigger_id, wait)
+        return jsonify(result), status
+    
+    def _prepare_trigger(self, connection_id, request, trigger_id=None):
+        """
+        解析触发器请求 (开发服务器和异步服务器共用)
+
+        trigger_id为None时按请求体注册新触发器，否则查找已有的触发器并读取 timeout 参数
+
+        Returns:
+            (会话, 触发器, 等待时间 (秒)，None表示不等待)
+
+        Raises:
+            KeyError: 连接或触发器不存在
+            ValueError: 参数无效
+        """
+        session = self._lookup_serial(getattr(self.app, 'serial_connections', {}), connection_id)
+        if session is None:
+            raise KeyError(f'Serial connection not found: {connection_id}')
+
+        if trigger_id is not None:
+            trigger = session.triggers.get(trigger_id)
+            if trigger is None:
+                raise KeyError(f'Serial trigger not found: {trigger_id}')
+            wait = request.args.get('timeout', self.config.SERIAL_TRIGGER_WAIT_TIMEOUT)
+        else:
+            data = request.get_json(silent=True) or {}
+            literals, regexes = data.get('literals', []), data.get('regexes', [])
+            for value in (literals, regexes):
+                if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                    raise ValueError('literals and regexes must be lists of strings')
+            since = data.get('since')
+            if since is not None and (isinstance(since, bool) or not isinstance(since, int) or since < 0):
+                raise ValueError('since must be a non-negative integer')
+
+            if len(session.triggers) >= self.config.SERIAL_MAX_TRIGGERS:
+                # 先删除最早的已结束触发器
+                finished = [t for t in session.triggers.values() if t.done]
+                if not finished:
+                    raise ValueError(f'Too many triggers (max {self.config.SERIAL_MAX_TRIGGERS})')
+                session.remove_trigger(min(finished, key=lambda t: t.created_at).id)
+            trigger = session.add_trigger(SerialTrigger(
+                session, literals, regexes, bool(data.get('ignore_case', False)), since))
+            wait = data.get('wait')
+
+        if wait is not None:
+            try:
+                wait = max(0.0, min(float(wait), self.config.SERIAL_TRIGGER_WAIT_TIMEOUT))
+            except (TypeError, ValueError):
+                if trigger_id is None:
+                    session.remove_trigger(trigger.id)
+                raise ValueError('Invalid timeout')
+        return session, trigger, wait
+    
+    @staticmethod
+    def _trigger_result(connection_id, session, trigger, trigger_id, wait):
+        """
+        触发器响应内容和状态码：新注册且不等待时返回201；注册时等待的触发器在返回结果后删除
+        """
+        result = trigger.to_dict()
+        if wait is None:
+            result['wait_url'] = f"/serial/{connection_id.lstrip('/')}/triggers/{trigger.id}/wait"
+            return result, 201
+        result['timed_out'] = not trigger.done
+        if trigger_id is None:
+            session.remove_trigger(trigger.id)
+        return result, 200
+    
+    def _subscribe_serial(self, connection_id, request, listener=None):
+        """
+        订阅串口连接 (开发服务器和异步服务器共用)
+
+        since 参数或 Last-Event-ID 请求头指定起始游标，不指定时只推送之后的新数据
+
+        Raises:
+            KeyError: 连接不存在
+            ValueError: 参数无效
+        """
+        session = self._lookup_serial(getattr(self.app, 'serial_connections', {}), connection_id)
+        if session is None:
+            raise KeyError(f'Serial connection not found: {connection_id}')
+
+        values = {}
+        for name, value in (('since', request.args.get('since', request.headers.get('Last-Event-ID'))),
+                            ('max_lag', request.args.get('max_lag', self.config.SERIAL_STREAM_MAX_LAG))):
+            if value is None:
+                values[name] = None
+                continue
+            try:
+                values[name] = int(value)
+            except (TypeError, ValueError):
+                values[name] = -1
+            if values[name] < 0:
+                raise ValueError(f'{name} must be a non-negative integer')
+        return session.subscribe(values['since'], values['max_lag'], listener)
+    
+    def _tag_firmware(self, result, sha):
+        """在结果中记录固件哈希"""
+        if sha:
+            result['firmware_sha256'] = sha
+        return result
+    
+    def _get_flag(self, request, name, data=None):
+        """读取布尔型请求参数 (JSON > URL参数 > 表单)"""
+        value = (data or {}).get(name, request.args.get(name, request.form.get(name, False)))
+        return str(value).lower() in ('1', 'true', 'yes')
+
+    def _is_async(self, request, data=None):
+        """请求是否要求异步执行"""
+        return self._get_flag(request, 'async', data)
+    
+    def _run_job(self, device, kind, func, cleanup=None, data=None, release_serial=True):
+        """
+        将操作提交到设备任务队列
+
+        异步请求立即返回202和任务ID；同步请求等待任务结束后返回结果字典
+        (异步服务器下不在此等待：任务登记到 DEFERRED_JOBS_ENVIRON，由服务器等待后替换响应体)。
+        release_serial 为True时任务执行期间暂停同一串口上的串口会话
+        """
+        job = self.jobs.submit(device, func, kind=kind, cleanup=cleanup, release_serial=release_serial)
+        if self._is_async(request, data):
+            return jsonify(self._with_warnings(device, {
+                'success': True,
+                'message': 'Job queued',
+                'job_id': job.id,
+                'status': job.status,
+                'device': device.name,
+                'status_url': f'/jobs/{job.id}',
+                'wait_url': f'/jobs/{job.id}/wait'
+            })), 202
+        deferred = request.environ.get(DEFERRED_JOBS_ENVIRON)
+        if deferred is not None:
+            deferred.append((device, job))
+            return jsonify({})
+        job.wait()
+        return jsonify(self._job_result(device, job))
+
+    def _job_result(self, device, job):
+        """同步请求的响应内容 (开发服务器和异步服务器共用)"""
+        if isinstance(job.result, dict):
+            return self._with_warnings(device, job.result)
+        return job.result
+
+    @staticmethod
+    def _with_warnings(device, result: dict) -> dict:
+        """在响应中加入设备的警告 (例如未注册串口的临时设备没有复位引脚)"""
+        warnings = device.warnings()
+        if not warnings:
+            return result
+        return dict(result, warnings=result.get('warnings', []) + warnings)
+    
     def _allowed_file(self, filename):
         """检查文件类型是否允许"""
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in self.config.ALLOWED_EXTENSIONS
     
-    def _get_flash_params(self, request, data=None):
+    def _resolve_device(self, request, data=None):
+        """从请求中解析目标设备 (device名称优先，其次按port查找)"""
+        data = data or {}
+        name = data.get('device') or request.args.get('device')
+        port = data.get('port') or request.args.get('port')
+        return self.devices.resolve(name, port)
+    
+    def _get_flash_params(self, request, data=None, device=None):
         """从请求中提取烧录参数"""
         params = {}
+        defaults = (device or self.devices.default).flash_params()
         
         # 从URL参数获取
-        params['mcu'] = request.args.get('mcu', self.config.DEFAULT_MCU)
-        params['programmer'] = request.args.get('programmer', self.config.DEFAULT_PROGRAMMER)
-        params['port'] = request.args.get('port', self.config.DEFAULT_PORT)
-        params['baudrate'] = int(request.args.get('baudrate', self.config.DEFAULT_BAUDRATE))
+        params['mcu'] = request.args.get('mcu', defaults['mcu'])
+        params['programmer'] = request.args.get('programmer', defaults['programmer'])
+        params['port'] = request.args.get('port', defaults['port'])
+        params['baudrate'] = int(request.args.get('baudrate', defaults['baudrate']))
+        
+        if 'backend' in request.args:
+            params['backend'] = request.args['backend']
         
         # 从JSON数据获取（优先级更高）
         if data:
             params.update({k: v for k, v in data.items() 
-                          if k in ['mcu', 'programmer', 'port', 'baudrate']})
+                          if k in ['mcu', 'programmer', 'port', 'baudrate', 'backend']})
+        
+        # 按器件数据库检查MCU和编程器，MCU统一为数据库中的名称
+        params['mcu'] = self.devices.parts.resolve_part(params['mcu']).name
+        self.devices.parts.resolve_programmer(params['programmer'])
+        
+        # 编程器后端
+        if 'backend' in params and params['backend'] not in PROGRAMMER_BACKENDS:
+            raise ValueError(f"Unknown programmer backend: {params['backend']}")
+        
+        # 固件未变化时跳过烧录，verify_readback 回读flash确认
+        for flag in ('if_changed', 'verify_readback'):
+            if self._get_flag(request, flag, data):
+                params[flag] = True
+        
+        # 烧录 (或复位) 后在设备锁内等待启动输出中出现 await_pattern (正则表达式)
+        options = {name: (data or {}).get(name, request.args.get(name, request.form.get(name)))
+                   for name in ('await_pattern', 'await_timeout', 'await_baudrate')}
+        if options['await_pattern']:
+            params['await_pattern'] = str(options['await_pattern'])
+            compile_patterns(regexes=[params['await_pattern']])
+            timeout = options['await_timeout']
+            timeout = self.config.BOOT_AWAIT_TIMEOUT if timeout is None else float(timeout)
+            params['await_timeout'] = max(0.0, min(timeout, self.config.FLASH_TIMEOUT))
+            if options['await_baudrate'] is not None:
+                params['await_baudrate'] = int(options['await_baudrate'])
+        
+        # 失败后按失败类别自动重试的最大尝试次数 (默认 FLASH_RETRY_ATTEMPTS)
+        max_attempts = (data or {}).get('max_attempts',
+                                        request.args.get('max_attempts', request.form.get('max_attempts')))
+        if max_attempts is not None:
+            params['max_attempts'] = max(1, min(int(max_attempts), 10))
+        
+        # 串口始终与设备一致，确保设备锁保护的就是实际使用的串口
+        if device is not None:
+            params['port'] = device.port
         
         return params
     
-    def run(self, host=None, port=None, debug=None):
-        """运行API服务器"""
+    def run(self, host=None, port=None, debug=None, server=None):
+        """
+        运行API服务器
+
+        Args:
+            server: 'flask' (开发服务器，每个连接一个线程) 或 'asyncio' (异步服务器)，
+                默认使用配置中的 SERVER_MODE
+        """
         if not self.app:
             self.logger.error("Flask app not available")
             return
@@ -495,17 +1106,25 @@ class FlasherAPI:
         host = host or self.config.HOST
         port = port or self.config.PORT
         debug = debug if debug is not None else self.config.DEBUG
+        server = server or self.config.SERVER_MODE
         
-        self.logger.info(f"Starting FlasherAPI server on {host}:{port}")
+        self.logger.info(f"Starting FlasherAPI server on {host}:{port} ({server})")
         
         try:
-            self.app.run(host=host, port=port, debug=debug)
+            if server == 'asyncio':
+                from .async_server import AsyncFlasherServer
+                AsyncFlasherServer(self, host, port).run()
+            else:
+                self.app.run(host=host, port=port, debug=debug)
         except KeyboardInterrupt:
             self.logger.info("Server stopped by user")
         except Exception as e:
             self.logger.error(f"Server error: {e}")
         finally:
-            self.flasher.cleanup()
+            for session in getattr(self.app, 'serial_connections', {}).values():
+                session.close()
+            self.jobs.shutdown(timeout=self.config.FLASH_TIMEOUT)
+            self.devices.cleanup()
 
 def main():
     """主函数"""
@@ -516,6 +1135,7 @@ def main():
     parser.add_argument('--port', type=int, default=5000, help='Port to bind to')
     parser.add_argument('--config', default='development', help='Configuration name')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--server', choices=['flask', 'asyncio'], help='Server mode (default: SERVER_MODE)')
     
     args = parser.parse_args()
     
@@ -523,7 +1143,7 @@ def main():
     api = FlasherAPI(args.config)
     
     # 运行服务器
-    api.run(host=args.host, port=args.port, debug=args.debug)
+    api.run(host=args.host, port=args.port, debug=args.debug, server=args.server)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,597 @@
+"""
+异步服务器 - RemoteFlasher API
+生产环境使用的asyncio HTTP/1.1服务器，不为每个进行中的流式烧录占用一个线程：
+
+- /flash/stream 在事件循环中处理：avrdude通过asyncio子进程管道驱动，
+  设备锁以非阻塞方式等待，流式客户端只占用协程
+- /serial/<id>/stream 的订阅者由串口读取线程唤醒，同样只占用协程
+- 等待串口触发器的长轮询 (POST /serial/<id>/triggers 带 wait 和 GET .../wait) 在匹配时被唤醒，
+  不占用线程池
+- 其他接口通过WSGI桥接到同一个Flask应用，在有界线程池中执行，
+  路由、参数和响应格式与开发服务器一致
+- 同步烧录等任务接口在线程池中只负责提交任务，任务结束由协程等待，
+  排队中的烧录不会占满线程池而阻塞 /status、/devices 等请求
+- 支持keep-alive、分块传输编码的请求体和 Expect: 100-continue；
+  HTTP/1.0客户端的流式响应不分块，以关闭连接结束
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from flask import jsonify, request as flask_request
+
+from .api_server import DEFERRED_JOBS_ENVIRON
+from .devices import UnknownDeviceError
+from .firmware_store import FirmwareNotFoundError
+
+STREAM_ROUTE = '/flash/stream'
+SERIAL_STREAM_ROUTE = re.compile(r'^/serial/(.+)/stream$')
+SERIAL_TRIGGER_ROUTE = re.compile(r'^/serial/(.+)/triggers(?:/([^/]+)/wait)?$')
+# 等待设备锁时的轮询间隔（秒）
+LOCK_POLL_INTERVAL = 0.05
+MAX_HEADERS = 100
+# 由服务器决定的逐跳头，不使用应用返回的值
+HOP_BY_HOP = {'connection', 'keep-alive', 'transfer-encoding', 'content-length'}
+
+STATUS_REASONS = {
+    200: 'OK',
+    201: 'CREATED',
+    400: 'BAD REQUEST',
+    404: 'NOT FOUND',
+    413: 'REQUEST ENTITY TOO LARGE',
+    431: 'REQUEST HEADER FIELDS TOO LARGE',
+    500: 'INTERNAL SERVER ERROR',
+}
+
+
+def use_pidfd_watcher(loop: asyncio.AbstractEventLoop):
+    """
+    Python 3.12之前默认的子进程监视器为每个子进程启动一个waitpid线程；
+    支持pidfd时改用绑定到服务器事件循环的PidfdChildWatcher，等待avrdude退出不占用线程
+    """
+    if sys.version_info >= (3, 12) or not hasattr(asyncio, 'PidfdChildWatcher'):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except (AttributeError, OSError):
+        return
+    watcher = asyncio.get_child_watcher()
+    if not isinstance(watcher, asyncio.PidfdChildWatcher):
+        watcher = asyncio.PidfdChildWatcher()
+        asyncio.set_child_watcher(watcher)
+    watcher.attach_loop(loop)
+
+
+class HTTPError(Exception):
+    """请求无法解析，返回错误后关闭连接"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class HTTPRequest:
+    """已读取请求体的HTTP请求"""
+
+    def __init__(self, method: str, target: str, version: str, headers: List[Tuple[str, str]]):
+        self.method = method.upper()
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.path, _, self.query = target.partition('?')
+        self.body = b''
+
+    def header(self, name: str, default: str = '') -> str:
+        name = name.lower()
+        values = [value for key, value in self.headers if key.lower() == name]
+        return ', '.join(values) if values else default
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.header('Connection').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    def environ(self, server_name: str, server_port: int, peer: Optional[Tuple]) -> Dict[str, Any]:
+        """构造WSGI environ"""
+        # PEP 3333：路径按latin-1承载UTF-8字节
+        path = unquote(self.path, 'utf-8', 'surrogateescape').encode('utf-8', 'surrogateescape')
+        environ = {
+            'REQUEST_METHOD': self.method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path.decode('latin-1'),
+            'QUERY_STRING': self.query,
+            'REQUEST_URI': self.target,
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': self.version,
+            'REMOTE_ADDR': peer[0] if peer else '',
+            'REMOTE_PORT': str(peer[1]) if peer else '',
+            'CONTENT_LENGTH': str(len(self.body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(self.body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in self.headers:
+            key = name.upper().replace('-', '_')
+            if key == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif key not in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+                key = 'HTTP_' + key
+                environ[key] = f'{environ[key]}, {value}' if key in environ else value
+        return environ
+
+
+class AsyncFlasherServer:
+    """FlasherAPI的asyncio服务器"""
+
+    def __init__(self, api, host: Optional[str] = None, port: Optional[int] = None,
+                 workers: Optional[int] = None):
+        """
+        Args:
+            api: FlasherAPI实例
+            host / port: 监听地址，默认使用配置；port为0时自动分配
+            workers: 执行普通接口和阻塞步骤的线程数，默认 ASYNC_WORKERS
+        """
+        self.api = api
+        self.app = api.app
+        self.config = api.config
+        self.logger = api.logger
+        self.host = host or self.config.HOST
+        self.port = self.config.PORT if port is None else port
+        self.workers = workers or self.config.ASYNC_WORKERS
+        self.max_body = self.config.MAX_CONTENT_LENGTH
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='flasher-worker')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._connections = set()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    async def serve(self):
+        """监听并处理请求，直到 stop()"""
+        loop = asyncio.get_running_loop()
+        use_pidfd_watcher(loop)
+        # 阻塞步骤 (run_in_executor(None, ...)) 共用有界线程池
+        loop.set_default_executor(self._executor)
+        self._loop = loop
+        self._stopping = asyncio.Event()
+
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.logger.info(f"Async server listening on {self.host}:{self.port} ({self.workers} workers)")
+        self._ready.set()
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+
+    def run(self):
+        """在当前线程中运行服务器 (阻塞)"""
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def start(self, timeout: float = 5) -> int:
+        """在后台线程中运行服务器，返回监听端口"""
+        self._thread = threading.Thread(target=self.run, name='flasher-async-server', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError('Async server failed to start')
+        return self.port
+
+    def stop(self, timeout: float = 5):
+        """停止后台运行的服务器"""
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        peer = writer.get_extra_info('peername')
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, writer)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                serial_stream = SERIAL_STREAM_ROUTE.match(unquote(request.path))
+                serial_trigger = SERIAL_TRIGGER_ROUTE.match(unquote(request.path))
+                if request.method == 'POST' and request.path == STREAM_ROUTE:
+                    keep_alive = await self._flash_stream(request, writer, peer)
+                elif request.method == 'GET' and serial_stream:
+                    keep_alive = await self._serial_stream(request, writer, peer, serial_stream.group(1))
+                elif serial_trigger and request.method == ('GET' if serial_trigger.group(2) else 'POST'):
+                    keep_alive = await self._serial_trigger(request, writer, peer, *serial_trigger.groups())
+                else:
+                    keep_alive = await self._dispatch(request, writer, peer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.error(f"Async server connection error: {e}")
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> Optional[HTTPRequest]:
+        """读取一个请求，连接关闭或空闲超时时返回None"""
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.config.ASYNC_KEEPALIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:
+            raise HTTPError(431, 'Request line too long')
+        if not line.strip():
+            return None
+
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise HTTPError(400, 'Malformed request line')
+
+        headers = []
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise HTTPError(431, 'Header line too long')
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(431, 'Too many headers')
+            name, sep, value = line.decode('latin-1').partition(':')
+            if not sep:
+                raise HTTPError(400, 'Malformed header')
+            headers.append((name.strip(), value.strip()))
+
+        request = HTTPRequest(*parts, headers)
+        chunked = 'chunked' in request.header('Transfer-Encoding').lower()
+        length = request.header('Content-Length', '0')
+        if not chunked:
+            if not length.isdigit():
+                raise HTTPError(400, 'Invalid Content-Length')
+            if int(length) > self.max_body:
+                raise HTTPError(413, 'Request entity too large')
+
+        if request.header('Expect').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            await writer.drain()
+
+        if chunked:
+            request.body = await self._read_chunked(reader)
+        elif int(length):
+            request.body = await reader.readexactly(int(length))
+        return request
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        body = bytearray()
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b';')[0].strip(), 16)
+            except ValueError:
+                raise HTTPError(400, 'Invalid chunk size')
+            if size == 0:
+                # 跳过trailer
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return bytes(body)
+            if len(body) + size > self.max_body:
+                raise HTTPError(413, 'Request entity too large')
+            body += await reader.readexactly(size)
+            await reader.readline()
+
+    async def _dispatch(self, request: HTTPRequest, writer: asyncio.StreamWriter, peer) -> bool:
+        """普通接口：在线程池中调用Flask应用"""
+        loop = asyncio.get_running_loop()
+        environ = request.environ(self.host, self.port, peer)
+        deferred = environ[DEFERRED_JOBS_ENVIRON] = []
+        status, headers, body = await loop.run_in_executor(None, self._call_app, environ)
+        if deferred and status.startswith('200'):
+            # 同步任务：应用只提交了任务，在这里等待结束后用结果替换响应体 (保留应用设置的响应头)
+            device, job = deferred[0]
+            await self._wait_job(job)
+            with self.app.app_context():
+                body = jsonify(self.api._job_result(device, job)).get_data()
+            headers = [(name, value) for name, value in headers if name.lower() != 'content-length']
+
+        content_length = None
+        response_headers = []
+        for name, value in headers:
+            if name.lower() == 'content-length':
+                content_length = value
+            if name.lower() not in HOP_BY_HOP:
+                response_headers.append((name, value))
+        if request.method == 'HEAD':
+            # HEAD响应保留应用声明的长度，不发送响应体
+            response_headers.append(('Content-Length', content_length or str(len(body))))
+            body = b''
+        else:
+            response_headers.append(('Content-Length', str(len(body))))
+
+        keep_alive = request.keep_alive
+        self._write_head(writer, status, response_headers, keep_alive)
+        writer.write(body)
+        await writer.drain()
+        return keep_alive
+
+    @staticmethod
+    async def _wait_job(job):
+        """等待任务结束：由工作线程唤醒协程"""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def resolve():
+            if not done.done():
+                done.set_result(None)
+
+        def wakeup():
+            try:
+                loop.call_soon_threadsafe(resolve)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+        job.on_done(wakeup)
+        await done
+
+    def _call_app(self, environ: Dict[str, Any]) -> Tuple[str, List[Tuple[str, str]], bytes]:
+        """调用WSGI应用并收集完整响应 (在线程池中执行)"""
+        response = {}
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+            return chunks.append
+
+        try:
+            result = self.app(environ, start_response)
+            try:
+                for chunk in result:
+                    chunks.append(chunk)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        except Exception as e:
+            self.logger.error(f"WSGI application error: {e}")
+            body = json.dumps({'error': str(e)}).encode('utf-8')
+            return '500 INTERNAL SERVER ERROR', [('Content-Type', 'application/json')], body
+        return response['status'], response['headers'], b''.join(chunks)
+
+    async def _flash_stream(self, request: HTTPRequest, writer: asyncio.StreamWriter, peer) -> bool:
+        """流式烧录：事件循环中驱动烧录并逐条发送事件"""
+        loop = asyncio.get_running_loop()
+        environ = request.environ(self.host, self.port, peer)
+        prepared = await loop.run_in_executor(None, self._prepare_stream, environ)
+        if len(prepared) == 2:
+            status, payload = prepared
+            await self._send_json(writer, status, payload, request.keep_alive)
+            return request.keep_alive
+
+        device, flash_params, sha = prepared
+        try:
+            chunked = self._start_stream(writer, request, [
+                ('Content-Type', 'text/plain; charset=utf-8'),
+                ('Cache-Control', 'no-cache'),
+                ('X-Accel-Buffering', 'no'),  # 禁用nginx缓冲
+            ])
+
+            events = self._flash_events(device, self.api.firmware.path(sha), flash_params)
+            try:
+                async for output in events:
+                    await self._write_chunk(writer, f"data: {json.dumps(output)}\n\n", chunked)
+            finally:
+                # 客户端断开时关闭生成器，结束avrdude并释放设备锁
+                await events.aclose()
+        finally:
+            self.api.firmware.unpin(sha)
+        return await self._end_stream(writer, request, chunked)
+
+    async def _serial_stream(self, request: HTTPRequest, writer: asyncio.StreamWriter, peer,
+                             connection_id: str) -> bool:
+        """串口推送：新数据到达时由读取线程唤醒协程"""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+
+        def listener():
+            loop.call_soon_threadsafe(wakeup.set)
+
+        environ = request.environ(self.host, self.port, peer)
+        subscriber = await loop.run_in_executor(None, self._subscribe_serial, environ, connection_id, listener)
+        if isinstance(subscriber, tuple):
+            status, payload = subscriber
+            await self._send_json(writer, status, payload, request.keep_alive)
+            return request.keep_alive
+
+        try:
+            chunked = self._start_stream(writer, request, [
+                ('Content-Type', 'text/event-stream; charset=utf-8'),
+                ('Cache-Control', 'no-cache'),
+                ('X-Accel-Buffering', 'no'),
+            ])
+            await self._write_chunk(writer, subscriber.opened_message(), chunked)
+            while True:
+                # 先清除再读取，读取期间到达的数据会再次唤醒
+                wakeup.clear()
+                for message in subscriber.messages():
+                    # drain() 对慢速订阅者形成背压，落后过多时由 max_lag 丢弃旧数据
+                    await self._write_chunk(writer, message, chunked)
+                if subscriber.closed:
+                    break
+                if subscriber.has_new_data():
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.config.SERIAL_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    await self._write_chunk(writer, ': keepalive\n\n', chunked)
+        finally:
+            subscriber.session.unsubscribe(subscriber)
+        return await self._end_stream(writer, request, chunked)
+
+    async def _serial_trigger(self, request: HTTPRequest, writer: asyncio.StreamWriter, peer,
+                              connection_id: str, trigger_id: Optional[str]) -> bool:
+        """注册或等待串口触发器：匹配时由读取线程唤醒协程"""
+        loop = asyncio.get_running_loop()
+        environ = request.environ(self.host, self.port, peer)
+        prepared = await loop.run_in_executor(None, self._prepare_trigger, environ, connection_id, trigger_id)
+        if len(prepared) == 2:
+            status, payload = prepared
+            await self._send_json(writer, status, payload, request.keep_alive)
+            return request.keep_alive
+
+        session, trigger, wait = prepared
+        if wait is not None and not trigger.done:
+            matched = asyncio.Event()
+
+            def wakeup():
+                try:
+                    loop.call_soon_threadsafe(matched.set)
+                except RuntimeError:
+                    pass  # 事件循环已关闭
+
+            trigger.on_done(wakeup)
+            try:
+                await asyncio.wait_for(matched.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        payload, status = self.api._trigger_result(connection_id, session, trigger, trigger_id, wait)
+        await self._send_json(writer, status, payload, request.keep_alive)
+        return request.keep_alive
+
+    def _prepare_trigger(self, environ: Dict[str, Any], connection_id: str, trigger_id: Optional[str]):
+        """在Flask请求上下文中注册或查找触发器 (在线程池中执行)"""
+        with self.app.request_context(environ):
+            try:
+                return self.api._prepare_trigger(connection_id, flask_request, trigger_id)
+            except KeyError as e:
+                return 404, {'success': False, 'message': str(e.args[0])}
+            except ValueError as e:
+                return 400, {'error': str(e)}
+
+    def _subscribe_serial(self, environ: Dict[str, Any], connection_id: str, listener):
+        """在Flask请求上下文中订阅串口 (在线程池中执行)"""
+        with self.app.request_context(environ):
+            try:
+                return self.api._subscribe_serial(connection_id, flask_request, listener)
+            except KeyError as e:
+                return 404, {'success': False, 'message': str(e.args[0])}
+            except ValueError as e:
+                return 400, {'error': str(e)}
+
+    def _prepare_stream(self, environ: Dict[str, Any]):
+        """
+        在Flask请求上下文中解析流式烧录请求 (在线程池中执行)
+
+        Returns:
+            (设备, 烧录参数, 固件SHA-256) 或 (错误状态码, 错误响应)
+        """
+        with self.app.request_context(environ):
+            try:
+                return self.api._prepare_stream(flask_request)
+            except (UnknownDeviceError, FirmwareNotFoundError) as e:
+                return 404, {'error': str(e.args[0])}
+            except ValueError as e:
+                return 400, {'error': str(e)}
+            except Exception as e:
+                self.logger.error(f"Stream flash error: {e}")
+                return 500, {'error': str(e)}
+
+    async def _flash_events(self, device, file_path: str, flash_params: Dict[str, Any]):
+        try:
+            for warning in device.warnings():
+                yield {'type': 'warning', 'message': warning}
+            # 设备锁覆盖整个流式烧录过程，等待时不占用线程
+            while not device.lock.acquire(blocking=False):
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+            loop = asyncio.get_running_loop()
+            sessions = []
+            try:
+                # 暂停同一串口上的串口会话 (关闭串口需要等待读取线程退出)
+                sessions = await loop.run_in_executor(None, self.api.devices.suspend_serial, device.port)
+                stream = device.flasher.flash_hex_file_stream_async(file_path, **flash_params)
+                try:
+                    async for output in stream:
+                        yield output
+                finally:
+                    await stream.aclose()
+            finally:
+                await loop.run_in_executor(None, self.api.devices.resume_serial, sessions)
+                device.lock.release()
+        except Exception as e:
+            yield {'type': 'error', 'message': str(e)}
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                         keep_alive: bool):
+        body = json.dumps(payload).encode('utf-8')
+        self._write_head(writer, f'{status} {STATUS_REASONS.get(status, "ERROR")}', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+        ], keep_alive)
+        writer.write(body)
+        await writer.drain()
+
+    def _start_stream(self, writer: asyncio.StreamWriter, request: HTTPRequest,
+                      headers: List[Tuple[str, str]]) -> bool:
+        """
+        发送流式响应头，返回是否使用分块传输编码
+
+        HTTP/1.0客户端不支持分块传输编码：响应体直接发送，以关闭连接表示结束
+        """
+        chunked = request.version != 'HTTP/1.0'
+        if chunked:
+            headers = headers + [('Transfer-Encoding', 'chunked')]
+        self._write_head(writer, '200 OK', headers, request.keep_alive and chunked)
+        return chunked
+
+    @staticmethod
+    async def _end_stream(writer: asyncio.StreamWriter, request: HTTPRequest, chunked: bool) -> bool:
+        """结束流式响应，返回是否保持连接"""
+        if not chunked:
+            return False
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return request.keep_alive
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, text: str, chunked: bool):
+        """发送一个分块传输编码的数据块 (chunked为False时直接发送数据)"""
+        data = text.encode('utf-8')
+        writer.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+        await writer.drain()
+
+    @staticmethod
+    def _write_head(writer: asyncio.StreamWriter, status: str, headers: List[Tuple[str, str]],
+                    keep_alive: bool):
+        lines = [f'HTTP/1.1 {status}']
+        lines.extend(f'{name}: {value}' for name, value in headers)
+        lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
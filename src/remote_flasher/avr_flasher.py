@@ -4,24 +4,56 @@ AVR烧录器核心模块 - RemoteFlasher API
 """
 
 import os
+import asyncio
+import functools
 import subprocess
 import time
 import logging
-import tempfile
-import requests
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Union
 from .config import get_config
-
-# 使用gpio命令行工具进行GPIO控制，不依赖gpiozero
+from .download import DownloadError
+from .avrdude_conf import PartDatabase
+from .flash_history import FlashHistory
+from .gpio import GPIOError, create_gpio_backend
+from .hexfile import FirmwareImage, HexFormatError, load_hex_file, parse_hex
+from .identity import DeviceIdentity, IdentityCache
+from .plan import BYTE_MEMORIES, ProgrammingPlan
+from .programmers import PROGRAMMER_BACKENDS, AvrdudeBackend, ProgrammerBackend, ProgrammerError
+from .retry import RetryPolicy
+from .serial_session import SerialSession
+from .serial_triggers import SerialTrigger
+from .timeline import ResetProfile, ResetTimeline
+from .url_cache import URLCache
+
+# 未显式指定复位引脚时使用配置中的 RESET_PIN
+_CONFIG_RESET_PIN = object()
 
 class AVRFlasher:
     """AVR单片机烧录器"""
     
-    def __init__(self, config_name=None):
+    def __init__(self, config_name=None, gpio_backend=None, reset_pin=_CONFIG_RESET_PIN,
+                 history=None, reset_profile=None, url_cache=None, identity=None, parts=None):
         self.config = get_config(config_name)
         self.logger = self._setup_logger()
+        # reset_pin=None 表示该设备没有复位控制线
+        self.reset_pin = self.config.RESET_PIN if reset_pin is _CONFIG_RESET_PIN else reset_pin
+        self.gpio = gpio_backend
+        self._owns_gpio = gpio_backend is None
         self.gpio_available = False
+        # 烧录历史，多个烧录器共享同一个文件时由创建者传入
+        self.history = history if history is not None else FlashHistory(self.config.FLASH_HISTORY_FILE)
+        # URL固件缓存，多个烧录器共享时由创建者传入
+        self.url_cache = url_cache if url_cache is not None else URLCache.from_config(self.config, self.logger)
+        # 设备身份缓存 (按串口和编程器)，多个烧录器共享时由创建者传入
+        self.identity = identity if identity is not None else IdentityCache.from_config(self.config)
+        # MCU和编程器数据库 (AVRDUDE_CONF)，多个烧录器共享时由创建者传入
+        self.parts = parts if parts is not None else PartDatabase(self.config, self.logger)
+        self._backends: Dict[str, ProgrammerBackend] = {}
+        # 板卡复位时序 (RESET_PROFILES 中的名称)
+        self.reset_profile = ResetProfile.from_config(self.config, reset_profile)
+        # 烧录失败后的自动重试策略，记住该设备上成功时的调整
+        self.retry_policy = RetryPolicy.from_config(self.config)
         self._setup_gpio()
         self._ensure_upload_dir()
     
@@ -47,21 +79,24 @@ class AVRFlasher:
         return logger
     
     def _setup_gpio(self):
-        """设置GPIO - 使用gpio命令行工具"""
+        """设置GPIO - 优先使用进程内后端，gpio命令行工具作为后备"""
+        if self.reset_pin is None:
+            self.logger.info("No reset pin configured, reset control disabled")
+            return
+
         try:
-            # 检查gpio命令是否可用
-            result = subprocess.run(["gpio", "-v"], capture_output=True, text=True)
-            if result.returncode == 0:
-                self.gpio_available = True
-                # 初始化GPIO 4为输出模式，默认高电平
-                subprocess.run(["gpio", "mode", "4", "out"], capture_output=True, text=True, check=True)
-                subprocess.run(["gpio", "write", "4", "1"], capture_output=True, text=True, check=True)
-                self.logger.info("GPIO 4 configured for reset control (using gpio command)")
-            else:
-                self.gpio_available = False
-                self.logger.warning("gpio command not available")
+            if self.gpio is None:
+                self.gpio = create_gpio_backend(self.config, self.logger)
+            if self.gpio is None:
+                self.logger.warning("No GPIO backend available")
+                return
 
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            # 复位引脚配置为输出模式，默认高电平
+            self.gpio.setup_output(self.reset_pin, 1)
+            self.gpio_available = True
+            self.logger.info(f"GPIO {self.reset_pin} configured for reset control ({self.gpio.name} backend)")
+
+        except GPIOError as e:
             self.gpio_available = False
             self.logger.warning(f"GPIO setup failed: {e}")
         except Exception as e:
@@ -76,27 +111,21 @@ class AVRFlasher:
     
     def control_arduino_reset(self, reset=True):
         """
-        通过GPIO控制Arduino的复位 (使用gpio命令行工具)
-        reset=True: 使Arduino进入复位状态 (GPIO 4 设为0)
-        reset=False: 使Arduino退出复位状态 (GPIO 4 设为1)
+        通过GPIO控制Arduino的复位
+        reset=True: 使Arduino进入复位状态 (复位引脚设为0)
+        reset=False: 使Arduino退出复位状态 (复位引脚设为1)
         """
         if not self.gpio_available:
             self.logger.warning("GPIO控制不可用")
             return False
 
-        state = "0" if reset else "1"
-        cmd = ["gpio", "write", "4", state]  # 使用GPIO 4
-
         try:
-            subprocess.run(cmd, capture_output=True, text=True, check=True)
+            self.gpio.write(self.reset_pin, 0 if reset else 1)
             action = "进入" if reset else "退出"
-            self.logger.info(f"Arduino {action}复位状态 (GPIO 4)")
+            self.logger.debug(f"Arduino {action}复位状态 (GPIO {self.reset_pin})")
             return True
-        except subprocess.CalledProcessError as e:
-            self.logger.warning(f"GPIO控制失败: {e.stderr}")
-            return False
-        except FileNotFoundError:
-            self.logger.warning("gpio命令未找到，无法控制复位")
+        except GPIOError as e:
+            self.logger.warning(f"GPIO控制失败: {e}")
             return False
 
     def reset_target(self, duration=0.1):
@@ -111,58 +140,66 @@ class AVRFlasher:
         self.logger.warning("电源循环功能未配置")
         return False
     
-    def download_hex_file(self, url: str) -> Optional[str]:
-        """从URL下载hex文件"""
-        try:
-            self.logger.info(f"Downloading hex file from: {url}")
-            response = requests.get(url, timeout=self.config.DOWNLOAD_TIMEOUT)
-            response.raise_for_status()
-            
-            # 创建临时文件
-            with tempfile.NamedTemporaryFile(
-                mode='w', 
-                suffix='.hex', 
-                dir=self.config.UPLOAD_FOLDER,
-                delete=False
-            ) as f:
-                f.write(response.text)
-                temp_file = f.name
-            
-            self.logger.info(f"Downloaded hex file to: {temp_file}")
-            return temp_file
-            
-        except Exception as e:
-            self.logger.error(f"Download failed: {e}")
-            return None
-    
-    def validate_hex_file(self, file_path: str) -> bool:
+    def download_hex_file(self, url: str, expected_sha256: Optional[str] = None) -> bytes:
+        """
+        从URL流式下载固件到内存 (经过URL缓存，二进制固件转换为HEX)
+
+        Raises:
+            DownloadError: 下载失败、超出 MAX_CONTENT_LENGTH 或SHA-256不一致
+        """
+        self.logger.info(f"Downloading hex file from: {url}")
+        data = self.url_cache.get(url, expected_sha256)
+        if data.lstrip()[:1] != b':':
+            # 二进制固件从地址0开始
+            data = FirmwareImage.from_binary(data).to_hex()
+        return data
+
+    def get_flash_geometry(self, mcu: str = None) -> Tuple[Optional[int], Optional[int]]:
+        """获取MCU的flash大小和页大小 (器件数据库)，未知MCU返回 (None, None)"""
+        return self.parts.geometry(mcu or self.config.DEFAULT_MCU)
+
+    def load_hex_image(self, source: Union[str, bytes], mcu: str = None) -> FirmwareImage:
+        """
+        解析并校验hex文件
+
+        Args:
+            source: hex文件路径，或内存中的HEX内容 (bytes)
+
+        Raises:
+            HexFormatError: 格式、校验和、地址错误或镜像超出flash大小
+        """
+        flash_size, _ = self.get_flash_geometry(mcu)
+        if isinstance(source, (bytes, bytearray)):
+            return parse_hex(source, max_address=flash_size)
+        return load_hex_file(source, max_address=flash_size)
+
+    @staticmethod
+    def _hex_path(source: Union[str, bytes]) -> Optional[str]:
+        """交给编程器后端的文件路径，内存中的镜像返回None"""
+        return None if isinstance(source, (bytes, bytearray)) else source
+
+    @staticmethod
+    def _describe(source: Union[str, bytes]) -> str:
+        """日志中显示的镜像来源"""
+        return '<memory>' if isinstance(source, (bytes, bytearray)) else source
+
+    def validate_hex_file(self, file_path: str, mcu: str = None) -> bool:
         """验证hex文件格式"""
         try:
-            with open(file_path, 'r') as f:
-                lines = f.readlines()
-            
-            if not lines:
-                return False
-            
-            # 检查Intel HEX格式
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                if not line.startswith(':'):
-                    return False
-                if len(line) < 11:  # 最小长度检查
-                    return False
-            
-            self.logger.info(f"Hex file validation passed: {file_path}")
+            image = self.load_hex_image(file_path, mcu)
+            self.logger.info(f"Hex file validation passed: {file_path} ({image.size} bytes)")
             return True
-            
-        except Exception as e:
+        except (HexFormatError, OSError) as e:
             self.logger.error(f"Hex file validation failed: {e}")
             return False
     
-    def build_avrdude_command(self, hex_file: str, **kwargs) -> list:
-        """构建avrdude命令"""
+    def build_avrdude_command(self, hex_file: Optional[str], operation: str = 'w',
+                              updates: Optional[List[str]] = None, **kwargs) -> list:
+        """
+        构建avrdude命令 (operation: w 写入 / r 读取 / v 校验)
+
+        updates 为编程计划中各操作的 -U 参数 (如 eeprom:w:/dev/fd/5:i)，此时忽略 hex_file
+        """
         mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
         programmer = kwargs.get('programmer', self.config.DEFAULT_PROGRAMMER)
         port = kwargs.get('port', self.config.DEFAULT_PORT)
@@ -174,9 +211,10 @@ class AVRFlasher:
             '-p', mcu,
             '-c', programmer,
             '-P', port,
-            '-b', str(baudrate),
-            '-U', f'flash:w:{hex_file}:i'
+            '-b', str(baudrate)
         ]
+        for update in updates or [f'flash:{operation}:{hex_file}:i']:
+            cmd += ['-U', update]
         
         # 添加详细输出
         if self.config.DEBUG:
@@ -184,8 +222,200 @@ class AVRFlasher:
         
         return cmd
 
-    def flash_hex_file(self, hex_file: str, **kwargs) -> Dict[str, Any]:
-        """烧录hex文件到AVR单片机"""
+    def get_backend(self, name: str = None, programmer: str = None) -> ProgrammerBackend:
+        """
+        获取编程器后端，后端不可用或不支持该编程器时退回到avrdude
+
+        Raises:
+            ValueError: 未知的后端名称
+        """
+        name = name or self.config.PROGRAMMER_BACKEND
+        backend_cls = PROGRAMMER_BACKENDS.get(name)
+        if backend_cls is None:
+            raise ValueError(f'Unknown programmer backend: {name}')
+
+        programmer = programmer or self.config.DEFAULT_PROGRAMMER
+        if not backend_cls.available() or not backend_cls.supports(programmer):
+            self.logger.info(f"Backend '{name}' cannot drive programmer '{programmer}', using avrdude")
+            backend_cls = AvrdudeBackend
+
+        if backend_cls.name not in self._backends:
+            self._backends[backend_cls.name] = backend_cls(self)
+        return self._backends[backend_cls.name]
+
+    def new_timeline(self, tuning: Dict[str, Any] = None) -> ResetTimeline:
+        """创建一次操作使用的复位时序 (tuning为重试策略的调整)"""
+        profile = self.reset_profile
+        if tuning and tuning.get('reset_scale', 1.0) != 1.0:
+            profile = profile.scaled(tuning['reset_scale'])
+        return ResetTimeline(self.control_arduino_reset, profile, self.logger)
+
+    def enter_bootloader(self, timeline: ResetTimeline = None, **kwargs) -> Optional[bool]:
+        """
+        复位目标板并等待bootloader就绪
+
+        Returns:
+            True 已就绪 / False 探测超时 / None 未探测 (见 ResetTimeline.enter_bootloader)
+        """
+        timeline = timeline or self.new_timeline()
+        return timeline.enter_bootloader(
+            kwargs.get('port', self.config.DEFAULT_PORT),
+            kwargs.get('baudrate', self.config.DEFAULT_BAUDRATE),
+            kwargs.get('programmer', self.config.DEFAULT_PROGRAMMER)
+        )
+
+    def await_boot(self, timeline: ResetTimeline, await_pattern: str, await_timeout: float = None,
+                   await_baudrate: int = None, **kwargs) -> Dict[str, Any]:
+        """
+        重启目标板并等待启动输出中出现 await_pattern (按行匹配的正则表达式)
+
+        串口在释放复位之前打开，复位后立即输出的启动信息不会丢失；
+        boot_ms 为释放复位到匹配的行到达读取线程的时间
+
+        Returns:
+            {'boot_matched', 'boot_ms', 'boot_log', 'boot_match', 'boot_error'}
+        """
+        port = kwargs.get('port', self.config.DEFAULT_PORT)
+        baudrate = int(await_baudrate or self.config.BOOT_AWAIT_BAUDRATE)
+        timeout = self.config.BOOT_AWAIT_TIMEOUT if await_timeout is None else float(await_timeout)
+        boot = {'boot_matched': False, 'boot_ms': None, 'boot_log': '', 'boot_match': None, 'boot_error': None}
+
+        conn = self.open_serial_connection(port, baudrate)
+        if conn is None:
+            timeline.restart()
+            boot['boot_error'] = f'Cannot open {port} @ {baudrate} to await boot'
+            return boot
+
+        session = SerialSession(conn, self.config.BOOT_LOG_MAX_BYTES, self.logger).start()
+        try:
+            timeline.restart()
+            released = time.perf_counter()
+            # 只匹配释放复位之后的输出 (旧程序复位前的输出也可能包含该模式)
+            since = session.buffer.end
+            trigger = SerialTrigger(session, regexes=[await_pattern], since=since)
+            matched_at = []
+            trigger.on_done(lambda: matched_at.append(time.perf_counter()))
+            session.add_trigger(trigger)
+            trigger.wait(timeout)
+
+            data, end, _ = session.buffer.read(since)
+            begin = end - len(data)
+            if trigger.match:
+                data = data[:max(0, trigger.match['next'] - begin)]
+                boot['boot_matched'] = True
+                boot['boot_ms'] = round((matched_at[0] - released) * 1000, 1)
+                boot['boot_match'] = trigger.match
+                self.logger.info(f"Boot pattern matched after {boot['boot_ms']} ms")
+            elif trigger.closed:
+                boot['boot_error'] = f'Serial port closed while awaiting boot: {session.error}'
+            else:
+                boot['boot_error'] = f'Boot pattern {await_pattern!r} not seen within {timeout:g}s'
+            boot['boot_log'] = data.decode('utf-8', errors='replace')
+        finally:
+            session.close()
+
+        if boot['boot_error']:
+            self.logger.error(boot['boot_error'])
+        return boot
+
+    def _apply_boot(self, result: Dict[str, Any], boot: Dict[str, Any]):
+        """把启动结果写入操作结果，没有等到启动输出时操作失败"""
+        result.update(boot)
+        if boot['boot_ms'] is not None:
+            result.setdefault('timings', {})['boot'] = boot['boot_ms'] / 1000
+        if not boot['boot_matched']:
+            result['success'] = False
+            result['message'] = f"{result['message']}; {boot['boot_error']}"
+
+    @staticmethod
+    def _boot_event(boot: Dict[str, Any]) -> Dict[str, Any]:
+        """启动结果对应的流式事件"""
+        if boot['boot_matched']:
+            return dict(boot, type='info', message=f"Boot pattern matched after {boot['boot_ms']} ms")
+        return dict(boot, type='error', message=boot['boot_error'])
+
+    def read_flash(self, **kwargs) -> FirmwareImage:
+        """
+        回读目标板flash内容
+
+        Raises:
+            ProgrammerError: 读取失败
+        """
+        backend = self.get_backend(kwargs.get('backend'), kwargs.get('programmer'))
+        timeline = self.new_timeline()
+        try:
+            if self.enter_bootloader(timeline, **kwargs) is False:
+                raise ProgrammerError('Bootloader not responding after reset')
+            return backend.read_flash(**kwargs)
+        finally:
+            # 读取结束后重启目标板，恢复运行原程序
+            timeline.restart()
+
+    def check_unchanged(self, image: FirmwareImage, **kwargs) -> Optional[Dict[str, Any]]:
+        """
+        检查目标板是否已经运行该固件
+
+        与烧录历史中该串口最近一次成功烧录的镜像摘要比较；
+        verify_readback=True 时还会回读flash确认内容一致。
+
+        Returns:
+            已是该固件时返回跳过烧录的结果字典，否则返回None
+        """
+        start_time = time.time()
+        port = kwargs.get('port', self.config.DEFAULT_PORT)
+        mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+        digest = image.digest()
+
+        last = self.history.get(port)
+        if not last or last.get('digest') != digest or last.get('mcu') != mcu:
+            return None
+
+        confirmed = False
+        if kwargs.get('verify_readback'):
+            try:
+                regions = [(start, start + len(data)) for start, data in image.segments]
+                if not image.matches(self.read_flash(regions=regions, **kwargs)):
+                    self.logger.info(f"Flash content on {port} differs from history, flashing")
+                    return None
+            except (ProgrammerError, HexFormatError, OSError, subprocess.TimeoutExpired) as e:
+                # 无法确认时按内容已变化处理
+                self.logger.warning(f"Flash read-back failed, flashing anyway: {e}")
+                return None
+            confirmed = True
+
+        self.logger.info(f"Firmware {digest[:12]} already on {port}, flash skipped")
+        return {
+            'success': True,
+            'skipped': True,
+            'confirmed': confirmed,
+            'message': 'Firmware unchanged, flash skipped',
+            'output': '',
+            'error': '',
+            'duration': time.time() - start_time,
+            'firmware_digest': digest,
+            'last_flash': last
+        }
+
+    def _record_flash(self, image: FirmwareImage, success: bool, **kwargs):
+        """烧录结束后更新烧录历史"""
+        port = kwargs.get('port', self.config.DEFAULT_PORT)
+        mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+        # 缓存的设备身份失效，烧录成功时编程器已确认签名与MCU一致
+        self.identity.invalidate(port)
+        if success:
+            self.identity.put(port, kwargs.get('programmer', self.config.DEFAULT_PROGRAMMER),
+                              DeviceIdentity(self.parts.signature(mcu), mcu, source='flash'))
+        try:
+            if success:
+                self.history.record(port, image.digest(), size=image.size, mcu=mcu)
+            else:
+                # 烧录失败后flash内容未知
+                self.history.forget(port)
+        except OSError as e:
+            self.logger.warning(f"Failed to update flash history: {e}")
+
+    def flash_hex_file(self, hex_file: Union[str, bytes], **kwargs) -> Dict[str, Any]:
+        """烧录hex文件 (路径或内存中的HEX内容) 到AVR单片机"""
         result = {
             'success': False,
             'message': '',
@@ -195,85 +425,73 @@ class AVRFlasher:
         }
 
         start_time = time.time()
+        timings = {}
 
         try:
-            # 验证hex文件
-            if not self.validate_hex_file(hex_file):
-                result['message'] = 'Invalid hex file format'
+            # 验证hex文件 (在复位目标板和启动avrdude之前)
+            phase_start = time.perf_counter()
+            mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+            try:
+                image = self.load_hex_image(hex_file, mcu)
+            except (HexFormatError, OSError) as e:
+                result['message'] = f'Invalid hex file format: {e}'
+                result['error_class'] = 'bad_image'
+                self.logger.error(f"Hex file validation failed: {e}")
                 return result
+            result['image'] = image.to_dict(self.get_flash_geometry(mcu)[1])
+            timings['validate'] = time.perf_counter() - phase_start
 
-            # 实现FangTangLink的Reset-Flash-Reset时序
-            self.logger.info("开始烧录程序到Arduino...")
+            # 目标板已运行该固件时直接返回
+            if kwargs.get('if_changed'):
+                skipped = self.check_unchanged(image, **kwargs)
+                if skipped:
+                    skipped['image'] = result['image']
+                    return skipped
 
-            # 1. 使Arduino进入复位状态
-            if not self.control_arduino_reset(reset=True):
-                self.logger.warning("无法控制Arduino复位，继续尝试烧录...")
-            else:
-                # 2. 等待一小段时间确保复位生效
-                time.sleep(0.5)
+            backend = self.get_backend(kwargs.get('backend'), kwargs.get('programmer'))
+            result['backend'] = backend.name
+            result['timings'] = timings
 
-                # 3. 使Arduino退出复位状态，进入bootloader
-                if not self.control_arduino_reset(reset=False):
-                    self.logger.warning("无法退出Arduino复位状态")
-                else:
-                    # 4. 给bootloader一点时间初始化
-                    time.sleep(0.5)
-
-            # 5. 构建并执行avrdude命令
-            cmd = self.build_avrdude_command(hex_file, **kwargs)
-            self.logger.info(f"Executing command: {' '.join(cmd)}")
-
-            # 执行烧录
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,  # 合并stderr到stdout
-                text=True,
-                bufsize=1,  # 行缓冲
-                universal_newlines=True
-            )
-
-            # 收集输出
-            output_lines = []
+            # Reset-Flash-Reset时序
+            self.logger.info("开始烧录程序到Arduino...")
 
-            try:
-                # 实时读取输出
-                while True:
-                    line = process.stdout.readline()
-                    if not line:
-                        break
-                    output_lines.append(line.rstrip())
-                    self.logger.info(f"avrdude: {line.rstrip()}")
-
-                # 等待进程结束
-                process.wait(timeout=self.config.FLASH_TIMEOUT)
-
-            except subprocess.TimeoutExpired:
-                process.kill()
-                output_lines.append("ERROR: Flash operation timed out")
-                self.logger.error("Flash operation timed out")
-            except TypeError:
-                # Python < 3.3 不支持timeout参数
-                process.wait()
+            # 1. 复位目标板，bootloader应答后立即开始烧录
+            # 2. 通过编程器后端写入flash，失败时按重试策略调整后重新复位烧录
+            phase_start = time.perf_counter()
+            program = functools.partial(backend.program, self._hex_path(hex_file), image)
+            (outcome, timeline, params), output_lines = self._collect_events(
+                self._program_with_retry(program, kwargs), backend.name)
+            timings['program'] = time.perf_counter() - phase_start
+            timings.update(outcome.get('timings', {}))
+            result.update({key: outcome[key] for key in ('attempts', 'retries')})
 
             result['output'] = '\n'.join(output_lines)
             result['error'] = ''
-            result['duration'] = time.time() - start_time
 
-            if process.returncode == 0:
+            self._record_flash(image, outcome['success'], **kwargs)
+
+            if outcome['success']:
                 result['success'] = True
-                result['message'] = 'Flash completed successfully'
-                self.logger.info(f"Flash successful in {result['duration']:.2f}s")
+                result['message'] = outcome['message']
 
-                # 6. 操作后再次复位Arduino使程序开始运行 (FangTangLink方式)
-                self.control_arduino_reset(reset=True)
-                time.sleep(0.1)
-                self.control_arduino_reset(reset=False)
+                # 3. 操作后再次复位Arduino使程序开始运行 (可选等待启动输出)
+                if kwargs.get('await_pattern'):
+                    self._apply_boot(result, self.await_boot(timeline, **params))
+                else:
+                    timeline.restart()
                 self.logger.info("Arduino已重启，程序开始运行")
 
             else:
-                result['message'] = f'Flash failed with return code {process.returncode}'
-                self.logger.error(f"Flash failed with return code {process.returncode}")
+                result['message'] = outcome['message']
+                for key in ('error_class', 'verify_error'):
+                    if key in outcome:
+                        result[key] = outcome[key]
+                self.logger.error(outcome['message'])
+
+            timings.update(timeline.timings)
+            result['duration'] = time.time() - start_time
+            if result['success']:
+                self.logger.info(f"Flash successful in {result['duration']:.2f}s")
 
         except subprocess.TimeoutExpired:
             result['message'] = 'Flash operation timed out'
@@ -287,13 +505,134 @@ class AVRFlasher:
 
         return result
 
+    def _collect_events(self, events, source: str):
+        """
+        消费后端产生的事件
+
+        Returns:
+            (后端结果, 输出行列表)
+        """
+        output_lines = []
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as stop:
+                return stop.value, output_lines
+            # 输出行只在调试级别记录，进度按阶段汇总
+            if event['type'] == 'output':
+                output_lines.append(event['message'])
+                self.logger.debug(f"{source}: {event['message']}")
+            elif event['type'] == 'phase' and event['state'] != 'start':
+                self.logger.info(f"{source}: {event['phase']} {event['state']}"
+                                 + (f" in {event['elapsed']:.2f}s" if 'elapsed' in event else ''))
+            elif event['type'] == 'info':
+                self.logger.info(event['message'])
+            elif event['type'] == 'retry':
+                self.logger.warning(f"{source}: attempt {event['attempt']} failed ({event['error_class']}), "
+                                    f"retrying with {event['action']}")
+
+    @staticmethod
+    def _failure_event(outcome: Dict[str, Any]) -> Dict[str, Any]:
+        """编程器失败时流式接口的最后一个事件"""
+        event = {"type": "error", "message": outcome['message']}
+        for key in ('error_class', 'verify_error', 'attempts', 'timings'):
+            if key in outcome:
+                event[key] = outcome[key]
+        return event
+
+    @staticmethod
+    def _ready_event(ready: Optional[bool], timeline: ResetTimeline) -> Dict[str, Any]:
+        """进入bootloader后的流式事件"""
+        if ready is None:
+            return {"type": "warning", "message": "未探测bootloader，按固定时间等待后继续烧录"}
+        return {"type": "info", "message": "Bootloader ready", "timings": dict(timeline.timings)}
+
+    @staticmethod
+    def _bootloader_timeout(timeline: ResetTimeline) -> Dict[str, Any]:
+        return {'success': False, 'message': 'Bootloader not responding after reset',
+                'error_class': 'bootloader_timeout', 'timings': dict(timeline.timings)}
+
+    def _next_attempt(self, outcome: Optional[Dict[str, Any]], state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        一次尝试结束后更新重试状态
+
+        Returns:
+            需要重试时返回 retry 事件，否则返回None (结果写入 state['outcome'])
+        """
+        policy = self.retry_policy
+        if outcome is None:
+            # 编程器没有给出结果 (子进程被结束或输出提前结束)，按未知错误处理
+            outcome = {'success': False, 'message': 'Programmer exited without a result', 'output': ''}
+        state['outcome'] = outcome
+        if outcome['success']:
+            policy.succeeded(state['tuning'], retried=bool(state['retries']))
+            return None
+        error_class = outcome.setdefault('error_class', 'unknown')
+        decision = None
+        if state['attempt'] < state['max_attempts']:
+            decision = policy.next(error_class, state['tuning'], state['params'])
+        if decision is None:
+            return None
+        action, state['tuning'] = decision
+        retry = {'attempt': state['attempt'], 'error_class': error_class, 'action': action,
+                 'message': outcome['message']}
+        state['retries'].append(retry)
+        state['attempt'] += 1
+        return dict(retry, type='retry', tuning=dict(state['tuning']))
+
+    def _retry_state(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        max_attempts = kwargs.get('max_attempts') or self.retry_policy.max_attempts
+        return {'attempt': 1, 'max_attempts': max(1, int(max_attempts)), 'retries': [],
+                'tuning': self.retry_policy.initial(kwargs), 'outcome': None}
+
+    @staticmethod
+    def _finish_attempts(state: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(state['outcome'], attempts=state['attempt'], retries=state['retries'],
+                    tuning=state['tuning'])
+
+    def _program_with_retry(self, program, kwargs: Dict[str, Any], output_callback=None):
+        """
+        复位进入bootloader并执行编程，失败时按重试策略调整参数后重试 (事件生成器)
+
+        Args:
+            program: 以本次尝试的参数调用，返回编程器事件生成器 (如 backend.program)
+
+        Returns:
+            (编程器结果, 最后一次尝试的复位时序, 最后一次尝试使用的参数)
+        """
+        state = self._retry_state(kwargs)
+        while True:
+            state['params'] = params = self.retry_policy.apply(state['tuning'], kwargs)
+            timeline = self.new_timeline(state['tuning'])
+            ready = self.enter_bootloader(timeline, **params)
+            if ready is False:
+                outcome = self._bootloader_timeout(timeline)
+            else:
+                yield self._ready_event(ready, timeline)
+                outcome = yield from self._relay_events(program(**params), output_callback)
+            retry = self._next_attempt(outcome, state)
+            if retry is None:
+                return self._finish_attempts(state), timeline, params
+            yield retry
+
+    def _relay_events(self, events, output_callback=None):
+        """转发后端事件 (流式接口)，返回后端结果"""
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as stop:
+                return stop.value
+            if event['type'] == 'output' and output_callback:
+                output_callback(event['message'])
+            yield event
+
     def perform_arduino_operation(self, hex_file=None, **kwargs):
         """
         完整的Arduino操作流程，完全模拟FangTangLink的实现
         包括复位控制和时序管理
         """
         try:
-            if hex_file and not os.path.exists(hex_file):
+            if self._hex_path(hex_file) and not os.path.exists(hex_file):
                 self.logger.error(f"文件 {hex_file} 不存在")
                 return {
                     'success': False,
@@ -306,41 +645,30 @@ class AVRFlasher:
             operation_type = "上传程序" if hex_file else "执行操作"
             self.logger.info(f"开始{operation_type}到Arduino...")
 
-            # 1. 使Arduino进入复位状态
-            if not self.control_arduino_reset(reset=True):
-                self.logger.error("错误: 无法控制Arduino复位")
-                # 继续尝试，不返回失败
-
-            # 2. 等待一小段时间确保复位生效
-            time.sleep(0.5)
-
-            # 3. 使Arduino退出复位状态，进入bootloader
-            if not self.control_arduino_reset(reset=False):
-                self.logger.error("错误: 无法退出Arduino复位状态")
-                # 继续尝试，不返回失败
-
-            # 4. 给bootloader一点时间初始化
-            time.sleep(0.5)
-
-            # 5. 执行烧录操作
             if hex_file:
+                # 复位、烧录和重启都由 flash_hex_file 按复位时序完成
                 result = self.flash_hex_file(hex_file, **kwargs)
             else:
                 # 如果没有hex文件，只是执行复位操作
+                start_time = time.time()
+                timeline = self.new_timeline()
+                boot = None
+                if kwargs.get('await_pattern'):
+                    boot = self.await_boot(timeline, **kwargs)
+                elif not timeline.restart():
+                    self.logger.error("错误: 无法控制Arduino复位")
                 result = {
                     'success': True,
                     'message': '复位操作完成',
                     'error': '',
                     'output': '',
-                    'duration': 1.0
+                    'duration': time.time() - start_time,
+                    'timings': timeline.timings
                 }
+                if boot is not None:
+                    self._apply_boot(result, boot)
 
-            # 6. 操作后再次复位Arduino使程序开始运行
             if result['success']:
-                self.control_arduino_reset(reset=True)
-                time.sleep(0.1)
-                self.control_arduino_reset(reset=False)
-                self.logger.info("Arduino已重启，程序开始运行")
                 self.logger.info("操作成功完成!")
             else:
                 self.logger.info("操作失败!")
@@ -357,96 +685,170 @@ class AVRFlasher:
                 'duration': 0
             }
 
-    def flash_from_url(self, url: str, **kwargs) -> Dict[str, Any]:
-        """从URL下载并烧录hex文件"""
+    def flash_from_url(self, url: str, expected_sha256: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """从URL下载并烧录hex文件 (下载内容只保存在内存中)"""
         # 下载文件
-        hex_file = self.download_hex_file(url)
-        if not hex_file:
+        try:
+            data = self.download_hex_file(url, expected_sha256)
+        except DownloadError as e:
+            self.logger.error(f"Download failed: {e}")
             return {
                 'success': False,
-                'message': 'Failed to download hex file',
+                'message': f'Failed to download hex file: {e}',
                 'output': '',
-                'error': '',
+                'error': str(e),
                 'duration': 0
             }
 
-        try:
-            # 烧录文件
-            result = self.flash_hex_file(hex_file, **kwargs)
-            return result
-        finally:
-            # 清理临时文件
-            try:
-                os.unlink(hex_file)
-                self.logger.info(f"Cleaned up temporary file: {hex_file}")
-            except Exception as e:
-                self.logger.warning(f"Failed to clean up temporary file: {e}")
+        # 烧录文件
+        return self.flash_hex_file(data, **kwargs)
+
+    def get_plan_backend(self, plan: ProgrammingPlan, name: str = None, programmer: str = None) -> ProgrammerBackend:
+        """获取执行编程计划的后端，所选后端不支持计划中的存储器时退回到avrdude"""
+        backend = self.get_backend(name, programmer)
+        if not backend.supports_plan(plan):
+            self.logger.info(f"Backend '{backend.name}' cannot program {', '.join(plan.memories)}, using avrdude")
+            backend = self.get_backend(AvrdudeBackend.name, programmer)
+        return backend
 
-    def get_device_info(self, **kwargs) -> Dict[str, Any]:
-        """获取设备信息"""
+    def program_plan(self, plan: ProgrammingPlan, **kwargs) -> Dict[str, Any]:
+        """
+        在一次编程器会话中执行编程计划 (只复位一次目标板，失败时整个计划按重试策略重试)
+
+        Returns:
+            与 flash_hex_file 相同格式的结果，results 为每个操作的结果
+            (读取的 flash/eeprom 为HEX文本，熔丝位/锁定位为 0x.. 形式的值)
+        """
         result = {
             'success': False,
             'message': '',
-            'device_signature': '',
             'output': '',
-            'error': ''
+            'error': '',
+            'duration': 0,
+            'plan': plan.to_dict()
         }
 
-        try:
-            mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
-            programmer = kwargs.get('programmer', self.config.DEFAULT_PROGRAMMER)
-            port = kwargs.get('port', self.config.DEFAULT_PORT)
-            baudrate = kwargs.get('baudrate', self.config.DEFAULT_BAUDRATE)
-
-            cmd = [
-                self.config.AVRDUDE_PATH,
-                '-C', self.config.AVRDUDE_CONF,
-                '-p', mcu,
-                '-c', programmer,
-                '-P', port,
-                '-b', str(baudrate),
-                '-v'
-            ]
-
-            self.logger.info(f"Getting device info: {' '.join(cmd)}")
-
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+        start_time = time.time()
 
-            stdout, stderr = process.communicate(timeout=30)
+        try:
+            backend = self.get_plan_backend(plan, kwargs.get('backend'), kwargs.get('programmer'))
+            result['backend'] = backend.name
+            self.logger.info(f"Programming {', '.join(plan.memories)} in one session ({backend.name})")
+
+            phase_start = time.perf_counter()
+            program = functools.partial(backend.program_plan, plan)
+            (outcome, timeline, params), output_lines = self._collect_events(
+                self._program_with_retry(program, kwargs), backend.name)
+            timings = {'program': time.perf_counter() - phase_start}
+            timings.update(outcome.get('timings', {}))
+            result['timings'] = timings
+            result.update({key: outcome[key] for key in ('attempts', 'retries')})
+            result['output'] = '\n'.join(output_lines)
+            result['message'] = outcome['message']
 
-            result['output'] = stdout
-            result['error'] = stderr
+            written = plan.written()
+            if 'flash' in written:
+                self._record_flash(plan.flash_image(), outcome['success'], **kwargs)
+            elif set(written) & set(BYTE_MEMORIES):
+                # 缓存的熔丝位已过期
+                self.identity.invalidate(kwargs.get('port', self.config.DEFAULT_PORT))
 
-            if process.returncode == 0:
+            if outcome['success']:
                 result['success'] = True
-                result['message'] = 'Device info retrieved successfully'
-
-                # 提取设备签名
-                for line in stderr.split('\n'):
-                    if 'Device signature' in line:
-                        result['device_signature'] = line.strip()
-                        break
-
+                result['results'] = [self._plan_result(item) for item in outcome['results']]
+                if kwargs.get('await_pattern'):
+                    self._apply_boot(result, self.await_boot(timeline, **params))
+                else:
+                    timeline.restart()
             else:
-                result['message'] = f'Failed to get device info: {stderr}'
+                for key in ('error_class', 'verify_error'):
+                    if key in outcome:
+                        result[key] = outcome[key]
+                self.logger.error(outcome['message'])
+
+            timings.update(timeline.timings)
+            result['duration'] = time.time() - start_time
 
+        except subprocess.TimeoutExpired:
+            result['message'] = 'Programming operation timed out'
+            self.logger.error("Programming operation timed out")
+        except FileNotFoundError:
+            result['message'] = 'avrdude not found. Please install avrdude.'
+            self.logger.error("avrdude not found")
         except Exception as e:
-            result['message'] = f'Error getting device info: {str(e)}'
-            self.logger.error(f"Error getting device info: {e}")
+            result['message'] = f'Programming operation failed: {str(e)}'
+            self.logger.error(f"Programming operation failed: {e}")
+
+        return result
+
+    @staticmethod
+    def _plan_result(item: Dict[str, Any]) -> Dict[str, Any]:
+        """编程计划中一个操作的结果 (读取的内容转为可序列化的形式)"""
+        item = dict(item)
+        data = item.pop('data', None)
+        if isinstance(data, FirmwareImage):
+            item.update(hex=data.to_hex().decode('ascii'), size=data.size, digest=data.digest())
+        elif data is not None:
+            item['value'] = f'0x{data:02x}'
+        return item
+
+    def cached_identity(self, port: str = None, programmer: str = None) -> Optional[DeviceIdentity]:
+        """该串口上缓存的设备身份，没有有效缓存时返回None"""
+        return self.identity.get(port or self.config.DEFAULT_PORT, programmer or self.config.DEFAULT_PROGRAMMER)
+
+    def cached_device_info(self, **kwargs) -> Optional[Dict[str, Any]]:
+        """由缓存的设备身份构造设备信息结果 (不访问目标板)，没有缓存时返回None"""
+        identity = self.cached_identity(kwargs.get('port'), kwargs.get('programmer'))
+        if identity is None:
+            return None
+        return {
+            'success': True,
+            'message': 'Device info from cache',
+            'device_signature': f'Device signature = 0x{identity.signature}',
+            'output': '',
+            'error': '',
+            'identity': identity.to_dict(),
+            'cached': True
+        }
+
+    def get_device_info(self, refresh: bool = False, **kwargs) -> Dict[str, Any]:
+        """
+        获取设备信息 (签名、识别出的MCU、熔丝位和bootloader版本)
 
+        Args:
+            refresh: 忽略缓存，复位目标板重新读取
+        """
+        if not refresh:
+            cached = self.cached_device_info(**kwargs)
+            if cached is not None:
+                return cached
+        try:
+            backend = self.get_backend(kwargs.get('backend'), kwargs.get('programmer'))
+        except ValueError as e:
+            return {'success': False, 'message': str(e), 'device_signature': '',
+                    'output': '', 'error': str(e)}
+        if backend.requires_bootloader:
+            self.enter_bootloader(**kwargs)
+        result = backend.device_info(**kwargs)
+        result['cached'] = False
+
+        port = kwargs.get('port', self.config.DEFAULT_PORT)
+        self.identity.invalidate(port)
+        parsed = result.pop('identity', None)
+        if parsed and parsed['signature']:
+            part = self.parts.by_signature(parsed['signature'])
+            identity = DeviceIdentity(parsed['signature'], part.name if part is not None else None,
+                                      parsed['fuses'], parsed['bootloader'])
+            result['identity'] = identity.to_dict()
+            self.identity.put(port, kwargs.get('programmer', self.config.DEFAULT_PROGRAMMER), identity)
         return result
 
-    def flash_hex_file_stream(self, hex_file: str, output_callback=None, **kwargs):
+    def flash_hex_file_stream(self, hex_file: Union[str, bytes], output_callback=None, **kwargs):
         """
         烧录hex文件到AVR单片机 (流式输出版本)
 
         Args:
-            hex_file: hex文件路径
+            hex_file: hex文件路径或内存中的HEX内容
             output_callback: 输出回调函数，接收每行输出
             **kwargs: 其他参数
 
@@ -457,73 +859,144 @@ class AVRFlasher:
 
         try:
             # 验证hex文件
-            if not self.validate_hex_file(hex_file):
-                yield {"type": "error", "message": "Invalid hex file format"}
+            mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+            try:
+                image = self.load_hex_image(hex_file, mcu)
+            except (HexFormatError, OSError) as e:
+                yield {"type": "error", "message": f"Invalid hex file format: {e}", "error_class": "bad_image"}
                 return
 
-            yield {"type": "info", "message": f"Hex file validation passed: {hex_file}"}
+            yield {
+                "type": "info",
+                "message": f"Hex file validation passed: {self._describe(hex_file)} ({image.size} bytes)",
+                "image": image.to_dict(self.get_flash_geometry(mcu)[1])
+            }
+
+            if kwargs.get('if_changed'):
+                skipped = self.check_unchanged(image, **kwargs)
+                if skipped:
+                    yield {"type": "success", "message": skipped['message'], "skipped": True,
+                           "confirmed": skipped['confirmed']}
+                    return
 
-            # 实现FangTangLink的Reset-Flash-Reset时序
+            backend = self.get_backend(kwargs.get('backend'), kwargs.get('programmer'))
+
+            # Reset-Flash-Reset时序
             yield {"type": "info", "message": "开始烧录程序到Arduino..."}
 
-            # 1. 使Arduino进入复位状态
-            if not self.control_arduino_reset(reset=True):
-                yield {"type": "warning", "message": "无法控制Arduino复位，继续尝试烧录..."}
-            else:
-                # 2. 等待一小段时间确保复位生效
-                time.sleep(0.5)
+            # 1. 复位目标板，bootloader应答后立即开始烧录
+            # 2. 通过编程器后端写入flash，失败时按重试策略调整后重新复位烧录
+            program = functools.partial(backend.program, self._hex_path(hex_file), image)
+            outcome, timeline, params = yield from self._program_with_retry(program, kwargs, output_callback)
+            duration = time.time() - start_time
+            self._record_flash(image, outcome['success'], **kwargs)
+
+            if outcome['success']:
+                yield {"type": "success", "message": f"Flash completed successfully in {duration:.2f}s",
+                       "backend": backend.name, "timings": outcome.get('timings'),
+                       "attempts": outcome['attempts']}
 
-                # 3. 使Arduino退出复位状态，进入bootloader
-                if not self.control_arduino_reset(reset=False):
-                    yield {"type": "warning", "message": "无法退出Arduino复位状态"}
+                # 3. 操作后再次复位Arduino使程序开始运行 (可选等待启动输出)
+                if kwargs.get('await_pattern'):
+                    boot = self.await_boot(timeline, **params)
                 else:
-                    # 4. 给bootloader一点时间初始化
-                    time.sleep(0.5)
-
-            # 5. 构建并执行avrdude命令
-            cmd = self.build_avrdude_command(hex_file, **kwargs)
-            yield {"type": "info", "message": f"Executing command: {' '.join(cmd)}"}
-
-            # 执行烧录
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
+                    timeline.restart()
+                yield {"type": "info", "message": "Arduino已重启，程序开始运行", "timings": timeline.timings}
+                if kwargs.get('await_pattern'):
+                    yield self._boot_event(boot)
 
-            # 实时输出
-            while True:
-                line = process.stdout.readline()
-                if not line:
-                    break
+            else:
+                yield self._failure_event(outcome)
 
-                line = line.rstrip()
-                if line:
-                    yield {"type": "output", "message": line}
-                    if output_callback:
-                        output_callback(line)
+        except subprocess.TimeoutExpired:
+            yield {"type": "error", "message": "Flash operation timed out"}
+        except FileNotFoundError:
+            yield {"type": "error", "message": "avrdude not found. Please install avrdude."}
+        except Exception as e:
+            yield {"type": "error", "message": f"Flash operation failed: {str(e)}"}
 
-            # 等待进程结束
-            process.wait()
-            duration = time.time() - start_time
+    async def flash_hex_file_stream_async(self, hex_file: Union[str, bytes], **kwargs):
+        """
+        flash_hex_file_stream() 的asyncio版本 (异步生成器)，事件与同步版本相同
 
-            if process.returncode == 0:
-                yield {"type": "success", "message": f"Flash completed successfully in {duration:.2f}s"}
+        编程器输出通过后端的 program_async() 读取 (avrdude使用asyncio子进程管道)；
+        校验、复位等短暂的阻塞步骤在事件循环的默认线程池中执行
+        """
+        loop = asyncio.get_running_loop()
+
+        def blocking(func, *args, **kw):
+            return loop.run_in_executor(None, functools.partial(func, *args, **kw))
+
+        start_time = time.time()
 
-                # 6. 操作后再次复位Arduino使程序开始运行
-                self.control_arduino_reset(reset=True)
-                time.sleep(0.1)
-                self.control_arduino_reset(reset=False)
-                yield {"type": "info", "message": "Arduino已重启，程序开始运行"}
+        try:
+            mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+            try:
+                image = await blocking(self.load_hex_image, hex_file, mcu)
+            except (HexFormatError, OSError) as e:
+                yield {"type": "error", "message": f"Invalid hex file format: {e}", "error_class": "bad_image"}
+                return
+
+            yield {
+                "type": "info",
+                "message": f"Hex file validation passed: {self._describe(hex_file)} ({image.size} bytes)",
+                "image": image.to_dict(self.get_flash_geometry(mcu)[1])
+            }
 
+            if kwargs.get('if_changed'):
+                skipped = await blocking(self.check_unchanged, image, **kwargs)
+                if skipped:
+                    yield {"type": "success", "message": skipped['message'], "skipped": True,
+                           "confirmed": skipped['confirmed']}
+                    return
+
+            backend = self.get_backend(kwargs.get('backend'), kwargs.get('programmer'))
+
+            yield {"type": "info", "message": "开始烧录程序到Arduino..."}
+
+            # 与 _program_with_retry() 相同的重试流程
+            state = self._retry_state(kwargs)
+            while True:
+                state['params'] = params = self.retry_policy.apply(state['tuning'], kwargs)
+                timeline = self.new_timeline(state['tuning'])
+                ready = await blocking(self.enter_bootloader, timeline, **params)
+                if ready is False:
+                    outcome = self._bootloader_timeout(timeline)
+                else:
+                    yield self._ready_event(ready, timeline)
+                    outcome = None
+                    events = backend.program_async(self._hex_path(hex_file), image, **params)
+                    try:
+                        async for event in events:
+                            if event['type'] == 'result':
+                                outcome = event['result']
+                            else:
+                                yield event
+                    finally:
+                        # 调用者提前停止时立即结束编程器 (不等待垃圾回收)
+                        await events.aclose()
+                retry = self._next_attempt(outcome, state)
+                if retry is None:
+                    break
+                yield retry
+            outcome = self._finish_attempts(state)
+            duration = time.time() - start_time
+            await blocking(self._record_flash, image, outcome['success'], **kwargs)
+
+            if outcome['success']:
+                yield {"type": "success", "message": f"Flash completed successfully in {duration:.2f}s",
+                       "backend": backend.name, "timings": outcome.get('timings'),
+                       "attempts": outcome['attempts']}
+                if kwargs.get('await_pattern'):
+                    boot = await blocking(self.await_boot, timeline, **params)
+                else:
+                    await blocking(timeline.restart)
+                yield {"type": "info", "message": "Arduino已重启，程序开始运行", "timings": timeline.timings}
+                if kwargs.get('await_pattern'):
+                    yield self._boot_event(boot)
             else:
-                yield {"type": "error", "message": f"Flash failed with return code {process.returncode}"}
+                yield self._failure_event(outcome)
 
-        except subprocess.TimeoutExpired:
-            yield {"type": "error", "message": "Flash operation timed out"}
         except FileNotFoundError:
             yield {"type": "error", "message": "avrdude not found. Please install avrdude."}
         except Exception as e:
@@ -618,10 +1091,14 @@ class AVRFlasher:
 
     def cleanup(self):
         """清理资源"""
-        # 使用gpio命令行工具时无需特殊清理
-        if self.gpio_available:
+        gpio = getattr(self, 'gpio', None)
+        if gpio is not None:
+            # 共享的GPIO后端由创建者负责关闭
+            if self._owns_gpio:
+                gpio.close()
+            self.gpio = None
+            self.gpio_available = False
             self.logger.info("GPIO cleanup completed")
-        pass
 
     def __del__(self):
         """析构函数"""
@@ -0,0 +1,452 @@
+"""
+avrdude.conf 器件数据库 - RemoteFlasher API
+解析 AVRDUDE_CONF 中的 part / programmer 定义 (含 parent 继承)，按型号、签名和编程器ID建立索引：
+
+- 按文件路径缓存解析结果，文件的 mtime/大小变化后才重新解析，每次查询只需一次 stat
+- MCU按 id (m328p) 或描述 (ATmega328P，不区分大小写) 查找，统一使用小写描述作为名称
+- 文件不存在时使用配置中的 SUPPORTED_MCUS / MCU_FLASH / MCU_SIGNATURES / SUPPORTED_PROGRAMMERS
+- 请求中的未知MCU和编程器在复位目标板之前被拒绝，并给出相近的名称
+"""
+
+import copy
+import difflib
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+_TOKEN = re.compile(r'\s+|#[^\n]*|"((?:[^"\\]|\\.)*)"|([=;,])|([^\s=;,"#]+)')
+
+# 开始一个定义块的顶层关键字
+_BLOCKS = ('part', 'programmer', 'serialadapter')
+
+_UNLOADED = object()
+
+
+class AvrdudeConfError(ValueError):
+    """avrdude.conf 语法错误"""
+
+
+def _tokenize(text: str):
+    pos = 0
+    line = 1
+    while pos < len(text):
+        found = _TOKEN.match(text, pos)
+        if not found:
+            raise AvrdudeConfError(f'Unexpected character {text[pos]!r} on line {line}')
+        string, punct, word = found.groups()
+        if string is not None:
+            yield 'string', string, line
+        elif punct is not None:
+            yield 'punct', punct, line
+        elif word is not None:
+            yield 'word', word, line
+        line += found.group(0).count('\n')
+        pos = found.end()
+
+
+class _Parser:
+    """avrdude.conf 语法: 顶层为 `key = value;` 或 `part [parent "id"] 语句... ;` 定义块"""
+
+    def __init__(self, text: str):
+        self.tokens = list(_tokenize(text))
+        self.pos = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos][:2]
+        return None
+
+    def next(self) -> Tuple[str, str]:
+        if self.pos >= len(self.tokens):
+            raise AvrdudeConfError('Unexpected end of file')
+        self.pos += 1
+        return self.tokens[self.pos - 1][:2]
+
+    def expect(self, kind: str, value: str = None) -> str:
+        line = self.tokens[min(self.pos, len(self.tokens) - 1)][2] if self.tokens else 0
+        token = self.next()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise AvrdudeConfError(f'Expected {value or kind} on line {line}, got {token[1]!r}')
+        return token[1]
+
+    def values(self) -> List[Any]:
+        """'=' 之后到 ';' 的值 (字符串、数字或标识符)"""
+        values = []
+        while True:
+            kind, value = self.next()
+            if kind == 'punct':
+                if value == ';':
+                    return values
+                continue
+            if kind == 'word':
+                try:
+                    value = int(value, 0)
+                except ValueError:
+                    pass
+            values.append(value)
+
+    def block(self) -> Tuple[Dict[str, List[Any]], Dict[str, Optional[Dict[str, List[Any]]]]]:
+        """定义块中的语句，直到单独的 ';'，返回 (字段, 存储器)"""
+        fields: Dict[str, List[Any]] = {}
+        memories: Dict[str, Optional[Dict[str, List[Any]]]] = {}
+        while True:
+            kind, value = self.next()
+            if (kind, value) == ('punct', ';'):
+                return fields, memories
+            if kind != 'word':
+                raise AvrdudeConfError(f'Unexpected {value!r} in definition')
+            if value == 'memory':
+                name = self.expect('string')
+                if self.peek() == ('punct', '='):
+                    # memory "name" = NULL; 删除从parent继承的存储器
+                    self.next()
+                    self.values()
+                    memories[name] = None
+                elif self.peek() == ('word', 'alias'):
+                    # memory "fuse0" alias "lfuse"; (avrdude 7.x)
+                    self.next()
+                    memories[name] = dict(memories.get(self.expect('string')) or {})
+                    self.expect('punct', ';')
+                else:
+                    memories[name] = self.block()[0]
+            else:
+                # 少数语句没有 '=' (如存储器中的 alias "lfuse";)
+                if self.peek() == ('punct', '='):
+                    self.next()
+                fields[value] = self.values()
+
+    def parse(self) -> List[Tuple[str, Optional[str], Dict, Dict]]:
+        """返回定义块列表 [(类型, parent, 字段, 存储器)]"""
+        entries = []
+        while self.peek() is not None:
+            kind, value = self.next()
+            if kind == 'word' and value in _BLOCKS:
+                parent = None
+                if self.peek() == ('word', 'parent'):
+                    self.next()
+                    parent = self.expect('string')
+                fields, memories = self.block()
+                entries.append((value, parent, fields, memories))
+            elif kind == 'word':
+                # 全局设置 (default_programmer 等)
+                self.expect('punct', '=')
+                self.values()
+            else:
+                raise AvrdudeConfError(f'Unexpected {value!r} at top level')
+        return entries
+
+
+class PartInfo:
+    """一个AVR器件的参数"""
+
+    def __init__(self, part_id: str, desc: Optional[str] = None, signature: Optional[str] = None,
+                 memories: Optional[Dict[str, Dict[str, Any]]] = None, layout_known: bool = True):
+        """
+        Args:
+            part_id: avrdude中的器件ID (如 m328p)
+            desc: 描述 (如 ATmega328P)
+            signature: 6位十六进制器件签名
+            memories: 存储器名称 -> {'size', 'page_size', 'paged', ...}
+            layout_known: memories 是否完整 (来自avrdude.conf)；配置中的MCU只知道flash
+        """
+        self.id = part_id
+        self.desc = desc or part_id
+        self.name = self.desc.lower()
+        self.signature = signature
+        self.memories = memories or {}
+        self.layout_known = layout_known
+
+    @property
+    def flash_size(self) -> Optional[int]:
+        return self.memories.get('flash', {}).get('size')
+
+    @property
+    def page_size(self) -> Optional[int]:
+        return self.memories.get('flash', {}).get('page_size')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'desc': self.desc,
+            'signature': self.signature,
+            'flash_size': self.flash_size,
+            'page_size': self.page_size,
+            'memories': copy.deepcopy(self.memories)
+        }
+
+
+class ProgrammerInfo:
+    """一个编程器定义"""
+
+    def __init__(self, ids: List[str], desc: Optional[str] = None, prog_type: Optional[str] = None,
+                 connection_type: Optional[str] = None):
+        self.ids = ids
+        self.desc = desc
+        self.type = prog_type
+        self.connection_type = connection_type
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'ids': list(self.ids), 'desc': self.desc, 'type': self.type,
+                'connection_type': self.connection_type}
+
+
+def _first(fields: Dict[str, List[Any]], name: str) -> Any:
+    values = fields.get(name)
+    return values[0] if values else None
+
+
+def _memory_layout(memory: Dict[str, List[Any]]) -> Dict[str, Any]:
+    layout = {'size': _first(memory, 'size'), 'page_size': _first(memory, 'page_size'),
+              'paged': _first(memory, 'paged') == 'yes'}
+    if 'offset' in memory:
+        layout['offset'] = _first(memory, 'offset')
+    return layout
+
+
+def parse_avrdude_conf(text: str) -> Tuple[List[PartInfo], List[ProgrammerInfo]]:
+    """
+    解析avrdude.conf内容
+
+    Returns:
+        (器件列表, 编程器列表)，按文件中的顺序，不含ID以'.'开头的公共模板
+
+    Raises:
+        AvrdudeConfError: 语法错误或parent不存在
+    """
+    resolved: Dict[Tuple[str, str], Tuple[Dict, Dict]] = {}
+    parts: List[PartInfo] = []
+    programmers: List[ProgrammerInfo] = []
+
+    for kind, parent, fields, memories in _Parser(text).parse():
+        group = 'programmer' if kind == 'serialadapter' else kind
+        if parent is not None:
+            if (group, parent) not in resolved:
+                raise AvrdudeConfError(f'Unknown parent {kind} "{parent}"')
+            base_fields, base_memories = copy.deepcopy(resolved[(group, parent)])
+            base_fields.update(fields)
+            for name, memory in memories.items():
+                if memory is None:
+                    base_memories.pop(name, None)
+                else:
+                    base_memories.setdefault(name, {}).update(memory)
+            fields, memories = base_fields, base_memories
+        ids = [str(value) for value in fields.get('id', [])]
+        for entry_id in ids:
+            resolved[(group, entry_id)] = (fields, memories)
+        ids = [entry_id for entry_id in ids if not entry_id.startswith('.')]
+        if not ids:
+            continue
+
+        if kind == 'part':
+            signature = fields.get('signature')
+            if signature and all(isinstance(b, int) for b in signature):
+                signature = ''.join(f'{b:02x}' for b in signature)
+            else:
+                signature = None
+            layout = {name: _memory_layout(memory) for name, memory in memories.items() if memory is not None}
+            parts.append(PartInfo(ids[0], _first(fields, 'desc'), signature, layout))
+        else:
+            prog_type = _first(fields, 'type')
+            connection = _first(fields, 'connection_type')
+            programmers.append(ProgrammerInfo(ids, _first(fields, 'desc'),
+                                              str(prog_type) if prog_type is not None else None,
+                                              str(connection) if connection is not None else None))
+    return parts, programmers
+
+
+class AvrdudeConf:
+    """解析后的avrdude.conf"""
+
+    def __init__(self, path: str, mtime: float, parts: List[PartInfo], programmers: List[ProgrammerInfo]):
+        self.path = path
+        self.mtime = mtime
+        self.parts = parts
+        self.programmers = programmers
+
+
+# 文件路径 -> ((mtime_ns, 大小), 解析结果)，文件不存在时解析结果为None
+_conf_cache: Dict[str, Tuple[Any, Optional[AvrdudeConf]]] = {}
+_conf_lock = threading.Lock()
+
+
+def load_avrdude_conf(path: str) -> Optional[AvrdudeConf]:
+    """
+    读取并解析avrdude.conf，文件未变化时返回缓存的结果
+
+    Returns:
+        解析结果，文件不存在时返回None
+
+    Raises:
+        AvrdudeConfError: 语法错误
+    """
+    try:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except (OSError, TypeError, ValueError):
+        stamp = None
+    cached = _conf_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with _conf_lock:
+        cached = _conf_cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        conf = None
+        if stamp is not None:
+            try:
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    parts, programmers = parse_avrdude_conf(f.read())
+            except AvrdudeConfError:
+                # 文件修改之前不再重复解析
+                _conf_cache[path] = (stamp, None)
+                raise
+            conf = AvrdudeConf(path, st.st_mtime, parts, programmers)
+        _conf_cache[path] = (stamp, conf)
+        return conf
+
+
+class PartDatabase:
+    """MCU和编程器的查询接口 (avrdude.conf，文件不存在时使用配置中的列表)"""
+
+    def __init__(self, config, logger: Optional[logging.Logger] = None):
+        self.config = config
+        self.path = config.AVRDUDE_CONF
+        self.logger = logger or logging.getLogger('AVRFlasher.parts')
+        self._lock = threading.Lock()
+        self._conf: Any = _UNLOADED
+        self._index: Dict[str, Any] = {}
+
+    def _config_parts(self) -> List[PartInfo]:
+        """配置中的MCU列表 (没有avrdude.conf时使用)"""
+        names = list(self.config.SUPPORTED_MCUS)
+        names += [name for name in self.config.MCU_FLASH if name not in names]
+        parts = []
+        for name in names:
+            memories = {}
+            if name in self.config.MCU_FLASH:
+                size, page_size = self.config.MCU_FLASH[name]
+                memories['flash'] = {'size': size, 'page_size': page_size, 'paged': True}
+            parts.append(PartInfo(name, name, self.config.MCU_SIGNATURES.get(name), memories, layout_known=False))
+        return parts
+
+    def _current(self) -> Dict[str, Any]:
+        """当前的索引，avrdude.conf变化后重建"""
+        try:
+            conf = load_avrdude_conf(self.path)
+        except (AvrdudeConfError, OSError) as e:
+            conf = None
+            self.logger.warning(f"Cannot parse {self.path}, using configured MCU list: {e}")
+        if conf is self._conf:
+            return self._index
+
+        with self._lock:
+            if conf is not self._conf:
+                if conf is not None:
+                    parts, programmers = conf.parts, conf.programmers
+                    self.logger.info(f"Loaded {len(parts)} parts and {len(programmers)} programmers from {self.path}")
+                else:
+                    parts = self._config_parts()
+                    programmers = [ProgrammerInfo([name]) for name in self.config.SUPPORTED_PROGRAMMERS]
+                self._index = self._build_index(conf, parts, programmers)
+                self._conf = conf
+            return self._index
+
+    @staticmethod
+    def _build_index(conf: Optional[AvrdudeConf], parts: List[PartInfo],
+                     programmers: List[ProgrammerInfo]) -> Dict[str, Any]:
+        lookup: Dict[str, PartInfo] = {}
+        signatures: Dict[str, PartInfo] = {}
+        for part in parts:
+            for key in (part.id.lower(), part.name):
+                lookup.setdefault(key, part)
+            if part.signature:
+                signatures.setdefault(part.signature, part)
+        programmer_ids: Dict[str, ProgrammerInfo] = {}
+        for programmer in programmers:
+            for prog_id in programmer.ids:
+                programmer_ids.setdefault(prog_id.lower(), programmer)
+        names = list(dict.fromkeys(part.name for part in parts))
+        return {
+            'parts': lookup,
+            'names': names,
+            'signatures': signatures,
+            'programmers': programmer_ids,
+            'programmer_names': [prog_id for programmer in programmers for prog_id in programmer.ids],
+            'source': {'type': 'avrdude.conf' if conf is not None else 'config',
+                       'path': conf.path if conf is not None else None,
+                       'mtime': conf.mtime if conf is not None else None,
+                       'parts': len(names), 'programmers': len(programmers)}
+        }
+
+    def load(self) -> Dict[str, Any]:
+        """立即读取 (服务启动时调用)，返回数据来源信息"""
+        return dict(self._current()['source'])
+
+    def part(self, mcu: str) -> Optional[PartInfo]:
+        """按ID或描述查找MCU，未知时返回None"""
+        return self._current()['parts'].get(str(mcu).lower())
+
+    def by_signature(self, signature: Optional[str]) -> Optional[PartInfo]:
+        """按6位十六进制签名查找MCU"""
+        return self._current()['signatures'].get((signature or '').lower())
+
+    def geometry(self, mcu: str) -> Tuple[Optional[int], Optional[int]]:
+        """MCU的flash大小和页大小，未知时返回 (None, None)"""
+        part = self.part(mcu)
+        return (part.flash_size, part.page_size) if part is not None else (None, None)
+
+    def signature(self, mcu: str) -> Optional[str]:
+        part = self.part(mcu)
+        return part.signature if part is not None else None
+
+    def mcus(self) -> List[str]:
+        return list(self._current()['names'])
+
+    def programmers(self) -> List[str]:
+        return list(self._current()['programmer_names'])
+
+    def resolve_part(self, mcu: str) -> PartInfo:
+        """
+        查找请求中的MCU
+
+        Raises:
+            ValueError: MCU未知 (消息中给出相近的名称)
+        """
+        part = self.part(mcu)
+        if part is None:
+            raise ValueError(f"Unknown MCU '{mcu}'{self._suggest(mcu, self._current()['parts'])}")
+        return part
+
+    def resolve_programmer(self, programmer: str) -> ProgrammerInfo:
+        """
+        查找请求中的编程器
+
+        Raises:
+            ValueError: 编程器未知
+        """
+        found = self._current()['programmers'].get(str(programmer).lower())
+        if found is None:
+            raise ValueError(f"Unknown programmer '{programmer}'"
+                             f"{self._suggest(programmer, self._current()['programmers'])}")
+        return found
+
+    @staticmethod
+    def _suggest(name: str, choices) -> str:
+        close = difflib.get_close_matches(str(name).lower(), list(choices), n=3)
+        return f" (did you mean: {', '.join(close)}?)" if close else ''
+
+    def describe(self) -> Dict[str, Any]:
+        """/config 返回的器件数据库 (每次加载只生成一次)"""
+        index = self._current()
+        if 'described' not in index:
+            parts: Dict[str, Any] = {}
+            for part in index['parts'].values():
+                parts.setdefault(part.name, part.to_dict())
+            programmers: Dict[str, Any] = {}
+            for programmer in index['programmers'].values():
+                programmers.setdefault(programmer.ids[0], programmer.to_dict())
+            index['described'] = dict(index['source'], parts=parts, programmers=programmers)
+        return index['described']
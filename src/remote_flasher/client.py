@@ -4,10 +4,12 @@ RemoteFlasher客户端SDK
 """
 
 import requests
+import hashlib
 import json
 import time
-from typing import Optional, Dict, Any, Union, Generator
+from typing import Optional, Dict, Any, List, Union, Generator
 from pathlib import Path
+from urllib.parse import quote
 
 class RemoteFlasherClient:
     """RemoteFlasher API客户端"""
@@ -23,6 +25,8 @@ class RemoteFlasherClient:
         self.base_url = base_url.rstrip('/')
         self.timeout = timeout
         self.session = requests.Session()
+        # (路径, 修改时间, 大小) -> SHA-256，避免重复计算同一文件的哈希
+        self._sha_cache = {}
     
     def _make_request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """发送HTTP请求"""
@@ -62,7 +66,8 @@ class RemoteFlasherClient:
                        mcu: str = None,
                        programmer: str = None,
                        port: str = None,
-                       baudrate: int = None) -> Dict[str, Any]:
+                       baudrate: int = None,
+                       refresh: bool = False) -> Dict[str, Any]:
         """
         获取设备信息
         
@@ -71,6 +76,7 @@ class RemoteFlasherClient:
             programmer: 编程器类型
             port: 串口
             baudrate: 波特率
+            refresh: 忽略服务端缓存的设备身份，复位目标板重新读取
         """
         params = {}
         if mcu:
@@ -81,6 +87,8 @@ class RemoteFlasherClient:
             params['port'] = port
         if baudrate:
             params['baudrate'] = baudrate
+        if refresh:
+            params['refresh'] = 'true'
         
         return self._make_request('GET', '/device/info', params=params)
     
@@ -89,7 +97,15 @@ class RemoteFlasherClient:
                    mcu: str = None,
                    programmer: str = None,
                    port: str = None,
-                   baudrate: int = None) -> Dict[str, Any]:
+                   baudrate: int = None,
+                   device: str = None,
+                   async_job: bool = False,
+                   if_changed: bool = False,
+                   verify_readback: bool = False,
+                   await_pattern: str = None,
+                   await_timeout: float = None,
+                   await_baudrate: int = None,
+                   max_attempts: int = None) -> Dict[str, Any]:
         """
         烧录本地hex文件
         
@@ -99,6 +115,14 @@ class RemoteFlasherClient:
             programmer: 编程器类型
             port: 串口
             baudrate: 波特率
+            device: 设备名称
+            async_job: 是否异步提交 (立即返回job_id)
+            if_changed: 设备上已是该固件时跳过烧录
+            verify_readback: 跳过前回读flash确认内容一致
+            await_pattern: 烧录后等待启动输出中出现的正则表达式，结果中包含 boot_ms 和 boot_log
+            await_timeout: 等待启动输出的超时时间（秒）
+            await_baudrate: 读取启动输出的串口波特率
+            max_attempts: 烧录失败后按失败类别自动重试的最大尝试次数 (默认服务器的 FLASH_RETRY_ATTEMPTS)
         """
         file_path = Path(file_path)
         
@@ -110,17 +134,17 @@ class RemoteFlasherClient:
             }
         
         # 准备参数
-        params = {}
-        if mcu:
-            params['mcu'] = mcu
-        if programmer:
-            params['programmer'] = programmer
-        if port:
-            params['port'] = port
-        if baudrate:
-            params['baudrate'] = baudrate
+        params = self._flash_params(mcu, programmer, port, baudrate, device,
+                                    async_job, if_changed, verify_readback,
+                                    await_pattern, await_timeout, await_baudrate, max_attempts)
+        
+        # 服务器已有相同固件时跳过上传，只发送哈希
+        upload = self.upload_firmware(file_path)
+        if upload.get('success'):
+            params['sha256'] = upload['sha256']
+            return self._make_request('POST', '/flash/file', params=params)
         
-        # 上传文件
+        # 服务器不支持固件存储时退回到直接上传文件
         try:
             with open(file_path, 'rb') as f:
                 files = {'file': (file_path.name, f, 'application/octet-stream')}
@@ -133,12 +157,126 @@ class RemoteFlasherClient:
                 'message': f'Failed to read file: {e}'
             }
     
+    def flash_bytes(self,
+                    data: bytes,
+                    mcu: str = None,
+                    programmer: str = None,
+                    port: str = None,
+                    baudrate: int = None,
+                    device: str = None,
+                    async_job: bool = False,
+                    if_changed: bool = False,
+                    verify_readback: bool = False,
+                    await_pattern: str = None,
+                    await_timeout: float = None,
+                    await_baudrate: int = None,
+                    max_attempts: int = None) -> Dict[str, Any]:
+        """
+        烧录内存中的hex内容 (请求体直接发送，服务器不写入磁盘)
+
+        Args:
+            data: Intel HEX内容
+            其他参数同 flash_file
+        """
+        params = self._flash_params(mcu, programmer, port, baudrate, device,
+                                    async_job, if_changed, verify_readback,
+                                    await_pattern, await_timeout, await_baudrate, max_attempts)
+        params['sha256'] = hashlib.sha256(data).hexdigest()
+        return self._make_request(
+            'POST', '/flash/raw',
+            data=data,
+            params=params,
+            headers={'Content-Type': 'application/octet-stream'}
+        )
+
+    def _flash_params(self, mcu, programmer, port, baudrate, device,
+                      async_job, if_changed, verify_readback,
+                      await_pattern=None, await_timeout=None, await_baudrate=None,
+                      max_attempts=None) -> Dict[str, Any]:
+        """构建烧录请求的URL参数"""
+        params = {}
+        if mcu:
+            params['mcu'] = mcu
+        if programmer:
+            params['programmer'] = programmer
+        if port:
+            params['port'] = port
+        if baudrate:
+            params['baudrate'] = baudrate
+        if device:
+            params['device'] = device
+        if async_job:
+            params['async'] = 'true'
+        if if_changed:
+            params['if_changed'] = 'true'
+        if verify_readback:
+            params['verify_readback'] = 'true'
+        if await_pattern:
+            params['await_pattern'] = await_pattern
+            if await_timeout is not None:
+                params['await_timeout'] = await_timeout
+            if await_baudrate:
+                params['await_baudrate'] = await_baudrate
+        if max_attempts:
+            params['max_attempts'] = max_attempts
+        return params
+
+    def firmware_sha256(self, file_path: Union[str, Path]) -> str:
+        """计算固件文件的SHA-256 (按路径、修改时间和大小缓存)"""
+        file_path = Path(file_path)
+        stat = file_path.stat()
+        key = (str(file_path.resolve()), stat.st_mtime_ns, stat.st_size)
+        if key not in self._sha_cache:
+            self._sha_cache[key] = hashlib.sha256(file_path.read_bytes()).hexdigest()
+        return self._sha_cache[key]
+
+    def has_firmware(self, sha256: str) -> bool:
+        """服务器的固件存储中是否已有该固件"""
+        try:
+            response = self.session.head(f"{self.base_url}/firmware/{sha256}", timeout=self.timeout)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def upload_firmware(self, file_path: Union[str, Path]) -> Dict[str, Any]:
+        """
+        上传固件到服务器的固件存储，服务器已有时跳过上传
+
+        Returns:
+            包含 'sha256' 和 'uploaded' (是否实际上传) 的结果字典
+        """
+        try:
+            sha = self.firmware_sha256(file_path)
+        except OSError as e:
+            return {'success': False, 'error': str(e), 'message': f'Failed to read file: {e}'}
+
+        if self.has_firmware(sha):
+            return {'success': True, 'sha256': sha, 'uploaded': False}
+
+        result = self._make_request(
+            'PUT', f'/firmware/{sha}',
+            data=Path(file_path).read_bytes(),
+            headers={'Content-Type': 'application/octet-stream'}
+        )
+        if result.get('success'):
+            result['uploaded'] = True
+        return result
+
     def flash_url(self, 
                   url: str,
                   mcu: str = None,
                   programmer: str = None,
                   port: str = None,
-                  baudrate: int = None) -> Dict[str, Any]:
+                  baudrate: int = None,
+                  device: str = None,
+                  async_job: bool = False,
+                  if_changed: bool = False,
+                  verify_readback: bool = False,
+                  sha256: str = None,
+                  await_pattern: str = None,
+                  await_timeout: float = None,
+                  await_baudrate: int = None,
+                  max_attempts: int = None) -> Dict[str, Any]:
         """
         从URL下载并烧录hex文件
         
@@ -148,6 +286,12 @@ class RemoteFlasherClient:
             programmer: 编程器类型
             port: 串口
             baudrate: 波特率
+            device: 设备名称
+            async_job: 是否异步提交 (立即返回job_id)
+            if_changed: 设备上已是该固件时跳过烧录
+            verify_readback: 跳过前回读flash确认内容一致
+            sha256: 固件的SHA-256，服务器下载后校验
+            await_pattern / await_timeout / await_baudrate / max_attempts: 同 flash_file
         """
         data = {'url': url}
         
@@ -159,8 +303,94 @@ class RemoteFlasherClient:
             data['port'] = port
         if baudrate:
             data['baudrate'] = baudrate
+        if device:
+            data['device'] = device
+        if async_job:
+            data['async'] = True
+        if if_changed:
+            data['if_changed'] = True
+        if verify_readback:
+            data['verify_readback'] = True
+        if sha256:
+            data['sha256'] = sha256
+        if await_pattern:
+            data['await_pattern'] = await_pattern
+            if await_timeout is not None:
+                data['await_timeout'] = await_timeout
+            if await_baudrate:
+                data['await_baudrate'] = await_baudrate
+        if max_attempts:
+            data['max_attempts'] = max_attempts
         
         return self._make_request('POST', '/flash/url', json=data)
+
+    def program(self,
+                operations: List[Dict[str, Any]],
+                files: Optional[Dict[str, Union[str, Path]]] = None,
+                mcu: str = None,
+                programmer: str = None,
+                device: str = None,
+                backend: str = None,
+                async_job: bool = False,
+                max_attempts: int = None) -> Dict[str, Any]:
+        """
+        在一次编程器会话中执行多个存储器操作 (只复位一次目标板)
+
+        Args:
+            operations: 操作列表，如
+                [{'memory': 'flash', 'op': 'write', 'sha256': ...},
+                 {'memory': 'eeprom', 'op': 'write', 'file': 'eeprom'},
+                 {'memory': 'lfuse', 'op': 'write', 'value': '0xFF'},
+                 {'memory': 'hfuse', 'op': 'read'}]
+            files: multipart上传的文件，字段名 -> 文件路径 (操作中用 file 引用)
+            mcu / programmer / device / async_job / max_attempts: 同 flash_url
+            backend: 编程器后端 (不支持计划中的存储器时服务器退回到avrdude)
+        """
+        data: Dict[str, Any] = {'operations': operations}
+        for name, value in (('mcu', mcu), ('programmer', programmer), ('device', device),
+                            ('backend', backend), ('max_attempts', max_attempts)):
+            if value:
+                data[name] = value
+        if async_job:
+            data['async'] = True
+
+        if not files:
+            return self._make_request('POST', '/program', json=data)
+
+        form = {name: json.dumps(value) if name == 'operations' else str(value) for name, value in data.items()}
+        handles = {name: open(path, 'rb') for name, path in files.items()}
+        try:
+            return self._make_request('POST', '/program', data=form,
+                                      files={name: (Path(files[name]).name, f) for name, f in handles.items()})
+        finally:
+            for f in handles.values():
+                f.close()
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """获取烧录任务状态"""
+        return self._make_request('GET', f'/jobs/{job_id}')
+
+    def wait_job(self, job_id: str, timeout: float = None) -> Dict[str, Any]:
+        """
+        等待烧录任务结束
+
+        服务器单次长轮询有最长等待时间，这里循环长轮询直到任务结束或超时
+
+        Args:
+            job_id: 任务ID
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            任务状态字典，任务结束时 'result' 为烧录结果
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = 30.0 if deadline is None else max(0.0, min(30.0, deadline - time.time()))
+            job = self._make_request('GET', f'/jobs/{job_id}/wait', params={'timeout': wait})
+            if job.get('done') or 'job_id' not in job:
+                return job
+            if deadline is not None and time.time() >= deadline:
+                return job
     
     def wait_for_service(self, max_wait: int = 30, check_interval: float = 1.0) -> bool:
         """
@@ -237,14 +467,25 @@ class RemoteFlasherClient:
         except Exception as e:
             yield {"type": "error", "message": f"Stream flash failed: {str(e)}"}
 
-    def serial_open(self, port: str = None, baudrate: int = 9600, timeout: int = 1) -> Dict[str, Any]:
-        """打开串口连接"""
+    def serial_open(self, port: str = None, baudrate: int = 9600, timeout: int = 1,
+                    bridge: Union[bool, Dict[str, Any], None] = None, capture: bool = False) -> Dict[str, Any]:
+        """
+        打开串口连接
+
+        bridge为True或参数字典 (port/protocol/nodelay/batch_delay/batch_size) 时同时开启TCP桥接，
+        结果中的 bridge 包含监听端口，可用 serial.serial_for_url('rfc2217://host:port') 打开；
+        capture为True时把收发数据记录到服务器上的抓包文件 (见 serial_capture)
+        """
         try:
             data = {
                 'port': port or '/dev/ttyS0',
                 'baudrate': baudrate,
                 'timeout': timeout
             }
+            if bridge:
+                data['bridge'] = bridge
+            if capture:
+                data['capture'] = True
 
             response = self.session.post(
                 f"{self.base_url}/serial/open",
@@ -258,14 +499,21 @@ class RemoteFlasherClient:
         except Exception as e:
             return self._handle_error(f"Serial open failed: {e}")
 
-    def serial_read(self, port: str = None, baudrate: int = 9600, max_lines: int = 100) -> Dict[str, Any]:
-        """读取串口数据"""
+    def serial_read(self, port: str = None, baudrate: int = 9600, max_lines: int = 100,
+                    since: Optional[int] = None) -> Dict[str, Any]:
+        """
+        读取串口数据
+
+        since为上一次结果中的 next 时从该位置继续读取；不指定时返回上一次读取之后的新数据
+        """
         try:
             data = {
                 'port': port or '/dev/ttyS0',
                 'baudrate': baudrate,
                 'max_lines': max_lines
             }
+            if since is not None:
+                data['since'] = since
 
             response = self.session.post(
                 f"{self.base_url}/serial/read",
@@ -279,6 +527,130 @@ class RemoteFlasherClient:
         except Exception as e:
             return self._handle_error(f"Serial read failed: {e}")
 
+    def serial_stream(self, port: str = None, baudrate: int = 9600, since: Optional[int] = None,
+                      max_lag: Optional[int] = None,
+                      connection_id: str = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        订阅串口输出 (server-sent events)，无需轮询
+
+        Args:
+            since: 起始游标 (lines事件中的 next)，不指定时只接收之后的新数据
+            max_lag: 最多落后的字节数，超出时服务器丢弃旧数据
+            connection_id: 连接ID，默认由port和baudrate组成
+
+        Yields:
+            Dict: subscribed / lines / dropped / closed 事件
+        """
+        conn_id = connection_id or f"{port or '/dev/ttyS0'}_{baudrate}"
+        params = {}
+        if since is not None:
+            params['since'] = since
+        if max_lag is not None:
+            params['max_lag'] = max_lag
+
+        try:
+            response = self.session.get(
+                f"{self.base_url}/serial/{quote(conn_id.lstrip('/'))}/stream",
+                params=params,
+                stream=True,
+                timeout=(self.timeout, None)  # 服务器定期发送心跳
+            )
+
+            response.raise_for_status()
+
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith('data: '):
+                        yield json.loads(line[6:])
+
+        except Exception as e:
+            yield {"type": "error", "message": f"Serial stream failed: {str(e)}"}
+
+    def serial_add_trigger(self, literals: Optional[List[str]] = None, regexes: Optional[List[str]] = None,
+                           port: str = None, baudrate: int = 9600, since: Optional[int] = None,
+                           ignore_case: bool = False, wait: Optional[float] = None,
+                           connection_id: str = None) -> Dict[str, Any]:
+        """
+        注册串口触发器，服务器匹配注册之后 (或since之后) 的输出
+
+        先注册再执行复位等操作，之后用 serial_wait_trigger 等待，不会错过操作期间的输出；
+        指定wait时直接等待第一个匹配 (最多wait秒) 并删除触发器
+
+        Returns:
+            触发器信息，match 为匹配的行、模式、偏移和时间
+        """
+        conn_id = connection_id or f"{port or '/dev/ttyS0'}_{baudrate}"
+        data = {'literals': literals or [], 'regexes': regexes or [], 'ignore_case': ignore_case}
+        if since is not None:
+            data['since'] = since
+        if wait is not None:
+            data['wait'] = wait
+
+        try:
+            response = self.session.post(
+                f"{self.base_url}/serial/{quote(conn_id.lstrip('/'))}/triggers",
+                json=data,
+                timeout=self.timeout + (wait or 0)
+            )
+
+            response.raise_for_status()
+            return response.json()
+
+        except Exception as e:
+            return self._handle_error(f"Serial trigger failed: {e}")
+
+    def serial_wait_trigger(self, trigger_id: str, timeout: float = 30, port: str = None, baudrate: int = 9600,
+                            connection_id: str = None) -> Dict[str, Any]:
+        """长轮询等待触发器匹配，超时时结果中 timed_out 为True"""
+        conn_id = connection_id or f"{port or '/dev/ttyS0'}_{baudrate}"
+        try:
+            response = self.session.get(
+                f"{self.base_url}/serial/{quote(conn_id.lstrip('/'))}/triggers/{trigger_id}/wait",
+                params={'timeout': timeout},
+                timeout=self.timeout + timeout
+            )
+
+            response.raise_for_status()
+            return response.json()
+
+        except Exception as e:
+            return self._handle_error(f"Serial trigger wait failed: {e}")
+
+    def serial_capture(self, port: str = None, baudrate: int = 9600, start: Optional[float] = None,
+                       end: Optional[float] = None, raw: bool = False,
+                       connection_id: str = None) -> Union[List[Dict[str, Any]], bytes, Dict[str, Any]]:
+        """
+        读取串口抓包中的时间范围 (串口关闭后仍可读取)
+
+        Args:
+            start / end: Unix时间戳 (秒)，不指定表示不限
+            raw: 为True时返回抓包文件格式的原始数据
+
+        Returns:
+            记录列表 ({"time", "dir": "rx"/"tx", "data"})，raw时为bytes
+        """
+        conn_id = connection_id or f"{port or '/dev/ttyS0'}_{baudrate}"
+        params = {'format': 'raw' if raw else 'jsonl'}
+        if start is not None:
+            params['from'] = start
+        if end is not None:
+            params['to'] = end
+
+        try:
+            response = self.session.get(
+                f"{self.base_url}/serial/{quote(conn_id.lstrip('/'))}/capture",
+                params=params,
+                timeout=self.timeout
+            )
+
+            response.raise_for_status()
+            if raw:
+                return response.content
+            return [json.loads(line) for line in response.iter_lines() if line]
+
+        except Exception as e:
+            return self._handle_error(f"Serial capture failed: {e}")
+
     def serial_write(self, data: str, port: str = None, baudrate: int = 9600, add_newline: bool = True) -> Dict[str, Any]:
         """向串口写入数据"""
         try:
@@ -14,12 +14,25 @@ class Config:
     HOST = '0.0.0.0'
     PORT = 5000
     DEBUG = True
+    # 服务器模式：flask (开发服务器) 或 asyncio (异步服务器，流式烧录不占用线程)
+    SERVER_MODE = 'flask'
+    ASYNC_WORKERS = 8  # 异步服务器中执行普通接口和阻塞步骤的线程数
+    ASYNC_KEEPALIVE_TIMEOUT = 15  # 空闲keep-alive连接的关闭时间（秒）
     
     # 文件上传配置
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # memfd不可用时交给avrdude的临时镜像文件目录 (应为tmpfs，避免写SD卡)
+    SCRATCH_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
     ALLOWED_EXTENSIONS = {'hex', 'bin'}
     
+    # 固件存储配置 (按SHA-256去重，超出上限按LRU淘汰)
+    FIRMWARE_STORE_DIR = 'firmware_store'
+    FIRMWARE_STORE_MAX_BYTES = 256 * 1024 * 1024
+
+    # 烧录历史 (记录每个串口最近一次烧录的固件摘要，用于 if_changed 跳过重复烧录)
+    FLASH_HISTORY_FILE = 'flash_history.json'
+    
     # AVR配置
     DEFAULT_MCU = 'atmega328p'
     DEFAULT_PROGRAMMER = 'arduino'
@@ -27,28 +40,126 @@ class Config:
     DEFAULT_PORT = '/dev/ttyS0'  # 用户指定的串口
 
     # GPIO配置 (Raspberry Pi)
-    RESET_PIN = 4   # GPIO 4 连接Arduino RST引脚
+    # 复位引脚 (BCM编号，所有GPIO后端相同)：BCM 23 即物理引脚16，
+    # 与旧版本 gpio 命令行工具使用的 WiringPi 4 是同一个引脚，原有接线不需要改动
+    RESET_PIN = 23
     POWER_PIN = None  # 可选的电源控制引脚
+    GPIO_BACKEND = 'auto'  # auto / chardev / sysfs / command / fake
+    GPIO_CHIP = '/dev/gpiochip0'  # chardev后端使用的GPIO控制器
+
+    # 多设备配置: 名称 -> 参数 (port/reset_pin/mcu/programmer/baudrate)
+    # 例如 {'board1': {'port': '/dev/ttyUSB0', 'reset_pin': 17}}
+    # 'default' 设备始终存在，使用 DEFAULT_* 和 RESET_PIN；未指定port的设备与它是同一块板子
+    DEVICES = {}
+    # 请求中只给出未注册的串口时创建的临时设备 (使用 RESET_PIN 复位)
+    ADHOC_DEVICE_LIMIT = 16  # 同时存在的临时设备数上限，超出时拒绝请求
+    ADHOC_DEVICE_TTL = 600  # 临时设备空闲多久后移除（秒）
     
     # avrdude配置
     AVRDUDE_PATH = '/usr/bin/avrdude'  # avrdude可执行文件路径
-    AVRDUDE_CONF = '/etc/avrdude.conf'  # avrdude配置文件路径
+    AVRDUDE_CONF = '/etc/avrdude.conf'  # avrdude配置文件路径 (同时作为MCU和编程器数据库，修改后自动重新解析)
+
+    # 编程器后端: avrdude (默认，支持所有编程器) / stk500 (原生STK500v1，
+    # 仅支持 arduino/stk500v1 编程器，其他编程器自动退回avrdude)
+    PROGRAMMER_BACKEND = 'avrdude'
+    STK500_TIMEOUT = 1.0  # 原生后端等待应答的超时时间（秒）
+    STK500_SYNC_ATTEMPTS = 10  # 与bootloader同步的最大尝试次数
+    STK500_SYNC_TIMEOUT = 0.2  # 每次同步尝试的等待时间（秒）
+
+    # 复位时序配置 (秒)：reset_hold 复位保持时间；probe 是否用GET_SYNC探测bootloader
+    # (仅 arduino/stk500v1 编程器)，每次等待 probe_interval，最长 boot_timeout；
+    # 不探测时释放复位后固定等待 settle；restart_hold 烧录后重启的复位保持时间
+    DEFAULT_RESET_PROFILE = 'default'
+    RESET_PROFILES = {
+        'default': {'reset_hold': 0.05, 'probe': True, 'probe_interval': 0.05,
+                    'boot_timeout': 1.5, 'settle': 0.5, 'restart_hold': 0.05},
+        # 旧版ATmegaBOOT在复位后等待更久才开始应答
+        'atmegaboot': {'reset_hold': 0.05, 'probe': True, 'probe_interval': 0.1,
+                       'boot_timeout': 3.0, 'settle': 1.0, 'restart_hold': 0.05},
+        # 原有的固定等待时序
+        'legacy': {'reset_hold': 0.5, 'probe': False, 'settle': 0.5, 'restart_hold': 0.1},
+    }
+    
+    # 串口调试：每个打开的串口由后台线程读取到该大小的环形缓冲区 (115200波特率下约90秒的输出)
+    SERIAL_BUFFER_SIZE = 1024 * 1024
+    # 串口推送 (/serial/<id>/stream)：订阅者最多落后的字节数和心跳间隔（秒）
+    SERIAL_STREAM_MAX_LAG = 256 * 1024
+    SERIAL_STREAM_HEARTBEAT = 15
+    # 串口TCP桥接 (/serial/open 的 bridge 参数)：监听地址、协议 (rfc2217/raw)、是否禁用Nagle算法，
+    # 以及批量发送的最长等待时间（秒，0表示立即发送）和目标字节数
+    SERIAL_BRIDGE_HOST = '0.0.0.0'
+    SERIAL_BRIDGE_PROTOCOL = 'rfc2217'
+    SERIAL_BRIDGE_NODELAY = True
+    SERIAL_BRIDGE_BATCH_DELAY = 0
+    SERIAL_BRIDGE_BATCH_SIZE = 4096
+    # 串口抓包 (/serial/open 的 capture 参数)：抓包文件目录和稀疏时间索引的间隔 (字节)
+    SERIAL_CAPTURE_DIR = 'serial_captures'
+    SERIAL_CAPTURE_INDEX_INTERVAL = 64 * 1024
+    # 串口触发器：长轮询最长等待时间（秒）和每个串口连接的触发器数量上限
+    SERIAL_TRIGGER_WAIT_TIMEOUT = 30
+    SERIAL_MAX_TRIGGERS = 32
+    # 烧录后等待启动输出 (烧录请求的 await_pattern 参数)：默认超时（秒）、串口波特率和保留的启动日志大小
+    BOOT_AWAIT_TIMEOUT = 10
+    BOOT_AWAIT_BAUDRATE = 9600
+    BOOT_LOG_MAX_BYTES = 64 * 1024
     
     # 超时配置
     FLASH_TIMEOUT = 60  # 烧录超时时间（秒）
-    DOWNLOAD_TIMEOUT = 30  # 下载超时时间（秒）
+    FLASH_PROGRESS_INTERVAL = 0.1  # 同一阶段两次进度事件的最小间隔（秒），阶段结束和100%总是发送
+    # 烧录失败后的自动重试：每次烧录的最大尝试次数、校验失败时依次尝试的波特率、
+    # bootloader无应答时复位时序每次延长的倍数和最大倍数
+    FLASH_RETRY_ATTEMPTS = 3
+    FLASH_RETRY_BAUDRATES = [115200, 57600, 38400, 19200]
+    FLASH_RETRY_RESET_SCALE = 2.0
+    FLASH_RETRY_MAX_RESET_SCALE = 8.0
+    DOWNLOAD_TIMEOUT = 30  # 下载时连接和两次读取之间的最长等待时间（秒）
+    DOWNLOAD_MAX_RESUMES = 3  # 下载中断后用HTTP Range续传的最大次数
+    # URL固件缓存 (内存)：TTL内直接使用，过期后条件请求重新验证；0字节表示不缓存
+    URL_CACHE_TTL = 60  # 秒
+    URL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    DEVICE_INFO_TIMEOUT = 30  # 读取设备信息 (avrdude -v) 的超时时间（秒）
+    # 设备身份缓存：TTL内 /device/info 直接返回缓存，不复位目标板；烧录或串口热插拔后失效，0表示不缓存
+    IDENTITY_CACHE_TTL = 3600  # 秒
+    JOB_WAIT_TIMEOUT = 30  # 任务长轮询最长等待时间（秒）
+
+    # 任务队列配置
+    JOB_HISTORY_SIZE = 1000  # 保留的已完成任务数
     
     # 日志配置
     LOG_LEVEL = 'INFO'
     LOG_FILE = 'flasher.log'
     
-    # 支持的MCU类型
+    # 支持的MCU类型 (AVRDUDE_CONF 不存在时使用，否则以avrdude.conf中的器件为准)
     SUPPORTED_MCUS = [
         'atmega328p', 'atmega168', 'atmega8', 'atmega32u4',
         'atmega2560', 'atmega1280', 'attiny85', 'attiny13'
     ]
     
-    # 支持的编程器类型
+    # MCU flash参数: (flash大小, 页大小)，用于烧录前检查镜像
+    MCU_FLASH = {
+        'atmega328p': (32768, 128),
+        'atmega168': (16384, 128),
+        'atmega8': (8192, 64),
+        'atmega32u4': (32768, 128),
+        'atmega2560': (262144, 256),
+        'atmega1280': (131072, 256),
+        'attiny85': (8192, 64),
+        'attiny13': (1024, 32),
+    }
+
+    # MCU器件签名，原生编程器后端烧录前检查
+    MCU_SIGNATURES = {
+        'atmega328p': '1e950f',
+        'atmega168': '1e9406',
+        'atmega8': '1e9307',
+        'atmega32u4': '1e9587',
+        'atmega2560': '1e9801',
+        'atmega1280': '1e9703',
+        'attiny85': '1e930b',
+        'attiny13': '1e9007',
+    }
+    
+    # 支持的编程器类型 (AVRDUDE_CONF 不存在时使用)
     SUPPORTED_PROGRAMMERS = [
         'arduino', 'usbasp', 'avrisp', 'avrispmkII', 'stk500v1', 'stk500v2'
     ]
@@ -64,6 +175,7 @@ class DevelopmentConfig(Config):
 # 生产环境配置
 class ProductionConfig(Config):
     DEBUG = False
+    SERVER_MODE = 'asyncio'
     LOG_LEVEL = 'WARNING'
 
     def __init__(self):
@@ -76,7 +188,12 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     DEBUG = True
-    UPLOAD_FOLDER = 'test_uploads'
+    # 不提供默认的临时目录，测试用例为每个测试创建并删除 (见 tests.scratch_config)
+    UPLOAD_FOLDER = None
+    FIRMWARE_STORE_DIR = None
+    FLASH_HISTORY_FILE = None
+    GPIO_BACKEND = 'fake'
+    FLASH_RETRY_ATTEMPTS = 1
 
 # 配置字典
 config = {
@@ -88,6 +205,8 @@ config = {
 
 def get_config(config_name=None):
     """获取配置对象"""
+    if isinstance(config_name, type):
+        return config_name
     if config_name is None:
         config_name = os.environ.get('FLASK_ENV', 'default')
     return config.get(config_name, config['default'])
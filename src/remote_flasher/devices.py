@@ -0,0 +1,304 @@
+"""
+设备注册表 - RemoteFlasher API
+管理同一台主机上连接的多块目标板，每块板子拥有独立的串口、复位引脚、
+烧录参数和互斥锁：不同设备的请求可以并行执行，同一设备的请求串行执行。
+烧录等独占串口的操作期间，同一串口上打开的串口会话被暂停，结束后自动恢复。
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple
+
+from .config import get_config
+from .gpio import create_gpio_backend
+from .avr_flasher import AVRFlasher
+from .avrdude_conf import PartDatabase
+from .flash_history import FlashHistory
+from .identity import DeviceIdentity, IdentityCache
+from .url_cache import URLCache
+
+DEFAULT_DEVICE_NAME = 'default'
+
+
+class DeviceBusyError(Exception):
+    """设备正在被其他请求占用"""
+
+
+class UnknownDeviceError(KeyError):
+    """设备未注册"""
+
+
+class Device:
+    """单个目标设备"""
+
+    def __init__(self, name: str, port: str, reset_pin: Optional[int], mcu: Optional[str],
+                 programmer: str, baudrate: int, flasher: AVRFlasher, ad_hoc: bool = False):
+        self.name = name
+        self.port = port
+        self.reset_pin = reset_pin
+        # 配置中指定的MCU，None表示使用识别出的MCU (没有时使用 DEFAULT_MCU)
+        self.mcu = mcu
+        self.programmer = programmer
+        self.baudrate = baudrate
+        self.flasher = flasher
+        self.lock = threading.Lock()
+        # 按请求中的串口临时创建的设备，空闲超时后被移除
+        self.ad_hoc = ad_hoc
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        """设备是否正在执行操作"""
+        return self.lock.locked()
+
+    def resolve_mcu(self) -> Tuple[str, str]:
+        """设备的MCU及来源: 'config' (配置指定)、'detected' (缓存的设备身份) 或 'default'"""
+        if self.mcu:
+            return self.mcu, 'config'
+        return self._mcu_from(self.flasher.cached_identity(self.port, self.programmer))
+
+    def _mcu_from(self, identity: Optional[DeviceIdentity]) -> Tuple[str, str]:
+        # 配置没有指定MCU时按已查询到的缓存身份确定MCU
+        if identity is not None and identity.mcu:
+            return identity.mcu, 'detected'
+        return self.flasher.config.DEFAULT_MCU, 'default'
+
+    def flash_params(self, mcu: Optional[str] = None) -> Dict[str, Any]:
+        """设备的默认烧录参数 (mcu为None时按 resolve_mcu() 确定)"""
+        return {
+            'mcu': mcu or self.resolve_mcu()[0],
+            'programmer': self.programmer,
+            'port': self.port,
+            'baudrate': self.baudrate
+        }
+
+    def warnings(self) -> List[str]:
+        """使用该设备的请求需要提示的问题"""
+        if not self.ad_hoc:
+            return []
+        if self.reset_pin is None:
+            return [f"Port {self.port} is not a registered device: no reset pin, "
+                    f"the target is not reset before programming (register it in DEVICES)"]
+        return [f"Port {self.port} is not a registered device: reset through the default "
+                f"RESET_PIN (GPIO {self.reset_pin}), register it in DEVICES if it has its own reset line"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化的字典"""
+        info = {'name': self.name, 'reset_pin': self.reset_pin, 'busy': self.busy, 'ad_hoc': self.ad_hoc,
+                'reset_profile': self.flasher.reset_profile.name, 'retry': self.flasher.retry_policy.to_dict()}
+        # 每次只查询一次身份缓存 (/status 和 /devices 按设备调用，避免重复计数和stat)
+        identity = self.flasher.cached_identity(self.port, self.programmer)
+        mcu, info['mcu_source'] = (self.mcu, 'config') if self.mcu else self._mcu_from(identity)
+        info.update(self.flash_params(mcu))
+        info['identity'] = identity.to_dict() if identity is not None else None
+        return info
+
+
+class DeviceRegistry:
+    """设备注册表"""
+
+    def __init__(self, config_name=None, gpio_backend=None):
+        self.config = get_config(config_name)
+        # 所有设备共享同一个GPIO后端 (不同设备使用不同的引脚)
+        self.gpio = gpio_backend if gpio_backend is not None else create_gpio_backend(self.config)
+        # 所有设备共享同一份烧录历史 (按串口记录)
+        self.history = FlashHistory(self.config.FLASH_HISTORY_FILE)
+        # 所有设备共享同一个URL固件缓存，批量烧录同一固件时只下载一次
+        self.url_cache = URLCache.from_config(self.config)
+        # 所有设备共享同一个设备身份缓存 (按串口和编程器)
+        self.identity = IdentityCache.from_config(self.config)
+        # 所有设备共享同一个MCU和编程器数据库，启动时读取 AVRDUDE_CONF
+        self.parts = PartDatabase(self.config)
+        self.parts.load()
+        # /serial/open 打开的串口会话 (连接ID -> SerialSession)，占用同一串口时暂停
+        self.serial_sessions: Dict[str, Any] = {}
+        self._devices: Dict[str, Device] = {}
+        # 临时设备: 串口 -> 设备，按最近使用排序
+        self._adhoc: 'OrderedDict[str, Device]' = OrderedDict()
+        # 未指定串口注册的设备名称：都使用 DEFAULT_PORT，是同一块目标板
+        self._on_default_port = set()
+        self._lock = threading.RLock()
+
+        self.register(DEFAULT_DEVICE_NAME)
+        for name, params in getattr(self.config, 'DEVICES', {}).items():
+            self.register(name, **params)
+
+    def register(self, name: str, port: str = None, reset_pin: int = None, mcu: str = None,
+                 programmer: str = None, baudrate: int = None, reset_profile: str = None) -> Device:
+        """
+        注册设备，未指定的参数使用配置默认值
+
+        未指定串口的设备与默认设备是同一块目标板：使用 DEFAULT_PORT 和 RESET_PIN，
+        并与默认设备共用设备锁
+
+        Args:
+            reset_profile: 复位时序名称 (RESET_PROFILES)
+
+        Returns:
+            注册后的设备对象
+
+        Raises:
+            ValueError: 串口已被占用或复位时序未知
+        """
+        inherit = port is None
+        port = port or self.config.DEFAULT_PORT
+        if reset_pin is None and inherit:
+            reset_pin = self.config.RESET_PIN
+
+        with self._lock:
+            shared = None
+            for device in self._devices.values():
+                if device.port == port and device.name != name:
+                    if not (inherit and device.name in self._on_default_port):
+                        raise ValueError(f"Port {port} already used by device '{device.name}'")
+                    shared = device
+
+            device = self._create_device(name, port, reset_pin, mcu, programmer, baudrate, reset_profile)
+            if shared is not None:
+                device.lock = shared.lock
+            if inherit:
+                self._on_default_port.add(name)
+            else:
+                self._on_default_port.discard(name)
+            old = self._devices.get(name)
+            self._devices[name] = device
+            # 注册后不再需要同一串口的临时设备
+            adhoc = self._adhoc.pop(port, None)
+
+        for replaced in (old, adhoc):
+            if replaced is not None:
+                replaced.flasher.cleanup()
+        return device
+
+    def _create_device(self, name: str, port: str, reset_pin: Optional[int], mcu: Optional[str] = None,
+                       programmer: str = None, baudrate: int = None, reset_profile: str = None,
+                       ad_hoc: bool = False) -> Device:
+        flasher = AVRFlasher(self.config, gpio_backend=self.gpio, reset_pin=reset_pin,
+                             history=self.history, reset_profile=reset_profile,
+                             url_cache=self.url_cache, identity=self.identity,
+                             parts=self.parts)
+        return Device(
+            name=name,
+            port=port,
+            reset_pin=reset_pin,
+            mcu=mcu,
+            programmer=programmer or self.config.DEFAULT_PROGRAMMER,
+            baudrate=int(baudrate or self.config.DEFAULT_BAUDRATE),
+            flasher=flasher,
+            ad_hoc=ad_hoc
+        )
+
+    @property
+    def default(self) -> Device:
+        """默认设备"""
+        return self._devices[DEFAULT_DEVICE_NAME]
+
+    def get(self, name: str) -> Device:
+        """按名称获取设备"""
+        try:
+            return self._devices[name]
+        except KeyError:
+            raise UnknownDeviceError(f"Unknown device: {name}")
+
+    def find_by_port(self, port: str) -> Optional[Device]:
+        """按串口查找设备 (含临时设备)"""
+        for device in list(self._devices.values()):
+            if device.port == port:
+                return device
+        return self._adhoc.get(port)
+
+    def resolve(self, name: str = None, port: str = None) -> Device:
+        """
+        解析请求对应的设备
+
+        优先按名称查找；只给出串口时按串口查找。未注册的串口使用以 RESET_PIN 复位的
+        临时设备 (见 Device.warnings)，保证对同一串口的并发访问经过同一把锁；
+        临时设备数量受 ADHOC_DEVICE_LIMIT 限制，空闲 ADHOC_DEVICE_TTL 秒后移除。
+
+        Raises:
+            UnknownDeviceError: 设备名称未注册
+            ValueError: 临时设备数已达上限
+        """
+        if name:
+            return self.get(name)
+        if port:
+            with self._lock:
+                device = self.find_by_port(port)
+                if device is None:
+                    device = self._add_adhoc(port)
+                elif device.ad_hoc:
+                    device.last_used = time.monotonic()
+                    self._adhoc.move_to_end(port)
+            return device
+        return self.default
+
+    def _add_adhoc(self, port: str) -> Device:
+        self._expire_adhoc()
+        limit = getattr(self.config, 'ADHOC_DEVICE_LIMIT', 16)
+        if len(self._adhoc) >= limit:
+            raise ValueError(f'Too many unregistered ports in use (limit {limit}), '
+                             f'register {port} in DEVICES')
+        device = self._adhoc[port] = self._create_device(f'port:{port}', port, self.config.RESET_PIN,
+                                                         ad_hoc=True)
+        return device
+
+    def _expire_adhoc(self):
+        # 只移除空闲的临时设备，正在使用的设备保留到下次检查
+        deadline = time.monotonic() - getattr(self.config, 'ADHOC_DEVICE_TTL', 600)
+        for port, device in list(self._adhoc.items()):
+            if not device.busy and device.last_used < deadline:
+                del self._adhoc[port]
+                device.flasher.cleanup()
+
+    def devices(self) -> List[Device]:
+        """所有设备 (已注册设备和当前的临时设备)"""
+        with self._lock:
+            return list(self._devices.values()) + list(self._adhoc.values())
+
+    def suspend_serial(self, port: str) -> List[Any]:
+        """暂停该串口 (含符号链接) 上打开的串口会话并释放串口，返回被暂停的会话"""
+        path = os.path.realpath(port)
+        return [session for session in list(self.serial_sessions.values())
+                if os.path.realpath(session.port) == path and session.suspend()]
+
+    @staticmethod
+    def resume_serial(sessions: List[Any]):
+        """恢复 suspend_serial() 暂停的会话"""
+        for session in sessions:
+            session.resume()
+
+    @contextmanager
+    def acquire(self, device: Device, timeout: float = -1, release_serial: bool = False):
+        """
+        独占设备
+
+        Args:
+            device: 设备对象
+            timeout: 等待时间（秒），-1表示一直等待
+            release_serial: 占用期间暂停设备串口上的串口会话 (烧录等需要独占串口的操作)
+
+        Raises:
+            DeviceBusyError: 超时仍未获得设备
+        """
+        if not device.lock.acquire(timeout=timeout):
+            raise DeviceBusyError(f"Device '{device.name}' is busy")
+        try:
+            sessions = self.suspend_serial(device.port) if release_serial else []
+            try:
+                yield device
+            finally:
+                self.resume_serial(sessions)
+        finally:
+            device.last_used = time.monotonic()
+            device.lock.release()
+
+    def cleanup(self):
+        """释放所有设备资源"""
+        for device in self.devices():
+            device.flasher.cleanup()
+        if self.gpio is not None:
+            self.gpio.close()
+            self.gpio = None
@@ -0,0 +1,171 @@
+"""
+固件下载模块 - RemoteFlasher API
+流式下载固件到内存：
+
+- 按块读取响应体，边下载边计算SHA-256，不解码为文本 (二进制固件不会损坏)
+- 下载过程中检查大小上限 (Content-Length 声明超限时不读取响应体)
+- 连接中断时用 HTTP Range 从断点继续下载 (If-Range 保证资源未变化)；请求不压缩的内容
+  (Accept-Encoding: identity)，已下载的字节数就是续传位置
+- 可选校验调用者给出的SHA-256
+- 支持条件请求 (If-None-Match / If-Modified-Since)，服务器返回304时 not_modified 为True
+"""
+
+import hashlib
+import logging
+from typing import Dict, Optional
+
+import requests
+
+# 连接中断时最后一个不完整的块会被丢弃，续传最多重复下载一个块
+CHUNK_SIZE = 8 * 1024
+
+
+class DownloadError(Exception):
+    """下载失败"""
+
+
+class DownloadTooLargeError(DownloadError):
+    """固件超出大小上限"""
+
+
+class DownloadHashMismatchError(DownloadError):
+    """下载内容与期望的SHA-256不一致"""
+
+
+class FirmwareDownload:
+    """一次固件下载 (支持断点续传)"""
+
+    def __init__(self, url: str, max_bytes: Optional[int] = None, expected_sha256: Optional[str] = None,
+                 timeout: float = 30, max_resumes: int = 3, session: Optional[requests.Session] = None,
+                 logger: Optional[logging.Logger] = None, headers: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            url: 固件URL
+            max_bytes: 固件大小上限，None表示不限制
+            expected_sha256: 期望的SHA-256 (十六进制)
+            timeout: 连接和两次读取之间的最长等待时间 (秒)
+            max_resumes: 连接中断后最多续传的次数
+            headers: 附加的请求头 (如条件请求头)
+        """
+        self.url = url
+        self.max_bytes = max_bytes
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.timeout = timeout
+        self.max_resumes = max_resumes
+        self.session = session or requests
+        self.logger = logger or logging.getLogger('AVRFlasher.download')
+        self.headers = dict(headers or {})
+
+        self.data = bytearray()
+        self.resumes = 0
+        self.not_modified = False
+        # 响应的缓存验证器
+        self.etag = None
+        self.last_modified = None
+        self._hash = hashlib.sha256()
+        self._validator = None
+        # 服务器仍然返回了压缩内容：Range按压缩后的字节计算，无法从解压后的长度续传
+        self._encoded = False
+
+    @property
+    def sha256(self) -> str:
+        """已下载内容的SHA-256"""
+        return self._hash.hexdigest()
+
+    def run(self) -> bytes:
+        """
+        执行下载
+
+        Returns:
+            固件内容 (服务器返回304时为空)
+
+        Raises:
+            DownloadTooLargeError: 超出大小上限
+            DownloadHashMismatchError: SHA-256不一致
+            DownloadError: 网络或HTTP错误 (续传次数用尽)
+        """
+        while True:
+            try:
+                self._fetch()
+                break
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                if self.resumes >= self.max_resumes:
+                    raise DownloadError(f'Download interrupted after {len(self.data)} bytes: {e}')
+                self.resumes += 1
+                self.logger.warning(f"Download interrupted at {len(self.data)} bytes, resuming: {e}")
+            except requests.HTTPError as e:
+                raise DownloadError(str(e))
+
+        if self.not_modified:
+            return b''
+        if self.expected_sha256 and self.sha256 != self.expected_sha256:
+            raise DownloadHashMismatchError(
+                f'SHA-256 mismatch: expected {self.expected_sha256}, got {self.sha256}')
+        return bytes(self.data)
+
+    def _fetch(self):
+        headers = {'Accept-Encoding': 'identity'}
+        headers.update(self.headers)
+        if self.data:
+            # 续传时已经拿到新内容，不再发送条件请求头
+            headers.pop('If-None-Match', None)
+            headers.pop('If-Modified-Since', None)
+            if not self._encoded:
+                headers['Range'] = f'bytes={len(self.data)}-'
+                if self._validator:
+                    headers['If-Range'] = self._validator
+
+        with self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if response.status_code == 304:
+                self.not_modified = True
+                return
+            if self.data and response.status_code != 206:
+                # 服务器不支持Range或资源已变化，从头下载
+                self.logger.info("Server ignored range request, restarting download")
+                self._restart()
+            elif response.status_code == 206 and self._range_start(response) != len(self.data):
+                raise DownloadError(f"Unexpected Content-Range: {response.headers.get('Content-Range')}")
+            self._encoded = response.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+            self._validator = self.etag or self.last_modified
+            self._check_declared_size(response)
+
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if self.max_bytes is not None and len(self.data) + len(chunk) > self.max_bytes:
+                    raise DownloadTooLargeError(f'Firmware exceeds {self.max_bytes} bytes')
+                self.data += chunk
+                self._hash.update(chunk)
+
+    def _check_declared_size(self, response):
+        """按响应头声明的大小提前拒绝过大的固件"""
+        if self.max_bytes is None:
+            return
+        total = None
+        content_range = response.headers.get('Content-Range', '')
+        if response.status_code == 206 and '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+        elif response.status_code == 200:
+            total = response.headers.get('Content-Length')
+        if total and total.isdigit() and int(total) > self.max_bytes:
+            raise DownloadTooLargeError(f'Firmware exceeds {self.max_bytes} bytes ({total} bytes declared)')
+
+    @staticmethod
+    def _range_start(response) -> Optional[int]:
+        """Content-Range (bytes START-END/TOTAL) 的起始位置"""
+        value = response.headers.get('Content-Range', '')
+        try:
+            return int(value.split()[1].split('-')[0])
+        except (IndexError, ValueError):
+            return None
+
+    def _restart(self):
+        self.data = bytearray()
+        self._hash = hashlib.sha256()
+
+
+def download_firmware(url: str, **kwargs) -> bytes:
+    """下载固件到内存，参数见 FirmwareDownload"""
+    return FirmwareDownload(url, **kwargs).run()
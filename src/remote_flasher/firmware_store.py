@@ -0,0 +1,204 @@
+"""
+固件存储 - RemoteFlasher API
+以SHA-256为键的内容寻址固件存储：相同的镜像只上传和保存一次，
+总大小超过上限时按最近最少使用 (LRU) 顺序淘汰。
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .hexfile import parse_hex
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class FirmwareNotFoundError(KeyError):
+    """存储中没有该固件"""
+
+
+class FirmwareHashMismatchError(ValueError):
+    """上传内容与声明的哈希不一致"""
+
+
+def is_sha256(value: str) -> bool:
+    """是否为小写十六进制的SHA-256摘要"""
+    return bool(value) and bool(_SHA256_RE.match(value))
+
+
+class FirmwareStore:
+    """内容寻址固件存储"""
+
+    def __init__(self, root: str, max_bytes: int, max_image_size: Optional[int] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_image_size = max_image_size
+        self.logger = logging.getLogger('FlasherAPI.firmware')
+        self._lock = threading.Lock()
+        # sha -> (路径, 大小)，按访问时间排序，最近使用的在末尾
+        self._entries: 'OrderedDict[str, Tuple[Path, int]]' = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._total = 0
+        self._load()
+
+    def _load(self):
+        """启动时按修改时间重建LRU顺序"""
+        files = []
+        for path in self.root.iterdir():
+            sha = path.stem
+            if path.is_file() and is_sha256(sha):
+                stat = path.stat()
+                files.append((stat.st_mtime, sha, path, stat.st_size))
+            elif path.is_file() and path.name.startswith('.upload-'):
+                path.unlink()
+        for _, sha, path, size in sorted(files):
+            self._entries[sha] = (path, size)
+            self._total += size
+
+    def has(self, sha: str) -> bool:
+        """存储中是否有该固件"""
+        return sha in self._entries
+
+    def path(self, sha: str) -> str:
+        """固件文件路径"""
+        try:
+            return str(self._entries[sha][0])
+        except KeyError:
+            raise FirmwareNotFoundError(f"Firmware not found: {sha}")
+
+    def size_of(self, sha: str) -> int:
+        """固件大小"""
+        try:
+            return self._entries[sha][1]
+        except KeyError:
+            raise FirmwareNotFoundError(f"Firmware not found: {sha}")
+
+    def put(self, data: bytes, expected_sha: Optional[str] = None, pin: bool = False) -> str:
+        """
+        保存固件
+
+        Args:
+            data: 固件内容 (Intel HEX文本或二进制)
+            expected_sha: 客户端声明的SHA-256，不一致时拒绝
+            pin: 保存的同时锁定固件 (调用者负责unpin)
+
+        Returns:
+            固件的SHA-256
+
+        Raises:
+            FirmwareHashMismatchError: 哈希不一致
+            HexFormatError: HEX内容无效
+            ValueError: 固件超出大小上限
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        if expected_sha and expected_sha.lower() != sha:
+            raise FirmwareHashMismatchError(f"SHA-256 mismatch: expected {expected_sha}, got {sha}")
+        if self.max_image_size is not None and len(data) > self.max_image_size:
+            raise ValueError(f"Firmware too large: {len(data)} bytes")
+
+        with self._lock:
+            if sha in self._entries:
+                self._touch(sha)
+                if pin:
+                    self._pins[sha] = self._pins.get(sha, 0) + 1
+                return sha
+
+        suffix = '.hex' if data.lstrip()[:1] == b':' else '.bin'
+        if suffix == '.hex':
+            parse_hex(data)
+
+        # 先写临时文件再原子重命名，读者永远看不到写了一半的文件
+        fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            path = self.root / f'{sha}{suffix}'
+            os.replace(temp_path, path)
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if sha not in self._entries:
+                self._entries[sha] = (path, len(data))
+                self._total += len(data)
+            self._touch(sha)
+            if pin:
+                self._pins[sha] = self._pins.get(sha, 0) + 1
+            self._evict()
+        self.logger.info(f"Stored firmware {sha} ({len(data)} bytes)")
+        return sha
+
+    def pin(self, sha: str) -> str:
+        """
+        锁定固件并返回文件路径，unpin之前不会被淘汰
+
+        Raises:
+            FirmwareNotFoundError: 存储中没有该固件
+        """
+        with self._lock:
+            if sha not in self._entries:
+                raise FirmwareNotFoundError(f"Firmware not found: {sha}")
+            self._pins[sha] = self._pins.get(sha, 0) + 1
+            self._touch(sha)
+            return str(self._entries[sha][0])
+
+    def unpin(self, sha: str):
+        """解除固件锁定"""
+        with self._lock:
+            if sha not in self._pins:
+                return
+            self._pins[sha] -= 1
+            if not self._pins[sha]:
+                del self._pins[sha]
+            self._evict()
+
+    @contextmanager
+    def checkout(self, sha: str):
+        """在with块内锁定固件并提供文件路径"""
+        path = self.pin(sha)
+        try:
+            yield path
+        finally:
+            self.unpin(sha)
+
+    def stats(self) -> Dict[str, Any]:
+        """存储统计信息"""
+        return {
+            'images': len(self._entries),
+            'total_bytes': self._total,
+            'max_bytes': self.max_bytes
+        }
+
+    def _touch(self, sha: str):
+        self._entries.move_to_end(sha)
+        try:
+            os.utime(self._entries[sha][0])
+        except OSError:
+            pass
+
+    def _evict(self):
+        # 从最久未使用的开始淘汰，跳过正在使用的固件
+        for sha in list(self._entries):
+            if self._total <= self.max_bytes:
+                break
+            if sha in self._pins:
+                continue
+            path, size = self._entries.pop(sha)
+            self._total -= size
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            self.logger.info(f"Evicted firmware {sha} ({size} bytes)")
@@ -0,0 +1,79 @@
+"""
+烧录历史 - RemoteFlasher API
+持久化记录每个设备最近一次成功烧录的固件摘要，用于跳过重复烧录。
+数据保存在一个JSON文件中，每次更新先写临时文件再原子替换，
+断电或进程崩溃后不会留下损坏的记录。
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class FlashHistory:
+    """设备烧录历史"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON文件路径，None表示只保存在内存中
+        """
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._records = json.load(f)
+            except (OSError, ValueError):
+                # 历史文件损坏时当作没有历史，下一次烧录会重新写入
+                self._records = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取设备最近一次烧录记录"""
+        record = self._records.get(key)
+        return dict(record) if record else None
+
+    def record(self, key: str, digest: str, **info) -> Dict[str, Any]:
+        """
+        记录一次成功烧录
+
+        Args:
+            key: 设备标识 (串口)
+            digest: 固件镜像摘要
+            **info: 其他要保存的信息 (mcu、大小等)
+        """
+        entry = {'digest': digest, 'flashed_at': time.time()}
+        entry.update(info)
+        with self._lock:
+            self._records[key] = entry
+            self._save()
+        return dict(entry)
+
+    def forget(self, key: str):
+        """删除设备的烧录记录 (烧录失败后设备内容未知)"""
+        with self._lock:
+            if self._records.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.history-', dir=self.path.parent)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._records, f, indent=2, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
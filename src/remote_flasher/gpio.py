@@ -0,0 +1,293 @@
+"""
+GPIO后端模块 - RemoteFlasher API
+为复位控制提供可插拔的GPIO实现：
+
+- CharDeviceGPIOBackend: Linux GPIO字符设备 (/dev/gpiochipN)，进程内ioctl
+- SysfsGPIOBackend: /sys/class/gpio 接口，保持value文件描述符常开
+- CommandGPIOBackend: 旧的 gpio 命令行工具 (每次调用都会启动子进程)
+- FakeGPIOBackend: 内存实现，用于测试
+
+所有后端的引脚号都是BCM编号 (gpiochip0 的line偏移)，命令行工具通过 -g 使用同一编号。
+"""
+
+import os
+import time
+import struct
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # 非Linux平台
+    fcntl = None
+
+
+class GPIOError(Exception):
+    """GPIO操作失败"""
+
+
+class GPIOBackend:
+    """GPIO后端基类"""
+
+    name = 'base'
+
+    def setup_output(self, pin: int, initial: int = 1) -> None:
+        """将引脚配置为输出并设置初始电平"""
+        raise NotImplementedError
+
+    def write(self, pin: int, value: int) -> None:
+        """设置引脚电平"""
+        raise NotImplementedError
+
+    def read(self, pin: int) -> int:
+        """读取引脚电平"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放所有引脚"""
+
+
+# Linux GPIO字符设备 v1 ABI (linux/gpio.h)
+_GPIOHANDLES_MAX = 64
+_GPIOHANDLE_REQUEST_OUTPUT = 1 << 1
+# struct gpiohandle_request: lineoffsets[64], flags, default_values[64], consumer_label[32], lines, fd
+_HANDLE_REQUEST = struct.Struct('64I I 64B 32s I i')
+_HANDLE_DATA_SIZE = _GPIOHANDLES_MAX
+
+
+def _iowr(nr: int, size: int) -> int:
+    return (3 << 30) | (size << 16) | (0xB4 << 8) | nr
+
+
+GPIO_GET_LINEHANDLE_IOCTL = _iowr(0x03, _HANDLE_REQUEST.size)
+GPIOHANDLE_GET_LINE_VALUES_IOCTL = _iowr(0x08, _HANDLE_DATA_SIZE)
+GPIOHANDLE_SET_LINE_VALUES_IOCTL = _iowr(0x09, _HANDLE_DATA_SIZE)
+
+
+class CharDeviceGPIOBackend(GPIOBackend):
+    """基于 /dev/gpiochipN 的进程内GPIO实现，引脚句柄在后端生命周期内保持打开"""
+
+    name = 'chardev'
+
+    def __init__(self, chip: str = '/dev/gpiochip0', consumer: str = 'remote-flasher'):
+        if fcntl is None:
+            raise GPIOError('fcntl not available on this platform')
+        try:
+            self._chip_fd = os.open(chip, os.O_RDWR | os.O_CLOEXEC)
+        except OSError as e:
+            raise GPIOError(f'Cannot open {chip}: {e}')
+        self.chip = chip
+        self.consumer = consumer.encode('ascii')[:31]
+        self._lines: Dict[int, int] = {}
+
+    def setup_output(self, pin: int, initial: int = 1) -> None:
+        if pin in self._lines:
+            self.write(pin, initial)
+            return
+
+        offsets = [pin] + [0] * (_GPIOHANDLES_MAX - 1)
+        defaults = [1 if initial else 0] + [0] * (_GPIOHANDLES_MAX - 1)
+        request = bytearray(_HANDLE_REQUEST.pack(
+            *offsets, _GPIOHANDLE_REQUEST_OUTPUT, *defaults, self.consumer, 1, -1
+        ))
+        try:
+            fcntl.ioctl(self._chip_fd, GPIO_GET_LINEHANDLE_IOCTL, request, True)
+        except OSError as e:
+            raise GPIOError(f'Cannot request line {pin} on {self.chip}: {e}')
+
+        self._lines[pin] = _HANDLE_REQUEST.unpack(request)[-1]
+
+    def write(self, pin: int, value: int) -> None:
+        line_fd = self._line_fd(pin)
+        data = bytes([1 if value else 0]) + bytes(_HANDLE_DATA_SIZE - 1)
+        try:
+            fcntl.ioctl(line_fd, GPIOHANDLE_SET_LINE_VALUES_IOCTL, data)
+        except OSError as e:
+            raise GPIOError(f'Cannot write line {pin}: {e}')
+
+    def read(self, pin: int) -> int:
+        line_fd = self._line_fd(pin)
+        data = bytearray(_HANDLE_DATA_SIZE)
+        try:
+            fcntl.ioctl(line_fd, GPIOHANDLE_GET_LINE_VALUES_IOCTL, data, True)
+        except OSError as e:
+            raise GPIOError(f'Cannot read line {pin}: {e}')
+        return data[0]
+
+    def close(self) -> None:
+        for line_fd in self._lines.values():
+            try:
+                os.close(line_fd)
+            except OSError:
+                pass
+        self._lines.clear()
+        if self._chip_fd is not None:
+            try:
+                os.close(self._chip_fd)
+            except OSError:
+                pass
+            self._chip_fd = None
+
+    def _line_fd(self, pin: int) -> int:
+        if pin not in self._lines:
+            raise GPIOError(f'GPIO {pin} not configured as output')
+        return self._lines[pin]
+
+
+class SysfsGPIOBackend(GPIOBackend):
+    """基于 /sys/class/gpio 的实现，value文件描述符常开，写入只需一次pwrite"""
+
+    name = 'sysfs'
+
+    def __init__(self, root: str = '/sys/class/gpio'):
+        if not os.path.isdir(root):
+            raise GPIOError(f'{root} not available')
+        self.root = root
+        self._values: Dict[int, int] = {}
+
+    def setup_output(self, pin: int, initial: int = 1) -> None:
+        pin_dir = os.path.join(self.root, f'gpio{pin}')
+        try:
+            if not os.path.isdir(pin_dir):
+                self._write_file(os.path.join(self.root, 'export'), str(pin))
+                # 导出后内核需要一点时间创建属性文件
+                for _ in range(100):
+                    if os.path.exists(os.path.join(pin_dir, 'direction')):
+                        break
+                    time.sleep(0.001)
+            # 'high'/'low' 在切换方向的同时设置初始电平，避免毛刺
+            self._write_file(os.path.join(pin_dir, 'direction'), 'high' if initial else 'low')
+            if pin not in self._values:
+                self._values[pin] = os.open(os.path.join(pin_dir, 'value'), os.O_RDWR | os.O_CLOEXEC)
+        except OSError as e:
+            raise GPIOError(f'Cannot configure GPIO {pin} via sysfs: {e}')
+
+    def write(self, pin: int, value: int) -> None:
+        try:
+            os.pwrite(self._value_fd(pin), b'1' if value else b'0', 0)
+        except OSError as e:
+            raise GPIOError(f'Cannot write GPIO {pin}: {e}')
+
+    def read(self, pin: int) -> int:
+        try:
+            return int(os.pread(self._value_fd(pin), 1, 0) or b'0')
+        except OSError as e:
+            raise GPIOError(f'Cannot read GPIO {pin}: {e}')
+
+    def close(self) -> None:
+        for fd in self._values.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._values.clear()
+
+    def _value_fd(self, pin: int) -> int:
+        if pin not in self._values:
+            raise GPIOError(f'GPIO {pin} not configured as output')
+        return self._values[pin]
+
+    @staticmethod
+    def _write_file(path: str, text: str) -> None:
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+class CommandGPIOBackend(GPIOBackend):
+    """gpio命令行工具实现 (兼容旧版本，每次操作启动一个子进程，-g 表示BCM编号)"""
+
+    name = 'command'
+
+    def __init__(self, command: str = 'gpio'):
+        self.command = command
+        try:
+            result = subprocess.run([command, '-v'], capture_output=True, text=True)
+        except FileNotFoundError:
+            raise GPIOError(f'{command} command not found')
+        if result.returncode != 0:
+            raise GPIOError(f'{command} command not available')
+
+    def setup_output(self, pin: int, initial: int = 1) -> None:
+        self._run('-g', 'mode', str(pin), 'out')
+        self.write(pin, initial)
+
+    def write(self, pin: int, value: int) -> None:
+        self._run('-g', 'write', str(pin), '1' if value else '0')
+
+    def read(self, pin: int) -> int:
+        return int(self._run('-g', 'read', str(pin)).strip() or 0)
+
+    def _run(self, *args) -> str:
+        try:
+            result = subprocess.run([self.command, *args], capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            raise GPIOError(f'{self.command} {" ".join(args)} failed: {e.stderr}')
+        except FileNotFoundError:
+            raise GPIOError(f'{self.command} command not found')
+        return result.stdout
+
+
+class FakeGPIOBackend(GPIOBackend):
+    """内存GPIO实现，记录每次电平变化，用于测试和模拟器"""
+
+    name = 'fake'
+
+    def __init__(self):
+        self.states: Dict[int, int] = {}
+        self.history: List[Tuple[float, int, int]] = []
+        self.listeners = []
+
+    def setup_output(self, pin: int, initial: int = 1) -> None:
+        self.write(pin, initial)
+
+    def write(self, pin: int, value: int) -> None:
+        value = 1 if value else 0
+        self.states[pin] = value
+        self.history.append((time.perf_counter(), pin, value))
+        for listener in list(self.listeners):
+            listener(pin, value)
+
+    def read(self, pin: int) -> int:
+        if pin not in self.states:
+            raise GPIOError(f'GPIO {pin} not configured as output')
+        return self.states[pin]
+
+
+GPIO_BACKENDS = {
+    'chardev': CharDeviceGPIOBackend,
+    'sysfs': SysfsGPIOBackend,
+    'command': CommandGPIOBackend,
+    'fake': FakeGPIOBackend,
+}
+
+# auto模式下的尝试顺序：进程内实现优先，命令行工具作为后备
+AUTO_BACKEND_ORDER = ('chardev', 'sysfs', 'command')
+
+
+def create_gpio_backend(config, logger=None) -> Optional[GPIOBackend]:
+    """
+    根据配置创建GPIO后端
+
+    Args:
+        config: 配置对象 (使用 GPIO_BACKEND / GPIO_CHIP)
+        logger: 可选的日志对象
+
+    Returns:
+        GPIO后端实例，全部不可用时返回None
+    """
+    backend_name = getattr(config, 'GPIO_BACKEND', 'auto')
+    names = AUTO_BACKEND_ORDER if backend_name == 'auto' else (backend_name,)
+
+    for name in names:
+        backend_cls = GPIO_BACKENDS.get(name)
+        if backend_cls is None:
+            raise ValueError(f'Unknown GPIO backend: {name}')
+        try:
+            if backend_cls is CharDeviceGPIOBackend:
+                return backend_cls(getattr(config, 'GPIO_CHIP', '/dev/gpiochip0'))
+            return backend_cls()
+        except GPIOError as e:
+            if logger:
+                logger.debug(f"GPIO backend '{name}' unavailable: {e}")
+
+    return None
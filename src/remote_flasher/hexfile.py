@@ -0,0 +1,365 @@
+"""
+Intel HEX解析模块 - RemoteFlasher API
+将Intel HEX文本解析为稀疏的内存镜像 (按地址排序的连续数据段)，
+在启动avrdude和复位目标板之前完成校验和、记录类型、扩展地址、
+记录重叠和镜像大小检查。
+
+解析时整份文件只做一次 bytes.fromhex 转换；等长、地址连续的数据记录
+整组通过步长切片批量校验和提取数据，其余记录通过 memoryview 逐条切片，
+不存在逐字符的Python循环。
+"""
+
+import hashlib
+import sys
+from array import array
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# 记录类型
+RECORD_DATA = 0x00
+RECORD_EOF = 0x01
+RECORD_EXT_SEGMENT = 0x02
+RECORD_START_SEGMENT = 0x03
+RECORD_EXT_LINEAR = 0x04
+RECORD_START_LINEAR = 0x05
+
+
+class HexFormatError(ValueError):
+    """Intel HEX格式错误"""
+
+    def __init__(self, message: str, line: Optional[int] = None):
+        self.line = line
+        if line is not None:
+            message = f'line {line}: {message}'
+        super().__init__(message)
+
+
+class FirmwareImage:
+    """稀疏固件镜像：按起始地址排序、互不重叠的数据段"""
+
+    def __init__(self, segments: Optional[List[Tuple[int, bytearray]]] = None,
+                 start_address: Optional[int] = None):
+        self.segments: List[Tuple[int, bytearray]] = segments or []
+        self.start_address = start_address
+
+    @classmethod
+    def from_binary(cls, data: bytes, base_address: int = 0) -> 'FirmwareImage':
+        """从原始二进制数据创建镜像"""
+        return cls([(base_address, bytearray(data))] if data else [])
+
+    @property
+    def size(self) -> int:
+        """数据字节数 (不含空洞)"""
+        return sum(len(data) for _, data in self.segments)
+
+    @property
+    def min_address(self) -> Optional[int]:
+        """最低数据地址"""
+        return self.segments[0][0] if self.segments else None
+
+    @property
+    def max_address(self) -> Optional[int]:
+        """最高数据地址 (不含)"""
+        if not self.segments:
+            return None
+        start, data = self.segments[-1]
+        return start + len(data)
+
+    def page_count(self, page_size: int) -> int:
+        """镜像涉及的flash页数"""
+        pages = 0
+        last_page = -1
+        for start, data in self.segments:
+            first = start // page_size
+            last = (start + len(data) - 1) // page_size
+            if first <= last_page:
+                first = last_page + 1
+            if last >= first:
+                pages += last - first + 1
+            last_page = max(last_page, last)
+        return pages
+
+    def pages(self, page_size: int, fill: int = 0xFF):
+        """按地址顺序产生镜像涉及的每一页 (页地址, 整页数据)，页内空洞用fill填充"""
+        last_page = -1
+        for start, data in self.segments:
+            first = max(start // page_size, last_page + 1)
+            last = (start + len(data) - 1) // page_size
+            for page in range(first, last + 1):
+                address = page * page_size
+                yield address, self.to_bytes(fill, address, address + page_size)
+            last_page = max(last_page, last)
+
+    def to_bytes(self, fill: int = 0xFF, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        """展开为连续的字节串，空洞用fill填充"""
+        if not self.segments:
+            return b''
+        start = self.min_address if start is None else start
+        end = self.max_address if end is None else end
+        buffer = bytearray([fill]) * (end - start)
+        for seg_start, data in self.segments:
+            lo = max(seg_start, start)
+            hi = min(seg_start + len(data), end)
+            if lo < hi:
+                buffer[lo - start:hi - start] = data[lo - seg_start:hi - seg_start]
+        return bytes(buffer)
+
+    def digest(self) -> str:
+        """镜像内容的SHA-256 (与HEX文本的记录划分和换行方式无关)"""
+        sha = hashlib.sha256()
+        for start, data in self.segments:
+            sha.update(start.to_bytes(4, 'big') + len(data).to_bytes(4, 'big'))
+            sha.update(data)
+        return sha.hexdigest()
+
+    def matches(self, other: 'FirmwareImage', fill: int = 0xFF) -> bool:
+        """other在本镜像的所有数据段上内容是否一致 (用于比较回读的flash)"""
+        return all(other.to_bytes(fill, start, start + len(data)) == data
+                   for start, data in self.segments)
+
+    def to_hex(self, record_size: int = 16) -> bytes:
+        """序列化为Intel HEX文本"""
+        lines = []
+        upper = 0
+        for start, data in self.segments:
+            offset = 0
+            while offset < len(data):
+                address = start + offset
+                if address >> 16 != upper:
+                    upper = address >> 16
+                    lines.append(_format_record(RECORD_EXT_LINEAR, 0, upper.to_bytes(2, 'big')))
+                # 单条记录不跨越64K边界
+                count = min(record_size, len(data) - offset, 0x10000 - (address & 0xFFFF))
+                lines.append(_format_record(RECORD_DATA, address & 0xFFFF, data[offset:offset + count]))
+                offset += count
+        if self.start_address is not None:
+            lines.append(_format_record(RECORD_START_LINEAR, 0, self.start_address.to_bytes(4, 'big')))
+        lines.append(_format_record(RECORD_EOF, 0, b''))
+        return b'\n'.join(lines) + b'\n'
+
+    def to_dict(self, page_size: Optional[int] = None) -> Dict[str, Any]:
+        """镜像摘要信息"""
+        info = {
+            'size': self.size,
+            'segments': len(self.segments),
+            'min_address': self.min_address,
+            'max_address': self.max_address,
+            'start_address': self.start_address
+        }
+        if page_size:
+            info['page_size'] = page_size
+            info['page_count'] = self.page_count(page_size)
+        return info
+
+
+def _format_record(record_type: int, address: int, data: bytes) -> bytes:
+    record = bytes([len(data), address >> 8, address & 0xFF, record_type]) + bytes(data)
+    checksum = (-sum(record)) & 0xFF
+    return b':' + (record + bytes([checksum])).hex().upper().encode('ascii')
+
+
+def parse_hex(data: Union[bytes, str], max_address: Optional[int] = None) -> FirmwareImage:
+    """
+    解析Intel HEX数据
+
+    Args:
+        data: HEX文本 (bytes或str)
+        max_address: 允许的最高地址 (不含)，通常为目标MCU的flash大小
+
+    Returns:
+        固件镜像
+
+    Raises:
+        HexFormatError: 格式、校验和、地址或大小错误
+    """
+    if isinstance(data, str):
+        data = data.encode('ascii', errors='replace')
+
+    lines = data.split()
+    if not lines:
+        raise HexFormatError('empty hex file')
+
+    # 每行必须以':'开头且只有一个':' (常规换行的文件只需两次count即可确认)
+    if data.count(b':') != len(lines) or not (
+            lines[0][:1] == b':' and data.count(b'\n:') == len(lines) - 1
+            or all(line[:1] == b':' for line in lines)):
+        for number, line in enumerate(lines, 1):
+            if line[:1] != b':' or line.count(b':') != 1:
+                raise HexFormatError('record does not start with ":"', number)
+
+    try:
+        raw = bytes.fromhex(data.replace(b':', b' ').decode('ascii'))
+    except (ValueError, UnicodeDecodeError):
+        _locate_bad_digits(lines)
+        raise HexFormatError('invalid hex digits')
+
+    parser = _HexParser(raw)
+    offset = 0
+    number = 1
+    # 相同长度的连续记录作为一组处理 (典型文件几乎全是16字节数据记录)
+    for length, group in groupby(map(len, lines)):
+        count = len(list(group))
+        if length % 2 == 0 or length < 11:
+            raise HexFormatError('record length does not match byte count', number)
+        stride = (length - 1) // 2
+        if count < _MIN_FAST_RUN or not parser.fast_run(offset, count, stride):
+            parser.slow_run(offset, count, stride, number)
+        offset += count * stride
+        number += count
+
+    if not parser.eof:
+        raise HexFormatError('missing end-of-file record')
+
+    image = FirmwareImage(_merge_segments(parser.segments), parser.start_address)
+    if max_address is not None and image.max_address is not None and image.max_address > max_address:
+        raise HexFormatError(
+            f'image ends at 0x{image.max_address:X}, exceeds flash size 0x{max_address:X}'
+        )
+    return image
+
+
+# 少于该数量的记录组直接逐条处理
+_MIN_FAST_RUN = 8
+
+
+class _HexParser:
+    """解析状态：当前扩展地址、正在追加的数据段和已完成的数据段"""
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self.view = memoryview(raw)
+        self.segments: List[Tuple[int, bytearray]] = []
+        self.seg_data = None
+        self.seg_end = -1
+        self.base = 0
+        self.start_address = None
+        self.eof = False
+
+    def fast_run(self, offset: int, count: int, stride: int) -> bool:
+        """
+        批量处理一组等长、地址连续的数据记录
+
+        记录类型、长度字段、地址和校验和都通过步长切片和C层迭代一次性检查，
+        任何一项不满足都返回False，由slow_run逐条处理并给出精确的出错行号。
+        """
+        raw = self.raw
+        end = offset + count * stride
+        size = stride - 5
+        if self.eof or size == 0:
+            return False
+        if raw[offset + 3:end:stride].count(RECORD_DATA) != count:
+            return False
+        if raw[offset:end:stride].count(size) != count:
+            return False
+
+        first = (raw[offset + 1] << 8) | raw[offset + 2]
+        last = first + (count - 1) * size
+        if last + size > 0x10000:
+            return False
+        addresses = bytearray(2 * count)
+        addresses[0::2] = raw[offset + 1:end:stride]
+        addresses[1::2] = raw[offset + 2:end:stride]
+        expected = array('H', range(first, last + 1, size))
+        if sys.byteorder == 'little':
+            expected.byteswap()
+        if addresses != expected.tobytes():
+            return False
+
+        # 校验和：把每一列字节放进定宽通道的大整数中相加，每个通道得到一条记录的字节和，
+        # 低字节必须为0。字节和最大为 255*stride：放得进16位时用16位通道，
+        # 否则 (长度超过251字节的记录) 用32位通道，保证通道之间不会进位
+        width = 2 if 255 * stride < 0x10000 else 4
+        lanes = bytearray(width * count)
+        total = 0
+        for column in range(stride):
+            lanes[0::width] = raw[offset + column:end:stride]
+            total += int.from_bytes(lanes, 'little')
+        if total.to_bytes(width * count, 'little')[0::width].count(0) != count:
+            return False
+
+        data = bytearray(count * size)
+        for column in range(size):
+            data[column::size] = raw[offset + 4 + column:end:stride]
+        self._append(self.base + first, data)
+        return True
+
+    def slow_run(self, offset: int, count: int, stride: int, number: int):
+        """逐条处理一组记录"""
+        raw = self.raw
+        view = self.view
+        for pos in range(offset, offset + count * stride, stride):
+            if self.eof:
+                raise HexFormatError('data after end-of-file record', number)
+            size = raw[pos]
+            end = pos + stride
+            if size != stride - 5:
+                raise HexFormatError('record length does not match byte count', number)
+            if sum(view[pos:end]) & 0xFF:
+                raise HexFormatError('checksum mismatch', number)
+
+            record_type = raw[pos + 3]
+            if record_type == RECORD_DATA:
+                if size:
+                    self._append(self.base + ((raw[pos + 1] << 8) | raw[pos + 2]), view[pos + 4:end - 1])
+            elif record_type == RECORD_EOF:
+                self.eof = True
+            elif record_type == RECORD_EXT_LINEAR:
+                _expect_count(size, 2, number)
+                self.base = ((raw[pos + 4] << 8) | raw[pos + 5]) << 16
+                self.seg_end = -1
+            elif record_type == RECORD_EXT_SEGMENT:
+                _expect_count(size, 2, number)
+                self.base = ((raw[pos + 4] << 8) | raw[pos + 5]) << 4
+                self.seg_end = -1
+            elif record_type in (RECORD_START_SEGMENT, RECORD_START_LINEAR):
+                _expect_count(size, 4, number)
+                self.start_address = int.from_bytes(view[pos + 4:pos + 8], 'big')
+            else:
+                raise HexFormatError(f'unknown record type 0x{record_type:02X}', number)
+            number += 1
+
+    def _append(self, address: int, data):
+        if address == self.seg_end:
+            self.seg_data += data
+        else:
+            self.seg_data = bytearray(data)
+            self.segments.append((address, self.seg_data))
+        self.seg_end = address + len(data)
+
+
+def load_hex_file(file_path: Union[str, Path], max_address: Optional[int] = None) -> FirmwareImage:
+    """读取并解析Intel HEX文件"""
+    with open(file_path, 'rb') as f:
+        return parse_hex(f.read(), max_address)
+
+
+def _expect_count(count: int, expected: int, number: int):
+    if count != expected:
+        raise HexFormatError(f'record must carry {expected} data bytes, got {count}', number)
+
+
+def _locate_bad_digits(lines: List[bytes]):
+    for number, line in enumerate(lines, 1):
+        try:
+            bytes.fromhex(line[1:].decode('ascii'))
+        except (ValueError, UnicodeDecodeError):
+            raise HexFormatError('invalid hex digits', number)
+
+
+def _merge_segments(segments: List[Tuple[int, bytearray]]) -> List[Tuple[int, bytearray]]:
+    """排序并合并相邻数据段，发现重叠时报错"""
+    if len(segments) <= 1:
+        return segments
+    segments.sort(key=lambda segment: segment[0])
+    merged = [segments[0]]
+    for start, data in segments[1:]:
+        last_start, last_data = merged[-1]
+        last_end = last_start + len(last_data)
+        if start < last_end:
+            raise HexFormatError(f'overlapping records at address 0x{start:X}')
+        if start == last_end:
+            last_data += data
+        else:
+            merged.append((start, data))
+    return merged
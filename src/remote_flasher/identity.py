@@ -0,0 +1,139 @@
+"""
+设备识别缓存 - RemoteFlasher API
+缓存每个串口/编程器上读到的设备身份 (签名、对应的MCU、熔丝位和bootloader版本)，
+读取设备信息需要复位目标板并运行一次编程器会话，缓存后轮询只需查表：
+
+- TTL 内直接使用缓存，refresh 时重新读取
+- 缓存时记录串口设备节点的 inode/ctime，读取时比较；节点被重新创建
+  (USB热插拔) 或消失后缓存失效
+- 烧录该串口后失效：成功时只保留烧录确认过的签名和MCU，失败时全部删除
+- 未指定 mcu 的烧录请求使用识别出的MCU (见 Device.flash_params)
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 接线错误或目标板无响应时读到的签名，不缓存
+INVALID_SIGNATURES = ('000000', 'ffffff')
+
+_SIGNATURE = re.compile(r'Device signature = (?:0x)?([0-9a-f]{6}|[0-9a-f]{2} [0-9a-f]{2} [0-9a-f]{2})\b', re.I)
+_FUSE = re.compile(r'\b(lfuse|hfuse|efuse|lock) reads as ([0-9a-f]{1,2})\b', re.I)
+_FUSES_OK = re.compile(r'Fuses OK \(E:([0-9a-f]{2}), H:([0-9a-f]{2}), L:([0-9a-f]{2})\)', re.I)
+_FIRMWARE = re.compile(r'Firmware Version\s*:\s*([\d.]+)', re.I)
+
+
+def parse_avrdude_identity(output: str) -> Dict[str, Any]:
+    """从 avrdude -v 的输出中提取签名、熔丝位和bootloader (编程器固件) 版本"""
+    identity: Dict[str, Any] = {'signature': None, 'fuses': {}, 'bootloader': None}
+    found = _SIGNATURE.search(output)
+    if found:
+        identity['signature'] = found.group(1).replace(' ', '').lower()
+    found = _FUSES_OK.search(output)
+    if found:
+        identity['fuses'] = dict(zip(('efuse', 'hfuse', 'lfuse'), (v.lower() for v in found.groups())))
+    for name, value in _FUSE.findall(output):
+        identity['fuses'][name.lower()] = value.lower().zfill(2)
+    found = _FIRMWARE.search(output)
+    if found:
+        identity['bootloader'] = found.group(1)
+    return identity
+
+
+def _port_stamp(port: str) -> Optional[Tuple[int, int]]:
+    """串口设备节点的 (inode, ctime)，节点不存在时返回None"""
+    try:
+        st = os.stat(port)
+    except (OSError, TypeError, ValueError):
+        return None
+    return st.st_ino, st.st_ctime_ns
+
+
+class DeviceIdentity:
+    """一个串口上目标板的身份"""
+
+    def __init__(self, signature: str, mcu: Optional[str] = None, fuses: Optional[Dict[str, str]] = None,
+                 bootloader: Optional[str] = None, source: str = 'device_info'):
+        """
+        Args:
+            signature: 6位十六进制器件签名
+            source: 'device_info' (读取设备信息) 或 'flash' (烧录成功后只知道签名和MCU)
+        """
+        self.signature = signature
+        self.mcu = mcu
+        self.fuses = dict(fuses or {})
+        self.bootloader = bootloader
+        self.source = source
+        self.read_at = time.time()
+
+    @property
+    def valid(self) -> bool:
+        """签名是否可信 (可以缓存)"""
+        return bool(self.signature) and self.signature not in INVALID_SIGNATURES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'signature': self.signature,
+            'mcu': self.mcu,
+            'fuses': dict(self.fuses),
+            'bootloader': self.bootloader,
+            'source': self.source,
+            'read_at': self.read_at
+        }
+
+
+class IdentityCache:
+    """(串口, 编程器) 到设备身份的缓存，多个设备共享"""
+
+    def __init__(self, ttl: float = 3600, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ttl: 缓存有效时间 (秒)，0表示不缓存
+            clock: 时钟函数 (测试用)
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        # (串口, 编程器) -> (身份, 缓存时间, 串口节点标记)
+        self._entries: Dict[Tuple[str, str], Tuple[DeviceIdentity, float, Any]] = {}
+        self._counters = {'hits': 0, 'misses': 0, 'invalidated': 0}
+
+    @classmethod
+    def from_config(cls, config) -> 'IdentityCache':
+        return cls(config.IDENTITY_CACHE_TTL)
+
+    def get(self, port: str, programmer: str) -> Optional[DeviceIdentity]:
+        """有效的缓存身份，过期、串口被重新插拔或没有缓存时返回None"""
+        key = (port, programmer)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                identity, cached_at, stamp = entry
+                if self.clock() - cached_at < self.ttl and _port_stamp(port) == stamp:
+                    self._counters['hits'] += 1
+                    return identity
+                del self._entries[key]
+                self._counters['invalidated'] += 1
+            self._counters['misses'] += 1
+        return None
+
+    def put(self, port: str, programmer: str, identity: DeviceIdentity) -> bool:
+        """缓存身份，签名不可信或不缓存时返回False"""
+        if not identity.valid or self.ttl <= 0:
+            return False
+        with self._lock:
+            self._entries[(port, programmer)] = (identity, self.clock(), _port_stamp(port))
+        return True
+
+    def invalidate(self, port: str):
+        """删除该串口上所有编程器的缓存"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == port]:
+                del self._entries[key]
+                self._counters['invalidated'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), ttl=self.ttl)
@@ -0,0 +1,233 @@
+"""
+异步烧录任务队列 - RemoteFlasher API
+提交烧录请求后立即返回任务ID，由每个设备独立的工作线程按提交顺序执行，
+客户端通过任务ID查询状态或长轮询等待结果。
+"""
+
+import queue
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+# 设备队列空闲多久后工作线程退出（秒），下次提交时重新创建
+WORKER_IDLE_TIMEOUT = 60
+
+
+class UnknownJobError(KeyError):
+    """任务不存在或已过期"""
+
+
+class Job:
+    """烧录任务"""
+
+    def __init__(self, device_name: str, kind: str, func: Callable[[], Dict[str, Any]],
+                 cleanup: Optional[Callable[[], None]] = None, release_serial: bool = True):
+        self.id = uuid.uuid4().hex
+        self.device_name = device_name
+        self.kind = kind
+        # 执行期间暂停设备串口上的串口会话
+        self.release_serial = release_serial
+        self.status = JOB_QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._func = func
+        self._cleanup = cleanup
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def done(self) -> bool:
+        """任务是否已结束"""
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待任务结束，返回任务是否已结束"""
+        return self._done.wait(timeout)
+
+    def on_done(self, callback: Callable[[], None]):
+        """任务结束时在工作线程中调用callback (已结束时立即调用)"""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def run(self):
+        """在工作线程中执行任务"""
+        self.status = JOB_RUNNING
+        self.started_at = time.time()
+        try:
+            self.result = self._func()
+        except Exception as e:
+            self.result = self._failure(f'Job failed: {str(e)}', e)
+        finally:
+            self._finish()
+
+    def fail(self, message: str, error: Exception):
+        """任务未能执行 (例如获取设备失败)：记录失败结果并结束任务"""
+        self.result = self._failure(message, error)
+        self._finish()
+
+    @staticmethod
+    def _failure(message: str, error: Exception) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'message': message,
+            'error': str(error),
+            'output': '',
+            'duration': 0
+        }
+
+    def _finish(self):
+        """执行清理函数、设置最终状态并唤醒等待者"""
+        if self._cleanup:
+            try:
+                self._cleanup()
+            except Exception:
+                pass
+        self._func = self._cleanup = None
+        self.finished_at = time.time()
+        try:
+            # 任务函数可能返回非字典结果，不能因此让工作线程退出
+            succeeded = isinstance(self.result, dict) and bool(self.result.get('success'))
+            self.status = JOB_SUCCEEDED if succeeded else JOB_FAILED
+        finally:
+            with self._lock:
+                self._done.set()
+                callbacks, self._callbacks = self._callbacks, []
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception:
+                    pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化的字典"""
+        return {
+            'job_id': self.id,
+            'device': self.device_name,
+            'kind': self.kind,
+            'status': self.status,
+            'done': self.done,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result
+        }
+
+
+class JobManager:
+    """任务管理器：每个设备一个队列和一个工作线程"""
+
+    def __init__(self, registry, history_size: int = 1000):
+        self.registry = registry
+        self.history_size = history_size
+        self.logger = logging.getLogger('FlasherAPI.jobs')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._queues: Dict[str, queue.Queue] = {}
+        self._workers: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, device, func: Callable[[], Dict[str, Any]], kind: str = 'flash',
+               cleanup: Optional[Callable[[], None]] = None, release_serial: bool = True) -> Job:
+        """
+        提交任务到设备队列
+
+        Args:
+            device: 目标设备
+            func: 在持有设备锁时执行的函数，返回结果字典
+            kind: 任务类型
+            cleanup: 任务结束后执行的清理函数
+            release_serial: 执行期间是否暂停设备串口上的串口会话 (不使用串口的任务为False)
+
+        Returns:
+            任务对象
+        """
+        job = Job(device.name, kind, func, cleanup, release_serial)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            device_queue = self._queues.get(device.name)
+            if device_queue is None:
+                device_queue = self._queues[device.name] = queue.Queue()
+                worker = threading.Thread(
+                    target=self._worker, args=(device.name, device_queue),
+                    name=f'flash-worker-{device.name}', daemon=True
+                )
+                self._workers[device.name] = worker
+                worker.start()
+            # 在锁内入队，空闲退出的工作线程不会丢下刚提交的任务；
+            # 同名设备可能已被重新创建 (临时设备)，任务带上提交时的设备对象
+            device_queue.put((device, job))
+        self.logger.info(f"Job {job.id} ({kind}) queued for device '{device.name}'")
+        return job
+
+    def get(self, job_id: str) -> Job:
+        """按ID获取任务"""
+        try:
+            return self._jobs[job_id]
+        except KeyError:
+            raise UnknownJobError(f"Unknown job: {job_id}")
+
+    def queue_depth(self, device_name: str) -> int:
+        """设备队列中等待的任务数"""
+        device_queue = self._queues.get(device_name)
+        return device_queue.qsize() if device_queue else 0
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """停止所有工作线程 (等待已排队的任务执行完)"""
+        with self._lock:
+            queues = list(self._queues.values())
+            workers = list(self._workers.values())
+        for device_queue in queues:
+            device_queue.put(None)
+        for worker in workers:
+            worker.join(timeout)
+        with self._lock:
+            self._queues.clear()
+            self._workers.clear()
+
+    def _worker(self, device_name: str, device_queue: queue.Queue):
+        while True:
+            try:
+                item = device_queue.get(timeout=WORKER_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self._lock:
+                    if device_queue.empty():
+                        if self._queues.get(device_name) is device_queue:
+                            del self._queues[device_name]
+                            del self._workers[device_name]
+                        break
+                continue
+            if item is None:
+                break
+            device, job = item
+            try:
+                with self.registry.acquire(device, release_serial=job.release_serial):
+                    job.run()
+            except Exception as e:
+                # 获取设备或暂停/恢复串口会话失败：结束任务，工作线程继续处理后续任务
+                self.logger.error(f"Job {job.id} on device {device_name}: {e}")
+                if not job.done:
+                    job.fail(f'Device unavailable: {str(e)}', e)
+            self.logger.info(f"Job {job.id} finished: {job.status}")
+
+    def _prune(self):
+        # 只淘汰已结束的任务，排队和执行中的任务始终保留
+        excess = len(self._jobs) - self.history_size
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:excess]:
+            del self._jobs[job_id]
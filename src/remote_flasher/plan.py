@@ -0,0 +1,175 @@
+"""
+编程计划模块 - RemoteFlasher API
+一个编程计划包含多个存储器操作 (flash/eeprom/熔丝位/锁定位的写入、读取和校验)，
+在一次编程器会话中按顺序执行，只复位一次目标板 (avrdude 的多个 -U 参数)。
+
+计划在排队执行之前完整检查：存储器是否存在于器件数据库、镜像是否超出存储器大小、
+熔丝位的值是否为单字节，以及bootloader编程器不能写入的熔丝位和锁定位。
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+from .avrdude_conf import PartInfo
+from .hexfile import FirmwareImage, HexFormatError, parse_hex
+
+# 支持的存储器，flash/eeprom 的内容为镜像，其余为单字节的值
+IMAGE_MEMORIES = ('flash', 'eeprom')
+BYTE_MEMORIES = ('lfuse', 'hfuse', 'efuse', 'lock')
+MEMORIES = IMAGE_MEMORIES + BYTE_MEMORIES
+
+# 操作 -> avrdude -U 的操作字母
+OPERATIONS = {'write': 'w', 'read': 'r', 'verify': 'v'}
+
+# 通过bootloader烧录的编程器，无法写入熔丝位和锁定位
+BOOTLOADER_PROGRAMMERS = ('arduino',)
+
+# 一个计划最多包含的操作数
+MAX_OPERATIONS = 16
+
+
+class PlanError(ValueError):
+    """编程计划无效"""
+
+
+class PlanOperation:
+    """计划中的一个存储器操作"""
+
+    def __init__(self, memory: str, op: str, image: Optional[FirmwareImage] = None, value: Optional[int] = None):
+        """
+        Args:
+            memory: 存储器名称 (MEMORIES)
+            op: 'write' / 'read' / 'verify'
+            image: flash/eeprom 写入或校验的内容
+            value: 熔丝位/锁定位写入或校验的值
+        """
+        self.memory = memory
+        self.op = op
+        self.image = image
+        self.value = value
+
+    @property
+    def code(self) -> str:
+        """avrdude -U 的操作字母"""
+        return OPERATIONS[self.op]
+
+    def to_dict(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {'memory': self.memory, 'op': self.op}
+        if self.image is not None:
+            info['size'] = self.image.size
+            info['digest'] = self.image.digest()
+        if self.value is not None:
+            info['value'] = f'0x{self.value:02x}'
+        return info
+
+
+class ProgrammingPlan:
+    """按顺序执行的存储器操作"""
+
+    def __init__(self, operations: List[PlanOperation]):
+        self.operations = operations
+
+    @property
+    def memories(self) -> List[str]:
+        return list(dict.fromkeys(operation.memory for operation in self.operations))
+
+    def written(self) -> List[str]:
+        """计划写入的存储器"""
+        return [operation.memory for operation in self.operations if operation.op == 'write']
+
+    def flash_image(self) -> Optional[FirmwareImage]:
+        """写入flash的镜像 (用于烧录历史)，没有时返回None"""
+        for operation in self.operations:
+            if operation.memory == 'flash' and operation.op == 'write':
+                return operation.image
+        return None
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [operation.to_dict() for operation in self.operations]
+
+
+def parse_byte(value: Any) -> int:
+    """熔丝位的值: 整数或 "0xFF" 形式的字符串"""
+    try:
+        number = value if isinstance(value, int) and not isinstance(value, bool) else int(str(value), 0)
+    except ValueError:
+        raise PlanError(f'Invalid byte value: {value!r}')
+    if not 0 <= number <= 0xFF:
+        raise PlanError(f'Byte value out of range: {value!r}')
+    return number
+
+
+def load_image(data: bytes, max_address: Optional[int] = None) -> FirmwareImage:
+    """解析镜像内容 (Intel HEX文本，或从地址0开始的二进制)"""
+    if data.lstrip()[:1] == b':':
+        return parse_hex(data, max_address=max_address)
+    if max_address is not None and len(data) > max_address:
+        raise HexFormatError(f'image of {len(data)} bytes exceeds memory size {max_address}')
+    return FirmwareImage.from_binary(data)
+
+
+def build_plan(specs: Any, part: PartInfo, programmer: str,
+               source: Callable[[Dict[str, Any]], Optional[bytes]]) -> ProgrammingPlan:
+    """
+    检查请求中的操作列表并构造编程计划
+
+    Args:
+        specs: [{'memory': 'flash', 'op': 'write', 'hex': ...}, {'memory': 'lfuse', 'op': 'write', 'value': '0xFF'}, ...]
+        part: 目标MCU
+        programmer: 编程器ID
+        source: 取得 flash/eeprom 操作内容的函数 (由请求中的 hex/sha256/file 字段)，没有内容时返回None
+
+    Raises:
+        PlanError: 计划无效 (消息中包含操作序号)
+    """
+    if not isinstance(specs, list) or not specs:
+        raise PlanError('operations must be a non-empty list')
+    if len(specs) > MAX_OPERATIONS:
+        raise PlanError(f'At most {MAX_OPERATIONS} operations per plan')
+
+    operations: List[PlanOperation] = []
+    written = set()
+    for index, spec in enumerate(specs):
+        try:
+            operations.append(_build_operation(spec, part, programmer, source))
+        except (PlanError, HexFormatError) as e:
+            raise PlanError(f'operations[{index}]: {e}')
+        operation = operations[-1]
+        if operation.op == 'write':
+            if operation.memory in written:
+                raise PlanError(f'operations[{index}]: {operation.memory} is written more than once')
+            written.add(operation.memory)
+    return ProgrammingPlan(operations)
+
+
+def _build_operation(spec: Any, part: PartInfo, programmer: str,
+                     source: Callable[[Dict[str, Any]], Optional[bytes]]) -> PlanOperation:
+    if not isinstance(spec, dict):
+        raise PlanError('operation must be an object')
+    memory = str(spec.get('memory', '')).lower()
+    op = str(spec.get('op', '')).lower()
+    if memory not in MEMORIES:
+        raise PlanError(f"Unknown memory '{memory}' (expected one of {', '.join(MEMORIES)})")
+    if op not in OPERATIONS:
+        raise PlanError(f"Unknown op '{op}' (expected write, read or verify)")
+    layout = part.memories.get(memory)
+    if layout is None and part.layout_known:
+        raise PlanError(f'{part.desc} has no {memory} memory')
+
+    if memory in BYTE_MEMORIES:
+        if op == 'write' and programmer.lower() in BOOTLOADER_PROGRAMMERS:
+            raise PlanError(f"Programmer '{programmer}' (bootloader) cannot write {memory}")
+        if op == 'read':
+            return PlanOperation(memory, op)
+        if 'value' not in spec:
+            raise PlanError(f'{op} {memory} requires a value')
+        return PlanOperation(memory, op, value=parse_byte(spec['value']))
+
+    if op == 'read':
+        return PlanOperation(memory, op)
+    data = source(spec)
+    if data is None:
+        raise PlanError(f'{op} {memory} requires hex, sha256 or file')
+    image = load_image(data, (layout or {}).get('size'))
+    if not image.size:
+        raise PlanError(f'{memory} image is empty')
+    return PlanOperation(memory, op, image=image)
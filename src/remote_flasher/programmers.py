@@ -0,0 +1,643 @@
+"""
+编程器后端模块 - RemoteFlasher API
+将"把镜像写入目标板"这一步抽象为可替换的后端：
+
+- AvrdudeBackend: 启动avrdude子进程 (默认，支持所有编程器)
+- STK500Backend: 通过pyserial直接与Optiboot通信的原生实现，只支持
+  arduino / stk500v1 编程器，省去进程启动、avrdude.conf解析和输出文本解析
+
+后端的 program() 是生成器：烧录过程中产生输出、阶段 (phase) 和进度 (progress) 事件，
+结束时通过 StopIteration.value 返回结果字典。
+program_async() 是供异步服务器使用的异步生成器，最后产生
+{"type": "result", "result": 结果字典} 事件。
+program_plan() 在一次编程器会话中按顺序执行编程计划的全部操作 (见 plan.py)，
+结果字典的 results 为每个操作的结果。
+"""
+
+import asyncio
+import os
+import threading
+import subprocess
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+from .hexfile import FirmwareImage, parse_hex
+from .identity import parse_avrdude_identity
+from .progress import AvrdudeOutputParser, ProgressThrottle, classify_error
+from .plan import IMAGE_MEMORIES, ProgrammingPlan
+from .stk500 import MEMTYPE_EEPROM, MEMTYPE_FLASH, PARM_SW_MAJOR, PARM_SW_MINOR, STK500v1, STK500Error
+
+try:
+    import serial
+except ImportError:  # pyserial未安装时只能使用avrdude
+    serial = None
+
+
+class ProgrammerError(Exception):
+    """编程器操作失败"""
+
+
+@contextmanager
+def anonymous_file(data: bytes = b'', fallback_dir: Optional[str] = None):
+    """
+    供子进程读写的匿名内存文件
+
+    Linux上使用memfd，内容只在内存中，子进程通过 /dev/fd/N 打开 (需要 pass_fds)；
+    不支持memfd时在 fallback_dir (通常为tmpfs) 中创建临时文件。
+
+    Yields:
+        (子进程可打开的路径, 需要传给子进程的文件描述符元组)
+    """
+    if hasattr(os, 'memfd_create'):
+        fd = os.memfd_create('remote-flasher-image')
+        try:
+            os.write(fd, data)
+            yield f'/dev/fd/{fd}', (fd,)
+        finally:
+            os.close(fd)
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.hex', dir=fallback_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        yield path, ()
+    finally:
+        os.unlink(path)
+
+
+def read_anonymous_file(path: str) -> bytes:
+    """读取 anonymous_file 的当前内容 (子进程写入后)"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+async def iterate_in_executor(events: Generator, executor=None):
+    """
+    在线程池中逐步推进同步事件生成器 (异步生成器)
+
+    每次只在推进生成器时占用线程；生成器结束时产生 result 事件。
+    调用者提前停止迭代时关闭生成器 (如结束子进程)。
+    """
+    loop = asyncio.get_running_loop()
+    # 取消等待后线程中的next()可能仍在执行，关闭前需等待其结束
+    lock = threading.Lock()
+
+    def step():
+        with lock:
+            try:
+                return False, next(events)
+            except StopIteration as stop:
+                return True, stop.value
+
+    def close():
+        with lock:
+            events.close()
+
+    try:
+        while True:
+            done, value = await loop.run_in_executor(executor, step)
+            if done:
+                yield {"type": "result", "result": value}
+                return
+            yield value
+    finally:
+        await loop.run_in_executor(executor, close)
+
+
+class ProgrammerBackend:
+    """编程器后端基类"""
+
+    name = 'base'
+    # 支持的编程器类型，None表示全部
+    programmers: Optional[Tuple[str, ...]] = None
+    # 读取设备信息前是否需要由烧录器先复位进入bootloader
+    requires_bootloader = False
+    # 编程计划中支持的存储器，None表示全部
+    plan_memories: Optional[Tuple[str, ...]] = None
+
+    def __init__(self, flasher):
+        self.flasher = flasher
+        self.config = flasher.config
+        self.logger = flasher.logger
+
+    @classmethod
+    def available(cls) -> bool:
+        """运行环境是否支持该后端"""
+        return True
+
+    @classmethod
+    def supports(cls, programmer: str) -> bool:
+        """是否支持该编程器类型"""
+        return cls.programmers is None or programmer in cls.programmers
+
+    def program(self, hex_file: Optional[str], image: FirmwareImage,
+                **kwargs) -> Generator[Dict[str, Any], None, Dict[str, Any]]:
+        """写入flash (目标板已处于bootloader中)，hex_file为None时镜像只在内存中"""
+        raise NotImplementedError
+
+    def program_async(self, hex_file: Optional[str], image: FirmwareImage, **kwargs):
+        """program() 的异步版本 (异步生成器)，默认在线程池中推进 program()"""
+        return iterate_in_executor(self.program(hex_file, image, **kwargs))
+
+    @classmethod
+    def supports_plan(cls, plan: ProgrammingPlan) -> bool:
+        """是否支持编程计划中的全部存储器"""
+        return cls.plan_memories is None or all(memory in cls.plan_memories for memory in plan.memories)
+
+    def program_plan(self, plan: ProgrammingPlan, **kwargs) -> Generator[Dict[str, Any], None, Dict[str, Any]]:
+        """在一次会话中执行编程计划 (目标板已处于bootloader中)"""
+        raise NotImplementedError
+
+    def read_flash(self, **kwargs) -> FirmwareImage:
+        """回读flash (目标板已处于bootloader中)"""
+        raise NotImplementedError
+
+    def device_info(self, **kwargs) -> Dict[str, Any]:
+        """读取设备信息，结果格式与 AVRFlasher.get_device_info 相同"""
+        raise NotImplementedError
+
+
+class AvrdudeBackend(ProgrammerBackend):
+    """avrdude子进程后端"""
+
+    name = 'avrdude'
+
+    def program(self, hex_file, image, **kwargs):
+        if hex_file is None:
+            # 内存中的镜像通过匿名文件交给avrdude，不写入磁盘
+            with anonymous_file(image.to_hex(), self.config.SCRATCH_DIR) as (path, fds):
+                return (yield from self._run(path, fds, **kwargs))
+        return (yield from self._run(hex_file, (), **kwargs))
+
+    def _run(self, hex_file, pass_fds, **kwargs):
+        cmd = self.flasher.build_avrdude_command(hex_file, **kwargs)
+        return (yield from self._execute(cmd, pass_fds))
+
+    def _execute(self, cmd, pass_fds):
+        yield {"type": "info", "message": f"Executing command: {' '.join(cmd)}"}
+
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # 合并stderr到stdout
+            bufsize=0,  # 不缓冲，进度条的每个字符到达即可读取
+            pass_fds=pass_fds
+        )
+        parser = AvrdudeOutputParser(self.config.FLASH_PROGRESS_INTERVAL)
+
+        try:
+            # 按块读取输出，不等待行结束
+            while True:
+                data = process.stdout.read(4096)
+                if not data:
+                    break
+                yield from parser.feed(data)
+            yield from parser.close()
+
+            # 等待进程结束
+            process.wait(timeout=self.config.FLASH_TIMEOUT)
+
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            yield from parser.feed(b"\nERROR: Flash operation timed out\n")
+        finally:
+            # 调用者提前停止迭代 (如流式客户端断开) 时结束avrdude
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+        return self._outcome(process.returncode, parser)
+
+    def program_plan(self, plan, **kwargs):
+        """每个操作对应一个 -U 参数，镜像和读取结果通过匿名文件传递"""
+        with ExitStack() as stack:
+            updates, pass_fds, reads = [], [], {}
+            for index, operation in enumerate(plan.operations):
+                if operation.value is not None:
+                    updates.append(f'{operation.memory}:{operation.code}:0x{operation.value:02x}:m')
+                    continue
+                data = operation.image.to_hex() if operation.image is not None else b''
+                path, fds = stack.enter_context(anonymous_file(data, self.config.SCRATCH_DIR))
+                updates.append(f'{operation.memory}:{operation.code}:{path}:i')
+                pass_fds += fds
+                if operation.op == 'read':
+                    reads[index] = path
+
+            cmd = self.flasher.build_avrdude_command(None, updates=updates, **kwargs)
+            outcome = yield from self._execute(cmd, tuple(pass_fds))
+            if not outcome['success']:
+                outcome['message'] = f"Programming failed with return code {outcome['returncode']}"
+                return outcome
+
+            results = []
+            for index, operation in enumerate(plan.operations):
+                result = {'memory': operation.memory, 'op': operation.op}
+                if index in reads:
+                    image = parse_hex(read_anonymous_file(reads[index]))
+                    if operation.memory in IMAGE_MEMORIES:
+                        result['data'] = image
+                    else:
+                        # 熔丝位/锁定位为地址0的一个字节
+                        result['data'] = image.to_bytes(0xFF, 0, 1)[0] if image.segments else None
+                results.append(result)
+            outcome['message'] = 'Programming completed successfully'
+            outcome['results'] = results
+            return outcome
+
+    async def program_async(self, hex_file, image, **kwargs):
+        """通过asyncio子进程管道读取avrdude输出，不占用线程"""
+        with ExitStack() as stack:
+            pass_fds = ()
+            if hex_file is None:
+                hex_file, pass_fds = stack.enter_context(
+                    anonymous_file(image.to_hex(), self.config.SCRATCH_DIR))
+            cmd = self.flasher.build_avrdude_command(hex_file, **kwargs)
+            yield {"type": "info", "message": f"Executing command: {' '.join(cmd)}"}
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.config.FLASH_TIMEOUT
+            parser = AvrdudeOutputParser(self.config.FLASH_PROGRESS_INTERVAL)
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                pass_fds=pass_fds
+            )
+
+            try:
+                while True:
+                    data = await asyncio.wait_for(process.stdout.read(4096), max(deadline - loop.time(), 0))
+                    if not data:
+                        break
+                    for event in parser.feed(data):
+                        yield event
+                for event in parser.close():
+                    yield event
+                await asyncio.wait_for(process.wait(), max(deadline - loop.time(), 0))
+
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                for event in parser.feed(b"\nERROR: Flash operation timed out\n"):
+                    yield event
+            finally:
+                # 流式客户端断开时结束avrdude
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+
+            yield {"type": "result", "result": self._outcome(process.returncode, parser)}
+
+    @staticmethod
+    def _outcome(returncode: int, parser: AvrdudeOutputParser) -> Dict[str, Any]:
+        summary = parser.summary()
+        # avrdude报告的各阶段耗时，键名与原生后端一致
+        timings = {key: summary.get('timings', {})[phase]
+                   for phase, key in (('writing', 'write'), ('verifying', 'verify'))
+                   if phase in summary.get('timings', {})}
+        if returncode == 0:
+            result = {'success': True, 'message': 'Flash completed successfully', 'timings': timings}
+            if 'bytes_written' in summary:
+                result['bytes_written'] = summary['bytes_written']
+            return result
+        result = {
+            'success': False,
+            'message': f'Flash failed with return code {returncode}',
+            'returncode': returncode,
+            'timings': timings,
+            'error_class': summary.get('error_class', 'unknown')
+        }
+        if 'verify_error' in summary:
+            result['verify_error'] = summary['verify_error']
+        return result
+
+    def read_flash(self, **kwargs):
+        # avrdude将回读结果写入匿名文件，不写入磁盘
+        with anonymous_file(b'', self.config.SCRATCH_DIR) as (path, fds):
+            cmd = self.flasher.build_avrdude_command(path, operation='r', **kwargs)
+            self.logger.info(f"Reading back flash: {' '.join(cmd)}")
+            process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     text=True, timeout=self.config.FLASH_TIMEOUT, pass_fds=fds)
+            if process.returncode != 0:
+                raise ProgrammerError(f'Flash read-back failed with return code {process.returncode}')
+            return parse_hex(read_anonymous_file(path))
+
+    def device_info(self, **kwargs):
+        result = {
+            'success': False,
+            'message': '',
+            'device_signature': '',
+            'output': '',
+            'error': ''
+        }
+
+        try:
+            mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+            programmer = kwargs.get('programmer', self.config.DEFAULT_PROGRAMMER)
+            port = kwargs.get('port', self.config.DEFAULT_PORT)
+            baudrate = kwargs.get('baudrate', self.config.DEFAULT_BAUDRATE)
+
+            cmd = [
+                self.config.AVRDUDE_PATH,
+                '-C', self.config.AVRDUDE_CONF,
+                '-p', mcu,
+                '-c', programmer,
+                '-P', port,
+                '-b', str(baudrate),
+                '-v'
+            ]
+
+            self.logger.info(f"Getting device info: {' '.join(cmd)}")
+
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+
+            try:
+                stdout, stderr = process.communicate(timeout=self.config.DEVICE_INFO_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+
+            result['output'] = stdout
+            result['error'] = stderr
+
+            # 签名与 -p 指定的MCU不符时avrdude失败，但仍会输出读到的签名
+            result['identity'] = parse_avrdude_identity(stderr)
+
+            if process.returncode == 0:
+                result['success'] = True
+                result['message'] = 'Device info retrieved successfully'
+            else:
+                result['message'] = f'Failed to get device info: {stderr}'
+
+            # 提取设备签名
+            for line in stderr.split('\n'):
+                if 'Device signature' in line:
+                    result['device_signature'] = line.strip()
+                    break
+
+        except Exception as e:
+            result['message'] = f'Error getting device info: {str(e)}'
+            self.logger.error(f"Error getting device info: {e}")
+
+        return result
+
+
+class STK500Backend(ProgrammerBackend):
+    """原生STK500v1后端 (Optiboot)"""
+
+    name = 'stk500'
+    programmers = ('arduino', 'stk500v1')
+    requires_bootloader = True
+    plan_memories = IMAGE_MEMORIES
+
+    @classmethod
+    def available(cls) -> bool:
+        return serial is not None
+
+    def _connect(self, **kwargs) -> Tuple[Any, STK500v1, int]:
+        """
+        打开串口并与bootloader同步
+
+        Returns:
+            (串口对象, 协议客户端, 同步尝试次数)
+        """
+        conn = serial.Serial(
+            port=kwargs.get('port', self.config.DEFAULT_PORT),
+            baudrate=int(kwargs.get('baudrate', self.config.DEFAULT_BAUDRATE)),
+            timeout=self.config.STK500_TIMEOUT
+        )
+        try:
+            stk = STK500v1(conn)
+            attempts = stk.sync(self.config.STK500_SYNC_ATTEMPTS, self.config.STK500_SYNC_TIMEOUT)
+            return conn, stk, attempts
+        except Exception:
+            conn.close()
+            raise
+
+    def _check_signature(self, signature: bytes, mcu: str):
+        expected = self.flasher.parts.signature(mcu)
+        if expected and signature.hex() != expected:
+            raise ProgrammerError(
+                f'Device signature 0x{signature.hex()} does not match {mcu} (0x{expected})')
+
+    def _page_size(self, mcu: str) -> int:
+        return self.flasher.get_flash_geometry(mcu)[1] or 128
+
+    def program(self, hex_file, image, **kwargs):
+        mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+        page_size = self._page_size(mcu)
+        pages = list(image.pages(page_size))
+        timings = {}
+        throttle = ProgressThrottle(self.config.FLASH_PROGRESS_INTERVAL)
+        phase_start = time.perf_counter()
+
+        try:
+            conn, stk, attempts = self._connect(**kwargs)
+        except (STK500Error, serial.SerialException) as e:
+            return {'success': False, 'message': f'Flash failed: {e}',
+                    'error_class': classify_error(str(e)) or 'unknown'}
+
+        try:
+            yield from self._start_session(stk, attempts, mcu)
+            timings['sync'] = time.perf_counter() - phase_start
+
+            timings['write'] = yield from self._write_pages(stk, pages, MEMTYPE_FLASH, throttle)
+            yield {"type": "output",
+                   "message": f"{len(pages) * page_size} bytes of flash written ({len(pages)} pages)"}
+
+            timings['verify'] = yield from self._verify_pages(stk, pages, MEMTYPE_FLASH, throttle)
+            yield {"type": "output", "message": f"{len(pages) * page_size} bytes of flash verified"}
+
+            stk.leave_progmode()
+        except (STK500Error, ProgrammerError, serial.SerialException) as e:
+            yield {"type": "output", "message": f"ERROR: {e}"}
+            return {'success': False, 'message': f'Flash failed: {e}', 'timings': timings,
+                    'error_class': classify_error(str(e)) or 'unknown'}
+        finally:
+            conn.close()
+
+        return {
+            'success': True,
+            'message': 'Flash completed successfully',
+            'timings': timings,
+            'pages': len(pages)
+        }
+
+    def program_plan(self, plan, **kwargs):
+        """按顺序写入/校验/读取 flash 和 eeprom (Optiboot不能访问熔丝位和锁定位)"""
+        mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+        timings = {}
+        throttle = ProgressThrottle(self.config.FLASH_PROGRESS_INTERVAL)
+        phase_start = time.perf_counter()
+
+        try:
+            conn, stk, attempts = self._connect(**kwargs)
+        except (STK500Error, serial.SerialException) as e:
+            return {'success': False, 'message': f'Programming failed: {e}',
+                    'error_class': classify_error(str(e)) or 'unknown'}
+
+        results = []
+        try:
+            yield from self._start_session(stk, attempts, mcu)
+            timings['sync'] = time.perf_counter() - phase_start
+
+            for operation in plan.operations:
+                memory = operation.memory
+                memtype = MEMTYPE_FLASH if memory == 'flash' else MEMTYPE_EEPROM
+                size, page_size = self._memory_geometry(mcu, memory)
+                result = {'memory': memory, 'op': operation.op}
+                if operation.op == 'read':
+                    if size is None:
+                        raise ProgrammerError(f'Unknown {memory} size for {mcu}')
+                    data = bytearray()
+                    for address in range(0, size, page_size):
+                        data += stk.read_page(address, page_size, memtype)
+                    yield {"type": "output", "message": f"{size} bytes of {memory} read"}
+                    result['data'] = FirmwareImage([(0, bytes(data))])
+                else:
+                    pages = list(operation.image.pages(page_size))
+                    if operation.op == 'write':
+                        elapsed = yield from self._write_pages(stk, pages, memtype, throttle)
+                        timings[f'{memory}_write'] = elapsed
+                        yield {"type": "output", "message": f"{len(pages) * page_size} bytes of {memory} written"}
+                    elapsed = yield from self._verify_pages(stk, pages, memtype, throttle)
+                    timings[f'{memory}_verify'] = elapsed
+                    yield {"type": "output", "message": f"{len(pages) * page_size} bytes of {memory} verified"}
+                results.append(result)
+
+            stk.leave_progmode()
+        except (STK500Error, ProgrammerError, serial.SerialException) as e:
+            yield {"type": "output", "message": f"ERROR: {e}"}
+            return {'success': False, 'message': f'Programming failed: {e}', 'timings': timings,
+                    'error_class': classify_error(str(e)) or 'unknown'}
+        finally:
+            conn.close()
+
+        return {'success': True, 'message': 'Programming completed successfully',
+                'timings': timings, 'results': results}
+
+    def _start_session(self, stk: STK500v1, attempts: int, mcu: str):
+        """检查签名并进入编程模式"""
+        yield {"type": "output", "message": f"Bootloader in sync after {attempts} attempt(s)"}
+        signature = stk.read_signature()
+        yield {"type": "output", "message": f"Device signature = 0x{signature.hex()}"}
+        self._check_signature(signature, mcu)
+        stk.enter_progmode()
+
+    def _memory_geometry(self, mcu: str, memory: str) -> Tuple[Optional[int], int]:
+        """存储器大小和每次读写的字节数"""
+        if memory == 'flash':
+            return self.flasher.get_flash_geometry(mcu)[0], self._page_size(mcu)
+        part = self.flasher.parts.part(mcu)
+        layout = part.memories.get(memory, {}) if part is not None else {}
+        # eeprom按字节寻址，但地址以字为单位传给bootloader，每次读写偶数个字节
+        return layout.get('size'), max(2, layout.get('page_size') or 4)
+
+    def _write_pages(self, stk: STK500v1, pages: List[Tuple[int, bytes]], memtype: int,
+                     throttle: ProgressThrottle):
+        """写入各页，返回耗时"""
+        phase_start = time.perf_counter()
+        yield {"type": "phase", "phase": "writing", "state": "start"}
+        for done, (address, data) in enumerate(pages, 1):
+            stk.program_page(address, data, memtype)
+            if throttle.allow('writing', final=done == len(pages)):
+                yield self._progress('writing', done, len(pages))
+        elapsed = time.perf_counter() - phase_start
+        yield {"type": "phase", "phase": "writing", "state": "end", "elapsed": elapsed}
+        return elapsed
+
+    def _verify_pages(self, stk: STK500v1, pages: List[Tuple[int, bytes]], memtype: int,
+                      throttle: ProgressThrottle):
+        """回读并比较各页，返回耗时"""
+        phase_start = time.perf_counter()
+        yield {"type": "phase", "phase": "verifying", "state": "start"}
+        for done, (address, data) in enumerate(pages, 1):
+            if stk.read_page(address, len(data), memtype) != data:
+                raise ProgrammerError(f'Verification error at page 0x{address:05x}')
+            if throttle.allow('verifying', final=done == len(pages)):
+                yield self._progress('verifying', done, len(pages))
+        elapsed = time.perf_counter() - phase_start
+        yield {"type": "phase", "phase": "verifying", "state": "end", "elapsed": elapsed}
+        return elapsed
+
+    @staticmethod
+    def _progress(phase: str, done: int, total: int) -> Dict[str, Any]:
+        return {"type": "progress", "phase": phase, "percent": done * 100 // total, "done": done, "total": total}
+
+    def read_flash(self, regions: Optional[List[Tuple[int, int]]] = None, **kwargs):
+        """
+        Args:
+            regions: 要读取的地址范围 [(起始, 结束)]，None表示整个flash
+        """
+        mcu = kwargs.get('mcu', self.config.DEFAULT_MCU)
+        flash_size, _ = self.flasher.get_flash_geometry(mcu)
+        page_size = self._page_size(mcu)
+        if regions is None:
+            if flash_size is None:
+                raise ProgrammerError(f'Unknown flash size for {mcu}')
+            regions = [(0, flash_size)]
+
+        try:
+            conn, stk, _ = self._connect(**kwargs)
+        except (STK500Error, serial.SerialException) as e:
+            raise ProgrammerError(f'Flash read-back failed: {e}')
+        try:
+            segments = []
+            for start, end in regions:
+                # 按页对齐读取
+                start -= start % page_size
+                data = bytearray()
+                for address in range(start, end, page_size):
+                    data += stk.read_page(address, page_size)
+                segments.append((start, data))
+            stk.leave_progmode()
+        except (STK500Error, serial.SerialException) as e:
+            raise ProgrammerError(f'Flash read-back failed: {e}')
+        finally:
+            conn.close()
+        return FirmwareImage(segments)
+
+    def device_info(self, **kwargs):
+        result = {
+            'success': False,
+            'message': '',
+            'device_signature': '',
+            'output': '',
+            'error': ''
+        }
+        try:
+            conn, stk, _ = self._connect(**kwargs)
+            try:
+                signature = stk.read_signature()
+                version = stk.get_parameter(PARM_SW_MAJOR), stk.get_parameter(PARM_SW_MINOR)
+                stk.leave_progmode()
+            finally:
+                conn.close()
+            result['success'] = True
+            result['message'] = 'Device info retrieved successfully'
+            result['device_signature'] = f'Device signature = 0x{signature.hex()}'
+            result['output'] = f"{result['device_signature']}\nFirmware Version: {version[0]}.{version[1]}"
+            # Optiboot不支持读取熔丝位
+            result['identity'] = {'signature': signature.hex(), 'fuses': {}, 'bootloader': '%d.%d' % version}
+        except (STK500Error, serial.SerialException) as e:
+            result['message'] = f'Failed to get device info: {e}'
+            result['error'] = str(e)
+            self.logger.error(f"Error getting device info: {e}")
+        return result
+
+
+PROGRAMMER_BACKENDS = {
+    'avrdude': AvrdudeBackend,
+    'stk500': STK500Backend,
+}
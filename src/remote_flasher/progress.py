@@ -0,0 +1,220 @@
+"""
+烧录进度模块 - RemoteFlasher API
+把编程器输出转为结构化的进度事件：
+
+- AvrdudeOutputParser: 逐块解析avrdude输出 (stdout/stderr合并)，不按行缓冲。
+  管道模式下avrdude先输出 "Writing | "，再逐个输出 '#' (每个2%)，最后输出 " | 100% 0.52s"；
+  终端模式下用 \r 重绘整行。两种进度条都在到达时转为 phase/progress 事件，
+  其余的行转为 output 事件，能识别的错误附带 error_class，校验失败时产生 verify_error 事件
+- ProgressThrottle: 同一阶段的进度事件按最小间隔限速，阶段开始/结束和100%总是发送
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# 错误类别 -> 匹配avrdude输出行的正则 (按顺序匹配第一个)
+ERROR_PATTERNS = (
+    ('port_unavailable', re.compile(r"ser_open\(\)|can't open device|could not open port|Permission denied", re.I)),
+    ('not_in_sync', re.compile(r'not in sync|getsync\(\)', re.I)),
+    ('not_responding', re.compile(r'not responding|did not respond|no response|Timeout waiting', re.I)),
+    ('signature_mismatch', re.compile(r'Expected signature|Invalid device signature|signature .*does not match', re.I)),
+    ('verification', re.compile(r'verification error|mismatch at', re.I)),
+    ('timeout', re.compile(r'timed out', re.I)),
+    ('file_error', re.compile(r"can't open input file|invalid input file|error reading|Invalid file format", re.I)),
+    ('config_error', re.compile(r"Part .* not found|Valid (?:parts|programmers) are|can't open config file|"
+                                r"Can't find programmer id|syntax error", re.I)),
+)
+
+_SEPARATOR = re.compile(rb'([\r\n])')
+_BAR = re.compile(r'^(Reading|Writing|Erasing) \| ([# ]*)(?:\| (\d+)% ([\d.]+)s)?')
+_WRITING = re.compile(r'writing (?:(\w+) \((\d+) bytes\)|(\d+) bytes? (\w+))', re.I)
+_READING = re.compile(r'reading on-chip (\w+) data', re.I)
+_DONE = re.compile(r'(\d+) bytes of (\w+) (written|verified)', re.I)
+_MISMATCH = re.compile(r'mismatch at (?:byte )?0x([0-9a-f]+)', re.I)
+_VALUES = re.compile(r'^\s*0x([0-9a-f]{2}) != 0x([0-9a-f]{2})\s*$', re.I)
+
+# 进度条标题 -> 没有上下文时的阶段名
+_HEADER_PHASES = {'Reading': 'initializing', 'Writing': 'writing', 'Erasing': 'erasing'}
+
+
+def classify_error(line: str) -> Optional[str]:
+    """avrdude输出行的错误类别，不是错误时返回None"""
+    for name, pattern in ERROR_PATTERNS:
+        if pattern.search(line):
+            return name
+    return 'unknown' if 'error' in line.lower() else None
+
+
+class ProgressThrottle:
+    """进度事件限速：同一阶段两次进度事件至少间隔 interval 秒"""
+
+    def __init__(self, interval: float = 0, clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._last: Dict[str, float] = {}
+
+    def allow(self, phase: str, final: bool = False) -> bool:
+        """是否发送该阶段的这次进度 (final为True时总是发送)"""
+        now = self.clock()
+        last = self._last.get(phase)
+        if final or last is None or now - last >= self.interval:
+            self._last[phase] = now
+            return True
+        return False
+
+
+class AvrdudeOutputParser:
+    """avrdude输出的增量解析器"""
+
+    def __init__(self, interval: float = 0, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            interval: 进度事件的最小间隔（秒）
+            clock: 时钟函数 (测试用)
+        """
+        self.throttle = ProgressThrottle(interval, clock)
+        self._line = bytearray()
+        # 当前进度条: 标题、阶段、已发送的百分比和是否已结束
+        self._bar: Optional[Dict[str, Any]] = None
+        # 下一个进度条对应的阶段 (由前面的提示行决定)
+        self._next_phase: Optional[str] = None
+        self._memory_size: Optional[int] = None
+        self._verifying = False
+        self._pending_mismatch: Optional[Dict[str, Any]] = None
+        self.error_class: Optional[str] = None
+        self.verify_error: Optional[Dict[str, Any]] = None
+        # 阶段 -> avrdude报告的耗时（秒）
+        self.timings: Dict[str, float] = {}
+        self.written: Optional[int] = None
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        """解析新到达的输出，返回产生的事件"""
+        events: List[Dict[str, Any]] = []
+        for piece in _SEPARATOR.split(data):
+            if piece == b'\n':
+                self._end_line(events)
+            elif piece == b'\r':
+                # 终端模式的进度条重绘，当前内容已在到达时解析
+                if self._bar is None:
+                    self._end_line(events)
+                self._line.clear()
+            elif piece:
+                self._line += piece
+                self._scan_bar(events)
+        return events
+
+    def close(self) -> List[Dict[str, Any]]:
+        """输出结束：处理最后一行未结束的输出"""
+        events: List[Dict[str, Any]] = []
+        self._end_line(events)
+        self._flush_mismatch(events)
+        return events
+
+    def summary(self) -> Dict[str, Any]:
+        """解析得到的结果信息，合并到后端结果中"""
+        summary: Dict[str, Any] = {}
+        if self.error_class:
+            summary['error_class'] = self.error_class
+        if self.verify_error:
+            summary['verify_error'] = self.verify_error
+        if self.timings:
+            summary['timings'] = dict(self.timings)
+        if self.written is not None:
+            summary['bytes_written'] = self.written
+        return summary
+
+    def _text(self) -> str:
+        return self._line.decode('utf-8', errors='replace')
+
+    def _scan_bar(self, events: List[Dict[str, Any]]):
+        """在进度条输出到达时产生进度事件 (不等待行结束)"""
+        found = _BAR.match(self._text())
+        if not found:
+            return
+        header, hashes, percent, elapsed = found.groups()
+        if self._bar is None or self._bar['header'] != header:
+            self._start_phase(header, events)
+        percent = int(percent) if percent is not None else min(hashes.count('#') * 2, 100)
+        self._progress(percent, events)
+        if elapsed is not None and percent == 100:
+            self._end_phase(float(elapsed), events)
+
+    def _start_phase(self, header: str, events: List[Dict[str, Any]]):
+        phase = self._next_phase or _HEADER_PHASES.get(header, header.lower())
+        self._next_phase = None
+        self._bar = {'header': header, 'phase': phase, 'percent': -1, 'done': False}
+        events.append({"type": "phase", "phase": phase, "state": "start"})
+
+    def _progress(self, percent: int, events: List[Dict[str, Any]]):
+        bar = self._bar
+        if bar['done'] or percent <= bar['percent']:
+            return
+        if not self.throttle.allow(bar['phase'], final=percent == 100):
+            return
+        bar['percent'] = percent
+        event = {"type": "progress", "phase": bar['phase'], "percent": percent}
+        if self._memory_size is not None and bar['phase'] in ('writing', 'verifying', 'reading'):
+            event['bytes'] = self._memory_size * percent // 100
+            event['total'] = self._memory_size
+        events.append(event)
+
+    def _end_phase(self, elapsed: float, events: List[Dict[str, Any]]):
+        bar = self._bar
+        bar['done'] = True
+        self.timings[bar['phase']] = elapsed
+        events.append({"type": "phase", "phase": bar['phase'], "state": "end", "elapsed": elapsed})
+
+    def _end_line(self, events: List[Dict[str, Any]]):
+        text = self._text()
+        self._line.clear()
+        bar, self._bar = self._bar, None
+        if bar is not None:
+            found = _BAR.match(text)
+            if found:
+                # 进度条之后同一行的输出 (如中途出错时的错误信息)
+                text = text[found.end():]
+            if not bar['done']:
+                events.append({"type": "phase", "phase": bar['phase'], "state": "abort",
+                               "percent": max(bar['percent'], 0)})
+        text = text.strip()
+        if text:
+            self._parse_line(text, events)
+
+    def _parse_line(self, text: str, events: List[Dict[str, Any]]):
+        values = _VALUES.match(text)
+        if values and self._pending_mismatch is not None:
+            self._pending_mismatch.update(expected=int(values.group(1), 16), actual=int(values.group(2), 16))
+        self._flush_mismatch(events)
+
+        event: Dict[str, Any] = {"type": "output", "message": text}
+        error_class = classify_error(text)
+        if error_class:
+            event['error_class'] = error_class
+            self.error_class = self.error_class or error_class
+        events.append(event)
+
+        writing = _WRITING.search(text)
+        if writing:
+            self._memory_size = int(writing.group(2) or writing.group(3))
+            self._next_phase = 'writing'
+            self._verifying = False
+        elif 'verifying' in text.lower():
+            self._verifying = True
+            self._next_phase = 'verifying'
+        elif _READING.search(text):
+            self._next_phase = 'verifying' if self._verifying else 'reading'
+        done = _DONE.search(text)
+        if done and done.group(3).lower() == 'written':
+            self.written = int(done.group(1))
+        mismatch = _MISMATCH.search(text)
+        if mismatch:
+            self._pending_mismatch = {"address": int(mismatch.group(1), 16), "message": text}
+
+    def _flush_mismatch(self, events: List[Dict[str, Any]]):
+        """校验失败的地址和随后一行的字节值一起作为 verify_error 事件发送"""
+        if self._pending_mismatch is None:
+            return
+        mismatch, self._pending_mismatch = self._pending_mismatch, None
+        self.verify_error = mismatch
+        events.append(dict(mismatch, type='verify_error'))
@@ -0,0 +1,110 @@
+"""
+烧录重试模块 - RemoteFlasher API
+根据失败类别 (见 progress.ERROR_PATTERNS) 决定是否自动重试以及如何调整参数：
+
+- not_in_sync / unknown: 立即按原参数重试 (通信偶发失步)
+- not_responding / bootloader_timeout / timeout: 延长复位时序 (复位保持和等待bootloader的时间加倍) 后重试
+- verification: 降到 FLASH_RETRY_BAUDRATES 中下一个较低的波特率后重试
+- bad_image / signature_mismatch / file_error / config_error / port_unavailable: 不重试
+
+每个设备 (AVRFlasher实例) 有自己的策略，记住最近一次成功时的调整，
+下一次烧录直接从该调整开始，不必再失败一次。
+"""
+
+import threading
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# 失败类别 -> 重试动作
+RETRY_ACTIONS = {
+    'not_in_sync': 'retry',
+    'unknown': 'retry',
+    'not_responding': 'longer_reset',
+    'bootloader_timeout': 'longer_reset',
+    'timeout': 'longer_reset',
+    'verification': 'lower_baudrate',
+}
+
+
+class RetryPolicy:
+    """单个设备的烧录重试策略"""
+
+    def __init__(self, max_attempts: int = 3, baudrates: Sequence[int] = (), reset_scale: float = 2.0,
+                 max_reset_scale: float = 8.0):
+        """
+        Args:
+            max_attempts: 每次烧录的最大尝试次数 (1表示不重试)
+            baudrates: 校验失败时依次尝试的波特率
+            reset_scale: 每次延长复位时序的倍数
+            max_reset_scale: 复位时序相对配置的最大倍数
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.baudrates = sorted(set(int(b) for b in baudrates), reverse=True)
+        self.reset_scale = reset_scale
+        self.max_reset_scale = max_reset_scale
+        # 最近一次成功时的调整: {'reset_scale': 2.0, 'baudrate': 57600, 'requested_baudrate': 115200}
+        self.tuning: Dict[str, Any] = {}
+        self.successes = 0
+        self.retried_successes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> 'RetryPolicy':
+        return cls(config.FLASH_RETRY_ATTEMPTS, config.FLASH_RETRY_BAUDRATES,
+                   config.FLASH_RETRY_RESET_SCALE, config.FLASH_RETRY_MAX_RESET_SCALE)
+
+    def initial(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """本次烧录开始时的调整 (记住的波特率只用于请求同一波特率的烧录)"""
+        with self._lock:
+            tuning = dict(self.tuning)
+        if 'baudrate' in tuning and tuning.get('requested_baudrate') != params.get('baudrate'):
+            del tuning['baudrate'], tuning['requested_baudrate']
+        return tuning
+
+    @staticmethod
+    def apply(tuning: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        """按调整修改烧录参数"""
+        if 'baudrate' in tuning:
+            return dict(params, baudrate=tuning['baudrate'])
+        return params
+
+    def next(self, error_class: str, tuning: Dict[str, Any],
+             params: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        失败后的下一次尝试
+
+        Returns:
+            (动作, 新的调整)，不应重试时返回None
+        """
+        action = RETRY_ACTIONS.get(error_class)
+        if action == 'longer_reset':
+            scale = tuning.get('reset_scale', 1.0) * self.reset_scale
+            if scale > self.max_reset_scale:
+                return None
+            return action, dict(tuning, reset_scale=scale)
+        if action == 'lower_baudrate':
+            current = int(params.get('baudrate') or 0)
+            lower = [b for b in self.baudrates if b < current]
+            if not lower:
+                return None
+            return action, dict(tuning, baudrate=lower[0],
+                                requested_baudrate=tuning.get('requested_baudrate', current))
+        if action == 'retry':
+            return action, dict(tuning)
+        return None
+
+    def succeeded(self, tuning: Dict[str, Any], retried: bool):
+        """记住成功时的调整"""
+        with self._lock:
+            self.tuning = dict(tuning)
+            self.successes += 1
+            if retried:
+                self.retried_successes += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_attempts': self.max_attempts,
+                'tuning': dict(self.tuning),
+                'successes': self.successes,
+                'retried_successes': self.retried_successes
+            }
@@ -0,0 +1,251 @@
+"""
+串口TCP桥接模块 - RemoteFlasher API
+为已打开的串口会话监听一个TCP端口，原样双向转发字节：
+
+- 串口 -> TCP：从会话的环形缓冲区读取 (与 /serial/read 和订阅者共用同一读取线程)，
+  新数据到达时立即发送；可选的批量发送 (batch_delay/batch_size) 用少量延迟换取更少的TCP包
+- TCP -> 串口：收到即写入，不调用 flush() (等待发送完成会让每次写入都阻塞到数据发完)
+- protocol='rfc2217' 时使用pyserial的RFC 2217实现协商波特率、数据格式和控制线，
+  客户端可以直接打开 rfc2217://host:port；protocol='raw' 时不做任何协商 (nc/socat)
+- 同一时间只允许一个客户端，其他连接被立即关闭
+"""
+
+import logging
+import socket
+import threading
+from typing import Any, Dict, Optional
+
+from .serial_session import SerialSession
+
+PROTOCOLS = ('raw', 'rfc2217')
+
+# Telnet IAC，RFC 2217模式下数据中的该字节需要转义
+IAC = b'\xff'
+# 单次发送/接收的最大字节数
+CHUNK_SIZE = 64 * 1024
+# 空闲时检查调制解调器控制线和客户端状态的间隔（秒）
+IDLE_INTERVAL = 1.0
+
+
+class _ControlLines:
+    """
+    转发给串口对象的代理
+
+    伪终端和部分USB转串口不支持调制解调器控制线，读取时视为无效、设置时忽略，
+    避免RFC 2217协商因此中断
+    """
+
+    _LINES = ('cts', 'dsr', 'ri', 'cd', 'dtr', 'rts', 'break_condition')
+
+    def __init__(self, conn):
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        try:
+            return getattr(self._conn, name)
+        except OSError:
+            if name in self._LINES:
+                return False
+            raise
+
+    def __setattr__(self, name, value):
+        try:
+            setattr(self._conn, name, value)
+        except OSError:
+            if name not in self._LINES:
+                raise
+
+
+class _BridgeClient:
+    """一个已连接的TCP客户端"""
+
+    def __init__(self, sock: socket.socket, peer, cursor: int):
+        self.sock = sock
+        self.peer = f"{peer[0]}:{peer[1]}"
+        # 转发连接建立之后的串口数据
+        self.cursor = cursor
+        self.closed = threading.Event()
+        self._send_lock = threading.Lock()
+
+    def write(self, data: bytes):
+        """发送数据 (RFC 2217应答和串口数据可能来自不同线程)"""
+        with self._send_lock:
+            self.sock.sendall(data)
+
+    def close(self):
+        self.closed.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class SerialBridge:
+    """串口会话的TCP桥接"""
+
+    def __init__(self, session: SerialSession, host: str = '0.0.0.0', port: int = 0,
+                 protocol: str = 'rfc2217', nodelay: bool = True, batch_delay: float = 0,
+                 batch_size: int = 4096, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            session: 已启动的串口会话
+            host / port: 监听地址，端口为0时自动分配
+            protocol: 'rfc2217' 或 'raw'
+            nodelay: 是否禁用Nagle算法 (TCP_NODELAY)
+            batch_delay: 串口数据不足batch_size时最多等待的时间（秒），0表示立即发送
+            batch_size: 批量发送的目标字节数
+        """
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unsupported bridge protocol: {protocol}")
+        if batch_delay < 0 or batch_size <= 0:
+            raise ValueError('batch_delay must be non-negative and batch_size positive')
+        self.session = session
+        self.protocol = protocol
+        self.nodelay = nodelay
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self.logger = logger or logging.getLogger('AVRFlasher.serial')
+
+        self.bytes_to_serial = 0
+        self.bytes_to_client = 0
+        # 客户端发送过慢，数据在环形缓冲区中被覆盖而丢失的字节数
+        self.dropped = 0
+        self.connections = 0
+        self.rejected = 0
+        self.client: Optional[_BridgeClient] = None
+        self._client_lock = threading.Lock()
+
+        self._server = socket.create_server((host, port))
+        self.host, self.port = self._server.getsockname()[:2]
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._accept, name=f'serial-bridge-{self.port}', daemon=True)
+
+    def start(self) -> 'SerialBridge':
+        self._thread.start()
+        self.logger.info(f"Serial bridge for {self.session.port} listening on {self.host}:{self.port} "
+                         f"({self.protocol})")
+        return self
+
+    def info(self) -> Dict[str, Any]:
+        """客户端连接所需的信息"""
+        return {'host': self.host, 'port': self.port, 'protocol': self.protocol,
+                'nodelay': self.nodelay, 'batch_delay': self.batch_delay}
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.info()
+        client = self.client
+        stats.update({
+            'client': client.peer if client else None,
+            'connections': self.connections,
+            'rejected': self.rejected,
+            'bytes_to_serial': self.bytes_to_serial,
+            'bytes_to_client': self.bytes_to_client,
+            'dropped': self.dropped
+        })
+        return stats
+
+    def close(self):
+        """停止监听并断开客户端"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        try:
+            # 唤醒阻塞在accept()中的线程
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+        with self._client_lock:
+            client = self.client
+        if client:
+            client.close()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(IDLE_INTERVAL * 2)
+
+    def _accept(self):
+        while not self._closed.is_set():
+            try:
+                sock, peer = self._server.accept()
+            except OSError:
+                break
+            with self._client_lock:
+                busy = self.client is not None
+                if not busy:
+                    client = self.client = _BridgeClient(sock, peer, self.session.buffer.end)
+                    self.connections += 1
+            if busy:
+                self.rejected += 1
+                self.logger.warning(f"Serial bridge {self.port}: rejected {peer[0]}:{peer[1]}, port in use")
+                sock.close()
+                continue
+            threading.Thread(target=self._serve, args=(client,), daemon=True,
+                             name=f'serial-bridge-{self.port}-client').start()
+
+    def _serve(self, client: _BridgeClient):
+        self.logger.info(f"Serial bridge {self.port}: client {client.peer} connected")
+        manager = None
+        try:
+            # 会话可能已被并发关闭，套接字选项也要在 finally 保护范围内设置
+            if self.nodelay:
+                client.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.protocol == 'rfc2217':
+                from serial.rfc2217 import PortManager
+                # 发送初始的Telnet选项协商
+                manager = PortManager(_ControlLines(self.session.conn), client)
+            sender = threading.Thread(target=self._send_serial_data, args=(client, manager), daemon=True,
+                                      name=f'serial-bridge-{self.port}-send')
+            sender.start()
+            self._receive(client, manager)
+        except Exception as e:
+            if not client.closed.is_set():
+                self.logger.warning(f"Serial bridge {self.port}: client {client.peer} error: {e}")
+        finally:
+            client.close()
+            with self._client_lock:
+                if self.client is client:
+                    self.client = None
+            self.logger.info(f"Serial bridge {self.port}: client {client.peer} disconnected")
+
+    def _receive(self, client: _BridgeClient, manager):
+        """TCP -> 串口"""
+        while not client.closed.is_set():
+            data = client.sock.recv(CHUNK_SIZE)
+            if not data:
+                return
+            if manager is not None and (manager.mode != 0 or IAC in data):
+                # 只有包含Telnet命令时才逐字节解析 (模式0为普通数据)
+                data = b''.join(manager.filter(data))
+            if data:
+                self.session.write(data)
+                self.bytes_to_serial += len(data)
+
+    def _send_serial_data(self, client: _BridgeClient, manager):
+        """串口 -> TCP"""
+        session = self.session
+        buffer = session.buffer
+        cursor = client.cursor
+        try:
+            while not client.closed.is_set():
+                if not session.wait(cursor, IDLE_INTERVAL):
+                    if manager is not None:
+                        manager.check_modem_lines()
+                    continue
+                if self.batch_delay and buffer.end - cursor < self.batch_size and session.is_open:
+                    session.wait(cursor + self.batch_size - 1, self.batch_delay)
+
+                data, cursor, dropped = buffer.read(cursor, CHUNK_SIZE)
+                self.dropped += dropped
+                if not data:
+                    if not session.is_open:
+                        break
+                    continue
+                if manager is not None:
+                    data = data.replace(IAC, IAC + IAC)
+                client.write(data)
+                self.bytes_to_client += len(data)
+        except OSError:
+            pass
+        finally:
+            # 串口关闭或发送失败时断开客户端，接收线程随之退出
+            client.close()
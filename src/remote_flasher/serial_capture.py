@@ -0,0 +1,217 @@
+"""
+串口抓包模块 - RemoteFlasher API
+把串口会话的收发数据追加到磁盘上的抓包文件，按时间范围读取：
+
+- 数据文件：文件头 (魔数、创建时的系统时间和单调时钟) 之后是连续的记录，
+  每条记录为 单调时钟纳秒 (8字节) + 方向 (1字节) + 长度 (4字节) + 数据
+- 索引文件 (.idx)：每写入 index_interval 字节记录一次 (时间, 记录偏移)，
+  查询时二分查找索引，只扫描目标时间之前最多一个间隔的记录头
+- 查询时用mmap映射两个文件，不把整个抓包读入内存；
+  时间范围使用系统时间 (Unix时间戳)，按文件头换算为单调时钟
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+MAGIC = b'RFCAP1\0\0'
+# 魔数、创建时的系统时间 (秒)、创建时的单调时钟 (纳秒)
+HEADER = struct.Struct('<8sdQ')
+# 单调时钟 (纳秒)、方向、数据长度
+RECORD = struct.Struct('<QBI')
+# 时间 (纳秒)、记录在数据文件中的偏移
+INDEX_ENTRY = struct.Struct('<QQ')
+
+RX = 0  # 目标板 -> 主机
+TX = 1  # 主机 -> 目标板
+DIRECTIONS = {RX: 'rx', TX: 'tx'}
+
+# 导出原始抓包时每次发送的最大字节数
+EXPORT_CHUNK_SIZE = 256 * 1024
+
+
+class SerialCapture:
+    """一个串口会话的抓包文件"""
+
+    def __init__(self, path: str, index_interval: int = 64 * 1024):
+        """
+        Args:
+            path: 数据文件路径，索引文件为 path + '.idx'
+            index_interval: 两个索引项之间的最大数据字节数
+        """
+        if index_interval <= 0:
+            raise ValueError('index_interval must be positive')
+        self.path = path
+        self.index_path = path + '.idx'
+        self.index_interval = index_interval
+        self.records = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'wb')
+        self._index = open(self.index_path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, time.time(), time.monotonic_ns()))
+        self._size = HEADER.size
+        # 上一个索引项对应的偏移，None表示下一条记录需要索引
+        self._indexed: Optional[int] = None
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def write(self, direction: int, data: bytes, timestamp_ns: Optional[int] = None):
+        """追加一条记录 (timestamp_ns为单调时钟纳秒，默认为当前时间)"""
+        if not data:
+            return
+        timestamp_ns = time.monotonic_ns() if timestamp_ns is None else timestamp_ns
+        with self._lock:
+            if self.closed:
+                return
+            if self._indexed is None or self._size - self._indexed >= self.index_interval:
+                self._index.write(INDEX_ENTRY.pack(timestamp_ns, self._size))
+                self._indexed = self._size
+            self._file.write(RECORD.pack(timestamp_ns, direction, len(data)))
+            self._file.write(data)
+            self._size += RECORD.size + len(data)
+            self.records += 1
+
+    def flush(self):
+        """写入磁盘缓冲，查询前调用"""
+        with self._lock:
+            if not self.closed:
+                self._file.flush()
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._file.close()
+            self._index.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': self.path, 'bytes': self._size, 'records': self.records, 'closed': self.closed}
+
+    def reader(self) -> 'CaptureReader':
+        self.flush()
+        return CaptureReader(self.path, self.index_path)
+
+    def read(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[float, str, bytes]]:
+        """
+        读取时间范围内的记录
+
+        Args:
+            start / end: Unix时间戳 (秒)，None表示不限
+
+        Yields:
+            (系统时间, 'rx'/'tx', 数据)
+        """
+        with self.reader() as reader:
+            yield from reader.records(start, end)
+
+    def export(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[bytes]:
+        """以抓包文件格式 (文件头 + 连续记录) 导出时间范围内的记录"""
+        with self.reader() as reader:
+            yield from reader.export(start, end)
+
+
+class CaptureReader:
+    """用mmap读取抓包文件 (包括已关闭会话的文件和导出的文件)"""
+
+    def __init__(self, path: str, index_path: Optional[str] = None):
+        """
+        Args:
+            path: 数据文件路径
+            index_path: 索引文件路径，没有索引时从头扫描记录头
+        """
+        self._maps = []
+        self.data = self._map(path)
+        if self.data is None or len(self.data) < HEADER.size or self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'Not a serial capture file: {path}')
+        _, self.wall_time, self.monotonic_ns = HEADER.unpack_from(self.data, 0)
+        self.size = len(self.data)
+        self.index = self._map(index_path) if index_path and os.path.exists(index_path) else None
+        self.index_count = len(self.index) // INDEX_ENTRY.size if self.index is not None else 0
+
+    def _map(self, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def __enter__(self) -> 'CaptureReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def to_monotonic_ns(self, wall_time: float) -> int:
+        return self.monotonic_ns + round((wall_time - self.wall_time) * 1e9)
+
+    def to_wall_time(self, timestamp_ns: int) -> float:
+        return self.wall_time + (timestamp_ns - self.monotonic_ns) / 1e9
+
+    def seek(self, timestamp_ns: int) -> int:
+        """二分查找索引，返回时间不晚于timestamp_ns的最后一个索引项的记录偏移"""
+        low, high = 0, self.index_count
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_ENTRY.unpack_from(self.index, middle * INDEX_ENTRY.size)[0] <= timestamp_ns:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return HEADER.size
+        offset = INDEX_ENTRY.unpack_from(self.index, (low - 1) * INDEX_ENTRY.size)[1]
+        return min(offset, self.size)
+
+    def scan(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[int, int, int, int]]:
+        """
+        逐条读取时间范围内的记录头 (从索引定位的位置开始，超出结束时间即停止)
+
+        Yields:
+            (记录偏移, 单调时钟纳秒, 方向, 数据长度)
+        """
+        start_ns = None if start is None else self.to_monotonic_ns(start)
+        end_ns = None if end is None else self.to_monotonic_ns(end)
+        offset = HEADER.size if start_ns is None else self.seek(start_ns)
+        while offset + RECORD.size <= self.size:
+            timestamp_ns, direction, length = RECORD.unpack_from(self.data, offset)
+            if offset + RECORD.size + length > self.size:
+                break  # 正在写入的记录
+            if end_ns is not None and timestamp_ns > end_ns:
+                break
+            if start_ns is None or timestamp_ns >= start_ns:
+                yield offset, timestamp_ns, direction, length
+            offset += RECORD.size + length
+
+    def records(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[float, str, bytes]]:
+        for offset, timestamp_ns, direction, length in self.scan(start, end):
+            offset += RECORD.size
+            yield (self.to_wall_time(timestamp_ns), DIRECTIONS.get(direction, str(direction)),
+                   self.data[offset:offset + length])
+
+    def export(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[bytes]:
+        yield self.data[:HEADER.size]
+        # 范围内的记录是连续的，按块发送
+        begin = stop = None
+        for offset, _, _, length in self.scan(start, end):
+            if begin is None:
+                begin = offset
+            stop = offset + RECORD.size + length
+            if stop - begin >= EXPORT_CHUNK_SIZE:
+                yield self.data[begin:stop]
+                begin = None
+        if begin is not None:
+            yield self.data[begin:stop]
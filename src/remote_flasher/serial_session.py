@@ -0,0 +1,495 @@
+"""
+串口会话模块 - RemoteFlasher API
+为每个打开的串口启动后台读取线程：
+
+- 读取线程一次读取所有可用字节，写入固定大小的环形缓冲区，
+  串口数据不会因为客户端轮询间隔过长而在内核缓冲区溢出
+- 缓冲区按绝对偏移寻址并索引换行位置，读取时从游标 (since) 开始，
+  耗时只与新数据量有关，不访问串口
+- 缓冲区写满后覆盖最旧的数据，读取结果中的 dropped 表示游标之后被覆盖的字节数
+- 任意数量的订阅者 (SerialSubscriber) 各自维护游标，新数据到达时被唤醒；
+  落后超过 max_lag 的订阅者跳到最近的数据并记录丢弃的字节数
+- 可选的抓包文件 (SerialCapture) 记录带时间戳的收发数据
+- 触发器 (SerialTrigger) 在读取线程中匹配新到达的行
+- 烧录同一串口时会话被暂停 (关闭串口、停止读取线程)，结束后重新打开并继续写入同一缓冲区，
+  中断位置记录在缓冲区中 (gaps)，读取结果和订阅者事件中报告
+"""
+
+import bisect
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .serial_capture import RX, TX
+
+# 读取线程每次等待数据的最长时间（秒），也是关闭会话时的最大延迟
+READ_POLL_TIMEOUT = 0.1
+
+
+def format_sse(payload: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """格式化一条server-sent event (id用于断线重连时的 Last-Event-ID)"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{prefix}data: {json.dumps(payload)}\n\n"
+
+
+class RingBuffer:
+    """按绝对偏移寻址的环形字节缓冲区 (带换行索引)"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError('Ring buffer capacity must be positive')
+        self.capacity = capacity
+        self._data = bytearray(capacity)
+        # 已写入的总字节数，即下一个字节的绝对偏移
+        self.end = 0
+        # 每行结束位置 (换行符之后) 的绝对偏移，_head之前的已被覆盖
+        self._line_ends: List[int] = []
+        self._head = 0
+        # 中断 (会话暂停) 记录，offset为恢复后第一个字节的绝对偏移
+        self.gaps: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def start(self) -> int:
+        """缓冲区中最旧字节的绝对偏移"""
+        return max(0, self.end - self.capacity)
+
+    def append(self, data: bytes):
+        """追加数据，超出容量时覆盖最旧的数据"""
+        if not data:
+            return
+        with self._lock:
+            base = self.end
+            index = data.find(b'\n')
+            while index >= 0:
+                self._line_ends.append(base + index + 1)
+                index = data.find(b'\n', index + 1)
+
+            self.end += len(data)
+            if len(data) > self.capacity:
+                data = data[-self.capacity:]
+            position = (self.end - len(data)) % self.capacity
+            first = min(len(data), self.capacity - position)
+            self._data[position:position + first] = data[:first]
+            self._data[:len(data) - first] = data[first:]
+
+            # 丢弃已被覆盖的行索引，定期压缩列表
+            start = self.start
+            while self._head < len(self._line_ends) and self._line_ends[self._head] <= start:
+                self._head += 1
+            if self._head > 1024 and self._head * 2 > len(self._line_ends):
+                del self._line_ends[:self._head]
+                self._head = 0
+
+    def read(self, since: int, max_bytes: Optional[int] = None) -> Tuple[bytes, int, int]:
+        """
+        读取游标之后的原始字节
+
+        Returns:
+            (数据, 下一次读取的游标, 被覆盖而丢失的字节数)
+        """
+        with self._lock:
+            begin, dropped = self._begin(since)
+            stop = self.end if max_bytes is None else min(self.end, begin + max_bytes)
+            return self._slice(begin, stop), stop, dropped
+
+    def read_lines(self, since: int, max_lines: int = 100) -> Tuple[List[bytes], int, int]:
+        """
+        读取游标之后的完整行 (不含未结束的最后一行)
+
+        Returns:
+            (行列表 (含换行符), 下一次读取的游标, 被覆盖而丢失的字节数)
+        """
+        with self._lock:
+            begin, dropped = self._begin(since)
+            index = bisect.bisect_right(self._line_ends, begin, lo=self._head)
+            lines = []
+            for line_end in self._line_ends[index:index + max_lines]:
+                lines.append(self._slice(begin, line_end))
+                begin = line_end
+            return lines, begin, dropped
+
+    def mark_gap(self, info: Dict[str, Any]):
+        """在当前位置记录一次中断，未结束的行在此处截断"""
+        with self._lock:
+            if self.end and (len(self._line_ends) <= self._head or self._line_ends[-1] != self.end):
+                self._line_ends.append(self.end)
+            start = self.start
+            self.gaps = [gap for gap in self.gaps if gap['offset'] >= start]
+            self.gaps.append(dict(info, offset=self.end))
+
+    def gaps_between(self, begin: int, end: int) -> List[Dict[str, Any]]:
+        """偏移在 [begin, end) 之间的中断"""
+        with self._lock:
+            return [dict(gap) for gap in self.gaps if begin <= gap['offset'] < end]
+
+    def next_line_start(self, offset: int) -> int:
+        """offset处或之后的第一个行首 (没有时返回offset)"""
+        with self._lock:
+            if offset <= self.start:
+                return max(offset, self.start)
+            index = bisect.bisect_left(self._line_ends, offset, lo=self._head)
+            return self._line_ends[index] if index < len(self._line_ends) else offset
+
+    def _begin(self, since: int) -> Tuple[int, int]:
+        since = min(max(since, 0), self.end)
+        start = self.start
+        if since < start:
+            return start, start - since
+        return since, 0
+
+    def _slice(self, begin: int, stop: int) -> bytes:
+        if stop <= begin:
+            return b''
+        first = begin % self.capacity
+        last = first + (stop - begin)
+        if last <= self.capacity:
+            return bytes(self._data[first:last])
+        return bytes(self._data[first:]) + bytes(self._data[:last - self.capacity])
+
+
+class SerialSession:
+    """已打开的串口连接及其后台读取线程"""
+
+    def __init__(self, conn, buffer_size: int, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            conn: 已打开的pyserial串口对象
+            buffer_size: 环形缓冲区大小 (字节)
+        """
+        self.conn = conn
+        self.port = conn.port
+        self.baudrate = conn.baudrate
+        self.buffer = RingBuffer(buffer_size)
+        self.logger = logger or logging.getLogger('AVRFlasher.serial')
+        # 读取线程停止的原因 (串口错误)
+        self.error: Optional[str] = None
+
+        # 未指定since的读取从该游标继续 (兼容只轮询新数据的旧客户端)
+        self._cursor = 0
+        self._cursor_lock = threading.Lock()
+        # 新数据到达或读取线程退出时通知订阅者
+        self._data_ready = threading.Condition()
+        self._listeners: List[Callable[[], None]] = []
+        self.subscribers: List['SerialSubscriber'] = []
+        self.triggers: Dict[str, Any] = {}
+        # TCP桥接 (SerialBridge) 和抓包文件 (SerialCapture)，随会话一起关闭
+        self.bridge = None
+        self.capture = None
+        # 暂停期间 (烧录同一串口) 串口关闭、读取线程停止，会话仍视为打开
+        self.suspended = False
+        self._suspended_at: Optional[Tuple[float, float, str]] = None
+        self._suspend_lock = threading.Lock()
+        self._paused = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'serial-reader-{self.port}', daemon=True)
+
+    def start(self) -> 'SerialSession':
+        self.conn.timeout = READ_POLL_TIMEOUT
+        self._thread.start()
+        return self
+
+    @property
+    def is_open(self) -> bool:
+        # 读取线程退出 (关闭或串口错误) 时设置_stop
+        if self.suspended:
+            return not self._stop.is_set()
+        return not self._stop.is_set() and bool(getattr(self.conn, 'is_open', True))
+
+    def read_lines(self, since: Optional[int] = None, max_lines: int = 100) -> Dict[str, Any]:
+        """
+        读取缓冲区中的完整行
+
+        Args:
+            since: 游标 (上一次结果中的 next)，None表示从上一次未指定游标的读取处继续
+            max_lines: 最多返回的行数
+
+        Returns:
+            {'lines': 去除首尾空白后的非空行, 'next': 下一次读取的游标, 'dropped': 丢失的字节数,
+             'gaps': 读取范围内的中断}
+        """
+        with self._cursor_lock:
+            cursor = self._cursor if since is None else since
+            lines, next_cursor, dropped = self.buffer.read_lines(cursor, max_lines)
+            if since is None:
+                self._cursor = next_cursor
+        decoded = [line.decode('utf-8', errors='ignore').strip() for line in lines]
+        gaps = self.buffer.gaps_between(next_cursor - sum(len(line) for line in lines), next_cursor)
+        return {'lines': [line for line in decoded if line], 'next': next_cursor, 'dropped': dropped,
+                'gaps': gaps}
+
+    def subscribe(self, since: Optional[int] = None, max_lag: Optional[int] = None,
+                  listener: Optional[Callable[[], None]] = None) -> 'SerialSubscriber':
+        """
+        添加订阅者
+
+        Args:
+            since: 起始游标，None表示只接收之后的新数据
+            max_lag: 订阅者最多落后的字节数，None表示只受缓冲区大小限制
+            listener: 新数据到达时在读取线程中调用的回调 (如唤醒事件循环)
+        """
+        subscriber = SerialSubscriber(self, since, max_lag)
+        with self._data_ready:
+            self.subscribers.append(subscriber)
+            if listener is not None:
+                self._listeners.append(listener)
+        subscriber.listener = listener
+        return subscriber
+
+    def unsubscribe(self, subscriber: 'SerialSubscriber'):
+        with self._data_ready:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+            if subscriber.listener in self._listeners:
+                self._listeners.remove(subscriber.listener)
+
+    def add_trigger(self, trigger):
+        """注册触发器，先扫描since之后已缓冲的数据"""
+        with self._data_ready:
+            self.triggers[trigger.id] = trigger
+            self._listeners.append(trigger.feed)
+        trigger.feed()
+        return trigger
+
+    def remove_trigger(self, trigger_id: str):
+        with self._data_ready:
+            trigger = self.triggers.pop(trigger_id, None)
+            if trigger is not None and trigger.feed in self._listeners:
+                self._listeners.remove(trigger.feed)
+        return trigger
+
+    def wait(self, cursor: int, timeout: float) -> bool:
+        """等待游标之后有新数据或会话关闭，超时返回False"""
+        with self._data_ready:
+            return self._data_ready.wait_for(lambda: self.buffer.end > cursor or not self.is_open, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """会话状态"""
+        return {
+            'buffered_bytes': self.buffer.end - self.buffer.start,
+            'total_bytes': self.buffer.end,
+            'buffer_size': self.buffer.capacity,
+            'subscribers': len(self.subscribers),
+            'triggers': len(self.triggers),
+            'suspended': self.suspended,
+            'gaps': len(self.buffer.gaps),
+            'bridge': self.bridge.stats() if self.bridge else None,
+            'capture': self.capture.stats() if self.capture else None,
+            'error': self.error
+        }
+
+    def write(self, data: bytes) -> int:
+        """向串口写入数据 (记录到抓包文件)，暂停期间丢弃"""
+        if self.suspended:
+            return 0
+        written = self.conn.write(data)
+        if self.capture is not None:
+            self.capture.write(TX, data)
+        return written
+
+    def flush(self):
+        if not self.suspended:
+            self.conn.flush()
+
+    def suspend(self, reason: str = 'flash') -> bool:
+        """
+        暂停会话：停止读取线程并关闭串口，让烧录程序独占串口
+
+        缓冲区、订阅者、触发器、TCP桥接和抓包文件保留，等待 resume()
+
+        Returns:
+            是否暂停 (已暂停或已关闭时为False)
+        """
+        with self._suspend_lock:
+            if self.suspended or not self.is_open:
+                return False
+            self.suspended = True
+            self._suspended_at = (time.time(), time.perf_counter(), reason)
+            self._paused.set()
+            # 立即结束正在等待的读取，不必等到读取超时
+            cancel_read = getattr(self.conn, 'cancel_read', None)
+            if cancel_read is not None:
+                try:
+                    cancel_read()
+                except Exception:
+                    pass
+            if self._thread.is_alive() and self._thread is not threading.current_thread():
+                self._thread.join(READ_POLL_TIMEOUT * 10)
+            try:
+                self.conn.close()
+            except Exception as e:
+                self.logger.warning(f"Failed to close serial port {self.port}: {e}")
+        self.logger.info(f"Serial session {self.port} suspended ({reason})")
+        return True
+
+    def resume(self) -> bool:
+        """
+        重新打开串口并恢复读取，在缓冲区中记录中断
+
+        Returns:
+            是否恢复；串口无法重新打开时会话关闭 (error中记录原因)
+        """
+        with self._suspend_lock:
+            if not self.suspended:
+                return False
+            started, perf_started, reason = self._suspended_at
+            self._paused.clear()
+            if not self._stop.is_set():
+                try:
+                    self.conn.open()
+                except Exception as e:
+                    self.error = f'Failed to reopen serial port after {reason}: {e}'
+                    self.logger.error(self.error)
+                    self._stop.set()
+            self.suspended = False
+            if self._stop.is_set():
+                # 暂停期间会话已关闭或无法重新打开
+                self._notify()
+                return False
+            self.buffer.mark_gap({'time': started, 'duration': round(time.perf_counter() - perf_started, 3),
+                                  'reason': reason})
+            self._thread = threading.Thread(target=self._run, name=f'serial-reader-{self.port}', daemon=True)
+            self._thread.start()
+        self.logger.info(f"Serial session {self.port} resumed")
+        self._notify()
+        return True
+
+    def close(self):
+        """停止读取线程和TCP桥接并关闭串口"""
+        if self.bridge is not None:
+            self.bridge.close()
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(READ_POLL_TIMEOUT * 10)
+        elif self.suspended:
+            # 暂停时没有读取线程通知订阅者和触发器
+            self._notify()
+        try:
+            self.conn.close()
+        except Exception as e:
+            self.logger.warning(f"Failed to close serial port {self.port}: {e}")
+        if self.capture is not None:
+            self.capture.close()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set() and not self._paused.is_set():
+                try:
+                    # 先等待第一个字节，再一次读走所有已到达的数据
+                    data = self.conn.read(max(1, self.conn.in_waiting))
+                except Exception as e:
+                    if not self._stop.is_set() and not self._paused.is_set():
+                        self.error = str(e)
+                        self.logger.error(f"Serial reader for {self.port} stopped: {e}")
+                    return
+                if data:
+                    self.buffer.append(data)
+                    if self.capture is not None:
+                        self.capture.write(RX, data)
+                    self._notify()
+        finally:
+            # 暂停时读取线程退出，会话保持打开
+            if not self._paused.is_set():
+                self._stop.set()
+                self._notify()
+
+    def _notify(self):
+        with self._data_ready:
+            self._data_ready.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+
+class SerialSubscriber:
+    """串口数据的一个订阅者 (独立游标和丢弃统计)"""
+
+    def __init__(self, session: SerialSession, since: Optional[int] = None, max_lag: Optional[int] = None):
+        self.session = session
+        self.cursor = session.buffer.end if since is None else since
+        self.max_lag = max_lag
+        # 因缓冲区覆盖或落后过多而跳过的总字节数
+        self.dropped = 0
+        self.lines_sent = 0
+        self.listener: Optional[Callable[[], None]] = None
+        # 上一次poll时缓冲区的结束位置，未结束的行不会反复唤醒订阅者
+        self._seen = self.cursor
+
+    @property
+    def closed(self) -> bool:
+        """会话已关闭且没有未读取的数据"""
+        return not self.session.is_open and self.cursor >= self.session.buffer.end
+
+    def poll(self, max_lines: int = 100) -> List[Dict[str, Any]]:
+        """
+        读取游标之后的新数据 (不阻塞)
+
+        Returns:
+            事件列表：{"type": "dropped", "bytes": n, "total": 累计}、
+            {"type": "lines", "lines": [...], "next": 游标} 和
+            {"type": "gap", "offset": 偏移, "time", "duration", "reason"} (在中断位置前后的行之间)
+        """
+        events = []
+        buffer = self.session.buffer
+        skipped = 0
+        if self.max_lag is not None and buffer.end - self.cursor > self.max_lag:
+            # 落后过多时跳到最近的行首，只发送最新的数据
+            target = buffer.next_line_start(buffer.end - self.max_lag)
+            skipped = target - self.cursor
+            self.cursor = target
+
+        seen = buffer.end
+        lines, next_cursor, dropped = buffer.read_lines(self.cursor, max_lines)
+        # 达到行数上限时还有未读取的完整行，不等待新数据
+        self._seen = next_cursor if len(lines) == max_lines else seen
+        if not self.session.is_open and next_cursor == self.cursor and buffer.end > next_cursor:
+            # 会话已关闭，发送最后一行未结束的数据
+            data, next_cursor, dropped = buffer.read(self.cursor)
+            lines = [data]
+        skipped += dropped
+        if skipped:
+            self.dropped += skipped
+            events.append({"type": "dropped", "bytes": skipped, "total": self.dropped})
+
+        self.cursor = next_cursor
+        position = next_cursor - sum(len(line) for line in lines)
+        # 中断位置总是行首 (mark_gap截断未结束的行)，按位置把行分成多个事件
+        gaps = buffer.gaps_between(position, next_cursor)
+        batch = []
+        for line in lines:
+            while gaps and gaps[0]['offset'] <= position:
+                self._append_lines(events, batch, position)
+                events.append(dict(gaps.pop(0), type='gap'))
+                batch = []
+            batch.append(line.decode('utf-8', errors='replace').rstrip('\r\n'))
+            position += len(line)
+        self._append_lines(events, batch, next_cursor)
+        return events
+
+    def _append_lines(self, events: List[Dict[str, Any]], lines: List[str], next_cursor: int):
+        if lines:
+            self.lines_sent += len(lines)
+            events.append({"type": "lines", "lines": lines, "next": next_cursor})
+
+    def has_new_data(self) -> bool:
+        """上一次poll之后是否有新数据 (或会话已关闭)"""
+        return self.session.buffer.end > self._seen or not self.session.is_open
+
+    def wait(self, timeout: float) -> bool:
+        """等待新数据，超时返回False"""
+        return self.session.wait(self._seen, timeout)
+
+    def opened_message(self) -> str:
+        """订阅开始时发送的事件"""
+        return format_sse({"type": "subscribed", "port": self.session.port,
+                           "baudrate": self.session.baudrate, "next": self.cursor})
+
+    def messages(self, max_lines: int = 100) -> List[str]:
+        """poll() 的结果格式化为server-sent events，会话关闭时附加 closed 事件"""
+        messages = [format_sse(event, event.get('next')) for event in self.poll(max_lines)]
+        if self.closed:
+            messages.append(format_sse({"type": "closed", "error": self.session.error,
+                                        "dropped": self.dropped}))
+        return messages
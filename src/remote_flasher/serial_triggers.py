@@ -0,0 +1,256 @@
+"""
+串口触发器模块 - RemoteFlasher API
+在服务器端匹配串口输出，客户端只需等待第一个匹配，不必轮询 /serial/read 再自己查找：
+
+- 所有字面量合并为一棵前缀树并生成一个无回溯分支的正则 (公共前缀只比较一次)，
+  与所有正则表达式组合为一个带命名分组的模式，由re模块在C代码中一次扫描整块新数据
+- 读取线程收到数据后推进每个触发器的游标，只扫描新到达的完整行，每个字节只扫描一次
+- 正则表达式按行匹配 (MULTILINE，^/$ 匹配行首行尾，\r\n 结尾的行同样适用)，标志只能使用局部形式如 (?i:...)
+"""
+
+import re
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+LITERAL_GROUP = 'literal'
+
+
+def literal_pattern(literals: Sequence[bytes]) -> bytes:
+    """
+    把字面量集合编译为等价的正则 (按前缀树展开)
+
+    例如 [b'boot', b'booted', b'bad'] -> b(?:oot(?:ed)?|ad)
+    """
+    trie: Dict[Any, Any] = {}
+    for literal in literals:
+        node = trie
+        for byte in literal:
+            node = node.setdefault(byte, {})
+        node[None] = True
+
+    def build(node) -> bytes:
+        children = sorted(key for key in node if key is not None)
+        # 没有后续字节的分支合并为字符类
+        leaves = [key for key in children if list(node[key]) == [None]]
+        branches = [re.escape(bytes([key])) + build(node[key]) for key in children if key not in leaves]
+        if len(leaves) == 1:
+            branches.append(re.escape(bytes(leaves)))
+        elif leaves:
+            branches.append(b'[' + b''.join(re.escape(bytes([key])) for key in leaves) + b']')
+        if not branches:
+            return b''
+        body = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+        if None in node:
+            # 当前位置已经是一个完整的字面量，较长的字面量优先
+            return (body if len(branches) > 1 else b'(?:' + body + b')') + b'?'
+        return body
+
+    return build(trie)
+
+
+_OCTAL_DIGITS = b'01234567'
+# re 只能用最多两位数字引用分组
+_MAX_GROUP_REFERENCE = 99
+_CONDITIONAL_GROUP = re.compile(rb'\(\?\((\d+)\)')
+
+
+def shift_group_references(source: bytes, offset: int) -> bytes:
+    """
+    把正则中按编号的反向引用 (\\N) 和条件分组 (?(N)...) 整体后移offset
+
+    组合模式时每个正则外面都包了一层命名分组，并排在其他模式之后，
+    原来的分组编号因此改变，命名引用 (?P=name) 不受影响
+    """
+    out = bytearray()
+    i, in_class = 0, False
+    while i < len(source):
+        char = source[i:i + 1]
+        if char == b'\\':
+            digits = source[i + 1:i + 4]
+            if in_class or not digits[:1].isdigit() or digits[:1] == b'0':
+                out += source[i:i + 2]
+                i += 2
+                continue
+            if len(digits) == 3 and all(d in _OCTAL_DIGITS for d in digits):
+                # 三位八进制转义，不是分组引用
+                out += source[i:i + 4]
+                i += 4
+                continue
+            size = 2 if digits[1:2].isdigit() else 1
+            out += b'(?:\\%d)' % _shifted_group(int(digits[:size]), offset)
+            i += 1 + size
+        elif in_class:
+            out += char
+            i += 1
+            if char == b']':
+                in_class = False
+        elif char == b'[':
+            # 紧跟在 [ 或 [^ 之后的 ] 是字符本身
+            end = i + 1
+            if source[end:end + 1] == b'^':
+                end += 1
+            if source[end:end + 1] == b']':
+                end += 1
+            out += source[i:end]
+            i, in_class = end, True
+        else:
+            conditional = _CONDITIONAL_GROUP.match(source, i) if char == b'(' else None
+            if conditional:
+                out += b'(?(%d)' % _shifted_group(int(conditional.group(1)), offset)
+                i = conditional.end()
+            else:
+                out += char
+                i += 1
+    return bytes(out)
+
+
+def _shifted_group(group: int, offset: int) -> int:
+    if group + offset > _MAX_GROUP_REFERENCE:
+        raise ValueError(f'Backreference \\{group} cannot be combined with other patterns '
+                         f'(more than {_MAX_GROUP_REFERENCE} groups), use a named group instead')
+    return group + offset
+
+
+def compile_patterns(literals: Sequence[str] = (), regexes: Sequence[str] = (),
+                     ignore_case: bool = False) -> 're.Pattern':
+    """
+    组合字面量和正则表达式
+
+    Raises:
+        ValueError: 没有模式或正则表达式无效
+    """
+    literals = [literal.encode('utf-8') for literal in literals if literal]
+    if not literals and not regexes:
+        raise ValueError('At least one literal or regex is required')
+    parts = []
+    # 组合模式中已经占用的分组数
+    groups = 0
+    if literals:
+        parts.append(b'(?P<%s>%s)' % (LITERAL_GROUP.encode(), literal_pattern(literals)))
+        groups += 1
+    for index, regex in enumerate(regexes):
+        source = regex.encode('utf-8')
+        try:
+            compiled = re.compile(source)
+        except re.error as e:
+            raise ValueError(f'Invalid regex {regex!r}: {e}')
+        # 外层的 rN 分组也占一个编号
+        parts.append(b'(?P<r%d>%s)' % (index, shift_group_references(source, groups + 1)))
+        groups += 1 + compiled.groups
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    try:
+        return re.compile(b'|'.join(parts), flags)
+    except re.error as e:
+        raise ValueError(f'Invalid pattern combination: {e}')
+
+
+class SerialTrigger:
+    """串口会话上的一组模式，记录游标之后的第一个匹配"""
+
+    def __init__(self, session, literals: Sequence[str] = (), regexes: Sequence[str] = (),
+                 ignore_case: bool = False, since: Optional[int] = None):
+        """
+        Args:
+            session: 串口会话
+            literals / regexes: 字面量和正则表达式
+            ignore_case: 是否忽略大小写
+            since: 起始游标，None表示只匹配之后的新数据
+        """
+        self.id = uuid.uuid4().hex
+        self.session = session
+        self.literals = list(literals)
+        self.regexes = list(regexes)
+        self.ignore_case = ignore_case
+        self._pattern = compile_patterns(self.literals, self.regexes, ignore_case)
+        # 匹配的文本 -> 字面量 (忽略大小写时匹配的文本可能与字面量不同)
+        self._literal_names = {self._literal_key(literal.encode('utf-8')): literal for literal in self.literals}
+        self.cursor = session.buffer.end if since is None else max(0, since)
+        self.created_at = time.time()
+        self.match: Optional[Dict[str, Any]] = None
+        # 扫描前已被缓冲区覆盖的字节数
+        self.dropped = 0
+        self.closed = False
+        self._done = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        """已匹配或会话已关闭"""
+        return self._done.is_set()
+
+    def feed(self):
+        """扫描游标之后的完整行 (由读取线程在新数据到达时调用)"""
+        with self._lock:
+            if self._done.is_set():
+                return
+            # 先检查会话状态：关闭前到达的数据一定能在这次读取中看到
+            session_open = self.session.is_open
+            data, end, dropped = self.session.buffer.read(self.cursor)
+            self.dropped += dropped
+            begin = end - len(data)
+            if session_open:
+                # 只扫描完整的行，未结束的行等到换行符到达
+                data = data[:data.rfind(b'\n') + 1]
+            # \r\n 换为等长的 \n\n，$ 可以匹配Arduino println() 输出的行尾，偏移不变
+            found = self._pattern.search(data.replace(b'\r\n', b'\n\n')) if data else None
+            if found:
+                self._record(found, data, begin)
+            else:
+                self.cursor = begin + len(data)
+                if session_open:
+                    return
+                self.closed = True
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _literal_key(self, text: bytes) -> bytes:
+        return text.lower() if self.ignore_case else text
+
+    def _record(self, found, data: bytes, begin: int):
+        line_start = data.rfind(b'\n', 0, found.start()) + 1
+        line_end = data.find(b'\n', found.start())
+        line_end = len(data) if line_end < 0 else line_end + 1
+        name = found.lastgroup
+        text = data[found.start(name):found.end(name)]
+        self.cursor = begin + line_end
+        self.match = {
+            'pattern': self._literal_names.get(self._literal_key(text)) if name == LITERAL_GROUP
+            else self.regexes[int(name[1:])],
+            'kind': 'literal' if name == LITERAL_GROUP else 'regex',
+            'text': text.decode('utf-8', errors='replace'),
+            'line': data[line_start:line_end].decode('utf-8', errors='replace').rstrip('\r\n'),
+            'offset': begin + line_start,
+            'next': self.cursor,
+            'time': time.time()
+        }
+
+    def on_done(self, callback: Callable[[], None]):
+        """匹配或会话关闭时调用callback (已结束时立即调用)"""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待匹配或会话关闭，超时返回False"""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trigger_id': self.id,
+            'literals': self.literals,
+            'regexes': self.regexes,
+            'ignore_case': self.ignore_case,
+            'matched': self.match is not None,
+            'match': self.match,
+            'closed': self.closed,
+            'cursor': self.cursor,
+            'dropped': self.dropped,
+            'created_at': self.created_at
+        }
@@ -0,0 +1,302 @@
+"""
+Bootloader模拟器 - RemoteFlasher API
+在伪终端 (pty) 上模拟Optiboot的STK500v1应答，用于在没有硬件的情况下
+端到端测试和评测完整的 复位-烧录-复位 流程。客户端 (avrdude或原生后端)
+打开 port 路径即可。
+
+- 可配置签名、flash大小、页大小
+- 按波特率 (或每字节延迟) 模拟串口传输时间，按页模拟flash写入时间
+- 可连接 FakeGPIOBackend 的复位引脚：拉低时目标板保持复位，释放后
+  bootloader在 boot_delay 后开始应答，bootloader_timeout 内没有收到命令
+  则启动应用程序 (停止应答)，与Optiboot的看门狗行为一致
+- 故障注入：同步丢失 (sync_loss_after 条命令后停止应答)、错误签名
+- 可选的应用程序启动输出 (banner)：bootloader超时或退出编程模式后输出，用于测试等待启动
+"""
+
+import os
+import select
+import threading
+import time
+import tty
+from typing import Optional
+
+from .stk500 import (
+    CRC_EOP, STK_GET_PARAMETER, STK_SET_DEVICE, STK_SET_DEVICE_EXT,
+    STK_LEAVE_PROGMODE, STK_LOAD_ADDRESS, STK_UNIVERSAL,
+    STK_PROG_PAGE, STK_READ_PAGE, STK_READ_SIGN, STK_INSYNC, STK_OK, MEMTYPE_FLASH
+)
+
+# 命令固定参数长度 (不含结尾的CRC_EOP)；页读写命令的长度取决于头部
+_ARGUMENT_SIZES = {
+    STK_GET_PARAMETER: 1,
+    STK_SET_DEVICE: 20,
+    STK_SET_DEVICE_EXT: 5,
+    STK_LOAD_ADDRESS: 2,
+    STK_UNIVERSAL: 4,
+    STK_READ_PAGE: 3,
+}
+
+# Optiboot对 GET_PARAMETER 的应答
+_PARAMETERS = {0x81: 8, 0x82: 0}
+
+# bad_signature 故障时返回的签名 (接线错误时avrdude读到的值)
+BAD_SIGNATURE = b'\x00\x00\x00'
+
+
+class OptibootSimulator:
+    """Optiboot bootloader模拟器"""
+
+    def __init__(self, signature: bytes = b'\x1e\x95\x0f', flash_size: int = 32768,
+                 page_size: int = 128, baudrate: Optional[int] = None,
+                 byte_delay: Optional[float] = None, page_write_time: float = 0.0,
+                 boot_delay: float = 0.0, bootloader_timeout: Optional[float] = 1.0,
+                 sync_loss_after: Optional[int] = None, bad_signature: bool = False,
+                 banner: Optional[bytes] = None):
+        """
+        Args:
+            signature: 器件签名
+            flash_size: flash大小 (字节)
+            page_size: 页大小 (字节)
+            baudrate: 模拟的串口波特率 (每字节10位)，None表示不限速
+            byte_delay: 每字节传输时间 (秒)，指定时优先于baudrate
+            page_write_time: 每页擦写时间 (秒)，ATmega328P约为4.5ms
+            boot_delay: 释放复位后bootloader开始应答的延迟 (秒)
+            bootloader_timeout: 没有命令时bootloader启动应用程序的时间 (秒)，None表示不超时
+            sync_loss_after: 每次复位后处理该数量的命令后停止应答 (故障注入)
+            bad_signature: 读取签名时返回 BAD_SIGNATURE (故障注入)
+            banner: 连接复位引脚时应用程序每次启动输出的数据
+        """
+        self.signature = bytes(signature)
+        self.flash_size = flash_size
+        self.page_size = page_size
+        if byte_delay is None:
+            byte_delay = 10.0 / baudrate if baudrate else 0.0
+        self.byte_delay = byte_delay
+        self.page_write_time = page_write_time
+        self.boot_delay = boot_delay
+        self.bootloader_timeout = bootloader_timeout
+        self.sync_loss_after = sync_loss_after
+        self.bad_signature = bad_signature
+        self.banner = banner
+
+        self.flash = bytearray(b'\xff') * flash_size
+        self.eeprom = bytearray(b'\xff') * 1024
+        self.address = 0
+        self.extended = 0
+        self.pages_written = 0
+        self.resets = 0
+        self.commands = 0
+
+        # 没有连接复位引脚时bootloader始终应答
+        self.reset_pin = None
+        self._held_in_reset = False
+        self._active = True
+        self._ready_at = 0.0
+        self._deadline = None
+        self._busy_time = 0.0
+        # 应用程序已启动，等待输出banner
+        self._banner_due = False
+        self._lock = threading.Lock()
+
+        self._input = bytearray()
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._stop = None
+        # 复位后唤醒服务线程，按bootloader超时时间输出banner
+        self._wake = None
+        self.port = None
+
+    @property
+    def in_bootloader(self) -> bool:
+        """bootloader当前是否在应答"""
+        with self._lock:
+            return self._bootloader_ready(time.perf_counter())
+
+    def attach_reset(self, gpio, pin: int):
+        """
+        连接复位引脚 (FakeGPIOBackend)
+
+        连接后目标板初始运行应用程序，只有复位之后bootloader才会应答
+        """
+        self.reset_pin = pin
+        with self._lock:
+            self._active = False
+            self._held_in_reset = gpio.states.get(pin, 1) == 0
+        gpio.listeners.append(self._on_reset_line)
+
+    def _on_reset_line(self, pin: int, value: int):
+        if pin != self.reset_pin:
+            return
+        with self._lock:
+            if not value:
+                # 复位期间不处理任何输入
+                self._held_in_reset = True
+                self._active = False
+                self._input.clear()
+            elif self._held_in_reset:
+                self._held_in_reset = False
+                self._boot()
+
+    def reset(self):
+        """产生一次复位脉冲，bootloader重新启动"""
+        with self._lock:
+            self._held_in_reset = False
+            self._boot()
+
+    def _boot(self):
+        now = time.perf_counter()
+        self.address = 0
+        self.extended = 0
+        self.resets += 1
+        self.commands = 0
+        self._input.clear()
+        self._active = True
+        self._ready_at = now + self.boot_delay
+        self._deadline = self._ready_at + self.bootloader_timeout if self.bootloader_timeout is not None else None
+        if self._wake is not None:
+            os.write(self._wake[1], b'x')
+
+    def _bootloader_ready(self, now: float) -> bool:
+        if not self._active or self._held_in_reset or now < self._ready_at:
+            return False
+        if self.reset_pin is not None and self._deadline is not None and now > self._deadline:
+            # 看门狗超时，启动应用程序
+            self._active = False
+            self._banner_due = self.banner is not None
+            return False
+        return True
+
+    def feed(self, data: bytes) -> bytes:
+        """处理收到的字节，返回bootloader的应答"""
+        with self._lock:
+            now = time.perf_counter()
+            if not self._bootloader_ready(now):
+                return b''
+            self._input += data
+            output = bytearray()
+            while self._input and self._active:
+                size = self._command_size()
+                if size is None or len(self._input) < size:
+                    break
+                command = bytes(self._input[:size])
+                del self._input[:size]
+                if command[-1] != CRC_EOP:
+                    # Optiboot收到错误的帧尾时通过看门狗复位，丢弃所有未处理数据
+                    self._input.clear()
+                    self._lose_sync()
+                    break
+                if self.sync_loss_after is not None and self.commands >= self.sync_loss_after:
+                    self._lose_sync()
+                    break
+                self.commands += 1
+                output += self._execute(command[:-1])
+                # 每收到一个字符Optiboot都会喂狗
+                if self._deadline is not None:
+                    self._deadline = now + self.bootloader_timeout
+            return bytes(output)
+
+    def _lose_sync(self):
+        self._input.clear()
+        self._active = False
+
+    def _command_size(self) -> Optional[int]:
+        cmd = self._input[0]
+        if cmd == STK_PROG_PAGE:
+            if len(self._input) < 3:
+                return None
+            return 4 + ((self._input[1] << 8) | self._input[2]) + 1
+        return 1 + _ARGUMENT_SIZES.get(cmd, 0) + 1
+
+    def _execute(self, command: bytes) -> bytes:
+        cmd, args = command[0], command[1:]
+        reply = b''
+        if cmd == STK_GET_PARAMETER:
+            reply = bytes([_PARAMETERS.get(args[0], 0x03)])
+        elif cmd == STK_LOAD_ADDRESS:
+            self.address = (self.extended << 17) | (((args[1] << 8) | args[0]) << 1)
+        elif cmd == STK_UNIVERSAL:
+            if args[0] == 0x4D:
+                self.extended = args[2]
+            reply = b'\x00'
+        elif cmd == STK_PROG_PAGE:
+            data = args[3:]
+            memory = self.flash if args[2] == MEMTYPE_FLASH else self.eeprom
+            memory[self.address:self.address + len(data)] = data
+            self.pages_written += 1
+            self._busy_time += self.page_write_time
+        elif cmd == STK_READ_PAGE:
+            size = (args[0] << 8) | args[1]
+            memory = self.flash if args[2] == MEMTYPE_FLASH else self.eeprom
+            reply = bytes(memory[self.address:self.address + size])
+        elif cmd == STK_READ_SIGN:
+            reply = BAD_SIGNATURE if self.bad_signature else self.signature
+        elif cmd == STK_LEAVE_PROGMODE and self.reset_pin is not None:
+            # Optiboot将看门狗设为最短超时，随后启动应用程序
+            self._active = False
+            self._banner_due = self.banner is not None
+        # GET_SYNC / SET_DEVICE / ENTER_PROGMODE 以及未知命令只回复 INSYNC/OK
+        return bytes([STK_INSYNC]) + reply + bytes([STK_OK])
+
+    def start(self) -> str:
+        """在伪终端上启动模拟器，返回客户端使用的串口路径"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop = os.pipe()
+        self._wake = os.pipe()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self.port
+
+    def _serve(self):
+        while True:
+            readable, _, _ = select.select([self._master, self._stop[0], self._wake[0]], [], [],
+                                           self._banner_timeout())
+            if self._stop[0] in readable:
+                return
+            if self._wake[0] in readable:
+                os.read(self._wake[0], 4096)
+            if self._master in readable:
+                try:
+                    data = os.read(self._master, 4096)
+                except OSError:
+                    return
+                reply = self.feed(data)
+                # 模拟串口传输和flash擦写时间
+                delay = (len(data) + len(reply)) * self.byte_delay + self._busy_time
+                self._busy_time = 0.0
+                if delay:
+                    time.sleep(delay)
+                if reply:
+                    os.write(self._master, reply)
+            with self._lock:
+                # 检查看门狗超时
+                self._bootloader_ready(time.perf_counter())
+                due, self._banner_due = self._banner_due, False
+            if due:
+                os.write(self._master, self.banner)
+
+    def _banner_timeout(self) -> Optional[float]:
+        """距离bootloader超时 (应用程序启动) 的时间，没有banner或bootloader未运行时为None"""
+        with self._lock:
+            if self.banner is None or self.reset_pin is None or not self._active or self._deadline is None:
+                return None
+            return max(0.0, self._deadline - time.perf_counter())
+
+    def stop(self):
+        """停止模拟器并关闭伪终端"""
+        if self._thread is None:
+            return
+        os.write(self._stop[1], b'x')
+        self._thread.join()
+        for fd in (self._master, self._slave) + self._stop + self._wake:
+            os.close(fd)
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,136 @@
+"""
+STK500v1协议模块 - RemoteFlasher API
+实现Optiboot (avrdude的 arduino / stk500v1 编程器) 使用的STK500v1子集：
+同步、读取签名、按页写入和读取flash。
+
+协议为严格的一问一答：每条命令以 CRC_EOP 结尾，bootloader先回复
+STK_INSYNC，返回数据 (如有)，最后回复 STK_OK。
+"""
+
+from typing import Optional
+
+# 命令
+STK_GET_SYNC = 0x30
+STK_GET_PARAMETER = 0x41
+STK_SET_DEVICE = 0x42
+STK_SET_DEVICE_EXT = 0x45
+STK_ENTER_PROGMODE = 0x50
+STK_LEAVE_PROGMODE = 0x51
+STK_LOAD_ADDRESS = 0x55
+STK_UNIVERSAL = 0x56
+STK_PROG_PAGE = 0x64
+STK_READ_PAGE = 0x74
+STK_READ_SIGN = 0x75
+
+# 应答
+STK_OK = 0x10
+STK_FAILED = 0x11
+STK_INSYNC = 0x14
+STK_NOSYNC = 0x15
+CRC_EOP = 0x20
+
+# GET_PARAMETER 参数: 固件 (bootloader) 版本
+PARM_SW_MAJOR = 0x81
+PARM_SW_MINOR = 0x82
+
+# 存储器类型
+MEMTYPE_FLASH = ord('F')
+MEMTYPE_EEPROM = ord('E')
+
+# 超过128KB的flash需要通过 Load Extended Address 指令选择64K字的段
+_UNIVERSAL_LOAD_EXTENDED_ADDRESS = 0x4D
+
+
+class STK500Error(Exception):
+    """与bootloader通信失败"""
+
+
+class STK500v1:
+    """
+    STK500v1协议客户端
+
+    conn 为任何提供 read(n)/write(data)/reset_input_buffer() 和可写
+    timeout 属性的对象 (pyserial的Serial或模拟串口)。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._extended = 0
+
+    def _read(self, size: int) -> bytes:
+        data = self.conn.read(size)
+        if len(data) < size:
+            raise STK500Error(f'Timeout waiting for bootloader ({len(data)}/{size} bytes)')
+        return data
+
+    def command(self, payload: bytes, response_size: int = 0) -> bytes:
+        """发送命令并返回应答数据 (不含 INSYNC/OK)"""
+        self.conn.write(payload + bytes([CRC_EOP]))
+        if self._read(1)[0] != STK_INSYNC:
+            raise STK500Error(f'Not in sync (command 0x{payload[0]:02x})')
+        response = self._read(response_size + 1)
+        if response[-1] != STK_OK:
+            raise STK500Error(f'Command 0x{payload[0]:02x} failed (0x{response[-1]:02x})')
+        return response[:-1]
+
+    def sync(self, attempts: int = 10, timeout: Optional[float] = None) -> int:
+        """
+        与bootloader同步
+
+        Args:
+            attempts: 最大尝试次数
+            timeout: 每次尝试等待应答的时间，None表示使用连接的超时时间
+
+        Returns:
+            成功同步时的尝试次数
+        """
+        previous = self.conn.timeout
+        if timeout is not None:
+            self.conn.timeout = timeout
+        try:
+            for attempt in range(1, attempts + 1):
+                self.conn.reset_input_buffer()
+                self.conn.write(bytes([STK_GET_SYNC, CRC_EOP]))
+                if self.conn.read(2) == bytes([STK_INSYNC, STK_OK]):
+                    # bootloader复位后扩展地址为0
+                    self._extended = 0
+                    return attempt
+        finally:
+            self.conn.timeout = previous
+        raise STK500Error(f'Bootloader not responding after {attempts} attempts')
+
+    def get_parameter(self, parameter: int) -> int:
+        """读取参数值 (如 PARM_SW_MAJOR)"""
+        return self.command(bytes([STK_GET_PARAMETER, parameter]), 1)[0]
+
+    def read_signature(self) -> bytes:
+        """读取3字节器件签名"""
+        return self.command(bytes([STK_READ_SIGN]), 3)
+
+    def enter_progmode(self):
+        """进入编程模式"""
+        self.command(bytes([STK_ENTER_PROGMODE]))
+
+    def leave_progmode(self):
+        """退出编程模式 (Optiboot随后通过看门狗复位启动应用程序)"""
+        self.command(bytes([STK_LEAVE_PROGMODE]))
+
+    def load_address(self, address: int):
+        """设置后续页操作的字节地址"""
+        extended = address >> 17
+        if extended != self._extended:
+            self.command(bytes([STK_UNIVERSAL, _UNIVERSAL_LOAD_EXTENDED_ADDRESS, 0x00, extended, 0x00]), 1)
+            self._extended = extended
+        word = (address >> 1) & 0xFFFF
+        self.command(bytes([STK_LOAD_ADDRESS, word & 0xFF, word >> 8]))
+
+    def program_page(self, address: int, data: bytes, memtype: int = MEMTYPE_FLASH):
+        """写入一页"""
+        self.load_address(address)
+        size = len(data)
+        self.command(bytes([STK_PROG_PAGE, size >> 8, size & 0xFF, memtype]) + bytes(data))
+
+    def read_page(self, address: int, size: int, memtype: int = MEMTYPE_FLASH) -> bytes:
+        """读取一页"""
+        self.load_address(address)
+        return self.command(bytes([STK_READ_PAGE, size >> 8, size & 0xFF, memtype]), size)
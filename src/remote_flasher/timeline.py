@@ -0,0 +1,158 @@
+"""
+复位时序模块 - RemoteFlasher API
+统一管理 复位-烧录-复位 流程中的复位时序：
+
+1. 拉低复位引脚 reset_hold 秒后释放
+2. STK500v1 bootloader (arduino/stk500v1 编程器) 通过反复发送 GET_SYNC
+   探测，bootloader应答后立即交给编程器；其他编程器或无法打开串口时
+   固定等待 settle 秒
+3. 烧录完成后再次复位 (restart_hold)，使应用程序从头开始运行
+
+各阶段耗时记录在 timings 中，写入烧录结果。
+"""
+
+import math
+import time
+from typing import Any, Dict, Optional
+
+from .stk500 import STK500v1, STK500Error
+
+try:
+    import serial
+except ImportError:  # 没有pyserial时无法探测，退回固定等待
+    serial = None
+
+# 可以用GET_SYNC探测bootloader的编程器
+PROBE_PROGRAMMERS = ('arduino', 'stk500v1')
+
+
+class ResetProfile:
+    """板卡复位时序参数 (秒)"""
+
+    def __init__(self, name: str = 'default', reset_hold: float = 0.05, probe: bool = True,
+                 probe_interval: float = 0.05, boot_timeout: float = 1.5, settle: float = 0.5,
+                 restart_hold: float = 0.05):
+        """
+        Args:
+            name: 配置名称
+            reset_hold: 复位引脚保持低电平的时间
+            probe: 是否用GET_SYNC探测bootloader
+            probe_interval: 每次探测等待应答的时间
+            boot_timeout: 释放复位后等待bootloader应答的最长时间
+            settle: 不探测时释放复位后的固定等待时间
+            restart_hold: 烧录完成后重启目标板时复位保持的时间
+        """
+        self.name = name
+        self.reset_hold = reset_hold
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.boot_timeout = boot_timeout
+        self.settle = settle
+        self.restart_hold = restart_hold
+
+    @classmethod
+    def from_config(cls, config, name: Optional[str] = None) -> 'ResetProfile':
+        """
+        从配置的 RESET_PROFILES 创建
+
+        Raises:
+            ValueError: 未知的配置名称
+        """
+        name = name or config.DEFAULT_RESET_PROFILE
+        try:
+            params = config.RESET_PROFILES[name]
+        except KeyError:
+            raise ValueError(f'Unknown reset profile: {name}')
+        return cls(name, **params)
+
+    def scaled(self, factor: float) -> 'ResetProfile':
+        """复位保持和等待bootloader的时间乘以factor (重试时延长复位时序)"""
+        params = self.to_dict()
+        for key in ('reset_hold', 'boot_timeout', 'settle'):
+            params[key] *= factor
+        return ResetProfile(**params)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class ResetTimeline:
+    """复位时序执行器"""
+
+    def __init__(self, reset_control, profile: ResetProfile, logger=None):
+        """
+        Args:
+            reset_control: 控制复位引脚的函数 (reset: bool) -> bool
+            profile: 时序参数
+            logger: 可选的日志对象
+        """
+        self.reset_control = reset_control
+        self.profile = profile
+        self.logger = logger
+        self.timings: Dict[str, float] = {}
+
+    def _log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def enter_bootloader(self, port: str, baudrate: int, programmer: str) -> Optional[bool]:
+        """
+        复位目标板并等待bootloader就绪
+
+        Returns:
+            True: bootloader已应答
+            False: 探测超时，bootloader没有应答
+            None: 没有探测 (无法控制复位、编程器不支持探测或串口打不开)
+        """
+        start = time.perf_counter()
+        if not self.reset_control(True):
+            self._log("无法控制Arduino复位，继续尝试烧录...")
+            return None
+        time.sleep(self.profile.reset_hold)
+        released = self.reset_control(False)
+        self.timings['reset'] = time.perf_counter() - start
+        if not released:
+            self._log("无法退出Arduino复位状态")
+            return None
+
+        start = time.perf_counter()
+        ready = None
+        if self.profile.probe and programmer in PROBE_PROGRAMMERS:
+            ready = self._probe(port, baudrate)
+        if ready is None:
+            time.sleep(self.profile.settle)
+        self.timings['bootloader_wait'] = time.perf_counter() - start
+        if ready:
+            self._log(f"Bootloader ready after {self.timings['bootloader_wait'] * 1000:.0f} ms")
+        return ready
+
+    def _probe(self, port: str, baudrate: int) -> Optional[bool]:
+        """反复发送GET_SYNC直到bootloader应答或超时"""
+        if serial is None:
+            return None
+        attempts = max(1, math.ceil(self.profile.boot_timeout / self.profile.probe_interval))
+        try:
+            conn = serial.Serial(port=port, baudrate=int(baudrate), timeout=self.profile.probe_interval)
+        except (serial.SerialException, OSError, ValueError) as e:
+            self._log(f"Cannot probe bootloader on {port}: {e}")
+            return None
+        try:
+            STK500v1(conn).sync(attempts, self.profile.probe_interval)
+            return True
+        except STK500Error:
+            return False
+        except (serial.SerialException, OSError) as e:
+            self._log(f"Bootloader probe failed on {port}: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def restart(self) -> bool:
+        """复位目标板使应用程序开始运行"""
+        start = time.perf_counter()
+        if not self.reset_control(True):
+            return False
+        time.sleep(self.profile.restart_hold)
+        released = self.reset_control(False)
+        self.timings['restart'] = time.perf_counter() - start
+        return released
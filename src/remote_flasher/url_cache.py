@@ -0,0 +1,193 @@
+"""
+URL固件缓存 - RemoteFlasher API
+缓存从URL下载的固件，批量烧录同一发布地址时只下载一次：
+
+- 在 ttl 秒内直接使用缓存；过期后用 If-None-Match / If-Modified-Since
+  条件请求重新验证，服务器返回304时继续使用缓存
+- 调用者给出的SHA-256与缓存内容一致时不访问服务器
+- 缓存保存在内存中，总大小超过 max_bytes 时按最近最少使用 (LRU) 顺序淘汰
+- 同一URL的并发请求只下载一次，其余请求等待并共享结果
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from .download import DownloadError, FirmwareDownload
+
+
+class URLCacheEntry:
+    """单个URL的缓存内容"""
+
+    def __init__(self, url: str, data: bytes, sha256: str, etag: Optional[str] = None,
+                 last_modified: Optional[str] = None):
+        self.url = url
+        self.data = data
+        self.sha256 = sha256
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """重新验证用的条件请求头"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class URLCache:
+    """URL到固件内容的缓存"""
+
+    def __init__(self, max_bytes: int, ttl: float = 60, max_image_size: Optional[int] = None,
+                 timeout: float = 30, max_resumes: int = 3, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            max_bytes: 缓存总大小上限，0表示不缓存
+            ttl: 缓存内容无需重新验证的时间 (秒)
+            max_image_size / timeout / max_resumes: 下载参数，见 FirmwareDownload
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_image_size = max_image_size
+        self.timeout = timeout
+        self.max_resumes = max_resumes
+        self.logger = logger or logging.getLogger('AVRFlasher.url_cache')
+
+        self._lock = threading.Lock()
+        # url -> 缓存内容，最近使用的在末尾
+        self._entries: 'OrderedDict[str, URLCacheEntry]' = OrderedDict()
+        # url -> [下载锁, 持有或等待该锁的请求数]，没有请求时删除
+        self._fetch_locks: Dict[str, List[Any]] = {}
+        self._total = 0
+        self._counters = {'hits': 0, 'misses': 0, 'revalidated': 0, 'evictions': 0}
+
+    @classmethod
+    def from_config(cls, config, logger=None) -> 'URLCache':
+        return cls(
+            config.URL_CACHE_MAX_BYTES,
+            ttl=config.URL_CACHE_TTL,
+            max_image_size=config.MAX_CONTENT_LENGTH,
+            timeout=config.DOWNLOAD_TIMEOUT,
+            max_resumes=config.DOWNLOAD_MAX_RESUMES,
+            logger=logger
+        )
+
+    def get(self, url: str, expected_sha256: Optional[str] = None) -> bytes:
+        """
+        取得URL对应的固件内容，必要时下载或重新验证
+
+        Raises:
+            DownloadError: 下载失败、超出大小上限或SHA-256不一致
+        """
+        expected = expected_sha256.lower() if expected_sha256 else None
+        with self._fetch_lock(url):
+            entry = self._lookup(url)
+            if entry is not None and self._usable(entry, expected):
+                self._count('hits')
+                return entry.data
+
+            # 缓存内容与期望的哈希不一致时无条件重新下载
+            headers = entry.conditional_headers() if entry is not None and expected is None else {}
+            download = FirmwareDownload(
+                url,
+                max_bytes=self.max_image_size,
+                expected_sha256=expected,
+                timeout=self.timeout,
+                max_resumes=self.max_resumes,
+                logger=self.logger,
+                headers=headers
+            )
+            data = download.run()
+
+            if download.not_modified:
+                if entry is None:
+                    raise DownloadError('Unexpected 304 response without cached firmware')
+                self._count('revalidated')
+                with self._lock:
+                    entry.validated_at = time.monotonic()
+                    if url in self._entries:
+                        self._entries.move_to_end(url)
+                self.logger.info(f"Cached firmware still valid: {url}")
+                return entry.data
+
+            self._count('misses')
+            self._store(URLCacheEntry(url, data, download.sha256, download.etag, download.last_modified))
+            return data
+
+    def invalidate(self, url: str):
+        """删除URL的缓存"""
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self._total -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                'entries': len(self._entries),
+                'total_bytes': self._total,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            })
+        return stats
+
+    def _usable(self, entry: URLCacheEntry, expected: Optional[str]) -> bool:
+        if expected is not None:
+            # 内容寻址：哈希一致时内容一定正确，无需重新验证
+            return entry.sha256 == expected
+        return time.monotonic() - entry.validated_at < self.ttl
+
+    @contextmanager
+    def _fetch_lock(self, url: str):
+        """同一URL的下载互斥，最后一个请求结束后删除该URL的锁"""
+        with self._lock:
+            slot = self._fetch_locks.setdefault(url, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._fetch_locks[url]
+
+    def _lookup(self, url: str) -> Optional[URLCacheEntry]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _store(self, entry: URLCacheEntry):
+        if entry.size > self.max_bytes:
+            self.invalidate(entry.url)
+            return
+        with self._lock:
+            old = self._entries.pop(entry.url, None)
+            if old is not None:
+                self._total -= old.size
+            self._entries[entry.url] = entry
+            self._total += entry.size
+            # 从最久未使用的开始淘汰
+            while self._total > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= evicted.size
+                self._counters['evictions'] += 1
+                self.logger.info(f"Evicted cached firmware {evicted.url} ({evicted.size} bytes)")
@@ -1,3 +1,49 @@
 """
 RemoteFlasher测试模块
 """
+
+import os
+import sys
+import stat
+import shutil
+import tempfile
+
+
+def scratch_dir(testcase) -> str:
+    """创建临时目录，测试结束后删除"""
+    path = tempfile.mkdtemp(prefix='remote-flasher-test-')
+    testcase.addCleanup(shutil.rmtree, path, True)
+    return path
+
+
+def scratch_config(testcase, base, **attrs):
+    """
+    派生测试配置：上传目录和固件存储使用本测试的临时目录 (测试结束后删除)
+
+    Args:
+        testcase: 当前测试用例 (注册清理函数)
+        base: 基础配置类
+        attrs: 覆盖的其他配置项
+    """
+    for key in ('UPLOAD_FOLDER', 'FIRMWARE_STORE_DIR'):
+        if key not in attrs:
+            attrs[key] = scratch_dir(testcase)
+    return type(base.__name__, (base,), attrs)
+
+
+def fake_avrdude(testcase, body: str, base, directory: str = None, **attrs):
+    """
+    写入可执行的假avrdude脚本，派生使用它的测试配置
+
+    Args:
+        testcase: 当前测试用例 (注册清理函数)
+        body: 脚本的Python代码 (解释器行由这里添加)
+        base: 基础配置类
+        directory: 脚本所在目录，默认新建临时目录 (测试结束后删除)
+        attrs: 覆盖的其他配置项
+    """
+    path = os.path.join(directory or scratch_dir(testcase), 'avrdude')
+    with open(path, 'w') as f:
+        f.write(f'#!{sys.executable}\n' + body)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return scratch_config(testcase, base, AVRDUDE_PATH=path, **attrs)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+异步服务器测试 (WSGI桥接、keep-alive、asyncio驱动的流式烧录)
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import hashlib
+import socket
+import threading
+import http.client
+import unittest
+from unittest.mock import patch
+
+import requests
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.api_server import FlasherAPI
+from remote_flasher.async_server import AsyncFlasherServer
+from remote_flasher.devices import Device
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from tests import fake_avrdude, scratch_dir
+
+FAKE_AVRDUDE = '''import os, sys, time
+with open({pid_file!r}, 'w') as f:
+    f.write(str(os.getpid()))
+lines = int(os.environ.get('FAKE_AVRDUDE_LINES', '5'))
+delay = float(os.environ.get('FAKE_AVRDUDE_DELAY', '0.01'))
+for i in range(lines):
+    print(f'avrdude: writing block {{i}}', flush=True)
+    time.sleep(delay)
+'''
+
+
+class AsyncTestConfig(TestingConfig):
+    LOG_FILE = None
+    DEBUG = False
+    PROGRAMMER_BACKEND = 'avrdude'
+    RESET_PROFILES = {'fast': {'reset_hold': 0, 'probe': False, 'probe_interval': 0.05,
+                               'boot_timeout': 0, 'settle': 0, 'restart_hold': 0}}
+    DEFAULT_RESET_PROFILE = 'fast'
+    ASYNC_WORKERS = 2
+    MAX_CONTENT_LENGTH = 1024 * 1024
+
+
+class TestAsyncServer(unittest.TestCase):
+    """异步服务器测试类"""
+
+    def setUp(self):
+        self.pid_file = os.path.join(scratch_dir(self), 'avrdude.pid')
+        config = fake_avrdude(self, FAKE_AVRDUDE.format(pid_file=self.pid_file), AsyncTestConfig)
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.server = AsyncFlasherServer(self.api, '127.0.0.1', 0)
+        self.base = f'http://127.0.0.1:{self.server.start()}'
+        self.addCleanup(self.server.stop)
+
+        self.data = os.urandom(512)
+        self.hex = FirmwareImage.from_binary(self.data).to_hex()
+        self.sha = hashlib.sha256(self.hex).hexdigest()
+
+    def set_avrdude(self, lines, delay):
+        os.environ['FAKE_AVRDUDE_LINES'] = str(lines)
+        os.environ['FAKE_AVRDUDE_DELAY'] = str(delay)
+        self.addCleanup(os.environ.pop, 'FAKE_AVRDUDE_LINES', None)
+        self.addCleanup(os.environ.pop, 'FAKE_AVRDUDE_DELAY', None)
+
+    def stream(self, port, **kwargs):
+        return requests.post(f'{self.base}/flash/stream', params={'port': port},
+                             files={'file': ('firmware.hex', io.BytesIO(self.hex))}, stream=True, **kwargs)
+
+    @staticmethod
+    def events(response):
+        return [json.loads(line[6:]) for line in response.iter_lines(decode_unicode=True)
+                if line.startswith('data: ')]
+
+    def test_wsgi_bridge(self):
+        """测试普通接口与Flask测试客户端的结果一致"""
+        response = requests.get(f'{self.base}/status')
+        self.assertEqual(response.status_code, 200)
+        expected = self.api.app.test_client().get('/status').get_json()
+        self.assertEqual(response.json().keys(), expected.keys())
+        self.assertEqual(requests.get(f'{self.base}/no-such-route').status_code, 404)
+
+    def test_keep_alive_and_head(self):
+        """测试同一连接上的多个请求，HEAD响应保留Content-Length且没有响应体"""
+        conn = http.client.HTTPConnection('127.0.0.1', int(self.base.rsplit(':', 1)[1]), timeout=5)
+        self.addCleanup(conn.close)
+        conn.request('PUT', f'/firmware/{self.sha}', body=self.hex)
+        response = conn.getresponse()
+        response.read()
+        self.assertIn(response.status, (200, 201))
+
+        conn.request('HEAD', f'/firmware/{self.sha}')
+        response = conn.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(int(response.getheader('Content-Length')), len(self.hex))
+        self.assertEqual(response.read(), b'')
+
+    def test_chunked_request_body(self):
+        """测试分块传输编码的请求体"""
+        response = requests.put(f'{self.base}/firmware/{self.sha}', data=iter([self.hex[:100], self.hex[100:]]))
+        self.assertIn(response.status_code, (200, 201))
+        self.assertTrue(self.api.firmware.has(self.sha))
+
+    def test_body_too_large(self):
+        """测试请求体超出上限时返回413"""
+        response = requests.post(f'{self.base}/flash/raw', data=b'x' * (AsyncTestConfig.MAX_CONTENT_LENGTH + 1),
+                                 headers={'Content-Type': 'application/octet-stream'})
+        self.assertEqual(response.status_code, 413)
+
+    def test_stream_errors(self):
+        """测试流式烧录的参数错误与开发服务器一致"""
+        response = requests.post(f'{self.base}/flash/stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'No file provided')
+        response = requests.post(f'{self.base}/flash/stream', params={'device': 'missing'},
+                                 files={'file': ('firmware.hex', io.BytesIO(self.hex))})
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_flash(self):
+        """测试avrdude输出通过asyncio子进程管道逐条发送"""
+        self.set_avrdude(5, 0.01)
+        with self.stream('/dev/ttyFAKE0') as response:
+            self.assertEqual(response.status_code, 200)
+            events = self.events(response)
+        outputs = [e['message'] for e in events if e['type'] == 'output']
+        self.assertEqual(outputs, [f'avrdude: writing block {i}' for i in range(5)])
+        self.assertEqual(events[-2]['type'], 'success')
+        self.assertEqual(events[-1]['message'], 'Arduino已重启，程序开始运行')
+        self.assertEqual(self.api.firmware._pins, {})
+
+    def test_stream_native_backend(self):
+        """测试没有异步实现的后端在线程池中逐步推进"""
+        with OptibootSimulator() as sim:
+            with requests.post(f'{self.base}/flash/stream', params={'port': sim.port, 'backend': 'stk500'},
+                               files={'file': ('firmware.hex', io.BytesIO(self.hex))}, stream=True) as response:
+                events = self.events(response)
+            self.assertEqual(events[-2]['type'], 'success', events)
+            self.assertEqual(events[-2]['backend'], 'stk500')
+            self.assertTrue(any(e['type'] == 'progress' for e in events))
+            self.assertEqual(bytes(sim.flash[:512]), self.data)
+
+    def test_concurrent_streams(self):
+        """测试多个流式烧录并发进行，线程数不随客户端数量增长"""
+        self.set_avrdude(10, 0.05)
+        results = {}
+
+        def run(index):
+            with self.stream(f'/dev/ttyFAKE{index}') as response:
+                results[index] = self.events(response)[-2]['type']
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(results, {i: 'success' for i in range(8)})
+        # 每个烧录约0.5秒，串行执行需要4秒以上
+        self.assertLess(elapsed, 3)
+        workers = [t for t in threading.enumerate() if t.name.startswith('flasher-worker')]
+        self.assertLessEqual(len(workers), AsyncTestConfig.ASYNC_WORKERS)
+
+    def test_sync_flashes_do_not_block_pool(self):
+        """测试并发的同步烧录不占用线程池，/status 和 /devices 轮询仍能及时响应"""
+        self.set_avrdude(20, 0.05)
+        results = {}
+
+        def flash(index):
+            response = requests.post(f'{self.base}/flash/file', params={'port': f'/dev/ttyFAKE{index}'},
+                                     files={'file': ('firmware.hex', io.BytesIO(self.hex))}, timeout=30)
+            results[index] = (response.status_code, response.json()['success'], response.json()['warnings'])
+
+        threads = [threading.Thread(target=flash, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        latencies = []
+        while any(thread.is_alive() for thread in threads):
+            for path in ('/status', '/devices'):
+                start = time.monotonic()
+                self.assertEqual(requests.get(f'{self.base}{path}', timeout=30).status_code, 200)
+                latencies.append(time.monotonic() - start)
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join(30)
+
+        self.assertEqual({i: result[:2] for i, result in results.items()}, {i: (200, True) for i in range(8)})
+        self.assertTrue(all(result[2] for result in results.values()))
+        self.assertGreater(len(latencies), 4)
+        # 每个烧录约1秒，阻塞线程池时轮询要等到烧录结束
+        self.assertLess(max(latencies), 0.5)
+
+    def test_stream_warnings(self):
+        """测试流式烧录与开发服务器一样先发送设备警告"""
+        self.set_avrdude(1, 0.01)
+        with patch.object(Device, 'warnings', return_value=['no reset pin']):
+            with self.stream('/dev/ttyFAKE3') as response:
+                events = self.events(response)
+        self.assertEqual(events[0], {'type': 'warning', 'message': 'no reset pin'})
+        self.assertEqual(events[-2]['type'], 'success')
+
+    def test_http10_stream(self):
+        """测试HTTP/1.0客户端的流式响应不使用分块传输编码，以关闭连接结束"""
+        self.set_avrdude(3, 0.01)
+        requests.put(f'{self.base}/firmware/{self.sha}', data=self.hex)
+        sock = socket.create_connection(('127.0.0.1', int(self.base.rsplit(':', 1)[1])), timeout=10)
+        self.addCleanup(sock.close)
+        sock.sendall(f'POST /flash/stream?port=/dev/ttyFAKE4&sha256={self.sha} HTTP/1.0\r\n'
+                     f'Content-Length: 0\r\n\r\n'.encode())
+        received = b''
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            received += data
+        head, _, body = received.partition(b'\r\n\r\n')
+        self.assertNotIn(b'transfer-encoding', head.lower())
+        self.assertIn(b'Connection: close', head)
+        events = [json.loads(line[6:]) for line in body.decode().split('\n\n') if line.startswith('data: ')]
+        self.assertEqual([e['message'] for e in events if e['type'] == 'output'],
+                         [f'avrdude: writing block {i}' for i in range(3)])
+        self.assertEqual(events[-2]['type'], 'success')
+
+    def test_disconnect_kills_avrdude(self):
+        """测试客户端断开时结束avrdude并释放设备和固件锁定"""
+        self.set_avrdude(1000, 0.05)
+        requests.put(f'{self.base}/firmware/{self.sha}', data=self.hex)
+        sock = socket.create_connection(('127.0.0.1', int(self.base.rsplit(':', 1)[1])), timeout=5)
+        sock.sendall(f'POST /flash/stream?port=/dev/ttyFAKE1&sha256={self.sha} HTTP/1.1\r\n'
+                     f'Host: test\r\nContent-Length: 0\r\n\r\n'.encode())
+        received = b''
+        while b'writing block' not in received:
+            received += sock.recv(4096)
+        with open(self.pid_file) as f:
+            pid = int(f.read())
+        sock.close()
+
+        deadline = time.monotonic() + 5
+        device = self.api.devices.resolve(port='/dev/ttyFAKE1')
+        while time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                if not device.lock.locked():
+                    break
+            time.sleep(0.05)
+        self.assertRaises(ProcessLookupError, os.kill, pid, 0)
+        self.assertFalse(device.lock.locked())
+        self.assertEqual(self.api.firmware._pins, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
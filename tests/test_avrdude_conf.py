@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+avrdude.conf 器件数据库测试 (解析、parent继承、按mtime重新加载和请求检查)
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.avrdude_conf import AvrdudeConfError, PartDatabase, parse_avrdude_conf
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+# avrdude 6.x 格式的片段
+AVRDUDE_CONF = """
+# 全局设置
+default_programmer = "arduino";
+
+programmer
+  id    = "arduino";
+  desc  = "Arduino";
+  type  = "arduino";
+  connection_type = serial;
+;
+
+programmer
+  id    = "avrisp2", "avrispmkII";
+  desc  = "Atmel AVR ISP mkII";
+  type  = "stk500v2";
+  connection_type = usb;
+;
+
+part
+    id               = ".common";
+    desc             = "common values";
+    has_debugwire    = no;
+    memory "eeprom"
+        size            = 512;
+        page_size       = 4;
+      ;
+;
+
+part parent ".common"
+    id               = "m328";
+    desc             = "ATmega328";
+    signature        = 0x1e 0x95 0x14;
+    memory "eeprom"
+        size            = 1024;
+        read            = "  1   0   1   0      0   0   0   0",
+                          "  0   0   0   x      x   x   a9  a8";
+      ;
+    memory "flash"
+        paged           = yes;
+        size            = 32768;
+        page_size       = 128;
+        num_pages       = 256;
+      ;
+    memory "lfuse"
+        size            = 1;
+      ;
+;
+
+part parent "m328"
+    id               = "m328p";
+    desc             = "ATmega328P";
+    signature        = 0x1e 0x95 0x0F;
+;
+
+part parent "m328"   # 继承后缩小flash并删除熔丝位
+    id               = "t13";
+    desc             = "ATtiny13";
+    signature        = 0x1e 0x90 0x07;
+    memory "flash"
+        size            = 1024;
+        page_size       = 32;
+      ;
+    memory "lfuse" = NULL;
+;
+"""
+
+
+def write_conf(text):
+    fd, path = tempfile.mkstemp(suffix='.conf')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    return path
+
+
+class TestParseAvrdudeConf(unittest.TestCase):
+    """avrdude.conf 解析测试类"""
+
+    def test_parts(self):
+        """测试器件参数和parent继承"""
+        parts, programmers = parse_avrdude_conf(AVRDUDE_CONF)
+        self.assertEqual([part.id for part in parts], ['m328', 'm328p', 't13'])
+        m328p = parts[1]
+        self.assertEqual((m328p.name, m328p.signature), ('atmega328p', '1e950f'))
+        self.assertEqual((m328p.flash_size, m328p.page_size), (32768, 128))
+        self.assertEqual(m328p.memories['eeprom'], {'size': 1024, 'page_size': 4, 'paged': False})
+        t13 = parts[2]
+        self.assertEqual((t13.flash_size, t13.page_size), (1024, 32))
+        self.assertTrue(t13.memories['flash']['paged'])
+        self.assertNotIn('lfuse', t13.memories)
+        self.assertEqual(programmers[1].ids, ['avrisp2', 'avrispmkII'])
+        self.assertEqual((programmers[0].type, programmers[0].connection_type), ('arduino', 'serial'))
+
+    def test_syntax_error(self):
+        """测试语法错误和未知parent"""
+        with self.assertRaises(AvrdudeConfError):
+            parse_avrdude_conf('part\n id = "m8"\n')
+        with self.assertRaises(AvrdudeConfError):
+            parse_avrdude_conf('part parent "nope"\n id = "m8";\n;\n')
+
+
+class TestPartDatabase(unittest.TestCase):
+    """PartDatabase测试类"""
+
+    def setUp(self):
+        self.path = write_conf(AVRDUDE_CONF)
+        self.addCleanup(os.unlink, self.path)
+        config = type('Config', (TestingConfig,), {'AVRDUDE_CONF': self.path})
+        self.parts = PartDatabase(config)
+
+    def test_lookup(self):
+        """测试按ID、描述和签名查找"""
+        self.assertEqual(self.parts.part('M328P').name, 'atmega328p')
+        self.assertEqual(self.parts.part('atmega328p').id, 'm328p')
+        self.assertEqual(self.parts.by_signature('1E9007').name, 'attiny13')
+        self.assertEqual(self.parts.geometry('t13'), (1024, 32))
+        self.assertEqual(self.parts.mcus(), ['atmega328', 'atmega328p', 'attiny13'])
+        self.assertEqual(self.parts.programmers(), ['arduino', 'avrisp2', 'avrispmkII'])
+        self.assertEqual(self.parts.resolve_programmer('AVRISPMKII').type, 'stk500v2')
+        with self.assertRaisesRegex(ValueError, "Unknown MCU 'atmega382p'.*atmega328p"):
+            self.parts.resolve_part('atmega382p')
+        with self.assertRaisesRegex(ValueError, "Unknown programmer 'usbasp'"):
+            self.parts.resolve_programmer('usbasp')
+
+    def test_reload_on_change(self):
+        """测试文件未变化时不重新解析，修改后重新加载"""
+        described = self.parts.describe()
+        self.assertIs(self.parts.describe(), described)
+        self.assertEqual(described['type'], 'avrdude.conf')
+        with open(self.path, 'a') as f:
+            f.write('part parent "m328"\n id = "m328pb";\n desc = "ATmega328PB";\n signature = 0x1e 0x95 0x16;\n;\n')
+        os.utime(self.path, ns=(0, 10 ** 9))
+        self.assertEqual(self.parts.part('m328pb').signature, '1e9516')
+
+    def test_config_fallback(self):
+        """测试avrdude.conf不存在或无法解析时使用配置中的列表"""
+        parts = PartDatabase(type('Config', (TestingConfig,), {'AVRDUDE_CONF': '/nonexistent/avrdude.conf'}))
+        self.assertEqual(parts.load()['type'], 'config')
+        self.assertEqual(parts.mcus(), TestingConfig.SUPPORTED_MCUS)
+        self.assertEqual(parts.geometry('atmega2560'), (262144, 256))
+        self.assertEqual(parts.signature('atmega168'), '1e9406')
+
+        broken = write_conf('part\n id = "m8"\n')
+        self.addCleanup(os.unlink, broken)
+        parts = PartDatabase(type('Config', (TestingConfig,), {'AVRDUDE_CONF': broken}))
+        self.assertEqual(parts.programmers(), TestingConfig.SUPPORTED_PROGRAMMERS)
+
+
+class TestRequestValidation(unittest.TestCase):
+    """烧录请求按器件数据库检查测试类"""
+
+    def setUp(self):
+        path = write_conf(AVRDUDE_CONF)
+        self.addCleanup(os.unlink, path)
+        config = scratch_config(self, TestingConfig, AVRDUDE_CONF=path, LOG_FILE=None,
+                                DEVICES={'uno': {'port': '/dev/ttyFAKE0', 'reset_pin': 17}})
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.client = self.api.app.test_client()
+
+    def flash(self, data, **params):
+        return self.client.post('/flash/raw', data=data, content_type='application/octet-stream',
+                                query_string=dict(params, device='uno'))
+
+    def resets(self):
+        return [event for event in self.api.devices.gpio.history if event[1] == 17 and event[2] == 0]
+
+    def test_unknown_mcu_and_programmer(self):
+        """测试MCU拼写错误和不支持的编程器在复位前被拒绝"""
+        hex_data = FirmwareImage.from_binary(b'\x00' * 64).to_hex()
+        response = self.flash(hex_data, mcu='atmega382p')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('did you mean: atmega328p', response.get_json()['error'])
+        self.assertEqual(self.flash(hex_data, mcu='m328p', programmer='usbasp').status_code, 400)
+        self.assertEqual(self.client.get('/device/info?device=uno&mcu=m999').status_code, 400)
+        self.assertEqual(self.resets(), [])
+
+    def test_oversize_image(self):
+        """测试超出器件flash大小的镜像在复位前被拒绝"""
+        result = self.flash(FirmwareImage.from_binary(b'\x00' * 2048).to_hex(), mcu='t13').get_json()
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_class'], 'bad_image')
+        self.assertEqual(self.resets(), [])
+
+    def test_config_endpoint(self):
+        """测试 /config 返回器件数据库"""
+        config = self.client.get('/config').get_json()
+        self.assertEqual(config['supported_mcus'], ['atmega328', 'atmega328p', 'attiny13'])
+        database = config['part_database']
+        self.assertEqual(database['parts']['attiny13']['flash_size'], 1024)
+        self.assertEqual(database['programmers']['avrisp2']['ids'], ['avrisp2', 'avrispmkII'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+烧录后等待启动输出测试 (await_pattern、boot_ms、启动日志和烧录接口参数)
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.gpio import FakeGPIOBackend
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+RESET_PIN = 4
+BANNER = b'\r\nFirmware v1.2\r\nREADY\r\n'
+
+
+class BootTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEBUG = False
+    PROGRAMMER_BACKEND = 'stk500'
+    STK500_SYNC_TIMEOUT = 0.05
+    RESET_PROFILES = dict(TestingConfig.RESET_PROFILES, fast={
+        'reset_hold': 0.01, 'probe': True, 'probe_interval': 0.02,
+        'boot_timeout': 0.3, 'settle': 0.2, 'restart_hold': 0.01})
+    DEFAULT_RESET_PROFILE = 'fast'
+
+
+class TestAwaitBoot(unittest.TestCase):
+    """AVRFlasher等待启动输出测试类"""
+
+    def setUp(self):
+        self.gpio = FakeGPIOBackend()
+        # 复位后bootloader等待0.2秒没有命令则启动应用程序并输出banner
+        self.sim = OptibootSimulator(bootloader_timeout=0.2, banner=BANNER)
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        self.flasher = AVRFlasher(BootTestConfig, gpio_backend=self.gpio, reset_pin=RESET_PIN)
+        self.addCleanup(self.flasher.cleanup)
+        self.sim.attach_reset(self.gpio, RESET_PIN)
+        self.image = FirmwareImage.from_binary(os.urandom(600))
+
+    def test_flash_and_await_boot(self):
+        """测试烧录后在同一结果中返回启动耗时和启动日志"""
+        result = self.flasher.flash_hex_file(self.image.to_hex(), port=self.sim.port, await_pattern=r'^READY$')
+        self.assertTrue(result['success'], result['message'])
+        self.assertTrue(result['boot_matched'])
+        self.assertEqual(result['boot_match']['line'], 'READY')
+        self.assertEqual(result['boot_log'], BANNER[:-1].decode() + '\n')
+        # 启动耗时约为bootloader超时时间
+        self.assertGreaterEqual(result['boot_ms'], 150)
+        self.assertLess(result['boot_ms'], 1000)
+        self.assertEqual(result['timings']['boot'], result['boot_ms'] / 1000)
+        self.assertTrue(self.image.matches(FirmwareImage.from_binary(bytes(self.sim.flash[:600]))))
+
+    def test_boot_timeout(self):
+        """测试没有等到启动输出时操作失败，烧录历史仍记录新固件"""
+        result = self.flasher.flash_hex_file(self.image.to_hex(), port=self.sim.port,
+                                             await_pattern='PANIC', await_timeout=0.5)
+        self.assertFalse(result['success'])
+        self.assertIn("'PANIC' not seen", result['message'])
+        self.assertIsNone(result['boot_ms'])
+        self.assertIn('READY', result['boot_log'])
+        self.assertEqual(self.flasher.history.get(self.sim.port)['digest'], self.image.digest())
+
+    def test_reset_only(self):
+        """测试没有hex文件时只重启并等待启动输出"""
+        result = self.flasher.perform_arduino_operation(port=self.sim.port, await_pattern='Firmware v')
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(result['boot_match']['text'], 'Firmware v')
+        self.assertEqual(self.sim.resets, 1)
+
+    def test_stream_boot_event(self):
+        """测试流式烧录最后报告启动结果"""
+        events = list(self.flasher.flash_hex_file_stream(self.image.to_hex(), port=self.sim.port,
+                                                         await_pattern='READY'))
+        self.assertEqual(events[-1]['type'], 'info')
+        self.assertTrue(events[-1]['boot_matched'])
+        self.assertIn('restart', events[-2]['timings'])
+
+    def test_serial_unavailable(self):
+        """测试无法打开串口时仍然重启目标板"""
+        result = self.flasher.perform_arduino_operation(port='/dev/ttyNONE', await_pattern='READY')
+        self.assertFalse(result['success'])
+        self.assertIn('Cannot open /dev/ttyNONE', result['message'])
+        self.assertEqual(self.sim.resets, 1)
+
+
+class TestAwaitBootAPI(unittest.TestCase):
+    """烧录接口的 await_pattern 参数测试类"""
+
+    def setUp(self):
+        self.sim = OptibootSimulator(bootloader_timeout=0.2, banner=BANNER)
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        config = scratch_config(self, BootTestConfig, DEVICES={'uno': {'port': self.sim.port, 'reset_pin': 17}})
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.sim.attach_reset(self.api.devices.gpio, 17)
+        self.client = self.api.app.test_client()
+        self.hex = FirmwareImage.from_binary(os.urandom(300)).to_hex()
+
+    def flash(self, **params):
+        return self.client.post('/flash/raw', data=self.hex, content_type='application/octet-stream',
+                                query_string=dict(params, device='uno'))
+
+    def test_flash_raw_await(self):
+        """测试一次请求完成烧录、重启和等待启动"""
+        result = self.flash(await_pattern='READY', await_baudrate=115200).get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertGreater(result['boot_ms'], 0)
+        self.assertIn('Firmware v1.2', result['boot_log'])
+
+    def test_invalid_options(self):
+        """测试无效的正则表达式和超时时间"""
+        self.assertEqual(self.flash(await_pattern='(').status_code, 400)
+        self.assertEqual(self.flash(await_pattern='READY', await_timeout='soon').status_code, 400)
+        self.assertEqual(self.sim.resets, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+设备注册表测试
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.gpio import FakeGPIOBackend
+from remote_flasher.devices import DeviceRegistry, DeviceBusyError, UnknownDeviceError
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config, scratch_dir
+
+
+class DeviceTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEVICES = {
+        'board1': {'port': '/dev/ttyUSB0', 'reset_pin': 17, 'mcu': 'atmega2560'},
+        'board2': {'port': '/dev/ttyUSB1', 'reset_pin': 27},
+    }
+
+
+class TestDeviceRegistry(unittest.TestCase):
+    """设备注册表测试类"""
+
+    def setUp(self):
+        self.gpio = FakeGPIOBackend()
+        self.registry = DeviceRegistry(DeviceTestConfig, gpio_backend=self.gpio)
+
+    def test_configured_devices(self):
+        """测试从配置注册设备"""
+        names = sorted(device.name for device in self.registry.devices())
+        self.assertEqual(names, ['board1', 'board2', 'default'])
+        board1 = self.registry.get('board1')
+        self.assertEqual(board1.flash_params()['mcu'], 'atmega2560')
+        self.assertEqual(board1.flasher.reset_pin, 17)
+
+    def test_devices_share_gpio_backend(self):
+        """测试设备共享GPIO后端并各自控制自己的引脚"""
+        self.registry.get('board2').flasher.control_arduino_reset(reset=True)
+        self.assertEqual(self.gpio.states[27], 0)
+        self.assertEqual(self.gpio.states[17], 1)
+
+    def test_resolve(self):
+        """测试按名称和串口解析设备"""
+        self.assertEqual(self.registry.resolve().name, 'default')
+        self.assertEqual(self.registry.resolve(port='/dev/ttyUSB1').name, 'board2')
+        with self.assertRaises(UnknownDeviceError):
+            self.registry.resolve('missing')
+
+    def test_resolve_unknown_port(self):
+        """测试未注册串口使用以 RESET_PIN 复位的临时设备，并给出警告"""
+        device = self.registry.resolve(port='/dev/ttyACM0')
+        self.assertTrue(device.ad_hoc)
+        self.assertEqual(device.reset_pin, DeviceTestConfig.RESET_PIN)
+        self.assertTrue(device.flasher.gpio_available)
+        self.assertIn('default RESET_PIN', device.warnings()[0])
+        self.assertEqual(self.registry.get('board1').warnings(), [])
+        self.assertIs(self.registry.resolve(port='/dev/ttyACM0'), device)
+        self.assertIs(self.registry.find_by_port('/dev/ttyACM0'), device)
+        with self.assertRaises(UnknownDeviceError):
+            self.registry.get('port:/dev/ttyACM0')
+
+    def test_adhoc_without_reset_pin(self):
+        """测试没有配置 RESET_PIN 时临时设备不复位，并给出警告"""
+        registry = DeviceRegistry(scratch_config(self, DeviceTestConfig, RESET_PIN=None), gpio_backend=self.gpio)
+        device = registry.resolve(port='/dev/ttyACM0')
+        self.assertIsNone(device.reset_pin)
+        self.assertFalse(device.flasher.gpio_available)
+        self.assertIn('no reset pin', device.warnings()[0])
+
+    def test_device_without_port(self):
+        """测试未指定串口的设备与默认设备共用 DEFAULT_PORT、RESET_PIN 和设备锁"""
+        config = scratch_config(self, DeviceTestConfig, DEVICES={'uno': {'mcu': 'atmega328p'}})
+        registry = DeviceRegistry(config, gpio_backend=self.gpio)
+        uno = registry.get('uno')
+        self.assertEqual((uno.port, uno.reset_pin), (config.DEFAULT_PORT, config.RESET_PIN))
+        self.assertIs(uno.lock, registry.default.lock)
+        with registry.acquire(uno):
+            self.assertTrue(registry.default.busy)
+        with self.assertRaises(ValueError):
+            registry.register('board3', port=config.DEFAULT_PORT)
+
+    def test_adhoc_devices_bounded(self):
+        """测试临时设备数量有上限，空闲超时后移除"""
+        config = scratch_config(self, DeviceTestConfig, ADHOC_DEVICE_LIMIT=2, ADHOC_DEVICE_TTL=60)
+        registry = DeviceRegistry(config, gpio_backend=self.gpio)
+        first = registry.resolve(port='/dev/ttyACM0')
+        registry.resolve(port='/dev/ttyACM1')
+        with self.assertRaises(ValueError):
+            registry.resolve(port='/dev/ttyACM2')
+        self.assertEqual(len(registry.devices()), 5)
+
+        # 正在使用的临时设备即使超时也不会被移除
+        first.last_used -= 120
+        with registry.acquire(first):
+            with self.assertRaises(ValueError):
+                registry.resolve(port='/dev/ttyACM2')
+        first.last_used -= 120
+        third = registry.resolve(port='/dev/ttyACM2')
+        self.assertIsNone(registry.find_by_port('/dev/ttyACM0'))
+        self.assertEqual(sorted(device.port for device in registry.devices() if device.ad_hoc),
+                         ['/dev/ttyACM1', '/dev/ttyACM2'])
+
+        # 注册同一串口后临时设备被替换
+        registry.register('board3', port='/dev/ttyACM2', reset_pin=5)
+        self.assertEqual(registry.resolve(port='/dev/ttyACM2').name, 'board3')
+        self.assertNotIn(third, registry.devices())
+
+    def test_duplicate_port_rejected(self):
+        """测试同一串口不能分配给两个设备"""
+        with self.assertRaises(ValueError):
+            self.registry.register('board3', port='/dev/ttyUSB0')
+
+    def test_same_device_serialized(self):
+        """测试同一设备的操作互斥"""
+        device = self.registry.get('board1')
+        with self.registry.acquire(device):
+            self.assertTrue(device.busy)
+            with self.assertRaises(DeviceBusyError):
+                with self.registry.acquire(device, timeout=0.01):
+                    pass
+        self.assertFalse(device.busy)
+
+    def test_acquire_release_serial(self):
+        """测试独占设备时暂停同一串口 (含符号链接) 上的串口会话，释放后恢复"""
+        class Session:
+            def __init__(self, port):
+                self.port = port
+                self.suspended = False
+
+            def suspend(self):
+                self.suspended = True
+                return True
+
+            def resume(self):
+                self.suspended = False
+
+        link = os.path.join(scratch_dir(self), 'ttyBoard1')
+        os.symlink('/dev/ttyUSB0', link)
+        same, other = Session(link), Session('/dev/ttyUSB1')
+        self.registry.serial_sessions.update(same=same, other=other)
+        device = self.registry.get('board1')
+        with self.registry.acquire(device):
+            self.assertFalse(same.suspended)
+        with self.registry.acquire(device, release_serial=True):
+            self.assertTrue(same.suspended)
+            self.assertFalse(other.suspended)
+        self.assertFalse(same.suspended)
+
+    def test_different_devices_parallel(self):
+        """测试不同设备的操作可以并行"""
+        def work(name):
+            with self.registry.acquire(self.registry.get(name)):
+                time.sleep(0.2)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=work, args=(name,)) for name in ('board1', 'board2')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.perf_counter() - start, 0.35)
+
+
+class TestDeviceAPI(unittest.TestCase):
+    """设备相关API测试类"""
+
+    def setUp(self):
+        self.api = FlasherAPI(scratch_config(self, DeviceTestConfig))
+        self.client = self.api.app.test_client()
+
+    def tearDown(self):
+        self.api.devices.cleanup()
+
+    def test_list_devices(self):
+        """测试列出设备"""
+        data = self.client.get('/devices').get_json()
+        self.assertEqual(data['total_devices'], 3)
+
+    def test_unknown_device(self):
+        """测试未知设备返回404"""
+        response = self.client.post('/control/reset', json={'device': 'nope', 'duration': 0})
+        self.assertEqual(response.status_code, 404)
+
+    def test_unregistered_port_warning(self):
+        """测试按未注册串口请求时通过 RESET_PIN 复位，响应中包含警告"""
+        response = self.client.post('/control/reset', json={'port': '/dev/ttyACM0', 'duration': 0})
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertIn('default RESET_PIN', data['warnings'][0])
+        self.assertTrue(self.client.get('/devices').get_json()['devices'][-1]['ad_hoc'])
+
+    def test_reset_named_device(self):
+        """测试复位指定设备"""
+        response = self.client.post('/control/reset', json={'device': 'board1', 'duration': 0})
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['device'], 'board1')
+
+
+if __name__ == '__main__':
+    unittest.main()
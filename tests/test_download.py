@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+固件下载测试 (使用本地HTTP服务器模拟固件服务器)
+"""
+
+import sys
+import os
+import gzip
+import hashlib
+import threading
+import unittest
+from unittest.mock import patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.download import (
+    CHUNK_SIZE, FirmwareDownload, DownloadError, DownloadTooLargeError, DownloadHashMismatchError
+)
+from remote_flasher.hexfile import FirmwareImage, parse_hex
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+
+class FirmwareServer(ThreadingHTTPServer):
+    """本地固件服务器，支持Range请求和故障注入"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.files = {}
+        self.etag = '"v1"'
+        self.last_modified = 'Wed, 01 Jan 2025 00:00:00 GMT'
+        self.support_range = True
+        self.send_length = True
+        # True: 客户端接受gzip时压缩；'always': 忽略 Accept-Encoding 始终压缩
+        self.gzip = False
+        # 前几次请求在发送该数量的字节后断开连接
+        self.cut_after = None
+        self.cuts = 0
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, name):
+        return f'http://127.0.0.1:{self.server_address[1]}/{name}'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        data = server.files.get(self.path.lstrip('/'))
+        if data is None:
+            self.send_error(404)
+            return
+
+        # 条件请求：内容未变化时返回304
+        if_none_match = self.headers.get('If-None-Match')
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if (if_none_match and if_none_match == server.etag) or \
+                (not if_none_match and if_modified_since and if_modified_since == server.last_modified):
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        encoding = self.headers.get('Accept-Encoding', '')
+        encode = server.gzip == 'always' or (server.gzip and 'gzip' in encoding)
+        if encode:
+            # Range按压缩后的字节计算
+            data = gzip.compress(data, mtime=0)
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if server.support_range and range_header and if_range in (None, server.etag, server.last_modified):
+            start = int(range_header.split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        else:
+            self.send_response(200)
+        body = data[start:]
+        if server.send_length:
+            self.send_header('Content-Length', str(len(body)))
+        if server.etag:
+            self.send_header('ETag', server.etag)
+        if server.last_modified:
+            self.send_header('Last-Modified', server.last_modified)
+        self.send_header('Accept-Ranges', 'bytes')
+        if encode:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+
+        if server.cut_after is not None and server.cuts:
+            server.cuts -= 1
+            self.wfile.write(body[:server.cut_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadTestConfig(TestingConfig):
+    LOG_FILE = None
+    DEBUG = False
+    PROGRAMMER_BACKEND = 'stk500'
+    DEFAULT_RESET_PROFILE = 'legacy'
+    DOWNLOAD_TIMEOUT = 5
+
+
+class TestFirmwareDownload(unittest.TestCase):
+    """流式下载测试类"""
+
+    def setUp(self):
+        self.server = FirmwareServer()
+        self.addCleanup(self.server.stop)
+        self.data = os.urandom(300 * 1024)
+        self.server.files['fw.bin'] = self.data
+        self.sha = hashlib.sha256(self.data).hexdigest()
+
+    def test_download(self):
+        """测试完整下载并校验SHA-256"""
+        download = FirmwareDownload(self.server.url('fw.bin'), expected_sha256=self.sha.upper())
+        self.assertEqual(download.run(), self.data)
+        self.assertEqual(download.resumes, 0)
+
+    def test_resume_with_range(self):
+        """测试连接中断后从断点续传"""
+        self.server.cut_after = 100000
+        self.server.cuts = 2
+        download = FirmwareDownload(self.server.url('fw.bin'), expected_sha256=self.sha)
+        self.assertEqual(download.run(), self.data)
+        self.assertEqual(download.resumes, 2)
+        # 续传从最后一个完整的块开始
+        first = int(self.server.requests[1]['Range'][6:-1])
+        self.assertGreater(first, 100000 - CHUNK_SIZE)
+        self.assertEqual(self.server.requests[1]['If-Range'], '"v1"')
+        self.assertGreater(int(self.server.requests[2]['Range'][6:-1]), first + 100000 - CHUNK_SIZE)
+
+    def test_resume_requests_identity_encoding(self):
+        """测试请求不压缩的内容，支持gzip的服务器上续传位置正确"""
+        self.server.gzip = True
+        self.server.cut_after = 100000
+        self.server.cuts = 1
+        download = FirmwareDownload(self.server.url('fw.bin'), expected_sha256=self.sha)
+        self.assertEqual(download.run(), self.data)
+        self.assertEqual([request['Accept-Encoding'] for request in self.server.requests], ['identity'] * 2)
+        self.assertIn('Range', self.server.requests[1])
+
+    def test_resume_encoded_response(self):
+        """测试服务器仍返回压缩内容时续传从头下载，不按解压后的长度发送Range"""
+        self.server.gzip = 'always'
+        self.server.cut_after = 100000
+        self.server.cuts = 1
+        download = FirmwareDownload(self.server.url('fw.bin'), expected_sha256=self.sha)
+        self.assertEqual(download.run(), self.data)
+        self.assertEqual(download.resumes, 1)
+        self.assertNotIn('Range', self.server.requests[1])
+
+    def test_resume_without_range_support(self):
+        """测试服务器不支持Range时从头重新下载"""
+        self.server.support_range = False
+        self.server.cut_after = 1000
+        self.server.cuts = 1
+        self.assertEqual(FirmwareDownload(self.server.url('fw.bin'), expected_sha256=self.sha).run(), self.data)
+
+    def test_resume_limit(self):
+        """测试续传次数用尽后失败"""
+        self.server.cut_after = 10
+        self.server.cuts = 5
+        with self.assertRaises(DownloadError):
+            FirmwareDownload(self.server.url('fw.bin'), max_resumes=2).run()
+
+    def test_declared_size_limit(self):
+        """测试Content-Length超出上限时不读取响应体"""
+        with self.assertRaises(DownloadTooLargeError):
+            FirmwareDownload(self.server.url('fw.bin'), max_bytes=1024).run()
+
+    def test_streaming_size_limit(self):
+        """测试没有Content-Length时在下载过程中检查上限"""
+        self.server.send_length = False
+        download = FirmwareDownload(self.server.url('fw.bin'), max_bytes=200 * 1024)
+        with self.assertRaises(DownloadTooLargeError):
+            download.run()
+        self.assertLessEqual(len(download.data), 200 * 1024)
+
+    def test_hash_mismatch(self):
+        """测试SHA-256不一致"""
+        with self.assertRaises(DownloadHashMismatchError):
+            FirmwareDownload(self.server.url('fw.bin'), expected_sha256='0' * 64).run()
+
+    def test_http_error(self):
+        """测试HTTP错误不重试"""
+        with self.assertRaises(DownloadError):
+            FirmwareDownload(self.server.url('missing.hex')).run()
+        self.assertEqual(len(self.server.requests), 1)
+
+
+class TestFlashFromURL(unittest.TestCase):
+    """从URL烧录测试类"""
+
+    def setUp(self):
+        self.server = FirmwareServer()
+        self.addCleanup(self.server.stop)
+        self.sim = OptibootSimulator()
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        self.config = scratch_config(self, DownloadTestConfig)
+        self.flasher = AVRFlasher(self.config)
+        self.addCleanup(self.flasher.cleanup)
+        self.data = os.urandom(1500)
+
+    def test_binary_firmware(self):
+        """测试二进制固件按字节下载，不被当作文本解码"""
+        self.server.files['fw.bin'] = self.data
+        self.assertEqual(parse_hex(self.flasher.download_hex_file(self.server.url('fw.bin'))).to_bytes(),
+                         self.data)
+
+    def test_flash_from_url(self):
+        """测试下载、校验并烧录，不写入上传目录"""
+        hex_data = FirmwareImage.from_binary(self.data).to_hex()
+        self.server.files['fw.hex'] = hex_data
+        self.server.cut_after = 500
+        self.server.cuts = 1
+        result = self.flasher.flash_from_url(self.server.url('fw.hex'),
+                                             expected_sha256=hashlib.sha256(hex_data).hexdigest(),
+                                             port=self.sim.port)
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(bytes(self.sim.flash[:1500]), self.data)
+        self.assertEqual(os.listdir(self.config.UPLOAD_FOLDER), [])
+
+    def test_hash_mismatch_not_flashed(self):
+        """测试哈希不一致时不烧录"""
+        self.server.files['fw.hex'] = FirmwareImage.from_binary(self.data).to_hex()
+        result = self.flasher.flash_from_url(self.server.url('fw.hex'), expected_sha256='0' * 64,
+                                             port=self.sim.port)
+        self.assertFalse(result['success'])
+        self.assertIn('SHA-256 mismatch', result['message'])
+        self.assertEqual(self.sim.pages_written, 0)
+
+
+
+class TestFlashURLAPI(unittest.TestCase):
+    """/flash/url 接口测试类"""
+
+    def setUp(self):
+        self.api = FlasherAPI(scratch_config(self, DownloadTestConfig))
+        self.client = self.api.app.test_client()
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+
+    def test_sha256_passed(self):
+        """测试请求中的sha256传给下载校验"""
+        sha = 'ab' * 32
+        with patch.object(self.api.flasher, 'flash_from_url', return_value={'success': True}) as flash:
+            self.client.post('/flash/url', json={'url': 'http://example.invalid/a.hex', 'sha256': sha})
+        self.assertEqual(flash.call_args[1]['expected_sha256'], sha)
+
+    def test_invalid_sha256(self):
+        """测试无效的sha256返回400"""
+        response = self.client.post('/flash/url', json={'url': 'http://example.invalid/a.hex', 'sha256': 'xyz'})
+        self.assertEqual(response.status_code, 400)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+固件存储测试
+"""
+
+import sys
+import os
+import io
+import hashlib
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.firmware_store import (
+    FirmwareStore, FirmwareHashMismatchError, FirmwareNotFoundError
+)
+from remote_flasher.hexfile import FirmwareImage, HexFormatError
+from remote_flasher.api_server import FlasherAPI
+from remote_flasher.client import RemoteFlasherClient
+from tests import scratch_config, scratch_dir
+
+
+def make_hex(size, seed=0):
+    return FirmwareImage.from_binary(bytes((seed + i) & 0xFF for i in range(size))).to_hex()
+
+
+class TestFirmwareStore(unittest.TestCase):
+    """固件存储测试类"""
+
+    def setUp(self):
+        self.root = scratch_dir(self)
+        self.store = FirmwareStore(self.root, max_bytes=6000)
+
+    def test_put_deduplicates(self):
+        """测试相同内容只保存一次"""
+        data = make_hex(256)
+        sha = self.store.put(data)
+        self.assertEqual(sha, hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.store.put(data), sha)
+        self.assertEqual(self.store.stats()['images'], 1)
+        with open(self.store.path(sha), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_hash_mismatch(self):
+        """测试声明的哈希与内容不一致"""
+        with self.assertRaises(FirmwareHashMismatchError):
+            self.store.put(make_hex(16), expected_sha='0' * 64)
+
+    def test_invalid_hex_rejected(self):
+        """测试无效HEX不会被保存"""
+        with self.assertRaises(HexFormatError):
+            self.store.put(b':10000000FF\n')
+        self.assertEqual(self.store.stats()['images'], 0)
+
+    def test_lru_eviction_skips_pinned(self):
+        """测试按LRU淘汰且不淘汰正在使用的固件"""
+        first = self.store.put(make_hex(1000, 1))
+        second = self.store.put(make_hex(1000, 2))
+        with self.store.checkout(first):
+            self.store.put(make_hex(1000, 3))
+            self.assertTrue(self.store.has(first))
+            self.assertFalse(self.store.has(second))
+        self.assertLessEqual(self.store.stats()["total_bytes"], 6000)
+
+    def test_reload_from_disk(self):
+        """测试重启后从磁盘恢复"""
+        sha = self.store.put(make_hex(64))
+        reloaded = FirmwareStore(self.root, max_bytes=6000)
+        self.assertTrue(reloaded.has(sha))
+
+    def test_unknown_firmware(self):
+        """测试引用不存在的固件"""
+        with self.assertRaises(FirmwareNotFoundError):
+            self.store.pin('f' * 64)
+
+
+class StoreTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+
+
+class TestFirmwareAPI(unittest.TestCase):
+    """固件存储API测试类"""
+
+    def setUp(self):
+        self.api = FlasherAPI(scratch_config(self, StoreTestConfig))
+        self.client = self.api.app.test_client()
+        self.data = make_hex(128, 7)
+        self.sha = hashlib.sha256(self.data).hexdigest()
+
+    def tearDown(self):
+        self.api.jobs.shutdown(timeout=1)
+        self.api.devices.cleanup()
+
+    def test_head_and_put(self):
+        """测试HEAD/PUT固件"""
+        other = hashlib.sha256(b'missing').hexdigest()
+        self.assertEqual(self.client.head(f'/firmware/{other}').status_code, 404)
+        response = self.client.put(f'/firmware/{self.sha}', data=self.data)
+        self.assertIn(response.status_code, (200, 201))
+        self.assertEqual(self.client.head(f'/firmware/{self.sha}').status_code, 200)
+
+    def test_put_wrong_hash(self):
+        """测试上传内容与URL中的哈希不一致"""
+        response = self.client.put(f'/firmware/{"0" * 64}', data=self.data)
+        self.assertEqual(response.status_code, 400)
+
+    def test_flash_by_hash(self):
+        """测试通过哈希引用固件烧录"""
+        self.client.put(f'/firmware/{self.sha}', data=self.data)
+        with patch.object(self.api.flasher, 'perform_arduino_operation',
+                          side_effect=lambda path, **kw: {'success': True, 'path': path}):
+            data = self.client.post(f'/flash/file?sha256={self.sha}').get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['firmware_sha256'], self.sha)
+        self.assertTrue(data['path'].startswith(self.api.config.FIRMWARE_STORE_DIR))
+
+    def test_flash_unknown_hash(self):
+        """测试引用不存在的固件返回404"""
+        response = self.client.post(f'/flash/file?sha256={"e" * 64}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_upload_stored(self):
+        """测试multipart上传的文件也进入固件存储"""
+        with patch.object(self.api.flasher, 'perform_arduino_operation',
+                          return_value={'success': True}):
+            self.client.post('/flash/file', data={'file': (io.BytesIO(self.data), 'a.hex')},
+                             content_type='multipart/form-data')
+        self.assertTrue(self.api.firmware.has(self.sha))
+
+
+class TestClientUploadSkip(unittest.TestCase):
+    """客户端去重上传测试类"""
+
+    @patch('requests.Session.request')
+    @patch('requests.Session.head')
+    def test_skip_upload_when_stored(self, mock_head, mock_request):
+        """测试服务器已有固件时不再上传"""
+        mock_head.return_value = Mock(status_code=200)
+        mock_request.return_value = Mock(json=Mock(return_value={'success': True}),
+                                         raise_for_status=Mock(return_value=None))
+        with tempfile.NamedTemporaryFile('wb', suffix='.hex', delete=False) as f:
+            f.write(make_hex(32))
+        try:
+            result = RemoteFlasherClient().flash_file(f.name)
+        finally:
+            os.unlink(f.name)
+
+        self.assertTrue(result['success'])
+        mock_request.assert_called_once()
+        kwargs = mock_request.call_args.kwargs
+        self.assertEqual(kwargs['url'], 'http://localhost:5000/flash/file')
+        self.assertNotIn('files', kwargs)
+        self.assertIn('sha256', kwargs['params'])
+
+
+if __name__ == '__main__':
+    unittest.main()
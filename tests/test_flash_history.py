@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+烧录历史与跳过重复烧录测试
+"""
+
+import sys
+import os
+import io
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.flash_history import FlashHistory
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.api_server import FlasherAPI
+from tests import fake_avrdude, scratch_config, scratch_dir
+
+# 模拟avrdude: 记录调用，写入时保存镜像，读取时返回保存的镜像
+FAKE_AVRDUDE = """import os, sys
+state = {state!r}
+op = sys.argv[sys.argv.index('-U') + 1].split(':')
+with open(os.path.join(state, 'calls'), 'a') as f:
+    f.write(op[1] + '\\n')
+if os.path.exists(os.path.join(state, 'fail')):
+    sys.exit(1)
+flash = os.path.join(state, 'flash.hex')
+if op[1] == 'w':
+    with open(op[2], 'rb') as src, open(flash, 'wb') as dst:
+        dst.write(src.read())
+elif op[1] == 'r':
+    with open(flash, 'rb') as src, open(op[2], 'wb') as dst:
+        dst.write(src.read())
+"""
+
+
+class HistoryTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEBUG = False
+    # 假avrdude没有bootloader可以探测
+    DEFAULT_RESET_PROFILE = 'legacy'
+
+
+class TestFlashHistory(unittest.TestCase):
+    """烧录历史存储测试类"""
+
+    def setUp(self):
+        self.path = os.path.join(scratch_dir(self), 'history.json')
+
+    def test_persisted(self):
+        """测试记录写入文件并可被新实例读取"""
+        FlashHistory(self.path).record('/dev/ttyUSB0', 'abc', mcu='atmega328p')
+        record = FlashHistory(self.path).get('/dev/ttyUSB0')
+        self.assertEqual(record['digest'], 'abc')
+        self.assertEqual(record['mcu'], 'atmega328p')
+
+    def test_forget(self):
+        """测试删除记录"""
+        history = FlashHistory(self.path)
+        history.record('/dev/ttyUSB0', 'abc')
+        history.forget('/dev/ttyUSB0')
+        self.assertIsNone(FlashHistory(self.path).get('/dev/ttyUSB0'))
+
+    def test_corrupt_file_ignored(self):
+        """测试损坏的历史文件当作空历史"""
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+        self.assertIsNone(FlashHistory(self.path).get('/dev/ttyUSB0'))
+
+    def test_no_temp_files_left(self):
+        """测试原子替换不留下临时文件"""
+        history = FlashHistory(self.path)
+        for i in range(3):
+            history.record('/dev/ttyUSB0', str(i))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['history.json'])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['/dev/ttyUSB0']['digest'], '2')
+
+
+class TestSkipUnchanged(unittest.TestCase):
+    """跳过重复烧录测试类"""
+
+    def setUp(self):
+        self.state = scratch_dir(self)
+        config = fake_avrdude(self, FAKE_AVRDUDE.format(state=self.state), HistoryTestConfig, self.state)
+        self.flasher = AVRFlasher(config)
+        self.firmware = self._write_hex(bytes(range(256)))
+
+        sleep = patch('remote_flasher.avr_flasher.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def _write_hex(self, data):
+        with tempfile.NamedTemporaryFile('wb', suffix='.hex', dir=self.state, delete=False) as f:
+            f.write(FirmwareImage.from_binary(data).to_hex())
+        return f.name
+
+    def _calls(self):
+        try:
+            with open(os.path.join(self.state, 'calls')) as f:
+                return f.read().split()
+        except FileNotFoundError:
+            return []
+
+    def test_skip_when_unchanged(self):
+        """测试相同固件第二次烧录被跳过，且不复位目标板"""
+        self.assertTrue(self.flasher.perform_arduino_operation(self.firmware)['success'])
+        resets = len(self.flasher.gpio.history)
+
+        result = self.flasher.perform_arduino_operation(self.firmware, if_changed=True)
+        self.assertTrue(result['success'])
+        self.assertTrue(result['skipped'])
+        self.assertFalse(result['confirmed'])
+        self.assertEqual(self._calls(), ['w'])
+        self.assertEqual(len(self.flasher.gpio.history), resets)
+
+    def test_flash_when_changed(self):
+        """测试固件变化时照常烧录"""
+        self.flasher.flash_hex_file(self.firmware)
+        result = self.flasher.flash_hex_file(self._write_hex(b'\x01' * 64), if_changed=True)
+        self.assertTrue(result['success'])
+        self.assertNotIn('skipped', result)
+        self.assertEqual(self._calls(), ['w', 'w'])
+
+    def test_different_port_not_skipped(self):
+        """测试历史按串口区分"""
+        self.flasher.flash_hex_file(self.firmware, port='/dev/ttyUSB0')
+        result = self.flasher.flash_hex_file(self.firmware, port='/dev/ttyUSB1', if_changed=True)
+        self.assertNotIn('skipped', result)
+
+    def test_failed_flash_forgets(self):
+        """测试烧录失败后清除历史"""
+        self.flasher.flash_hex_file(self.firmware)
+        open(os.path.join(self.state, 'fail'), 'w').close()
+        self.assertFalse(self.flasher.flash_hex_file(self._write_hex(b'\x01' * 64))['success'])
+        os.unlink(os.path.join(self.state, 'fail'))
+
+        result = self.flasher.flash_hex_file(self.firmware, if_changed=True)
+        self.assertNotIn('skipped', result)
+
+    def test_readback_confirms(self):
+        """测试回读确认一致时跳过"""
+        self.flasher.flash_hex_file(self.firmware)
+        result = self.flasher.flash_hex_file(self.firmware, if_changed=True, verify_readback=True)
+        self.assertTrue(result['skipped'])
+        self.assertTrue(result['confirmed'])
+        self.assertEqual(self._calls(), ['w', 'r'])
+
+    def test_readback_mismatch_flashes(self):
+        """测试回读内容与历史不一致时重新烧录"""
+        self.flasher.flash_hex_file(self.firmware)
+        # 模拟板子被其他途径改写
+        with open(os.path.join(self.state, 'flash.hex'), 'wb') as f:
+            f.write(FirmwareImage.from_binary(b'\x00' * 256).to_hex())
+
+        result = self.flasher.flash_hex_file(self.firmware, if_changed=True, verify_readback=True)
+        self.assertTrue(result['success'])
+        self.assertNotIn('skipped', result)
+        self.assertEqual(self._calls(), ['w', 'r', 'w'])
+
+
+class TestSkipUnchangedAPI(unittest.TestCase):
+    """跳过重复烧录API测试类"""
+
+    def setUp(self):
+        self.api = FlasherAPI(scratch_config(self, HistoryTestConfig))
+        self.client = self.api.app.test_client()
+
+    def tearDown(self):
+        self.api.jobs.shutdown(timeout=1)
+        self.api.devices.cleanup()
+
+    def test_flags_passed_to_flasher(self):
+        """测试 if_changed/verify_readback 参数传递给烧录器"""
+        with patch.object(self.api.flasher, 'perform_arduino_operation',
+                          return_value={'success': True}) as operation:
+            self.client.post(
+                '/flash/file?if_changed=true',
+                data={'file': (io.BytesIO(b':00000001FF\n'), 'firmware.hex'), 'verify_readback': '1'},
+                content_type='multipart/form-data'
+            )
+        kwargs = operation.call_args[1]
+        self.assertTrue(kwargs['if_changed'])
+        self.assertTrue(kwargs['verify_readback'])
+
+    def test_flags_default_off(self):
+        """测试未指定时不传递跳过参数"""
+        with patch.object(self.api.flasher, 'flash_from_url', return_value={'success': True}) as flash:
+            self.client.post('/flash/url', json={'url': 'http://example.invalid/a.hex'})
+        self.assertNotIn('if_changed', flash.call_args[1])
+
+    def test_devices_share_history(self):
+        """测试所有设备共享同一份烧录历史"""
+        self.assertIs(self.api.devices.resolve(port='/dev/ttyACM0').flasher.history,
+                      self.api.flasher.history)
+
+
+if __name__ == '__main__':
+    unittest.main()
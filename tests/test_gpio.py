@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+GPIO后端测试
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.config import Config, TestingConfig
+from remote_flasher.gpio import (
+    _HANDLE_REQUEST, CharDeviceGPIOBackend, CommandGPIOBackend, FakeGPIOBackend, GPIOError,
+    SysfsGPIOBackend, create_gpio_backend
+)
+from remote_flasher.avr_flasher import AVRFlasher
+
+
+class GPIOTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    RESET_PIN = 17
+
+
+class TestGPIOBackends(unittest.TestCase):
+    """GPIO后端测试类"""
+
+    def test_fake_backend_records_history(self):
+        """测试内存后端记录电平变化"""
+        gpio = FakeGPIOBackend()
+        gpio.setup_output(4, 1)
+        gpio.write(4, 0)
+        self.assertEqual(gpio.read(4), 0)
+        self.assertEqual([value for _, _, value in gpio.history], [1, 0])
+
+    def test_fake_backend_unconfigured_pin(self):
+        """测试读取未配置引脚"""
+        with self.assertRaises(GPIOError):
+            FakeGPIOBackend().read(5)
+
+    def test_create_backend_from_config(self):
+        """测试按配置创建后端"""
+        self.assertIsInstance(create_gpio_backend(GPIOTestConfig), FakeGPIOBackend)
+
+    def test_unknown_backend(self):
+        """测试未知后端名称"""
+        config = type('Cfg', (GPIOTestConfig,), {'GPIO_BACKEND': 'bogus'})
+        with self.assertRaises(ValueError):
+            create_gpio_backend(config)
+
+    @patch('subprocess.run')
+    def test_command_backend(self, mock_run):
+        """测试命令行后端调用gpio工具"""
+        mock_run.return_value = Mock(returncode=0, stdout='1\n')
+        gpio = CommandGPIOBackend()
+        gpio.setup_output(23, 1)
+        gpio.write(23, 0)
+        commands = [call.args[0] for call in mock_run.call_args_list]
+        self.assertIn(['gpio', '-g', 'mode', '23', 'out'], commands)
+        self.assertEqual(commands[-1], ['gpio', '-g', 'write', '23', '0'])
+
+    def test_backends_use_same_numbering(self):
+        """测试所有后端对同一个 RESET_PIN 访问同一条GPIO线 (BCM编号)"""
+        pin = Config.RESET_PIN
+        lines = {}
+
+        requests = []
+        with patch('remote_flasher.gpio.os.open', return_value=1000), \
+                patch('remote_flasher.gpio.fcntl.ioctl', side_effect=lambda fd, op, arg, *a: requests.append(bytes(arg))):
+            CharDeviceGPIOBackend().setup_output(pin, 1)
+        lines['chardev'] = _HANDLE_REQUEST.unpack(requests[0])[0]
+
+        with tempfile.TemporaryDirectory() as root:
+            open(os.path.join(root, 'export'), 'w').close()
+            writes = []
+            with patch.object(SysfsGPIOBackend, '_write_file', side_effect=lambda path, text: writes.append((path, text))), \
+                    patch('remote_flasher.gpio.os.open', return_value=1001) as mock_open:
+                SysfsGPIOBackend(root).setup_output(pin, 1)
+        self.assertEqual(writes[0], (os.path.join(root, 'export'), str(pin)))
+        lines['sysfs'] = int(os.path.basename(os.path.dirname(mock_open.call_args.args[0]))[len('gpio'):])
+
+        with patch('subprocess.run', return_value=Mock(returncode=0, stdout='1\n')) as mock_run:
+            CommandGPIOBackend().setup_output(pin, 1)
+        mode = mock_run.call_args_list[1].args[0]
+        # -g: 命令行工具按BCM编号解释引脚，而不是WiringPi编号
+        self.assertEqual(mode[:3], ['gpio', '-g', 'mode'])
+        lines['command'] = int(mode[3])
+
+        self.assertEqual(lines, {'chardev': 23, 'sysfs': 23, 'command': 23})
+
+    def test_sysfs_backend_keeps_value_open(self):
+        """测试sysfs后端通过常开的value文件写入"""
+        with tempfile.TemporaryDirectory() as root:
+            pin_dir = os.path.join(root, 'gpio6')
+            os.makedirs(pin_dir)
+            open(os.path.join(pin_dir, 'direction'), 'w').close()
+            with open(os.path.join(pin_dir, 'value'), 'w') as f:
+                f.write('1')
+
+            gpio = SysfsGPIOBackend(root)
+            gpio.setup_output(6, 1)
+            gpio.write(6, 0)
+            self.assertEqual(gpio.read(6), 0)
+            with open(os.path.join(pin_dir, 'direction')) as f:
+                self.assertEqual(f.read(), 'high')
+            gpio.close()
+
+
+class TestFlasherReset(unittest.TestCase):
+    """烧录器复位控制测试类"""
+
+    def test_reset_uses_configured_pin(self):
+        """测试复位使用配置的引脚"""
+        gpio = FakeGPIOBackend()
+        flasher = AVRFlasher(GPIOTestConfig, gpio_backend=gpio)
+        self.assertTrue(flasher.gpio_available)
+        self.assertTrue(flasher.reset_target(duration=0))
+        self.assertEqual([(pin, value) for _, pin, value in gpio.history],
+                         [(17, 1), (17, 0), (17, 1)])
+
+    def test_reset_without_backend(self):
+        """测试无GPIO后端时复位失败"""
+        with patch('remote_flasher.avr_flasher.create_gpio_backend', return_value=None):
+            flasher = AVRFlasher(GPIOTestConfig)
+        self.assertFalse(flasher.gpio_available)
+        self.assertFalse(flasher.control_arduino_reset(reset=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
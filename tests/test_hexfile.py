@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Intel HEX解析模块测试
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage, HexFormatError, parse_hex
+from remote_flasher.avr_flasher import AVRFlasher
+
+SAMPLE_HEX = b""":100000000C9434000C943E000C943E000C943E0082
+:100010000C943E000C943E000C943E000C943E0068
+:00000001FF
+"""
+
+
+class TestParseHex(unittest.TestCase):
+    """HEX解析测试类"""
+
+    def test_parse_sample(self):
+        """测试解析普通HEX文件"""
+        image = parse_hex(SAMPLE_HEX)
+        self.assertEqual(image.size, 32)
+        self.assertEqual((image.min_address, image.max_address), (0, 32))
+        self.assertEqual(image.to_bytes()[:4], bytes.fromhex('0C943400'))
+
+    def test_crlf_and_str_input(self):
+        """测试CRLF换行和str输入"""
+        image = parse_hex(SAMPLE_HEX.decode().replace('\n', '\r\n'))
+        self.assertEqual(image.size, 32)
+
+    def test_checksum_mismatch(self):
+        """测试校验和错误并报告行号"""
+        bad = SAMPLE_HEX.replace(b'0068', b'0069')
+        with self.assertRaises(HexFormatError) as ctx:
+            parse_hex(bad)
+        self.assertEqual(ctx.exception.line, 2)
+
+    def test_missing_colon(self):
+        """测试缺少起始冒号"""
+        with self.assertRaises(HexFormatError):
+            parse_hex(SAMPLE_HEX.replace(b':10001000', b'10001000'))
+
+    def test_missing_eof(self):
+        """测试缺少结束记录"""
+        with self.assertRaises(HexFormatError):
+            parse_hex(SAMPLE_HEX.replace(b':00000001FF\n', b''))
+
+    def test_unknown_record_type(self):
+        """测试未知记录类型"""
+        with self.assertRaises(HexFormatError):
+            parse_hex(b':00000006FA\n:00000001FF\n')
+
+    def test_overlapping_records(self):
+        """测试重叠记录"""
+        first = SAMPLE_HEX.splitlines()[0]
+        with self.assertRaises(HexFormatError):
+            parse_hex(first + b'\n' + first + b'\n:00000001FF\n')
+
+    def test_flash_size_limit(self):
+        """测试镜像超出flash大小"""
+        with self.assertRaises(HexFormatError):
+            parse_hex(SAMPLE_HEX, max_address=16)
+
+    def test_round_trip_with_extended_address(self):
+        """测试跨64K边界和空洞的镜像序列化后再解析"""
+        data = os.urandom(5000)
+        image = FirmwareImage([(0x100, bytearray(data[:1000])),
+                               (0xFF00, bytearray(data[1000:]))])
+        parsed = parse_hex(image.to_hex())
+        self.assertEqual(len(parsed.segments), 2)
+        self.assertEqual(parsed.to_bytes(), image.to_bytes())
+        self.assertEqual(parsed.max_address, 0xFF00 + 4000)
+
+    def test_fast_path_detects_bad_checksum(self):
+        """测试批量路径中的校验和错误"""
+        text = bytearray(FirmwareImage.from_binary(bytes(range(256)) * 4).to_hex())
+        lines = text.split(b'\n')
+        lines[20] = lines[20][:-2] + b'00'
+        with self.assertRaises(HexFormatError) as ctx:
+            parse_hex(b'\n'.join(lines))
+        self.assertEqual(ctx.exception.line, 21)
+
+    def test_fast_path_long_records(self):
+        """测试255字节记录的批量路径：字节和超过16位时不溢出，也不因进位漏掉校验和错误"""
+        text = FirmwareImage.from_binary(b'\xff' * 2550, 0x100).to_hex(record_size=255)
+        self.assertEqual(parse_hex(text).to_bytes(), b'\xff' * 2550)
+
+        lines = text.split(b'\n')
+        checksum = int(lines[1][-2:], 16)
+        lines[1] = lines[1][:-2] + b'%02X' % ((checksum - 1) & 0xFF)
+        with self.assertRaises(HexFormatError) as ctx:
+            parse_hex(b'\n'.join(lines))
+        self.assertEqual(ctx.exception.line, 2)
+
+    def test_page_count(self):
+        """测试页数统计"""
+        image = FirmwareImage([(0, bytearray(130)), (200, bytearray(100))])
+        self.assertEqual(image.page_count(128), 3)
+        self.assertEqual(image.to_dict(128)['page_count'], 3)
+
+    def test_pages(self):
+        """测试按页展开镜像，页内空洞填充0xFF"""
+        image = FirmwareImage([(10, bytearray(b'\x01' * 10)), (120, bytearray(b'\x02' * 20))])
+        pages = list(image.pages(128))
+        self.assertEqual([address for address, _ in pages], [0, 128])
+        self.assertEqual(pages[0][1][:10], b'\xff' * 10)
+        self.assertEqual(len(pages[1][1]), 128)
+
+
+class HexTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+
+
+class TestFlasherValidation(unittest.TestCase):
+    """烧录前校验测试类"""
+
+    def test_invalid_hex_rejected_before_reset(self):
+        """测试无效HEX在复位之前被拒绝"""
+        flasher = AVRFlasher(HexTestConfig)
+        with tempfile.NamedTemporaryFile('wb', suffix='.hex', delete=False) as f:
+            f.write(SAMPLE_HEX.replace(b'0068', b'0069'))
+        try:
+            history = len(flasher.gpio.history)
+            result = flasher.flash_hex_file(f.name)
+        finally:
+            os.unlink(f.name)
+        self.assertFalse(result['success'])
+        self.assertIn('checksum', result['message'])
+        self.assertEqual(len(flasher.gpio.history), history)
+
+    def test_oversize_image_for_mcu(self):
+        """测试镜像超出目标MCU的flash大小"""
+        flasher = AVRFlasher(HexTestConfig)
+        with tempfile.NamedTemporaryFile('wb', suffix='.hex', delete=False) as f:
+            f.write(FirmwareImage.from_binary(bytes(2048)).to_hex())
+        try:
+            self.assertFalse(flasher.validate_hex_file(f.name, mcu='attiny13'))
+            self.assertTrue(flasher.validate_hex_file(f.name, mcu='atmega328p'))
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+设备身份缓存测试 (avrdude -v 输出解析、TTL和热插拔失效、MCU自动识别)
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.identity import DeviceIdentity, IdentityCache, parse_avrdude_identity
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+# avrdude 6.x 的 -v 输出 (arduino编程器)
+AVRDUDE6_OUTPUT = """
+         Programmer Type : Arduino
+         Description     : Arduino
+         Hardware Version: 3
+         Firmware Version: 4.4
+avrdude: AVR device initialized and ready to accept instructions
+avrdude: Device signature = 0x1e950f (probably m328p)
+avrdude: safemode: hfuse reads as DE
+avrdude: safemode: efuse reads as 5
+avrdude: safemode: lfuse reads as FF
+avrdude: safemode: Fuses OK (E:FD, H:DE, L:FF)
+"""
+
+
+class TestIdentityParsing(unittest.TestCase):
+    """avrdude输出解析测试类"""
+
+    def test_avrdude6(self):
+        """测试提取签名、熔丝位和bootloader版本"""
+        identity = parse_avrdude_identity(AVRDUDE6_OUTPUT)
+        self.assertEqual(identity, {'signature': '1e950f', 'bootloader': '4.4',
+                                    'fuses': {'lfuse': 'ff', 'hfuse': 'de', 'efuse': '05'}})
+
+    def test_avrdude7_signature(self):
+        """测试avrdude 7.x 按字节输出的签名"""
+        identity = parse_avrdude_identity('avrdude: device signature = 1E 98 01 (ATmega2560)\n')
+        self.assertEqual(identity['signature'], '1e9801')
+        self.assertEqual(identity['fuses'], {})
+
+
+class TestIdentityCache(unittest.TestCase):
+    """IdentityCache测试类"""
+
+    def setUp(self):
+        self.now = [0.0]
+        self.cache = IdentityCache(ttl=10, clock=lambda: self.now[0])
+        fd, self.port = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.port)
+
+    def test_ttl(self):
+        """测试TTL内命中，过期后失效"""
+        self.assertTrue(self.cache.put(self.port, 'arduino', DeviceIdentity('1e950f', 'atmega328p')))
+        self.assertEqual(self.cache.get(self.port, 'arduino').mcu, 'atmega328p')
+        self.assertIsNone(self.cache.get(self.port, 'usbasp'))
+        self.now[0] = 11
+        self.assertIsNone(self.cache.get(self.port, 'arduino'))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_hotplug(self):
+        """测试串口节点被重新创建后失效"""
+        self.cache.put(self.port, 'arduino', DeviceIdentity('1e950f'))
+        fd, replacement = tempfile.mkstemp()
+        os.close(fd)
+        os.replace(replacement, self.port)
+        self.assertIsNone(self.cache.get(self.port, 'arduino'))
+
+        self.cache.put(self.port, 'arduino', DeviceIdentity('1e950f'))
+        os.unlink(self.port)
+        self.assertIsNone(self.cache.get(self.port, 'arduino'))
+        open(self.port, 'w').close()
+
+    def test_invalid_signature(self):
+        """测试无效签名不缓存"""
+        self.assertFalse(self.cache.put(self.port, 'arduino', DeviceIdentity('000000')))
+        self.assertFalse(self.cache.put(self.port, 'arduino', DeviceIdentity(None)))
+        self.assertIsNone(self.cache.get(self.port, 'arduino'))
+
+
+class IdentityTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    PROGRAMMER_BACKEND = 'stk500'
+    STK500_SYNC_TIMEOUT = 0.05
+    RESET_PROFILES = dict(TestingConfig.RESET_PROFILES, fast={
+        'reset_hold': 0.01, 'probe': True, 'probe_interval': 0.02,
+        'boot_timeout': 0.3, 'settle': 0.1, 'restart_hold': 0.01})
+    DEFAULT_RESET_PROFILE = 'fast'
+
+
+class TestIdentityAPI(unittest.TestCase):
+    """设备信息缓存和MCU自动识别测试类"""
+
+    def setUp(self):
+        # ATmega2560，设备配置中没有指定MCU
+        self.sim = OptibootSimulator(b'\x1e\x98\x01', flash_size=262144, page_size=256)
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        config = scratch_config(self, IdentityTestConfig, DEVICES={'mega': {'port': self.sim.port, 'reset_pin': 17}})
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.sim.attach_reset(self.api.devices.gpio, 17)
+        self.client = self.api.app.test_client()
+        self.hex = FirmwareImage.from_binary(os.urandom(600)).to_hex()
+
+    def device(self):
+        return [d for d in self.client.get('/devices').get_json()['devices'] if d['name'] == 'mega'][0]
+
+    def flash(self, **params):
+        return self.client.post('/flash/raw', data=self.hex, content_type='application/octet-stream',
+                                query_string=dict(params, device='mega')).get_json()
+
+    def test_cached_device_info(self):
+        """测试第二次读取设备信息直接返回缓存，不复位目标板"""
+        self.assertEqual((self.device()['mcu'], self.device()['mcu_source']), ('atmega328p', 'default'))
+        result = self.client.get('/device/info?device=mega').get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertFalse(result['cached'])
+        self.assertEqual((result['identity']['mcu'], result['identity']['bootloader']), ('atmega2560', '8.0'))
+        self.assertEqual(self.sim.resets, 1)
+
+        result = self.client.get('/device/info?device=mega').get_json()
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['device_signature'], 'Device signature = 0x1e9801')
+        self.assertEqual(self.sim.resets, 1)
+        self.assertEqual((self.device()['mcu'], self.device()['mcu_source']), ('atmega2560', 'detected'))
+
+        self.client.get('/device/info?device=mega&refresh=true')
+        self.assertEqual(self.sim.resets, 2)
+
+    def test_device_list_single_lookup(self):
+        """测试 /devices 和 /status 对每个设备只查询一次身份缓存"""
+        self.client.get('/device/info?device=mega')
+        cache = self.api.devices.identity
+
+        def lookups():
+            stats = cache.stats()
+            return stats['hits'] + stats['misses']
+
+        for path in ('/devices', '/status'):
+            before = lookups()
+            self.client.get(path)
+            self.assertEqual(lookups() - before, len(self.api.devices.devices()))
+        self.assertEqual((self.device()['mcu'], self.device()['mcu_source']), ('atmega2560', 'detected'))
+
+    def test_flash_uses_detected_mcu(self):
+        """测试未指定MCU的烧录使用识别出的MCU，烧录后只保留确认过的签名"""
+        # 按 DEFAULT_MCU (atmega328p) 烧录时签名不符，身份缓存被删除
+        result = self.flash()
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_class'], 'signature_mismatch')
+
+        self.client.get('/device/info?device=mega')
+        result = self.flash()
+        self.assertTrue(result['success'], result['message'])
+        identity = self.device()['identity']
+        self.assertEqual((identity['mcu'], identity['source']), ('atmega2560', 'flash'))
+
+        self.assertFalse(self.flash(mcu='atmega328p')['success'])
+        self.assertIsNone(self.device()['identity'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+异步任务队列测试
+"""
+
+import sys
+import os
+import io
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.gpio import FakeGPIOBackend
+from remote_flasher.devices import DeviceRegistry
+from remote_flasher.jobs import JobManager, UnknownJobError, JOB_SUCCEEDED, JOB_FAILED
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+
+class JobTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEVICES = {'board1': {'port': '/dev/ttyUSB0', 'reset_pin': 17}}
+
+
+class TestJobManager(unittest.TestCase):
+    """任务管理器测试类"""
+
+    def setUp(self):
+        self.registry = DeviceRegistry(JobTestConfig, gpio_backend=FakeGPIOBackend())
+        self.jobs = JobManager(self.registry, history_size=3)
+
+    def tearDown(self):
+        self.jobs.shutdown(timeout=1)
+
+    def test_job_result(self):
+        """测试任务执行结果"""
+        job = self.jobs.submit(self.registry.default, lambda: {'success': True, 'message': 'ok'})
+        self.assertTrue(job.wait(1))
+        self.assertEqual(job.status, JOB_SUCCEEDED)
+        self.assertEqual(self.jobs.get(job.id).result['message'], 'ok')
+
+    def test_job_exception(self):
+        """测试任务异常转换为失败结果"""
+        def fail():
+            raise RuntimeError('boom')
+
+        job = self.jobs.submit(self.registry.default, fail)
+        job.wait(1)
+        self.assertEqual(job.status, JOB_FAILED)
+        self.assertIn('boom', job.result['error'])
+
+    def test_non_dict_result(self):
+        """测试任务返回非字典结果时标记失败且不会卡住后续任务"""
+        for result in (None, 'ok', ['success']):
+            job = self.jobs.submit(self.registry.default, lambda result=result: result)
+            self.assertTrue(job.wait(1))
+            self.assertEqual(job.status, JOB_FAILED)
+            self.assertIs(job.result, result)
+
+        job = self.jobs.submit(self.registry.default, lambda: {'success': True})
+        self.assertTrue(job.wait(1))
+        self.assertEqual(job.status, JOB_SUCCEEDED)
+
+    def test_acquire_error(self):
+        """测试获取设备失败时任务标记失败并执行清理，工作线程继续处理后续任务"""
+        cleaned = threading.Event()
+        with patch.object(self.registry, 'suspend_serial', side_effect=OSError('port gone')):
+            job = self.jobs.submit(self.registry.default, lambda: {'success': True}, cleanup=cleaned.set)
+            self.assertTrue(job.wait(1))
+        self.assertEqual(job.status, JOB_FAILED)
+        self.assertIn('port gone', job.result['error'])
+        self.assertTrue(cleaned.is_set())
+        self.assertFalse(self.registry.default.busy)
+
+        job = self.jobs.submit(self.registry.default, lambda: {'success': True})
+        self.assertTrue(job.wait(1))
+        self.assertEqual(job.status, JOB_SUCCEEDED)
+
+    def test_jobs_per_device_serialized(self):
+        """测试同一设备的任务按顺序执行，且在设备锁内执行"""
+        order = []
+        device = self.registry.default
+
+        def work(n):
+            self.assertTrue(device.busy)
+            time.sleep(0.02)
+            order.append(n)
+            return {'success': True}
+
+        jobs = [self.jobs.submit(device, lambda n=n: work(n)) for n in range(5)]
+        for job in jobs:
+            job.wait(2)
+        self.assertEqual(order, list(range(5)))
+
+    def test_cleanup_called(self):
+        """测试任务结束后执行清理函数"""
+        cleaned = threading.Event()
+        job = self.jobs.submit(self.registry.default, lambda: {'success': True}, cleanup=cleaned.set)
+        job.wait(1)
+        self.assertTrue(cleaned.is_set())
+
+    def test_on_done_callback(self):
+        """测试任务结束时调用回调，已结束的任务立即调用"""
+        release = threading.Event()
+        called = []
+        job = self.jobs.submit(self.registry.default, lambda: release.wait(1) and {'success': True})
+        job.on_done(lambda: called.append(job.status))
+        self.assertEqual(called, [])
+        release.set()
+        self.assertTrue(job.wait(1))
+        job.on_done(lambda: called.append('late'))
+        self.assertEqual(called, [JOB_SUCCEEDED, 'late'])
+
+    def test_idle_worker_exits(self):
+        """测试空闲的工作线程退出，之后提交的任务重新创建工作线程"""
+        device = self.registry.default
+        with patch('remote_flasher.jobs.WORKER_IDLE_TIMEOUT', 0.05):
+            self.assertTrue(self.jobs.submit(device, lambda: {'success': True}).wait(1))
+            deadline = time.monotonic() + 2
+            while self.jobs._workers and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.jobs._workers, {})
+            job = self.jobs.submit(device, lambda: {'success': True})
+            self.assertTrue(job.wait(1))
+            self.assertEqual(job.status, JOB_SUCCEEDED)
+
+    def test_history_pruned(self):
+        """测试只保留有限数量的已完成任务"""
+        jobs = [self.jobs.submit(self.registry.default, lambda: {'success': True}) for _ in range(5)]
+        jobs[-1].wait(1)
+        self.jobs.submit(self.registry.default, lambda: {'success': True}).wait(1)
+        with self.assertRaises(UnknownJobError):
+            self.jobs.get(jobs[0].id)
+
+
+class TestJobAPI(unittest.TestCase):
+    """任务API测试类"""
+
+    def setUp(self):
+        self.api = FlasherAPI(scratch_config(self, JobTestConfig))
+        self.client = self.api.app.test_client()
+
+    def tearDown(self):
+        self.api.jobs.shutdown(timeout=1)
+        self.api.devices.cleanup()
+
+    def test_async_flash_file(self):
+        """测试异步烧录返回任务ID并可长轮询结果"""
+        flasher = self.api.devices.get('board1').flasher
+        release = threading.Event()
+
+        def fake_operation(hex_file, **kwargs):
+            release.wait(2)
+            return {'success': True, 'message': 'done', 'port': kwargs['port'],
+                    'file_exists': os.path.exists(hex_file)}
+
+        with patch.object(flasher, 'perform_arduino_operation', side_effect=fake_operation):
+            response = self.client.post(
+                '/flash/file?device=board1&async=true',
+                data={'file': (io.BytesIO(b':00000001FF\n'), 'firmware.hex')},
+                content_type='multipart/form-data'
+            )
+            self.assertEqual(response.status_code, 202)
+            job_id = response.get_json()['job_id']
+
+            pending = self.client.get(f'/jobs/{job_id}/wait?timeout=0.05').get_json()
+            self.assertFalse(pending['done'])
+
+            release.set()
+            job = self.client.get(f'/jobs/{job_id}/wait?timeout=2').get_json()
+
+        self.assertEqual(job['status'], JOB_SUCCEEDED)
+        self.assertEqual(job['result']['port'], '/dev/ttyUSB0')
+        self.assertTrue(job['result']['file_exists'])
+
+    def test_sync_flash_returns_result(self):
+        """测试同步请求仍然直接返回结果字典"""
+        with patch.object(self.api.flasher, 'flash_from_url',
+                          return_value={'success': False, 'message': 'Failed to download hex file'}):
+            response = self.client.post('/flash/url', json={'url': 'http://example.invalid/a.hex'})
+        self.assertEqual(response.get_json()['message'], 'Failed to download hex file')
+
+    def test_unknown_job(self):
+        """测试未知任务返回404"""
+        self.assertEqual(self.client.get('/jobs/missing').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
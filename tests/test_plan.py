@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+编程计划测试 (计划检查、一次会话中写入flash和eeprom、avrdude的多个 -U 参数)
+"""
+
+import sys
+import os
+import io
+import json
+import tempfile
+import unittest
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage, parse_hex
+from remote_flasher.avrdude_conf import PartInfo, parse_avrdude_conf
+from remote_flasher.plan import PlanError, build_plan
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.api_server import FlasherAPI
+from tests import fake_avrdude, scratch_config, scratch_dir
+
+AVRDUDE_CONF = """
+programmer
+  id    = "arduino";
+  type  = "arduino";
+;
+
+programmer
+  id    = "usbasp";
+  type  = "usbasp";
+;
+
+part
+    id               = "m328p";
+    desc             = "ATmega328P";
+    signature        = 0x1e 0x95 0x0f;
+    memory "eeprom"
+        size            = 1024;
+        page_size       = 4;
+      ;
+    memory "flash"
+        size            = 32768;
+        page_size       = 128;
+      ;
+    memory "lfuse" size = 1; ;
+    memory "hfuse" size = 1; ;
+    memory "efuse" size = 1; ;
+    memory "lock" size = 1; ;
+;
+
+part
+    id               = "t13";
+    desc             = "ATtiny13";
+    signature        = 0x1e 0x90 0x07;
+    memory "eeprom"
+        size            = 64;
+        page_size       = 4;
+      ;
+    memory "flash"
+        size            = 1024;
+        page_size       = 32;
+      ;
+    memory "lfuse" size = 1; ;
+;
+"""
+
+# 模拟avrdude: 记录参数，检查写入的镜像可读，读取操作写入固定内容
+FAKE_AVRDUDE = """import json, sys
+updates = [sys.argv[i + 1] for i, arg in enumerate(sys.argv) if arg == '-U']
+sizes = []
+for update in updates:
+    memory, op, path = update.split(':')[:3]
+    if op == 'r':
+        data = ':01000000DE21\\n:00000001FF\\n' if memory.endswith('fuse') else ':020000001234B8\\n:00000001FF\\n'
+        with open(path, 'w') as f:
+            f.write(data)
+    elif path.startswith('/'):
+        with open(path, 'rb') as f:
+            sizes.append(len(f.read()))
+with open({log!r}, 'w') as f:
+    json.dump({{'argv': sys.argv[1:], 'sizes': sizes}}, f)
+"""
+
+
+class PlanTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    PROGRAMMER_BACKEND = 'stk500'
+    STK500_SYNC_TIMEOUT = 0.05
+    RESET_PROFILES = dict(TestingConfig.RESET_PROFILES, fast={
+        'reset_hold': 0.01, 'probe': True, 'probe_interval': 0.02,
+        'boot_timeout': 0.3, 'settle': 0.1, 'restart_hold': 0.01})
+    DEFAULT_RESET_PROFILE = 'fast'
+
+
+def write_file(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def hex_of(data):
+    return FirmwareImage.from_binary(data).to_hex().decode()
+
+
+class TestBuildPlan(unittest.TestCase):
+    """计划检查测试类"""
+
+    def setUp(self):
+        parts, _ = parse_avrdude_conf(AVRDUDE_CONF)
+        self.m328p, self.t13 = parts
+
+    def build(self, specs, part=None, programmer='usbasp'):
+        return build_plan(specs, part or self.m328p, programmer, lambda spec: spec.get('data'))
+
+    def test_plan(self):
+        """测试构造计划"""
+        plan = self.build([
+            {'memory': 'flash', 'op': 'write', 'data': b'\x0c\x94' * 100},
+            {'memory': 'EEPROM', 'op': 'write', 'data': hex_of(b'\x01\x02').encode()},
+            {'memory': 'lfuse', 'op': 'write', 'value': '0xFF'},
+            {'memory': 'hfuse', 'op': 'verify', 'value': 0xDE},
+            {'memory': 'lock', 'op': 'read'}])
+        self.assertEqual(plan.memories, ['flash', 'eeprom', 'lfuse', 'hfuse', 'lock'])
+        self.assertEqual(plan.written(), ['flash', 'eeprom', 'lfuse'])
+        self.assertEqual(plan.flash_image().size, 200)
+        self.assertEqual(plan.to_dict()[2], {'memory': 'lfuse', 'op': 'write', 'value': '0xff'})
+        self.assertEqual(plan.to_dict()[1]['size'], 2)
+
+    def test_invalid(self):
+        """测试无效的计划在执行前被拒绝"""
+        cases = [
+            ([], 'non-empty'),
+            ([{'memory': 'sram', 'op': 'write'}], r"operations\[0\]: Unknown memory 'sram'"),
+            ([{'memory': 'flash', 'op': 'erase'}], "Unknown op 'erase'"),
+            ([{'memory': 'lfuse', 'op': 'write', 'value': 256}], 'out of range'),
+            ([{'memory': 'lfuse', 'op': 'write', 'value': 'high'}], 'Invalid byte value'),
+            ([{'memory': 'hfuse', 'op': 'verify'}], 'requires a value'),
+            ([{'memory': 'eeprom', 'op': 'write'}], 'requires hex, sha256 or file'),
+            ([{'memory': 'eeprom', 'op': 'write', 'data': b'\x00' * 1025}], 'exceeds'),
+            ([{'memory': 'lfuse', 'op': 'read'}, {'memory': 'lfuse', 'op': 'write', 'value': 1},
+              {'memory': 'lfuse', 'op': 'write', 'value': 2}], r'operations\[2\]: lfuse is written more than once'),
+        ]
+        for specs, message in cases:
+            with self.subTest(message=message):
+                with self.assertRaisesRegex(PlanError, message):
+                    self.build(specs)
+        with self.assertRaisesRegex(PlanError, 'ATtiny13 has no hfuse memory'):
+            self.build([{'memory': 'hfuse', 'op': 'read'}], self.t13)
+        with self.assertRaisesRegex(PlanError, 'bootloader'):
+            self.build([{'memory': 'lock', 'op': 'write', 'value': 0x3f}], programmer='arduino')
+
+    def test_config_part(self):
+        """测试配置中的MCU (只知道flash) 不限制存储器"""
+        part = PartInfo('atmega8', memories={'flash': {'size': 8192, 'page_size': 64}}, layout_known=False)
+        plan = self.build([{'memory': 'eeprom', 'op': 'read'}, {'memory': 'efuse', 'op': 'read'}], part)
+        self.assertEqual(plan.memories, ['eeprom', 'efuse'])
+        with self.assertRaisesRegex(PlanError, 'exceeds'):
+            self.build([{'memory': 'flash', 'op': 'write', 'data': b'\x00' * 8193}], part)
+
+
+class TestProgramSession(unittest.TestCase):
+    """原生后端在一次会话中写入flash和eeprom测试类"""
+
+    def setUp(self):
+        self.sim = OptibootSimulator()
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        config = scratch_config(
+            self, PlanTestConfig, AVRDUDE_CONF=write_file(scratch_dir(self), 'avrdude.conf', AVRDUDE_CONF),
+            DEVICES={'uno': {'port': self.sim.port, 'reset_pin': 17, 'mcu': 'atmega328p'}})
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.sim.attach_reset(self.api.devices.gpio, 17)
+        self.client = self.api.app.test_client()
+        self.firmware = os.urandom(700)
+
+    def test_flash_and_eeprom(self):
+        """测试flash、eeprom写入和eeprom读取在一次bootloader会话中完成"""
+        eeprom = b'calibration:42'
+        response = self.client.post('/program', json={'device': 'uno', 'operations': [
+            {'memory': 'flash', 'op': 'write', 'hex': hex_of(self.firmware)},
+            {'memory': 'eeprom', 'op': 'write', 'hex': hex_of(eeprom)},
+            {'memory': 'eeprom', 'op': 'read'}]})
+        result = response.get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(result['backend'], 'stk500')
+        # 复位进入bootloader一次，结束后重启一次 (分开烧录flash和eeprom需要两倍)
+        self.assertEqual(self.sim.resets, 2)
+        self.assertEqual(bytes(self.sim.flash[:700]), self.firmware)
+        self.assertEqual(bytes(self.sim.eeprom[:len(eeprom)]), eeprom)
+
+        read = result['results'][2]
+        self.assertEqual(read['size'], 1024)
+        self.assertEqual(parse_hex(read['hex'].encode()).to_bytes()[:len(eeprom)], eeprom)
+        uno = [d for d in self.client.get('/devices').get_json()['devices'] if d['name'] == 'uno'][0]
+        self.assertEqual(uno['identity']['source'], 'flash')
+
+    def test_multipart_files(self):
+        """测试multipart上传的文件和已存储的固件"""
+        sha = self.api.firmware.put(hex_of(self.firmware).encode())
+        response = self.client.post('/program', content_type='multipart/form-data', data={
+            'device': 'uno',
+            'operations': json.dumps([{'memory': 'flash', 'op': 'write', 'sha256': sha},
+                                      {'memory': 'eeprom', 'op': 'write', 'file': 'eeprom'}]),
+            'eeprom': (io.BytesIO(b'\x01\x02\x03\x04'), 'eeprom.bin')})
+        result = response.get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(bytes(self.sim.eeprom[:4]), b'\x01\x02\x03\x04')
+        self.assertEqual(self.sim.resets, 2)
+
+    def test_rejected_before_reset(self):
+        """测试无效的计划在复位目标板之前被拒绝"""
+        cases = [
+            ({'operations': [{'memory': 'lfuse', 'op': 'write', 'value': '0xff'}]}, 400),
+            ({'operations': [{'memory': 'eeprom', 'op': 'write', 'file': 'missing'}]}, 400),
+            ({'operations': [{'memory': 'flash', 'op': 'write', 'sha256': 'ab' * 32}]}, 404),
+            ({'operations': 'flash'}, 400),
+        ]
+        for body, status in cases:
+            with self.subTest(body=body):
+                response = self.client.post('/program', json=dict(body, device='uno'))
+                self.assertEqual(response.status_code, status, response.get_json())
+        self.assertEqual(self.sim.resets, 0)
+
+
+class TestAvrdudePlan(unittest.TestCase):
+    """avrdude在一次运行中执行多个操作测试类"""
+
+    def setUp(self):
+        directory = scratch_dir(self)
+        self.log = os.path.join(directory, 'argv.json')
+        config = fake_avrdude(
+            self, FAKE_AVRDUDE.format(log=self.log), PlanTestConfig, directory,
+            AVRDUDE_CONF=write_file(directory, 'avrdude.conf', AVRDUDE_CONF),
+            DEVICES={'isp': {'port': '/dev/ttyFAKE0', 'programmer': 'usbasp', 'mcu': 'm328p'}})
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.client = self.api.app.test_client()
+
+    def test_single_invocation(self):
+        """测试所有操作按顺序作为 -U 参数传给一次avrdude运行"""
+        eeprom = hex_of(b'\x05' * 16)
+        result = self.client.post('/program', json={'device': 'isp', 'backend': 'stk500', 'operations': [
+            {'memory': 'flash', 'op': 'write', 'hex': hex_of(b'\x0c\x94' * 64)},
+            {'memory': 'eeprom', 'op': 'verify', 'hex': eeprom},
+            {'memory': 'hfuse', 'op': 'write', 'value': '0xde'},
+            {'memory': 'lock', 'op': 'write', 'value': 0x3f},
+            {'memory': 'lfuse', 'op': 'read'},
+            {'memory': 'eeprom', 'op': 'read'}]}).get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(result['backend'], 'avrdude')
+
+        with open(self.log) as f:
+            run = json.load(f)
+        updates = [run['argv'][i + 1] for i, arg in enumerate(run['argv']) if arg == '-U']
+        self.assertEqual([update.split(':')[:2] for update in updates],
+                         [['flash', 'w'], ['eeprom', 'v'], ['hfuse', 'w'], ['lock', 'w'],
+                          ['lfuse', 'r'], ['eeprom', 'r']])
+        self.assertEqual(updates[2:4], ['hfuse:w:0xde:m', 'lock:w:0x3f:m'])
+        self.assertEqual(run['sizes'][1], len(eeprom))
+        self.assertEqual(result['results'][4], {'memory': 'lfuse', 'op': 'read', 'value': '0xde'})
+        self.assertEqual(result['results'][5]['size'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+编程器后端测试 (使用伪终端上的Optiboot模拟器)
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.stk500 import STK500v1, STK500Error
+from remote_flasher.programmers import AvrdudeBackend, STK500Backend
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+import serial
+
+
+class ProgrammerTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    PROGRAMMER_BACKEND = 'stk500'
+
+
+class TestSTK500Protocol(unittest.TestCase):
+    """STK500v1协议测试类"""
+
+    def setUp(self):
+        self.sim = OptibootSimulator()
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        self.conn = serial.Serial(self.sim.port, 115200, timeout=1)
+        self.addCleanup(self.conn.close)
+        self.stk = STK500v1(self.conn)
+
+    def test_sync_and_signature(self):
+        """测试同步和读取签名"""
+        self.assertEqual(self.stk.sync(), 1)
+        self.assertEqual(self.stk.read_signature(), b'\x1e\x95\x0f')
+
+    def test_page_round_trip(self):
+        """测试写入后读回一页"""
+        self.stk.sync()
+        page = bytes(range(128))
+        self.stk.program_page(0x100, page)
+        self.assertEqual(self.stk.read_page(0x100, 128), page)
+        self.assertEqual(bytes(self.sim.flash[0x100:0x180]), page)
+
+    def test_extended_address(self):
+        """测试128KB以上地址使用扩展地址指令"""
+        sim = OptibootSimulator(b'\x1e\x98\x01', flash_size=262144, page_size=256)
+        sim.feed(bytes([0x30, 0x20]))
+        stk = STK500v1(_LoopbackConnection(sim))
+        stk.program_page(0x20000, b'\xaa' * 256)
+        self.assertEqual(sim.flash[0x20000], 0xAA)
+        self.assertEqual(sim.flash[0], 0xFF)
+
+    def test_no_bootloader(self):
+        """测试bootloader无应答时报错"""
+        self.sim.stop()
+        conn = _LoopbackConnection(None)
+        with self.assertRaises(STK500Error):
+            STK500v1(conn).sync(attempts=2, timeout=0.01)
+
+
+class _LoopbackConnection:
+    """直接调用模拟器的内存连接"""
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.timeout = 1
+        self._pending = b''
+
+    def write(self, data):
+        if self.sim is not None:
+            self._pending += self.sim.feed(data)
+        return len(data)
+
+    def read(self, size):
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def reset_input_buffer(self):
+        self._pending = b''
+
+
+class TestSTK500Backend(unittest.TestCase):
+    """原生后端烧录测试类"""
+
+    def setUp(self):
+        self.sim = OptibootSimulator()
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        self.flasher = AVRFlasher(ProgrammerTestConfig)
+        self.addCleanup(self.flasher.cleanup)
+
+        sleep = patch('remote_flasher.avr_flasher.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+        self.data = os.urandom(1000)
+        with tempfile.NamedTemporaryFile('wb', suffix='.hex', delete=False) as f:
+            f.write(FirmwareImage.from_binary(self.data, 0x80).to_hex())
+        self.hex_file = f.name
+        self.addCleanup(os.unlink, self.hex_file)
+
+    def test_flash(self):
+        """测试原生后端写入并校验flash"""
+        result = self.flasher.flash_hex_file(self.hex_file, port=self.sim.port)
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(result['backend'], 'stk500')
+        self.assertLessEqual({'validate', 'reset', 'bootloader_wait', 'program',
+                              'sync', 'write', 'verify', 'restart'}, set(result['timings']))
+        self.assertEqual(bytes(self.sim.flash[0x80:0x80 + 1000]), self.data)
+        # 镜像跨越8页 (0x80-0x468)，页内空洞保持0xFF
+        self.assertEqual(self.sim.pages_written, 8)
+        self.assertEqual(self.sim.flash[0x7F], 0xFF)
+
+    def test_stream_progress(self):
+        """测试流式接口产生进度事件"""
+        events = list(self.flasher.flash_hex_file_stream(self.hex_file, port=self.sim.port))
+        progress = [e for e in events if e['type'] == 'progress']
+        self.assertEqual(progress[-1], {'type': 'progress', 'phase': 'verifying', 'percent': 100,
+                                        'done': 8, 'total': 8})
+        phases = [(e['phase'], e['state']) for e in events if e['type'] == 'phase']
+        self.assertEqual(phases, [('writing', 'start'), ('writing', 'end'), ('verifying', 'start'), ('verifying', 'end')])
+        self.assertEqual(events[-2]['type'], 'success')
+
+    def test_signature_mismatch(self):
+        """测试器件签名与MCU不符时拒绝烧录"""
+        result = self.flasher.flash_hex_file(self.hex_file, port=self.sim.port, mcu='atmega168')
+        self.assertFalse(result['success'])
+        self.assertIn('signature', result['message'])
+        self.assertEqual(self.sim.pages_written, 0)
+
+    def test_verify_readback(self):
+        """测试通过原生后端回读确认跳过烧录"""
+        self.flasher.flash_hex_file(self.hex_file, port=self.sim.port)
+        result = self.flasher.flash_hex_file(self.hex_file, port=self.sim.port,
+                                             if_changed=True, verify_readback=True)
+        self.assertTrue(result['skipped'])
+        self.assertTrue(result['confirmed'])
+
+    def test_device_info(self):
+        """测试读取设备签名"""
+        result = self.flasher.get_device_info(port=self.sim.port)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['device_signature'], 'Device signature = 0x1e950f')
+
+    def test_fallback_to_avrdude(self):
+        """测试不支持的编程器退回avrdude"""
+        self.assertIsInstance(self.flasher.get_backend(programmer='usbasp'), AvrdudeBackend)
+        self.assertIsInstance(self.flasher.get_backend(), STK500Backend)
+        with self.assertRaises(ValueError):
+            self.flasher.get_backend('nope')
+
+
+class TestBackendAPI(unittest.TestCase):
+    """编程器后端API测试类"""
+
+    def setUp(self):
+        self.api = FlasherAPI(scratch_config(self, ProgrammerTestConfig))
+        self.client = self.api.app.test_client()
+
+    def tearDown(self):
+        self.api.jobs.shutdown(timeout=1)
+        self.api.devices.cleanup()
+
+    def test_unknown_backend_rejected(self):
+        """测试未知后端返回400"""
+        response = self.client.get('/device/info?backend=nope')
+        self.assertEqual(response.status_code, 400)
+
+    def test_config_lists_backends(self):
+        """测试配置接口列出可用后端"""
+        data = self.client.get('/config').get_json()
+        self.assertEqual(data['programmer_backend'], 'stk500')
+        self.assertIn('avrdude', data['programmer_backends'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+烧录进度测试 (avrdude输出解析、进度限速和avrdude后端的进度事件)
+"""
+
+import sys
+import os
+import asyncio
+import unittest
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.progress import AvrdudeOutputParser, ProgressThrottle, classify_error
+from remote_flasher.programmers import AvrdudeBackend
+from remote_flasher.avr_flasher import AVRFlasher
+from tests import fake_avrdude, scratch_dir
+
+# avrdude 6.x 通过管道输出时的格式 (stderr不是终端)
+PIPE_OUTPUT = (
+    b"\navrdude: AVR device initialized and ready to accept instructions\n\n"
+    b"Reading | " + b"#" * 50 + b" | 100% 0.00s\n\n"
+    b"avrdude: Device signature = 0x1e950f (probably m328p)\n"
+    b"avrdude: writing flash (1000 bytes):\n\n"
+    b"Writing | " + b"#" * 50 + b" | 100% 0.18s\n\n"
+    b"avrdude: 1000 bytes of flash written\n"
+    b"avrdude: verifying flash memory against x.hex:\n"
+    b"avrdude: reading on-chip flash data:\n\n"
+    b"Reading | " + b"#" * 50 + b" | 100% 0.14s\n\n"
+    b"avrdude: verifying ...\n"
+    b"avrdude: 1000 bytes of flash verified\n\n"
+    b"avrdude done.  Thank you.\n\n"
+)
+
+# 模拟avrdude: 写入一半后等待测试创建go文件 (最多5秒)，再完成进度条
+FAKE_AVRDUDE = """import os, sys, time
+out = sys.stderr.buffer
+out.write(b"avrdude: writing flash (512 bytes):\\n\\nWriting | ")
+for i in range(25):
+    out.write(b"#")
+    out.flush()
+deadline = time.time() + 5
+while not os.path.exists({go!r}) and time.time() < deadline:
+    time.sleep(0.01)
+if not os.path.exists({go!r}):
+    out.write(b"avrdude: stk500_recv(): programmer is not responding\\n")
+    sys.exit(1)
+out.write(b"#" * 25 + b" | 100% 0.30s\\n\\navrdude: 512 bytes of flash written\\n")
+if os.environ.get('FAKE_AVRDUDE_MISMATCH'):
+    out.write(b"avrdude: verification error, first mismatch at byte 0x0040\\n         0x0c != 0xff\\n")
+    sys.exit(1)
+"""
+
+
+def feed_bytewise(parser, data):
+    events = []
+    for i in range(len(data)):
+        events += parser.feed(data[i:i + 1])
+    return events + parser.close()
+
+
+class TestAvrdudeOutputParser(unittest.TestCase):
+    """AvrdudeOutputParser测试类"""
+
+    def test_pipe_output(self):
+        """测试管道格式的进度条逐字节解析为阶段和进度事件"""
+        parser = AvrdudeOutputParser()
+        events = feed_bytewise(parser, PIPE_OUTPUT)
+        phases = [(e['phase'], e['state']) for e in events if e['type'] == 'phase']
+        self.assertEqual(phases, [('initializing', 'start'), ('initializing', 'end'), ('writing', 'start'),
+                                  ('writing', 'end'), ('verifying', 'start'), ('verifying', 'end')])
+        writing = [e for e in events if e['type'] == 'progress' and e['phase'] == 'writing']
+        self.assertEqual([e['percent'] for e in writing], list(range(0, 101, 2)))
+        self.assertEqual((writing[25]['bytes'], writing[25]['total']), (500, 1000))
+        outputs = [e['message'] for e in events if e['type'] == 'output']
+        self.assertIn('avrdude: 1000 bytes of flash written', outputs)
+        self.assertFalse(any('|' in line for line in outputs))
+        self.assertEqual(parser.summary(), {'timings': {'initializing': 0.0, 'writing': 0.18, 'verifying': 0.14},
+                                            'bytes_written': 1000})
+
+    def test_chunking(self):
+        """测试整块输入时只产生到达时的进度，其余事件与逐字节输入相同"""
+        parser = AvrdudeOutputParser()
+        whole = parser.feed(PIPE_OUTPUT) + parser.close()
+        bytewise = feed_bytewise(AvrdudeOutputParser(), PIPE_OUTPUT)
+        self.assertEqual([e for e in whole if e['type'] != 'progress'],
+                         [e for e in bytewise if e['type'] != 'progress'])
+        self.assertEqual([e['percent'] for e in whole if e['type'] == 'progress'], [100, 100, 100])
+
+    def test_tty_output(self):
+        """测试终端格式 (\\r 重绘整行) 的进度条"""
+        frames = b''.join(b'\rWriting | %-50s | %d%% %.2fs' % (b'#' * (p // 2), p, p / 100) for p in (0, 10, 56, 100))
+        events = AvrdudeOutputParser().feed(b'avrdude: writing flash (200 bytes):\n\n' + frames + b'\n\n')
+        self.assertEqual([e['percent'] for e in events if e['type'] == 'progress'], [0, 10, 56, 100])
+        self.assertEqual(events[-1], {'type': 'phase', 'phase': 'writing', 'state': 'end', 'elapsed': 1.0})
+
+    def test_throttle(self):
+        """测试进度事件按间隔限速，100%总是发送"""
+        now = [0.0]
+        parser = AvrdudeOutputParser(interval=0.1, clock=lambda: now[0])
+        events = parser.feed(b'Writing | ')
+        for _ in range(50):
+            now[0] += 0.02
+            events += parser.feed(b'#')
+        events += parser.feed(b' | 100% 1.00s\n')
+        percents = [e['percent'] for e in events if e['type'] == 'progress']
+        self.assertEqual(percents[0], 0)
+        self.assertEqual(percents[-1], 100)
+        self.assertLessEqual(len(percents), 12)
+
+    def test_abort_mid_bar(self):
+        """测试进度条中途出错时结束阶段，同一行的错误信息作为输出"""
+        parser = AvrdudeOutputParser()
+        events = parser.feed(b'Writing | ' + b'#' * 10 + b'avrdude: stk500_recv(): programmer is not responding\n')
+        self.assertEqual(events[-2], {'type': 'phase', 'phase': 'writing', 'state': 'abort', 'percent': 20})
+        self.assertEqual(events[-1]['error_class'], 'not_responding')
+        self.assertEqual(parser.summary()['error_class'], 'not_responding')
+
+    def test_verify_error(self):
+        """测试校验失败的地址和字节值"""
+        parser = AvrdudeOutputParser()
+        events = parser.feed(b'avrdude: verification error, first mismatch at byte 0x0080\n         0x0c != 0xff\n')
+        events += parser.close()
+        mismatch = [e for e in events if e['type'] == 'verify_error']
+        self.assertEqual(len(mismatch), 1)
+        self.assertEqual((mismatch[0]['address'], mismatch[0]['expected'], mismatch[0]['actual']), (0x80, 0x0c, 0xff))
+        self.assertEqual(parser.summary()['error_class'], 'verification')
+
+    def test_classify_error(self):
+        """测试错误分类"""
+        self.assertEqual(classify_error('avrdude: ser_open(): can\'t open device "/dev/ttyUSB0"'), 'port_unavailable')
+        self.assertEqual(classify_error('avrdude: stk500_getsync() attempt 1 of 10: not in sync: resp=0x00'),
+                         'not_in_sync')
+        self.assertEqual(classify_error('avrdude: Expected signature for ATmega328P is 1E 95 0F'),
+                         'signature_mismatch')
+        self.assertEqual(classify_error('avrdude: error: something new'), 'unknown')
+        self.assertIsNone(classify_error('avrdude: 1000 bytes of flash verified'))
+
+    def test_progress_throttle(self):
+        """测试各阶段分别限速"""
+        now = [0.0]
+        throttle = ProgressThrottle(1, clock=lambda: now[0])
+        self.assertTrue(throttle.allow('writing'))
+        self.assertFalse(throttle.allow('writing'))
+        self.assertTrue(throttle.allow('verifying'))
+        self.assertTrue(throttle.allow('writing', final=True))
+        now[0] = 2
+        self.assertTrue(throttle.allow('writing'))
+
+
+class ProgressTestConfig(TestingConfig):
+    LOG_FILE = None
+    PROGRAMMER_BACKEND = 'avrdude'
+    FLASH_PROGRESS_INTERVAL = 0
+    RESET_PROFILES = {'fast': {'reset_hold': 0, 'probe': False, 'probe_interval': 0.05,
+                               'boot_timeout': 0, 'settle': 0, 'restart_hold': 0}}
+    DEFAULT_RESET_PROFILE = 'fast'
+
+
+class TestAvrdudeBackendProgress(unittest.TestCase):
+    """avrdude后端进度事件测试类"""
+
+    def setUp(self):
+        self.go = os.path.join(scratch_dir(self), 'go')
+        config = fake_avrdude(self, FAKE_AVRDUDE.format(go=self.go), ProgressTestConfig)
+        self.flasher = AVRFlasher(config)
+        self.addCleanup(self.flasher.cleanup)
+        self.backend = AvrdudeBackend(self.flasher)
+        self.image = FirmwareImage.from_binary(os.urandom(512))
+
+    def run_program(self):
+        events = []
+        program = self.backend.program(None, self.image)
+        while True:
+            try:
+                event = next(program)
+            except StopIteration as stop:
+                return events, stop.value
+            events.append(event)
+            if event.get('percent') == 50:
+                # 进度条所在的行还没有结束
+                open(self.go, 'w').close()
+
+    def test_progress_before_line_end(self):
+        """测试进度条的字符到达后立即产生进度事件"""
+        events, outcome = self.run_program()
+        self.assertTrue(outcome['success'], events)
+        # 模拟的avrdude在收到50%之前不会继续输出
+        percents = [e['percent'] for e in events if e['type'] == 'progress']
+        self.assertIn(50, percents)
+        self.assertEqual(percents, sorted(percents))
+        self.assertEqual(percents[-1], 100)
+        self.assertEqual(outcome['timings'], {'write': 0.3})
+        self.assertEqual(outcome['bytes_written'], 512)
+
+    def test_failure_details(self):
+        """测试失败结果包含错误类别和校验失败的地址"""
+        os.environ['FAKE_AVRDUDE_MISMATCH'] = '1'
+        self.addCleanup(os.environ.pop, 'FAKE_AVRDUDE_MISMATCH', None)
+        events, outcome = self.run_program()
+        self.assertFalse(outcome['success'])
+        self.assertEqual(outcome['error_class'], 'verification')
+        self.assertEqual(outcome['verify_error']['address'], 0x40)
+
+        stream = list(self.flasher.flash_hex_file_stream(self.image.to_hex()))
+        self.assertEqual(stream[-1]['type'], 'error')
+        self.assertEqual(stream[-1]['error_class'], 'verification')
+
+    def test_async_progress(self):
+        """测试asyncio子进程管道同样按块解析"""
+        open(self.go, 'w').close()
+
+        async def collect():
+            return [event async for event in self.backend.program_async(None, self.image)]
+
+        events = asyncio.run(collect())
+        self.assertEqual(events[-1]['result']['timings'], {'write': 0.3})
+        self.assertEqual([e['percent'] for e in events if e['type'] == 'progress'][-1], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+内存烧录流程测试 (/flash/raw、匿名文件和avrdude内存镜像)
+"""
+
+import sys
+import os
+import hashlib
+import subprocess
+import unittest
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.programmers import anonymous_file, read_anonymous_file
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.api_server import FlasherAPI
+from tests import fake_avrdude, scratch_config, scratch_dir
+
+# 模拟avrdude: 写入时保存镜像，读取时返回保存的镜像
+FAKE_AVRDUDE = """import sys
+op = sys.argv[sys.argv.index('-U') + 1].split(':')
+flash = {flash!r}
+if op[1] == 'w':
+    with open(op[2], 'rb') as src, open(flash, 'wb') as dst:
+        dst.write(src.read())
+elif op[1] == 'r':
+    with open(flash, 'rb') as src, open(op[2], 'wb') as dst:
+        dst.write(src.read())
+"""
+
+
+class RawTestConfig(TestingConfig):
+    LOG_FILE = None
+    DEBUG = False
+    PROGRAMMER_BACKEND = 'stk500'
+    DEFAULT_RESET_PROFILE = 'legacy'
+
+
+class TestAnonymousFile(unittest.TestCase):
+    """匿名文件测试类"""
+
+    def test_child_reads_and_writes(self):
+        """测试子进程通过路径读写匿名文件"""
+        with anonymous_file(b'hello') as (path, fds):
+            subprocess.run([sys.executable, '-c',
+                            'import sys; d = open(sys.argv[1], "rb").read(); '
+                            'open(sys.argv[1], "wb").write(d.upper())', path],
+                           check=True, pass_fds=fds)
+            self.assertEqual(read_anonymous_file(path), b'HELLO')
+        if hasattr(os, 'memfd_create'):
+            self.assertTrue(path.startswith('/dev/fd/'))
+
+
+class TestAvrdudeInMemory(unittest.TestCase):
+    """avrdude后端内存镜像测试类"""
+
+    def setUp(self):
+        self.flash = os.path.join(scratch_dir(self), 'flash.hex')
+        self.config = fake_avrdude(self, FAKE_AVRDUDE.format(flash=self.flash), RawTestConfig,
+                                   PROGRAMMER_BACKEND='avrdude')
+        self.flasher = AVRFlasher(self.config)
+        self.addCleanup(self.flasher.cleanup)
+        self.image = FirmwareImage.from_binary(os.urandom(300))
+
+    def test_flash_and_read_back(self):
+        """测试内存镜像交给avrdude并通过匿名文件回读"""
+        result = self.flasher.flash_hex_file(self.image.to_hex())
+        self.assertTrue(result['success'], result['message'])
+        self.assertTrue(self.image.matches(self.flasher.read_flash()))
+        self.assertEqual(os.listdir(self.config.UPLOAD_FOLDER), [])
+
+
+class TestRawFlashAPI(unittest.TestCase):
+    """/flash/raw 接口测试类"""
+
+    def setUp(self):
+        self.sim = OptibootSimulator()
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        self.api = FlasherAPI(scratch_config(self, RawTestConfig))
+        self.client = self.api.app.test_client()
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.data = os.urandom(700)
+        self.hex = FirmwareImage.from_binary(self.data).to_hex()
+
+    def _post(self, body, content_type='application/octet-stream', **params):
+        params.setdefault('port', self.sim.port)
+        return self.client.post('/flash/raw', data=body, query_string=params,
+                                content_type=content_type)
+
+    def test_flash_without_disk(self):
+        """测试烧录请求体内容，不写入固件存储和上传目录"""
+        response = self._post(self.hex)
+        result = response.get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(bytes(self.sim.flash[:700]), self.data)
+        self.assertEqual(len(result['firmware_sha256']), 64)
+        self.assertEqual(self.api.firmware.stats()['images'], 0)
+        self.assertEqual(os.listdir(self.api.config.UPLOAD_FOLDER), [])
+
+    def test_flash_binary(self):
+        """测试请求体为二进制固件时从地址0开始烧录"""
+        data = b'\x0c\x94' + self.data[2:]
+        response = self._post(data)
+        result = response.get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(bytes(self.sim.flash[:700]), data)
+        self.assertEqual(result['firmware_sha256'], hashlib.sha256(data).hexdigest())
+
+    def test_wrong_content_type(self):
+        """测试非octet-stream请求返回415"""
+        self.assertEqual(self._post(self.hex, content_type='text/plain').status_code, 415)
+
+    def test_hash_mismatch(self):
+        """测试声明的哈希不一致时返回400"""
+        self.assertEqual(self._post(self.hex, sha256='0' * 64).status_code, 400)
+
+    def test_invalid_hex(self):
+        """测试无效内容不复位目标板"""
+        result = self._post(b':00000001FE\nnot hex').get_json()
+        self.assertFalse(result['success'])
+        self.assertIn('Invalid hex', result['message'])
+        self.assertEqual(self.sim.pages_written, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+烧录重试测试 (失败分类、按类别调整参数重试和记住设备上成功时的调整)
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.gpio import FakeGPIOBackend
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.retry import RetryPolicy
+from remote_flasher.timeline import ResetProfile
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.api_server import FlasherAPI
+from tests import fake_avrdude, scratch_dir
+
+RESET_PIN = 4
+
+# 模拟avrdude: 第一次运行时失步 (指定 sync_file 时)，波特率高于57600时校验失败
+FAKE_AVRDUDE = """import os, sys
+baudrate = int(sys.argv[sys.argv.index('-b') + 1])
+out = sys.stderr.buffer
+sync_file = os.environ.get('FAKE_AVRDUDE_SYNC_FILE')
+if sync_file and not os.path.exists(sync_file):
+    open(sync_file, 'w').close()
+    out.write(b"avrdude: stk500_getsync() attempt 10 of 10: not in sync: resp=0x00\\n")
+    sys.exit(1)
+out.write(b"avrdude: writing flash (300 bytes):\\n\\nWriting | " + b"#" * 50 + b" | 100% 0.05s\\n\\n")
+if baudrate > 57600:
+    out.write(b"avrdude: verification error, first mismatch at byte 0x0010\\n         0x0c != 0xff\\n")
+    sys.exit(1)
+"""
+
+
+class RetryTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    PROGRAMMER_BACKEND = 'stk500'
+    STK500_SYNC_TIMEOUT = 0.05
+    STK500_TIMEOUT = 0.2
+    FLASH_RETRY_ATTEMPTS = 3
+    RESET_PROFILES = dict(TestingConfig.RESET_PROFILES, fast={
+        'reset_hold': 0.01, 'probe': True, 'probe_interval': 0.02,
+        'boot_timeout': 0.1, 'settle': 0.1, 'restart_hold': 0.01})
+    DEFAULT_RESET_PROFILE = 'fast'
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """RetryPolicy测试类"""
+
+    def setUp(self):
+        self.policy = RetryPolicy(3, [115200, 57600, 19200], reset_scale=2, max_reset_scale=4)
+
+    def test_actions(self):
+        """测试各失败类别的重试动作"""
+        self.assertEqual(self.policy.next('not_in_sync', {}, {}), ('retry', {}))
+        self.assertEqual(self.policy.next('bootloader_timeout', {}, {}), ('longer_reset', {'reset_scale': 2}))
+        self.assertEqual(self.policy.next('verification', {}, {'baudrate': 115200}),
+                         ('lower_baudrate', {'baudrate': 57600, 'requested_baudrate': 115200}))
+        for error_class in ('bad_image', 'signature_mismatch', 'port_unavailable', 'config_error'):
+            self.assertIsNone(self.policy.next(error_class, {}, {'baudrate': 115200}))
+
+    def test_limits(self):
+        """测试复位时序倍数和波特率用尽后不再重试"""
+        self.assertIsNone(self.policy.next('not_responding', {'reset_scale': 4}, {}))
+        tuning = {'baudrate': 57600, 'requested_baudrate': 115200}
+        self.assertEqual(self.policy.next('verification', tuning, {'baudrate': 57600})[1]['baudrate'], 19200)
+        self.assertIsNone(self.policy.next('verification', {}, {'baudrate': 19200}))
+
+    def test_remembered_tuning(self):
+        """测试记住的波特率只用于请求同一波特率的烧录，复位时序总是使用"""
+        self.policy.succeeded({'reset_scale': 2, 'baudrate': 57600, 'requested_baudrate': 115200}, retried=True)
+        self.assertEqual(self.policy.initial({'baudrate': 115200}),
+                         {'reset_scale': 2, 'baudrate': 57600, 'requested_baudrate': 115200})
+        self.assertEqual(self.policy.initial({'baudrate': 9600}), {'reset_scale': 2})
+        self.assertEqual(RetryPolicy.apply(self.policy.initial({'baudrate': 115200}), {'baudrate': 115200}),
+                         {'baudrate': 57600})
+        self.assertEqual(self.policy.to_dict()['retried_successes'], 1)
+
+    def test_scaled_profile(self):
+        """测试延长复位时序不改变重启时间"""
+        profile = ResetProfile(reset_hold=0.05, boot_timeout=1.0, settle=0.5, restart_hold=0.05).scaled(2)
+        self.assertEqual((profile.reset_hold, profile.boot_timeout, profile.settle, profile.restart_hold),
+                         (0.1, 2.0, 1.0, 0.05))
+
+
+class TestFlashRetry(unittest.TestCase):
+    """烧录失败后自动重试测试类"""
+
+    def setUp(self):
+        self.gpio = FakeGPIOBackend()
+        self.flasher = AVRFlasher(RetryTestConfig, gpio_backend=self.gpio, reset_pin=RESET_PIN)
+        self.addCleanup(self.flasher.cleanup)
+        self.data = os.urandom(600)
+        self.hex = FirmwareImage.from_binary(self.data).to_hex()
+
+    def start_sim(self, **kwargs):
+        sim = OptibootSimulator(**kwargs)
+        sim.start()
+        self.addCleanup(sim.stop)
+        sim.attach_reset(self.gpio, RESET_PIN)
+        return sim
+
+    def test_longer_reset(self):
+        """测试bootloader没有及时应答时延长复位时序重试，下一次烧录直接使用该时序"""
+        # bootloader在释放复位0.15秒后才应答，超过配置的0.1秒
+        sim = self.start_sim(boot_delay=0.15)
+        result = self.flasher.flash_hex_file(self.hex, port=sim.port)
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(result['attempts'], 2)
+        self.assertEqual([(r['error_class'], r['action']) for r in result['retries']],
+                         [('bootloader_timeout', 'longer_reset')])
+        self.assertEqual(bytes(sim.flash[:600]), self.data)
+        self.assertEqual(self.flasher.retry_policy.tuning, {'reset_scale': 2.0})
+
+        result = self.flasher.flash_hex_file(self.hex, port=sim.port)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['attempts'], 1)
+
+    def test_bootloader_lost(self):
+        """测试烧录中bootloader停止应答时延长复位时序重试 (流式接口报告重试事件)"""
+        sim = self.start_sim(sync_loss_after=6)
+        events = []
+        for event in self.flasher.flash_hex_file_stream(self.hex, port=sim.port):
+            events.append(event)
+            if event['type'] == 'retry':
+                sim.sync_loss_after = None
+        retries = [e for e in events if e['type'] == 'retry']
+        self.assertEqual(len(retries), 1)
+        self.assertEqual((retries[0]['error_class'], retries[0]['action']), ('not_responding', 'longer_reset'))
+        self.assertEqual(events[-2]['type'], 'success')
+        self.assertEqual(events[-2]['attempts'], 2)
+        self.assertEqual(bytes(sim.flash[:600]), self.data)
+
+    def test_no_retry(self):
+        """测试签名不符和无效镜像不重试"""
+        sim = self.start_sim()
+        result = self.flasher.flash_hex_file(self.hex, port=sim.port, mcu='atmega168')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_class'], 'signature_mismatch')
+        self.assertEqual(result['attempts'], 1)
+        self.assertEqual(sim.resets, 1)
+
+        result = self.flasher.flash_hex_file(b':00000001FE\nnot hex\n', port=sim.port)
+        self.assertEqual(result['error_class'], 'bad_image')
+        self.assertEqual(sim.resets, 1)
+
+    def test_missing_result(self):
+        """测试编程器没有给出结果 (子进程被结束) 时按失败处理，同步和异步接口都不抛出异常"""
+        sim = self.start_sim()
+        backend = self.flasher.get_backend()
+
+        def program(hex_file, image, **kwargs):
+            yield {'type': 'output', 'message': 'avrdude: writing flash'}
+
+        async def program_async(hex_file, image, **kwargs):
+            yield {'type': 'output', 'message': 'avrdude: writing flash'}
+
+        with patch.object(backend, 'program', program), patch.object(backend, 'program_async', program_async):
+            result = self.flasher.flash_hex_file(self.hex, port=sim.port, max_attempts=1)
+            self.assertFalse(result['success'])
+            self.assertEqual(result['error_class'], 'unknown')
+
+            async def collect():
+                return [event async for event in self.flasher.flash_hex_file_stream_async(
+                    self.hex, port=sim.port, max_attempts=1)]
+
+            events = asyncio.run(collect())
+        self.assertEqual(events[-1]['type'], 'error')
+        self.assertEqual(events[-1]['message'], 'Programmer exited without a result')
+        self.assertEqual(events[-1]['error_class'], 'unknown')
+
+    def test_max_attempts(self):
+        """测试 max_attempts=1 时不重试"""
+        sim = self.start_sim(boot_delay=0.15)
+        result = self.flasher.flash_hex_file(self.hex, port=sim.port, max_attempts=1)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_class'], 'bootloader_timeout')
+        self.assertEqual(result['retries'], [])
+
+
+class TestBaudrateFallback(unittest.TestCase):
+    """校验失败后降低波特率测试类"""
+
+    def setUp(self):
+        config = fake_avrdude(
+            self, FAKE_AVRDUDE, RetryTestConfig, PROGRAMMER_BACKEND='avrdude', DEVICES={'uno': {'port': '/dev/ttyFAKE0'}},
+            RESET_PROFILES={'fast': dict(RetryTestConfig.RESET_PROFILES['fast'], probe=False, settle=0)})
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.client = self.api.app.test_client()
+        self.hex = FirmwareImage.from_binary(os.urandom(300)).to_hex()
+
+    def flash(self, **params):
+        return self.client.post('/flash/raw', data=self.hex, content_type='application/octet-stream',
+                                query_string=dict({'device': 'uno', 'baudrate': 115200}, **params)).get_json()
+
+    def test_lower_baudrate(self):
+        """测试校验失败时降低波特率重试，设备信息中记住成功时的波特率"""
+        result = self.flash()
+        self.assertTrue(result['success'], result)
+        self.assertEqual(result['attempts'], 2)
+        self.assertEqual(result['retries'][0]['error_class'], 'verification')
+        self.assertEqual(result['retries'][0]['action'], 'lower_baudrate')
+
+        device = self.client.get('/devices').get_json()['devices']
+        uno = [d for d in device if d['name'] == 'uno'][0]
+        self.assertEqual(uno['retry']['tuning']['baudrate'], 57600)
+        self.assertEqual(self.flash()['attempts'], 1)
+
+    def test_fast_retry_after_sync_loss(self):
+        """测试失步时按原参数立即重试"""
+        os.environ['FAKE_AVRDUDE_SYNC_FILE'] = os.path.join(scratch_dir(self), 'synced')
+        self.addCleanup(os.environ.pop, 'FAKE_AVRDUDE_SYNC_FILE', None)
+        result = self.flash(baudrate=57600)
+        self.assertTrue(result['success'], result)
+        self.assertEqual([(r['error_class'], r['action']) for r in result['retries']], [('not_in_sync', 'retry')])
+
+    def test_request_max_attempts(self):
+        """测试请求参数 max_attempts"""
+        result = self.flash(max_attempts=1)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_class'], 'verification')
+        self.assertEqual(result['verify_error']['address'], 0x10)
+        response = self.client.post('/flash/raw', data=self.hex, content_type='application/octet-stream',
+                                    query_string={'device': 'uno', 'max_attempts': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+串口TCP桥接测试 (原始字节转发、RFC 2217协商、/serial/open 的 bridge 参数)
+"""
+
+import sys
+import os
+import time
+import select
+import socket
+import tempfile
+import tty
+import unittest
+
+import serial
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.serial_session import SerialSession
+from remote_flasher.serial_bridge import SerialBridge
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+
+class BridgeTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    SERIAL_BRIDGE_HOST = '127.0.0.1'
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class BridgeTestCase(unittest.TestCase):
+    """使用伪终端模拟目标板串口"""
+
+    def setUp(self):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(os.close, slave)
+
+    def device_read(self, size, timeout=5):
+        """从目标板一侧读取size字节"""
+        data = b''
+        deadline = time.monotonic() + timeout
+        while len(data) < size and select.select([self.master], [], [], max(0, deadline - time.monotonic()))[0]:
+            data += os.read(self.master, size - len(data))
+        return data
+
+    def open_session(self, baudrate=115200):
+        session = SerialSession(serial.Serial(self.port, baudrate), 64 * 1024).start()
+        self.addCleanup(session.close)
+        return session
+
+    def connect(self, bridge):
+        sock = socket.create_connection(('127.0.0.1', bridge.port), timeout=5)
+        self.addCleanup(sock.close)
+        return sock
+
+    @staticmethod
+    def recv_exactly(sock, size):
+        data = b''
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+
+class TestSerialBridge(BridgeTestCase):
+    """SerialBridge测试类"""
+
+    def test_raw_relay(self):
+        """测试原始模式双向转发，缓冲区读取不受影响"""
+        session = self.open_session()
+        bridge = session.bridge = SerialBridge(session, '127.0.0.1', 0, protocol='raw').start()
+        sock = self.connect(bridge)
+        self.assertTrue(wait_until(lambda: bridge.client is not None))
+
+        os.write(self.master, b'boot\n\xff\x00')
+        self.assertEqual(self.recv_exactly(sock, 7), b'boot\n\xff\x00')
+        sock.sendall(b'\x01\xffping')
+        self.assertEqual(self.device_read(6), b'\x01\xffping')
+        self.assertEqual(session.read_lines(0)['lines'], ['boot'])
+        self.assertTrue(wait_until(lambda: bridge.stats()['bytes_to_serial'] == 6))
+        self.assertEqual(bridge.stats()['bytes_to_client'], 7)
+
+    def test_rfc2217_client(self):
+        """测试pyserial的RFC 2217客户端设置波特率并转发 (含需要转义的0xFF)"""
+        session = self.open_session()
+        bridge = session.bridge = SerialBridge(session, '127.0.0.1', 0).start()
+        remote = serial.serial_for_url(f'rfc2217://127.0.0.1:{bridge.port}', baudrate=57600, timeout=5)
+        self.addCleanup(remote.close)
+        self.assertEqual(session.conn.baudrate, 57600)
+
+        remote.write(b'\xffcmd\n')
+        self.assertEqual(self.device_read(5), b'\xffcmd\n')
+        os.write(self.master, b'ok\xff\n')
+        self.assertEqual(remote.read(4), b'ok\xff\n')
+
+    def test_single_client(self):
+        """测试同一时间只允许一个客户端，断开后可以重新连接"""
+        session = self.open_session()
+        bridge = session.bridge = SerialBridge(session, '127.0.0.1', 0, protocol='raw').start()
+        first = self.connect(bridge)
+        self.assertTrue(wait_until(lambda: bridge.client is not None))
+        second = self.connect(bridge)
+        self.assertEqual(second.recv(1), b'')
+        self.assertEqual(bridge.rejected, 1)
+
+        first.close()
+        self.assertTrue(wait_until(lambda: bridge.client is None))
+        third = self.connect(bridge)
+        self.assertTrue(wait_until(lambda: bridge.client is not None))
+        os.write(self.master, b'x')
+        self.assertEqual(third.recv(1), b'x')
+
+    def test_session_close_disconnects(self):
+        """测试关闭串口会话时断开客户端并停止监听"""
+        session = self.open_session()
+        bridge = session.bridge = SerialBridge(session, '127.0.0.1', 0, protocol='raw').start()
+        sock = self.connect(bridge)
+        self.assertTrue(wait_until(lambda: bridge.client is not None))
+        session.close()
+        self.assertEqual(sock.recv(1), b'')
+        self.assertRaises(OSError, socket.create_connection, ('127.0.0.1', bridge.port), 1)
+
+    def test_client_closed_before_serve(self):
+        """测试客户端在设置套接字选项前已被并发关闭时仍释放连接槽位"""
+        from remote_flasher.serial_bridge import _BridgeClient
+
+        session = self.open_session()
+        bridge = session.bridge = SerialBridge(session, '127.0.0.1', 0, protocol='raw').start()
+        left, right = socket.socketpair()
+        self.addCleanup(right.close)
+        client = bridge.client = _BridgeClient(left, ('127.0.0.1', 0), session.buffer.end)
+        client.close()
+
+        bridge._serve(client)
+        self.assertIsNone(bridge.client)
+        sock = self.connect(bridge)
+        self.assertTrue(wait_until(lambda: bridge.client is not None))
+        os.write(self.master, b'x')
+        self.assertEqual(sock.recv(1), b'x')
+
+    def test_invalid_options(self):
+        """测试无效的协议和批量参数"""
+        session = self.open_session()
+        self.assertRaises(ValueError, SerialBridge, session, protocol='telnet')
+        self.assertRaises(ValueError, SerialBridge, session, batch_delay=-1)
+
+
+class TestSerialBridgeAPI(BridgeTestCase):
+    """/serial/open 的 bridge 参数测试类"""
+
+    def setUp(self):
+        super().setUp()
+        self.api = FlasherAPI(scratch_config(self, BridgeTestConfig))
+        self.client = self.api.app.test_client()
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+
+    def test_open_with_bridge(self):
+        """测试打开串口时开启桥接，状态中包含桥接统计，关闭串口时停止桥接"""
+        result = self.client.post('/serial/open', json={'port': self.port, 'baudrate': 115200,
+                                                        'bridge': {'protocol': 'raw'}}).get_json()
+        self.assertTrue(result['success'])
+        bridge = result['bridge']
+        self.assertEqual(bridge['protocol'], 'raw')
+        self.assertTrue(bridge['nodelay'])
+
+        sock = socket.create_connection(('127.0.0.1', bridge['port']), timeout=5)
+        self.addCleanup(sock.close)
+        sock.sendall(b'hello')
+        self.assertEqual(self.device_read(5), b'hello')
+        self.assertTrue(wait_until(lambda: self.client.get('/serial/status').get_json()
+                                   ['connections'][0]['bridge']['bytes_to_serial'] == 5))
+
+        self.client.post('/serial/close', json={'port': self.port, 'baudrate': 115200})
+        self.assertEqual(sock.recv(1), b'')
+
+    def test_open_without_bridge(self):
+        """测试默认不开启桥接"""
+        result = self.client.post('/serial/open', json={'port': self.port, 'baudrate': 115200}).get_json()
+        self.addCleanup(self.client.post, '/serial/close', json={'port': self.port, 'baudrate': 115200})
+        self.assertIsNone(result['bridge'])
+
+    def test_invalid_bridge_options(self):
+        """测试无效的桥接参数返回400，且不保留串口连接"""
+        response = self.client.post('/serial/open', json={'port': self.port, 'baudrate': 115200,
+                                                          'bridge': {'protocol': 'telnet'}})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/serial/status').get_json()['total_connections'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+串口抓包测试 (记录格式、稀疏时间索引、时间范围查询和 /serial/<id>/capture)
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import tty
+import unittest
+
+import serial
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.serial_capture import SerialCapture, CaptureReader, RX, TX, MAGIC, HEADER
+from remote_flasher.serial_session import SerialSession
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+SECOND = 1000000000
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestSerialCapture(unittest.TestCase):
+    """SerialCapture测试类"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.capture = SerialCapture(os.path.join(self.tmp, 'test.cap'), index_interval=1024)
+        self.addCleanup(self.capture.close)
+        with self.capture.reader() as reader:
+            self.wall_time, self.base = reader.wall_time, reader.monotonic_ns
+
+    def write_records(self, count, step=SECOND // 100):
+        """每条记录间隔step纳秒 (默认10毫秒)"""
+        for i in range(count):
+            self.capture.write(RX if i % 2 == 0 else TX, b'record %05d\n' % i, self.base + i * step)
+
+    def at(self, index, step=SECOND // 100):
+        """第index条记录的系统时间"""
+        return self.wall_time + index * step / SECOND
+
+    def test_read_window(self):
+        """测试按时间范围读取"""
+        self.write_records(100)
+        # 系统时间为浮点数，边界取在两条记录之间
+        records = list(self.capture.read(self.at(9.5), self.at(12.5)))
+        self.assertEqual([r[2] for r in records], [b'record 00010\n', b'record 00011\n', b'record 00012\n'])
+        self.assertEqual([r[1] for r in records], ['rx', 'tx', 'rx'])
+        self.assertAlmostEqual(records[0][0], self.at(10), places=6)
+        self.assertEqual(len(list(self.capture.read())), 100)
+        self.assertEqual(len(list(self.capture.read(start=self.at(94.5)))), 5)
+        self.assertEqual(list(self.capture.read(self.at(200), self.at(300))), [])
+
+    def test_sparse_index(self):
+        """测试索引只记录每个间隔的第一条记录，查询只扫描目标之前的一个间隔"""
+        self.write_records(10000)
+        with self.capture.reader() as reader:
+            # 每条记录26字节，索引间隔1024字节
+            self.assertAlmostEqual(reader.index_count, 10000 * 26 / 1024, delta=10)
+            offset = reader.seek(self.base + 5000 * SECOND // 100)
+            target = HEADER.size + 5000 * 26
+            self.assertLessEqual(offset, target)
+            self.assertLess(target - offset, 1024 + 26)
+
+            records = list(reader.records(self.at(4999.5), self.at(5001.5)))
+        self.assertEqual([r[2] for r in records], [b'record 05000\n', b'record 05001\n'])
+
+    def test_unflushed_records_visible(self):
+        """测试查询前写入的记录立即可见"""
+        self.write_records(3)
+        self.assertEqual(len(list(self.capture.read())), 3)
+        self.capture.write(TX, b'late', self.base + SECOND)
+        self.assertEqual(list(self.capture.read(self.at(1, SECOND)))[0][2], b'late')
+
+    def test_export_roundtrip(self):
+        """测试导出的原始抓包可以再次读取"""
+        self.write_records(100)
+        exported = os.path.join(self.tmp, 'window.cap')
+        with open(exported, 'wb') as f:
+            for chunk in self.capture.export(self.at(19.5), self.at(29.5)):
+                f.write(chunk)
+        with CaptureReader(exported) as reader:
+            records = list(reader.records())
+        self.assertEqual(len(records), 10)
+        self.assertEqual(records[0][2], b'record 00020\n')
+        self.assertAlmostEqual(records[0][0], self.at(20), places=6)
+
+    def test_not_a_capture(self):
+        """测试打开非抓包文件"""
+        path = os.path.join(self.tmp, 'other.bin')
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        self.assertRaises(ValueError, CaptureReader, path)
+
+    def test_closed_capture_readable(self):
+        """测试关闭后仍可读取，不再写入"""
+        self.write_records(5)
+        self.capture.close()
+        self.capture.write(RX, b'ignored')
+        self.assertEqual(len(list(self.capture.read())), 5)
+
+
+class TestCaptureSession(unittest.TestCase):
+    """串口会话抓包和 /serial/<id>/capture 测试类"""
+
+    def setUp(self):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(os.close, slave)
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test_session_records_both_directions(self):
+        """测试会话记录接收和发送的数据"""
+        session = SerialSession(serial.Serial(self.port, 115200), 4096)
+        session.capture = SerialCapture(os.path.join(self.tmp, 'session.cap'))
+        session.start()
+        self.addCleanup(session.close)
+
+        os.write(self.master, b'hello\n')
+        self.assertTrue(wait_until(lambda: session.buffer.end == 6))
+        session.write(b'cmd\n')
+        self.assertEqual(os.read(self.master, 16), b'cmd\n')
+        records = [(r[1], r[2]) for r in session.capture.read()]
+        self.assertEqual(records, [('rx', b'hello\n'), ('tx', b'cmd\n')])
+        self.assertEqual(session.stats()['capture']['records'], 2)
+
+    def test_capture_api(self):
+        """测试打开串口时开启抓包，按时间范围读取，关闭串口后仍可读取"""
+        config = scratch_config(self, TestingConfig, UPLOAD_FOLDER=self.tmp, LOG_FILE=None,
+                                SERIAL_CAPTURE_DIR=self.tmp)
+        api = FlasherAPI(config)
+        self.addCleanup(api.devices.cleanup)
+        self.addCleanup(api.jobs.shutdown, timeout=1)
+        client = api.app.test_client()
+        params = {'port': self.port, 'baudrate': 115200}
+        result = client.post('/serial/open', json=dict(params, capture=True)).get_json()
+        self.assertTrue(result['capture'].startswith(self.tmp))
+        session = api.app.serial_connections[f'{self.port}_115200']
+
+        os.write(self.master, b'before\n')
+        self.assertTrue(wait_until(lambda: session.buffer.end == 7))
+        time.sleep(0.05)
+        middle = time.time()
+        time.sleep(0.05)
+        client.post('/serial/write', json=dict(params, data='reset'))
+        os.write(self.master, b'after\n')
+        self.assertTrue(wait_until(lambda: session.buffer.end == 13))
+        client.post('/serial/close', json=params)
+
+        url = f'/serial{self.port}_115200/capture'
+        response = client.get(url, query_string={'from': middle})
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(records[0]['dir'], 'tx')
+        self.assertEqual(records[0]['data'], 'reset\n')
+        self.assertGreaterEqual(records[0]['time'], middle)
+        # 接收的数据可能分多次读取
+        self.assertEqual({r['dir'] for r in records[1:]}, {'rx'})
+        self.assertEqual(''.join(r['data'] for r in records[1:]), 'after\n')
+
+        response = client.get(url, query_string={'to': middle, 'format': 'raw'})
+        self.assertEqual(response.get_data()[:len(MAGIC)], MAGIC)
+        exported = os.path.join(self.tmp, 'before.cap')
+        with open(exported, 'wb') as f:
+            f.write(response.get_data())
+        with CaptureReader(exported) as reader:
+            self.assertEqual(b''.join(r[2] for r in reader.records()), b'before\n')
+
+        self.assertEqual(client.get(url, query_string={'from': 'yesterday'}).status_code, 400)
+        self.assertEqual(client.get(url, query_string={'format': 'pcap'}).status_code, 400)
+        self.assertEqual(client.get('/serial/dev/ttyNONE_9600/capture').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+串口会话测试 (环形缓冲区、后台读取线程和 /serial/read 游标)
+"""
+
+import sys
+import os
+import time
+import tempfile
+import tty
+import threading
+import unittest
+
+import requests
+import serial
+from werkzeug.serving import make_server
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.serial_session import RingBuffer, SerialSession
+from remote_flasher.api_server import FlasherAPI
+from remote_flasher.async_server import AsyncFlasherServer
+from remote_flasher.client import RemoteFlasherClient
+from tests import scratch_config
+
+
+class SerialTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEBUG = False
+    SERIAL_BUFFER_SIZE = 4096
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestRingBuffer(unittest.TestCase):
+    """环形缓冲区测试类"""
+
+    def test_read_from_cursor(self):
+        """测试从游标读取新数据"""
+        buffer = RingBuffer(16)
+        buffer.append(b'hello ')
+        data, cursor, dropped = buffer.read(0)
+        self.assertEqual((data, cursor, dropped), (b'hello ', 6, 0))
+        buffer.append(b'world')
+        self.assertEqual(buffer.read(cursor), (b'world', 11, 0))
+        self.assertEqual(buffer.read(11), (b'', 11, 0))
+
+    def test_overwrite_reports_dropped(self):
+        """测试写满后覆盖最旧数据并报告丢失的字节数"""
+        buffer = RingBuffer(8)
+        buffer.append(b'0123456789')
+        self.assertEqual(buffer.read(0), (b'23456789', 10, 2))
+        buffer.append(b'abc')
+        self.assertEqual(buffer.read(6), (b'6789abc', 13, 0))
+        self.assertEqual(buffer.read(4), (b'56789abc', 13, 1))
+        # 单次写入超过容量
+        buffer.append(b'x' * 20)
+        self.assertEqual(buffer.read(33, max_bytes=4), (b'', 33, 0))
+        self.assertEqual(buffer.read(25, max_bytes=4), (b'xxxx', 29, 0))
+
+    def test_lines_across_wrap(self):
+        """测试跨越缓冲区边界的行和未结束的行"""
+        buffer = RingBuffer(16)
+        buffer.append(b'aaaaaaa\nbbbb')
+        lines, cursor, _ = buffer.read_lines(0)
+        self.assertEqual((lines, cursor), ([b'aaaaaaa\n'], 8))
+        buffer.append(b'bbbb\ncc\n')
+        lines, cursor, dropped = buffer.read_lines(cursor)
+        self.assertEqual((lines, cursor, dropped), ([b'bbbbbbbb\n', b'cc\n'], 20, 0))
+
+        buffer.append(b'dd\nee\nff\n')
+        lines, cursor, dropped = buffer.read_lines(8, max_lines=2)
+        self.assertEqual(dropped, 5)
+        self.assertEqual(lines, [b'bbb\n', b'cc\n'])
+        self.assertEqual(buffer.read_lines(cursor)[0], [b'dd\n', b'ee\n', b'ff\n'])
+
+    def test_line_index_compaction(self):
+        """测试大量短行时索引不会无限增长"""
+        buffer = RingBuffer(64)
+        for i in range(10000):
+            buffer.append(b'%d\n' % i)
+        self.assertLess(len(buffer._line_ends), 3000)
+        lines, _, _ = buffer.read_lines(buffer.end - 5)
+        self.assertEqual(lines[-1], b'9999\n')
+
+
+    def test_gap_splits_line(self):
+        """测试中断处截断未结束的行并按偏移查询"""
+        buffer = RingBuffer(64)
+        buffer.append(b'a\npart')
+        buffer.mark_gap({'reason': 'flash'})
+        buffer.append(b'ial\n')
+        buffer.mark_gap({'reason': 'flash'})
+        lines, _, _ = buffer.read_lines(0)
+        self.assertEqual(lines, [b'a\n', b'part', b'ial\n'])
+        self.assertEqual([gap['offset'] for gap in buffer.gaps_between(0, buffer.end + 1)], [6, 10])
+        self.assertEqual(buffer.gaps_between(0, 6), [])
+
+
+class SerialPortTestCase(unittest.TestCase):
+    """使用伪终端模拟目标板串口"""
+
+    def setUp(self):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(os.close, slave)
+
+    def device_write(self, data):
+        os.write(self.master, data)
+
+
+class TestSerialSession(SerialPortTestCase):
+    """后台读取线程测试类"""
+
+    def test_burst_larger_than_kernel_buffer(self):
+        """测试客户端不轮询时也不会丢失超过内核缓冲区的输出"""
+        session = SerialSession(serial.Serial(self.port, 115200), 64 * 1024).start()
+        self.addCleanup(session.close)
+        expected = b''.join(b'line %05d\n' % i for i in range(2000))
+        for offset in range(0, len(expected), 1024):
+            self.device_write(expected[offset:offset + 1024])
+        self.assertTrue(wait_until(lambda: session.buffer.end == len(expected)))
+
+        result = session.read_lines(0, max_lines=5000)
+        self.assertEqual(len(result['lines']), 2000)
+        self.assertEqual(result['lines'][-1], 'line 01999')
+        self.assertEqual(result['dropped'], 0)
+
+    def test_default_cursor(self):
+        """测试不指定since时只返回上一次读取之后的新行"""
+        session = SerialSession(serial.Serial(self.port, 115200), 4096).start()
+        self.addCleanup(session.close)
+        self.device_write(b'first\nsecond\npart')
+        self.assertTrue(wait_until(lambda: session.buffer.end == 17))
+        self.assertEqual(session.read_lines()['lines'], ['first', 'second'])
+        self.device_write(b'ial\n')
+        self.assertTrue(wait_until(lambda: session.buffer.end == 21))
+        self.assertEqual(session.read_lines()['lines'], ['partial'])
+        self.assertEqual(session.read_lines()['lines'], [])
+        # 指定游标的读取不影响默认游标
+        self.assertEqual(session.read_lines(0)['lines'], ['first', 'second', 'partial'])
+
+    def test_suspend_and_resume(self):
+        """测试暂停时释放串口、丢弃写入，恢复后继续写入同一缓冲区并记录中断"""
+        session = SerialSession(serial.Serial(self.port, 115200), 4096).start()
+        self.addCleanup(session.close)
+        self.device_write(b'before\npart')
+        self.assertTrue(wait_until(lambda: session.buffer.end == 11))
+
+        self.assertTrue(session.suspend())
+        self.assertFalse(session.suspend())
+        self.assertFalse(session.conn.is_open)
+        self.assertTrue(session.is_open)
+        self.assertEqual(session.write(b'ignored'), 0)
+        self.assertTrue(session.stats()['suspended'])
+
+        self.assertTrue(session.resume())
+        self.device_write(b'after\n')
+        self.assertTrue(wait_until(lambda: session.buffer.end == 17))
+        result = session.read_lines(0)
+        self.assertEqual(result['lines'], ['before', 'part', 'after'])
+        self.assertEqual([(gap['offset'], gap['reason']) for gap in result['gaps']], [(11, 'flash')])
+        self.assertEqual(session.stats()['gaps'], 1)
+        self.assertIsNone(session.error)
+
+    def test_close_while_suspended(self):
+        """测试暂停期间关闭会话，恢复不再打开串口"""
+        session = SerialSession(serial.Serial(self.port, 115200), 4096).start()
+        session.suspend()
+        session.close()
+        self.assertFalse(session.is_open)
+        self.assertFalse(session.resume())
+        self.assertFalse(session.conn.is_open)
+
+    def test_close_stops_reader(self):
+        """测试关闭会话后读取线程退出"""
+        session = SerialSession(serial.Serial(self.port, 115200), 4096).start()
+        session.close()
+        self.assertFalse(session.is_open)
+        self.assertIsNone(session.error)
+
+
+class TestSerialAPI(SerialPortTestCase):
+    """/serial 接口测试类"""
+
+    def setUp(self):
+        super().setUp()
+        self.api = FlasherAPI(scratch_config(self, SerialTestConfig))
+        self.client = self.api.app.test_client()
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        response = self.client.post('/serial/open', json={'port': self.port, 'baudrate': 115200})
+        self.assertTrue(response.get_json()['success'])
+        self.addCleanup(self.client.post, '/serial/close', json={'port': self.port, 'baudrate': 115200})
+        self.session = self.api.app.serial_connections[f'{self.port}_115200']
+
+    def read(self, **kwargs):
+        return self.client.post('/serial/read', json=dict(port=self.port, baudrate=115200, **kwargs)).get_json()
+
+    def test_read_with_cursor(self):
+        """测试用since游标读取，不访问串口"""
+        self.device_write(b'boot ok\nvalue=1\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 16))
+        result = self.read(since=0)
+        self.assertEqual(result['data'], ['boot ok', 'value=1'])
+        self.assertEqual((result['next'], result['dropped']), (16, 0))
+
+        self.device_write(b'value=2\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 24))
+        self.assertEqual(self.read(since=result['next'])['data'], ['value=2'])
+        # 旧客户端不指定since
+        self.assertEqual(self.read()['data'], ['boot ok', 'value=1', 'value=2'])
+        self.assertEqual(self.read()['data'], [])
+
+    def test_dropped_after_overflow(self):
+        """测试缓冲区被覆盖后报告丢失的字节数"""
+        self.device_write(b'x' * 100 + b'\n' + b'y' * 5000 + b'\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 5102))
+        result = self.read(since=0)
+        self.assertEqual(result['dropped'], 5102 - SerialTestConfig.SERIAL_BUFFER_SIZE)
+        self.assertEqual(result['next'], 5102)
+
+    def test_invalid_since(self):
+        """测试无效的since返回400"""
+        response = self.client.post('/serial/read', json={'port': self.port, 'baudrate': 115200, 'since': -1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_status(self):
+        """测试状态中包含缓冲区信息"""
+        connection = self.client.get('/serial/status').get_json()['connections'][0]
+        self.assertTrue(connection['is_open'])
+        self.assertEqual(connection['buffer_size'], SerialTestConfig.SERIAL_BUFFER_SIZE)
+
+    def test_write(self):
+        """测试写入仍然直接发送到串口"""
+        result = self.client.post('/serial/write', json={'port': self.port, 'baudrate': 115200,
+                                                         'data': 'ping'}).get_json()
+        self.assertTrue(result['success'])
+        self.assertEqual(os.read(self.master, 16), b'ping\n')
+
+
+class TestSerialSubscriber(SerialPortTestCase):
+    """串口订阅者测试类"""
+
+    def setUp(self):
+        super().setUp()
+        self.session = SerialSession(serial.Serial(self.port, 115200), 4096).start()
+        self.addCleanup(self.session.close)
+
+    def receive(self, subscriber, count):
+        """接收指定行数"""
+        lines = []
+        while len(lines) < count and subscriber.wait(2):
+            for event in subscriber.poll():
+                lines.extend(event.get('lines', []))
+        return lines
+
+    def test_independent_cursors(self):
+        """测试订阅者各自维护游标，新订阅者默认只接收新数据"""
+        self.device_write(b'old\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 4))
+        first = self.session.subscribe(since=0)
+        second = self.session.subscribe()
+        self.device_write(b'new\n')
+        self.assertEqual(self.receive(first, 2), ['old', 'new'])
+        self.assertEqual(self.receive(second, 1), ['new'])
+        self.assertEqual(self.session.stats()['subscribers'], 2)
+        self.session.unsubscribe(first)
+        self.assertEqual(self.session.stats()['subscribers'], 1)
+
+    def test_partial_line_does_not_wake(self):
+        """测试未结束的行不会让订阅者反复被唤醒"""
+        subscriber = self.session.subscribe()
+        self.device_write(b'no newline yet')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 14))
+        self.assertTrue(subscriber.wait(2))
+        self.assertEqual(subscriber.poll(), [])
+        self.assertFalse(subscriber.wait(0.2))
+        self.device_write(b'\n')
+        self.assertEqual(self.receive(subscriber, 1), ['no newline yet'])
+
+    def test_slow_subscriber_dropped(self):
+        """测试落后超过max_lag时跳到最近的行首并记录丢弃的字节数"""
+        subscriber = self.session.subscribe(max_lag=100)
+        self.device_write(b''.join(b'line %03d\n' % i for i in range(100)))
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 900))
+        events = subscriber.poll()
+        self.assertEqual(events[0]['type'], 'dropped')
+        self.assertEqual(events[0]['bytes'], 900 - 99)
+        self.assertEqual(events[1]['lines'][0], 'line 089')
+        self.assertEqual(subscriber.dropped, 801)
+
+    def test_gap_event(self):
+        """测试中断事件位于中断前后的行之间"""
+        subscriber = self.session.subscribe()
+        self.device_write(b'one\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 4))
+        self.session.suspend()
+        self.session.resume()
+        self.device_write(b'two\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 8))
+        events = subscriber.poll()
+        self.assertEqual([event['type'] for event in events], ['lines', 'gap', 'lines'])
+        self.assertEqual((events[0]['lines'], events[0]['next']), (['one'], 4))
+        self.assertEqual(events[1]['offset'], 4)
+        self.assertEqual(events[2]['lines'], ['two'])
+
+    def test_closed_event(self):
+        """测试会话关闭后发送剩余数据和closed事件"""
+        subscriber = self.session.subscribe()
+        self.device_write(b'bye')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 3))
+        self.session.close()
+        messages = subscriber.messages()
+        self.assertIn('"lines": ["bye"]', messages[0])
+        self.assertIn('"type": "closed"', messages[-1])
+        self.assertTrue(subscriber.closed)
+
+
+class SerialStreamServerMixin:
+    """在真实HTTP服务器上测试 /serial/<id>/stream"""
+
+    def setUp(self):
+        super().setUp()
+        self.api = FlasherAPI(scratch_config(self, SerialTestConfig))
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.base = self.start_server()
+        self.client = RemoteFlasherClient(self.base)
+        result = self.client.serial_open(self.port, 115200)
+        self.assertTrue(result['success'])
+        self.addCleanup(requests.post, f'{self.base}/serial/close', json={'port': self.port, 'baudrate': 115200})
+        self.session = self.api.app.serial_connections[f'{self.port}_115200']
+
+    def subscribe(self, results, count, **kwargs):
+        """在后台线程中订阅，收到count个lines事件后停止"""
+        subscribed = threading.Event()
+
+        def run():
+            for event in self.client.serial_stream(self.port, 115200, **kwargs):
+                results.append(event)
+                if event['type'] == 'subscribed':
+                    subscribed.set()
+                if event['type'] in ('closed', 'error') or \
+                        sum(len(e.get('lines', [])) for e in results) >= count:
+                    break
+            subscribed.set()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.assertTrue(subscribed.wait(5))
+        return thread
+
+    def test_multiple_subscribers(self):
+        """测试多个订阅者都收到推送的新行"""
+        first, second = [], []
+        threads = [self.subscribe(first, 2), self.subscribe(second, 2)]
+        self.device_write(b'hello\nworld\n')
+        for thread in threads:
+            thread.join(5)
+        for events in (first, second):
+            lines = [line for e in events for line in e.get('lines', [])]
+            self.assertEqual(lines, ['hello', 'world'])
+
+    def test_replay_and_resume(self):
+        """测试since从缓冲区重放，Last-Event-ID从断点继续"""
+        self.device_write(b'a\nb\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 4))
+        events = []
+        self.subscribe(events, 2, since=0).join(5)
+        self.assertEqual(events[-1], {'type': 'lines', 'lines': ['a', 'b'], 'next': 4})
+
+        self.device_write(b'c\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 6))
+        url = f"{self.base}/serial/{self.port.lstrip('/')}_115200/stream"
+        with requests.get(url, headers={'Last-Event-ID': '2'}, stream=True, timeout=5) as response:
+            self.assertEqual(response.headers['Content-Type'].split(';')[0], 'text/event-stream')
+            lines = response.iter_lines(decode_unicode=True)
+            received = [line for _, line in zip(range(5), lines)]
+        self.assertIn('id: 6', received)
+        self.assertIn('data: {"type": "lines", "lines": ["b", "c"], "next": 6}', received)
+
+    def test_close_ends_stream(self):
+        """测试关闭串口后订阅者收到closed事件"""
+        events = []
+        thread = self.subscribe(events, 100)
+        self.client.serial_close(self.port, 115200)
+        thread.join(5)
+        self.assertEqual(events[-1]['type'], 'closed')
+        self.assertFalse(thread.is_alive())
+
+    def test_unknown_connection(self):
+        """测试连接不存在时返回404"""
+        response = requests.get(f'{self.base}/serial/dev/missing_9600/stream', timeout=5)
+        self.assertEqual(response.status_code, 404)
+        response = requests.get(f"{self.base}/serial/{self.port.lstrip('/')}_115200/stream",
+                                params={'since': 'x'}, timeout=5)
+        self.assertEqual(response.status_code, 400)
+
+
+class TestSerialStreamFlask(SerialStreamServerMixin, SerialPortTestCase):
+    """开发服务器 (每个订阅者一个线程)"""
+
+    def start_server(self):
+        server = make_server('127.0.0.1', 0, self.api.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_port}'
+
+
+class TestSerialStreamAsync(SerialStreamServerMixin, SerialPortTestCase):
+    """异步服务器 (订阅者只占用协程)"""
+
+    def start_server(self):
+        server = AsyncFlasherServer(self.api, '127.0.0.1', 0)
+        self.addCleanup(server.stop)
+        return f'http://127.0.0.1:{server.start()}'
+
+
+class TestSuspendForFlash(unittest.TestCase):
+    """烧录同一串口时暂停串口会话测试类"""
+
+    def setUp(self):
+        self.sim = OptibootSimulator(bootloader_timeout=0.2, banner=b'READY\r\n')
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        config = scratch_config(self, SerialTestConfig, PROGRAMMER_BACKEND='stk500', STK500_SYNC_TIMEOUT=0.05,
+                                DEVICES={'uno': {'port': self.sim.port, 'reset_pin': 17}})
+        self.api = FlasherAPI(config)
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.sim.attach_reset(self.api.devices.gpio, 17)
+        self.client = self.api.app.test_client()
+        params = {'port': self.sim.port, 'baudrate': 115200}
+        self.assertTrue(self.client.post('/serial/open', json=params).get_json()['success'])
+        self.addCleanup(self.client.post, '/serial/close', json=params)
+        self.session = self.api.app.serial_connections[f'{self.sim.port}_115200']
+
+    def test_flash_with_open_session(self):
+        """测试串口会话打开时烧录成功，之后会话自动恢复并读取到启动输出"""
+        image = FirmwareImage.from_binary(os.urandom(500))
+        response = self.client.post('/flash/raw', data=image.to_hex(), content_type='application/octet-stream',
+                                    query_string={'device': 'uno'})
+        result = response.get_json()
+        self.assertTrue(result['success'], result['message'])
+        self.assertTrue(image.matches(FirmwareImage.from_binary(bytes(self.sim.flash[:500]))))
+        self.assertFalse(self.session.suspended)
+        self.assertTrue(wait_until(lambda: self.session.buffer.end >= 7))
+        result = self.client.post('/serial/read', json={'port': self.sim.port, 'baudrate': 115200,
+                                                        'since': 0}).get_json()
+        self.assertEqual(result['data'], ['READY'])
+        self.assertEqual(result['gaps'][0]['reason'], 'flash')
+
+    def test_write_while_suspended(self):
+        """测试暂停期间写入返回409"""
+        self.session.suspend()
+        response = self.client.post('/serial/write', json={'port': self.sim.port, 'baudrate': 115200, 'data': 'x'})
+        self.assertEqual(response.status_code, 409)
+        self.session.resume()
+
+    def test_reset_keeps_session(self):
+        """测试只复位时不暂停串口会话"""
+        result = self.client.post('/operation/arduino', query_string={'device': 'uno'}).get_json()
+        self.assertTrue(result['success'])
+        self.assertEqual(self.session.stats()['gaps'], 0)
+        self.assertTrue(wait_until(lambda: self.session.buffer.end >= 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
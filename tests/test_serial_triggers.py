@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+串口触发器测试 (字面量前缀树、组合模式、读取线程中的匹配和 /serial/<id>/triggers)
+"""
+
+import sys
+import os
+import re
+import time
+import random
+import tempfile
+import threading
+import tty
+import unittest
+
+import requests
+import serial
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.serial_session import SerialSession
+from remote_flasher.serial_triggers import SerialTrigger, literal_pattern, compile_patterns
+from remote_flasher.api_server import FlasherAPI
+from remote_flasher.async_server import AsyncFlasherServer
+from tests import scratch_config
+
+
+class TriggerTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEBUG = False
+    SERIAL_MAX_TRIGGERS = 3
+    ASYNC_WORKERS = 2
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestPatterns(unittest.TestCase):
+    """模式编译测试类"""
+
+    def test_literal_pattern_matches_naive_search(self):
+        """测试前缀树正则与逐个查找字面量的最左匹配一致"""
+        rng = random.Random(1)
+        for _ in range(200):
+            literals = {bytes(rng.choice(b'ab.*') for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))}
+            pattern = re.compile(literal_pattern(sorted(literals)))
+            for literal in literals:
+                self.assertTrue(pattern.fullmatch(literal), (literals, literal))
+            text = bytes(rng.choice(b'ab.*c') for _ in range(30))
+            found = pattern.search(text)
+            starts = [i for literal in literals for i in [text.find(literal)] if i >= 0]
+            self.assertEqual(found.start() if found else None, min(starts) if starts else None)
+            if found:
+                # 同一位置优先匹配最长的字面量
+                longest = max(len(l) for l in literals if text.startswith(l, found.start()))
+                self.assertEqual(found.end() - found.start(), longest)
+
+    def test_shared_prefix(self):
+        """测试公共前缀只展开一次"""
+        self.assertEqual(literal_pattern([b'boot', b'booted', b'bad']), b'b(?:ad|oot(?:ed)?)')
+        self.assertEqual(literal_pattern([b'a', b'b', b'c']), b'[abc]')
+
+    def test_backreferences(self):
+        """测试组合后编号反向引用仍指向各自正则中的分组"""
+        found = compile_patterns(['boot'], [r'(\w)\1']).search(b'xx aa')
+        self.assertEqual((found.group(), found.lastgroup), (b'xx', 'r0'))
+        found = compile_patterns([], [r'(\w)\1']).search(b'ab cc')
+        self.assertEqual(found.group(), b'cc')
+
+        pattern = compile_patterns(['ok'], [r'(a)(b)\2\1', r'(x)?(?(1)y|z)\x41[\1]'])
+        self.assertEqual(pattern.search(b'ab abba').group(), b'abba')
+        self.assertEqual(pattern.search(b'zA\x01').group(), b'zA\x01')
+        self.assertEqual(pattern.search(b'xyA\x01').lastgroup, 'r1')
+
+    def test_invalid_patterns(self):
+        """测试没有模式和无效的正则表达式"""
+        self.assertRaises(ValueError, compile_patterns)
+        self.assertRaises(ValueError, compile_patterns, [], ['(unclosed'])
+
+
+class TriggerTestCase(unittest.TestCase):
+    """使用伪终端模拟目标板串口"""
+
+    def setUp(self):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self.addCleanup(os.close, self.master)
+        self.addCleanup(os.close, slave)
+
+    def device_write(self, data):
+        os.write(self.master, data)
+
+
+class TestSerialTrigger(TriggerTestCase):
+    """SerialTrigger测试类"""
+
+    def setUp(self):
+        super().setUp()
+        self.session = SerialSession(serial.Serial(self.port, 115200), 4096).start()
+        self.addCleanup(self.session.close)
+
+    def test_first_match(self):
+        """测试返回第一个匹配的行、模式和偏移"""
+        trigger = self.session.add_trigger(SerialTrigger(self.session, ['READY', 'PANIC'], [r'^temp=(\d+)$']))
+        self.device_write(b'booting\ntemp=42\nREADY\n')
+        self.assertTrue(trigger.wait(2))
+        match = trigger.match
+        self.assertEqual((match['kind'], match['pattern'], match['line']), ('regex', r'^temp=(\d+)$', 'temp=42'))
+        self.assertEqual((match['offset'], match['next']), (8, 16))
+        self.assertEqual(self.session.stats()['triggers'], 1)
+
+    def test_crlf_line_end(self):
+        """测试 $ 匹配 \\r\\n 结尾的行，偏移按原始数据计算"""
+        trigger = self.session.add_trigger(SerialTrigger(self.session, regexes=[r'^READY$']))
+        self.device_write(b'boot\r\nREADY\r\n')
+        self.assertTrue(trigger.wait(2))
+        self.assertEqual((trigger.match['line'], trigger.match['text']), ('READY', 'READY'))
+        self.assertEqual((trigger.match['offset'], trigger.match['next']), (6, 13))
+
+    def test_partial_line(self):
+        """测试未结束的行在换行符到达后才匹配"""
+        trigger = self.session.add_trigger(SerialTrigger(self.session, ['READY']))
+        self.device_write(b'REA')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 3))
+        self.device_write(b'DY')
+        self.assertFalse(trigger.wait(0.2))
+        self.device_write(b'\n')
+        self.assertTrue(trigger.wait(2))
+        self.assertEqual(trigger.match['line'], 'READY')
+
+    def test_since_replays_buffer(self):
+        """测试since之后已缓冲的输出在注册时立即匹配，默认只匹配新输出"""
+        self.device_write(b'Boot OK\n')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 8))
+        replay = self.session.add_trigger(SerialTrigger(self.session, ['boot ok'], ignore_case=True, since=0))
+        self.assertTrue(replay.done)
+        self.assertEqual(replay.match['pattern'], 'boot ok')
+        self.assertEqual(replay.match['text'], 'Boot OK')
+        fresh = self.session.add_trigger(SerialTrigger(self.session, ['Boot OK']))
+        self.assertFalse(fresh.wait(0.1))
+
+    def test_session_closed(self):
+        """测试会话关闭时结束等待，最后一行未结束的数据也参与匹配"""
+        trigger = self.session.add_trigger(SerialTrigger(self.session, ['never']))
+        done = []
+        trigger.on_done(lambda: done.append(True))
+        self.device_write(b'tail never')
+        self.assertTrue(wait_until(lambda: self.session.buffer.end == 10))
+        self.session.close()
+        self.assertTrue(trigger.wait(2))
+        self.assertEqual(trigger.match['line'], 'tail never')
+        self.assertEqual(done, [True])
+
+        other = SerialTrigger(self.session, ['missing'])
+        self.session.add_trigger(other)
+        self.assertTrue(other.closed)
+
+
+class TriggerAPIMixin:
+    """开发服务器和异步服务器共用的接口测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.api = FlasherAPI(scratch_config(self, TriggerTestConfig))
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+        self.base = self.start_server()
+        response = requests.post(f'{self.base}/serial/open', json={'port': self.port, 'baudrate': 115200})
+        self.assertTrue(response.json()['success'])
+        self.addCleanup(requests.post, f'{self.base}/serial/close', json={'port': self.port, 'baudrate': 115200})
+        self.url = f'{self.base}/serial{self.port}_115200/triggers'
+
+    def test_register_then_wait(self):
+        """测试先注册再等待，不会错过之间的输出"""
+        response = requests.post(self.url, json={'literals': ['READY']})
+        self.assertEqual(response.status_code, 201)
+        trigger = response.json()
+        self.assertFalse(trigger['matched'])
+        self.device_write(b'READY\n')
+        result = requests.get(self.base + trigger['wait_url'], params={'timeout': 5}).json()
+        self.assertTrue(result['matched'])
+        self.assertFalse(result['timed_out'])
+        self.assertEqual(result['match']['line'], 'READY')
+        self.assertEqual(requests.delete(f"{self.url}/{trigger['trigger_id']}").status_code, 200)
+        self.assertEqual(requests.get(f"{self.url}/{trigger['trigger_id']}").status_code, 404)
+
+    def test_wait_in_request(self):
+        """测试注册时等待第一个匹配，返回后删除触发器"""
+        timer = threading.Timer(0.2, self.device_write, (b'noise\nFAIL: assert\n',))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        result = requests.post(self.url, json={'regexes': [r'^(PASS|FAIL)\b'], 'wait': 5}).json()
+        self.assertEqual(result['match']['text'], 'FAIL')
+        session = self.api.app.serial_connections[f'{self.port}_115200']
+        self.assertEqual(session.triggers, {})
+
+    def test_wait_timeout(self):
+        """测试等待超时"""
+        start = time.monotonic()
+        result = requests.post(self.url, json={'literals': ['never'], 'wait': 0.2}).json()
+        self.assertTrue(result['timed_out'])
+        self.assertFalse(result['matched'])
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_errors(self):
+        """测试无效参数和不存在的连接或触发器"""
+        self.assertEqual(requests.post(self.url, json={'regexes': ['(']}).status_code, 400)
+        self.assertEqual(requests.post(self.url, json={'literals': 'READY'}).status_code, 400)
+        self.assertEqual(requests.post(self.url, json={'literals': ['x'], 'wait': 'soon'}).status_code, 400)
+        self.assertEqual(requests.post(f'{self.base}/serial/dev/ttyNONE_9600/triggers',
+                                       json={'literals': ['x']}).status_code, 404)
+        self.assertEqual(requests.get(f'{self.url}/missing/wait').status_code, 404)
+
+    def test_trigger_limit(self):
+        """测试触发器数量上限，已结束的触发器先被删除"""
+        ids = [requests.post(self.url, json={'literals': [f'x{i}']}).json()['trigger_id'] for i in range(3)]
+        self.assertEqual(requests.post(self.url, json={'literals': ['y']}).status_code, 400)
+        self.device_write(b'x1\n')
+        self.assertEqual(requests.get(f'{self.url}/{ids[1]}/wait', params={'timeout': 5}).json()['match']['line'], 'x1')
+        self.assertEqual(requests.post(self.url, json={'literals': ['y']}).status_code, 201)
+        self.assertEqual(requests.get(f'{self.url}/{ids[1]}').status_code, 404)
+
+
+class TestTriggerAPIFlask(TriggerAPIMixin, TriggerTestCase):
+    """开发服务器"""
+
+    def start_server(self):
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, self.api.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        return f'http://127.0.0.1:{server.server_port}'
+
+
+class TestTriggerAPIAsync(TriggerAPIMixin, TriggerTestCase):
+    """异步服务器"""
+
+    def start_server(self):
+        server = AsyncFlasherServer(self.api, '127.0.0.1', 0)
+        port = server.start()
+        self.addCleanup(server.stop)
+        return f'http://127.0.0.1:{port}'
+
+    def test_waiters_do_not_use_workers(self):
+        """测试等待中的请求不占用线程池"""
+        results = []
+
+        def wait():
+            results.append(requests.post(self.url, json={'literals': ['GO'], 'wait': 5}).json())
+
+        threads = [threading.Thread(target=wait) for _ in range(TriggerTestConfig.ASYNC_WORKERS + 1)]
+        for thread in threads:
+            thread.start()
+        session = self.api.app.serial_connections[f'{self.port}_115200']
+        self.assertTrue(wait_until(lambda: len(session.triggers) == len(threads)))
+        # 线程池被占满时普通接口会阻塞
+        self.assertEqual(requests.get(f'{self.base}/status', timeout=2).status_code, 200)
+        self.device_write(b'GO\n')
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual([r['match']['line'] for r in results], ['GO'] * len(threads))
+
+
+if __name__ == '__main__':
+    unittest.main()
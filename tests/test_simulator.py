@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Optiboot模拟器测试 (复位线配对、传输延迟、故障注入和完整烧录流程)
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.gpio import FakeGPIOBackend
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.stk500 import STK500v1, STK500Error
+from remote_flasher.avr_flasher import AVRFlasher
+
+import serial
+
+RESET_PIN = 4
+
+
+class SimulatorTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEBUG = False
+    PROGRAMMER_BACKEND = 'stk500'
+    STK500_SYNC_TIMEOUT = 0.05
+    AVRDUDE_PATH = shutil.which('avrdude') or '/usr/bin/avrdude'
+
+
+class TestSimulatorTarget(unittest.TestCase):
+    """模拟目标板行为测试类"""
+
+    def _connect(self, sim):
+        sim.start()
+        self.addCleanup(sim.stop)
+        conn = serial.Serial(sim.port, 115200, timeout=0.5)
+        self.addCleanup(conn.close)
+        return STK500v1(conn)
+
+    def test_reset_line(self):
+        """测试连接复位引脚后只有复位才进入bootloader，超时后启动应用程序"""
+        gpio = FakeGPIOBackend()
+        gpio.setup_output(RESET_PIN, 1)
+        sim = OptibootSimulator(bootloader_timeout=0.2)
+        sim.attach_reset(gpio, RESET_PIN)
+        stk = self._connect(sim)
+
+        with self.assertRaises(STK500Error):
+            stk.sync(attempts=2, timeout=0.05)
+
+        gpio.write(RESET_PIN, 0)
+        self.assertFalse(sim.in_bootloader)
+        gpio.write(RESET_PIN, 1)
+        self.assertEqual(stk.sync(timeout=0.05), 1)
+        self.assertEqual(sim.resets, 1)
+
+        time.sleep(0.3)
+        self.assertFalse(sim.in_bootloader)
+
+    def test_boot_delay(self):
+        """测试bootloader启动延迟期间不应答"""
+        sim = OptibootSimulator(boot_delay=0.15)
+        stk = self._connect(sim)
+        sim.reset()
+        self.assertGreater(stk.sync(attempts=20, timeout=0.05), 1)
+
+    def test_byte_delay(self):
+        """测试按波特率模拟传输时间"""
+        sim = OptibootSimulator(baudrate=9600)
+        self.assertAlmostEqual(sim.byte_delay, 10 / 9600)
+        stk = self._connect(sim)
+        stk.sync()
+        start = time.perf_counter()
+        stk.read_page(0, 128)
+        self.assertGreaterEqual(time.perf_counter() - start, 128 * 10 / 9600)
+
+    def test_sync_loss(self):
+        """测试同步丢失故障"""
+        sim = OptibootSimulator(sync_loss_after=3)
+        stk = self._connect(sim)
+        stk.sync()
+        stk.read_signature()
+        stk.load_address(0)
+        with self.assertRaises(STK500Error):
+            stk.read_page(0, 128)
+
+
+class TestFlashPipeline(unittest.TestCase):
+    """完整 复位-烧录-复位 流程测试类"""
+
+    def setUp(self):
+        self.gpio = FakeGPIOBackend()
+        self.sim = OptibootSimulator(bootloader_timeout=1.0)
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        self.flasher = AVRFlasher(SimulatorTestConfig, gpio_backend=self.gpio, reset_pin=RESET_PIN)
+        self.sim.attach_reset(self.gpio, RESET_PIN)
+
+        sleep = patch('remote_flasher.avr_flasher.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+        self.data = os.urandom(2000)
+        with tempfile.NamedTemporaryFile('wb', suffix='.hex', delete=False) as f:
+            f.write(FirmwareImage.from_binary(self.data).to_hex())
+        self.hex_file = f.name
+        self.addCleanup(os.unlink, self.hex_file)
+
+    def test_arduino_operation(self):
+        """测试通过复位线进入bootloader并烧录"""
+        result = self.flasher.perform_arduino_operation(self.hex_file, port=self.sim.port)
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(bytes(self.sim.flash[:2000]), self.data)
+        self.assertGreaterEqual(self.sim.resets, 2)
+
+    def test_no_reset_no_bootloader(self):
+        """测试没有复位时bootloader不应答"""
+        self.flasher.gpio_available = False
+        result = self.flasher.flash_hex_file(self.hex_file, port=self.sim.port)
+        self.assertFalse(result['success'])
+        self.assertIn('not responding', result['message'])
+
+    def test_sync_loss_mid_flash(self):
+        """测试烧录中途同步丢失，失败并清除烧录历史"""
+        self.flasher.history.record(self.sim.port, 'previous', mcu='atmega328p')
+        self.sim.sync_loss_after = 10
+        result = self.flasher.flash_hex_file(self.hex_file, port=self.sim.port)
+        self.assertFalse(result['success'])
+        self.assertIn('Timeout', result['message'])
+        self.assertIsNone(self.flasher.history.get(self.sim.port))
+
+    def test_bad_signature(self):
+        """测试错误签名时拒绝写入"""
+        self.sim.bad_signature = True
+        result = self.flasher.flash_hex_file(self.hex_file, port=self.sim.port)
+        self.assertFalse(result['success'])
+        self.assertIn('0x000000', result['message'])
+        self.assertEqual(self.sim.pages_written, 0)
+
+    @unittest.skipUnless(os.path.exists(SimulatorTestConfig.AVRDUDE_PATH), 'avrdude not installed')
+    def test_avrdude_backend(self):
+        """测试avrdude后端通过模拟器烧录"""
+        result = self.flasher.flash_hex_file(self.hex_file, port=self.sim.port, backend='avrdude')
+        self.assertTrue(result['success'], result['output'])
+        self.assertEqual(bytes(self.sim.flash[:2000]), self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
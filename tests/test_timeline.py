@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+复位时序测试 (bootloader就绪探测、时序配置和单次复位流程)
+"""
+
+import sys
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.gpio import FakeGPIOBackend
+from remote_flasher.hexfile import FirmwareImage
+from remote_flasher.simulator import OptibootSimulator
+from remote_flasher.timeline import ResetProfile, ResetTimeline
+from remote_flasher.avr_flasher import AVRFlasher
+from remote_flasher.devices import DeviceRegistry
+
+RESET_PIN = 4
+
+
+class TimelineTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEBUG = False
+    PROGRAMMER_BACKEND = 'stk500'
+    STK500_SYNC_TIMEOUT = 0.05
+    RESET_PROFILES = dict(TestingConfig.RESET_PROFILES, fast={
+        'reset_hold': 0.01, 'probe': True, 'probe_interval': 0.02,
+        'boot_timeout': 0.3, 'settle': 0.2, 'restart_hold': 0.01})
+    DEFAULT_RESET_PROFILE = 'fast'
+
+
+class TestResetProfile(unittest.TestCase):
+    """复位时序配置测试类"""
+
+    def test_from_config(self):
+        """测试按名称加载时序配置"""
+        profile = ResetProfile.from_config(TimelineTestConfig)
+        self.assertEqual(profile.name, 'fast')
+        legacy = ResetProfile.from_config(TimelineTestConfig, 'legacy')
+        self.assertFalse(legacy.probe)
+        self.assertEqual(legacy.to_dict()['reset_hold'], 0.5)
+
+    def test_unknown_profile(self):
+        """测试未知的时序名称"""
+        with self.assertRaises(ValueError):
+            ResetProfile.from_config(TimelineTestConfig, 'nope')
+        registry = DeviceRegistry(TimelineTestConfig)
+        self.addCleanup(registry.cleanup)
+        with self.assertRaises(ValueError):
+            registry.register('uno', port='/dev/ttyX', reset_profile='nope')
+
+
+class TestResetTimeline(unittest.TestCase):
+    """复位时序执行测试类"""
+
+    def setUp(self):
+        self.gpio = FakeGPIOBackend()
+        self.gpio.setup_output(RESET_PIN, 1)
+        self.profile = ResetProfile.from_config(TimelineTestConfig)
+
+    def _control(self, reset=True):
+        self.gpio.write(RESET_PIN, 0 if reset else 1)
+        return True
+
+    def _simulator(self, **kwargs):
+        sim = OptibootSimulator(**kwargs)
+        sim.attach_reset(self.gpio, RESET_PIN)
+        sim.start()
+        self.addCleanup(sim.stop)
+        return sim
+
+    def test_probe_hands_off_early(self):
+        """测试bootloader应答后立即返回，不等待固定时间"""
+        sim = self._simulator(boot_delay=0.06)
+        timeline = ResetTimeline(self._control, self.profile)
+        self.assertTrue(timeline.enter_bootloader(sim.port, 115200, 'arduino'))
+        self.assertGreaterEqual(timeline.timings['bootloader_wait'], 0.05)
+        self.assertLess(timeline.timings['bootloader_wait'], self.profile.boot_timeout)
+        self.assertTrue(sim.in_bootloader)
+
+    def test_probe_timeout(self):
+        """测试bootloader不应答时探测超时"""
+        sim = self._simulator(sync_loss_after=0)
+        timeline = ResetTimeline(self._control, self.profile)
+        self.assertFalse(timeline.enter_bootloader(sim.port, 115200, 'arduino'))
+        self.assertGreaterEqual(timeline.timings['bootloader_wait'], self.profile.boot_timeout)
+
+    def test_fixed_settle(self):
+        """测试不支持探测的编程器按固定时间等待"""
+        timeline = ResetTimeline(self._control, self.profile)
+        with patch('remote_flasher.timeline.time.sleep') as sleep:
+            self.assertIsNone(timeline.enter_bootloader('/dev/null', 115200, 'usbasp'))
+        sleep.assert_called_with(self.profile.settle)
+
+    def test_no_reset_control(self):
+        """测试无法控制复位时不探测"""
+        timeline = ResetTimeline(lambda reset=True: False, self.profile)
+        self.assertIsNone(timeline.enter_bootloader('/dev/null', 115200, 'arduino'))
+        self.assertEqual(timeline.timings, {})
+
+
+class TestSingleResetPipeline(unittest.TestCase):
+    """复位-烧录-复位流程只复位一次测试类"""
+
+    def setUp(self):
+        self.gpio = FakeGPIOBackend()
+        self.sim = OptibootSimulator(boot_delay=0.03)
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        self.flasher = AVRFlasher(TimelineTestConfig, gpio_backend=self.gpio, reset_pin=RESET_PIN)
+        self.sim.attach_reset(self.gpio, RESET_PIN)
+
+        data = os.urandom(600)
+        with tempfile.NamedTemporaryFile('wb', suffix='.hex', delete=False) as f:
+            f.write(FirmwareImage.from_binary(data).to_hex())
+        self.hex_file = f.name
+        self.addCleanup(os.unlink, self.hex_file)
+
+    def test_arduino_operation_resets_twice(self):
+        """测试完整流程只进入一次bootloader、重启一次，并记录各阶段耗时"""
+        start = time.perf_counter()
+        result = self.flasher.perform_arduino_operation(self.hex_file, port=self.sim.port)
+        self.assertTrue(result['success'], result['message'])
+        # 一次进入bootloader的复位 + 一次烧录后重启
+        self.assertEqual(self.sim.resets, 2)
+        self.assertLessEqual({'validate', 'reset', 'bootloader_wait', 'program', 'restart'},
+                             set(result['timings']))
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_reset_only(self):
+        """测试没有hex文件时只重启一次"""
+        result = self.flasher.perform_arduino_operation()
+        self.assertTrue(result['success'])
+        self.assertEqual(self.sim.resets, 1)
+        self.assertIn('restart', result['timings'])
+
+    def test_stream_reports_ready(self):
+        """测试流式接口报告bootloader就绪"""
+        events = list(self.flasher.flash_hex_file_stream(self.hex_file, port=self.sim.port))
+        self.assertTrue(any(e.get('message') == 'Bootloader ready' for e in events))
+        self.assertEqual(events[-2]['type'], 'success')
+        self.assertIn('restart', events[-1]['timings'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+URL固件缓存测试 (条件请求重新验证、TTL、LRU淘汰和并发下载)
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# 添加src目录和项目根目录 (tests包) 到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from remote_flasher.config import TestingConfig
+from remote_flasher.download import DownloadError, DownloadHashMismatchError
+from remote_flasher.url_cache import URLCache
+from remote_flasher.api_server import FlasherAPI
+from tests import scratch_config
+
+from tests.test_download import FirmwareServer
+
+
+class CacheTestConfig(TestingConfig):
+    UPLOAD_FOLDER = tempfile.gettempdir()
+    LOG_FILE = None
+    DEBUG = False
+
+
+class TestURLCache(unittest.TestCase):
+    """URL缓存测试类"""
+
+    def setUp(self):
+        self.server = FirmwareServer()
+        self.addCleanup(self.server.stop)
+        self.data = os.urandom(4096)
+        self.server.files['fw.hex'] = self.data
+        self.url = self.server.url('fw.hex')
+
+    def test_hit_within_ttl(self):
+        """测试TTL内直接使用缓存"""
+        cache = URLCache(1024 * 1024, ttl=60)
+        self.assertEqual(cache.get(self.url), self.data)
+        self.assertEqual(cache.get(self.url), self.data)
+        self.assertEqual(len(self.server.requests), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['total_bytes'], 4096)
+
+    def test_revalidate_with_etag(self):
+        """测试过期后用If-None-Match重新验证，304时使用缓存"""
+        cache = URLCache(1024 * 1024, ttl=0)
+        cache.get(self.url)
+        self.assertEqual(cache.get(self.url), self.data)
+        self.assertEqual(self.server.requests[1]['If-None-Match'], '"v1"')
+        self.assertEqual(cache.stats()['revalidated'], 1)
+
+    def test_revalidate_with_last_modified(self):
+        """测试没有ETag时用If-Modified-Since重新验证"""
+        self.server.etag = None
+        cache = URLCache(1024 * 1024, ttl=0)
+        cache.get(self.url)
+        self.assertEqual(cache.get(self.url), self.data)
+        self.assertEqual(self.server.requests[1]['If-Modified-Since'], self.server.last_modified)
+        self.assertEqual(cache.stats()['revalidated'], 1)
+
+    def test_changed_content(self):
+        """测试服务器内容变化后重新下载"""
+        cache = URLCache(1024 * 1024, ttl=0)
+        cache.get(self.url)
+        new = os.urandom(100)
+        self.server.files['fw.hex'] = new
+        self.server.etag = '"v2"'
+        self.assertEqual(cache.get(self.url), new)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_expected_sha256(self):
+        """测试哈希一致时不访问服务器，不一致时无条件重新下载"""
+        cache = URLCache(1024 * 1024, ttl=0)
+        cache.get(self.url)
+        self.assertEqual(cache.get(self.url, hashlib.sha256(self.data).hexdigest()), self.data)
+        self.assertEqual(len(self.server.requests), 1)
+
+        with self.assertRaises(DownloadHashMismatchError):
+            cache.get(self.url, '0' * 64)
+        self.assertNotIn('If-None-Match', self.server.requests[1])
+        # 校验失败不影响原有缓存
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_lru_eviction(self):
+        """测试总大小超过上限时淘汰最久未使用的固件"""
+        for name in ('a', 'b', 'c'):
+            self.server.files[name] = os.urandom(4000)
+        cache = URLCache(10000, ttl=60)
+        cache.get(self.server.url('a'))
+        cache.get(self.server.url('b'))
+        cache.get(self.server.url('a'))
+        cache.get(self.server.url('c'))
+        stats = cache.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['entries'], 2)
+        cache.get(self.server.url('a'))
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_disabled(self):
+        """测试上限为0时不缓存"""
+        cache = URLCache(0, ttl=60)
+        cache.get(self.url)
+        cache.get(self.url)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_concurrent_single_download(self):
+        """测试同一URL的并发请求只下载一次"""
+        cache = URLCache(1024 * 1024, ttl=60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(self.url))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [self.data] * 5)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(cache._fetch_locks, {})
+
+    def test_fetch_locks_released(self):
+        """测试每个URL的下载锁在请求结束后删除 (包括下载失败)"""
+        cache = URLCache(0, ttl=60)
+        for index in range(20):
+            self.server.files[f'fw{index}.hex'] = self.data
+            cache.get(self.server.url(f'fw{index}.hex'))
+        with self.assertRaises(DownloadError):
+            cache.get(self.server.url('missing.hex'))
+        self.assertEqual(cache._fetch_locks, {})
+
+
+class TestURLCacheAPI(unittest.TestCase):
+    """URL缓存API测试类"""
+
+    def setUp(self):
+        self.api = FlasherAPI(scratch_config(self, CacheTestConfig))
+        self.client = self.api.app.test_client()
+        self.addCleanup(self.api.devices.cleanup)
+        self.addCleanup(self.api.jobs.shutdown, timeout=1)
+
+    def test_shared_by_devices(self):
+        """测试所有设备共享同一个缓存"""
+        device = self.api.devices.resolve(port='/dev/ttyACM0')
+        self.assertIs(device.flasher.url_cache, self.api.flasher.url_cache)
+
+    def test_status_counters(self):
+        """测试状态接口返回缓存计数"""
+        stats = self.client.get('/status').get_json()['url_cache']
+        self.assertEqual(stats['hits'], 0)
+        self.assertEqual(stats['max_bytes'], CacheTestConfig.URL_CACHE_MAX_BYTES)
+
+
+if __name__ == '__main__':
+    unittest.main()